@@ -24,6 +24,10 @@ class Settings:
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_URL: str = os.getenv("REDIS_URL") or f"redis://{REDIS_HOST}:{REDIS_PORT}"
 
+    # Admin dashboard stats snapshot: how often the background refresher
+    # recomputes it (seconds). The endpoint also accepts ?refresh=true.
+    DASHBOARD_STATS_REFRESH_SECONDS: int = int(os.getenv("DASHBOARD_STATS_REFRESH_SECONDS", "60"))
+
     # JWT - SECURITY: SECRET_KEY MUST be set via environment variable in all deployed environments
     # Only local development (ENVIRONMENT=development) allows auto-generated keys
     _secret_key_env: Optional[str] = os.getenv("SECRET_KEY")
@@ -109,6 +113,8 @@ class Settings:
 
     # Email Service Configuration
     RESEND_API_KEY: Optional[str] = os.getenv("RESEND_API_KEY")
+    # Overridable so broadcasts can run against scripts/resend_stub.py.
+    RESEND_BASE_URL: str = os.getenv("RESEND_BASE_URL", "https://api.resend.com")
     FROM_EMAIL: str = os.getenv("FROM_EMAIL", "onboarding@resend.dev")
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
@@ -138,6 +144,9 @@ class Settings:
 
     # Anthropic (Claude) API - used by moderation_service and ai_chat
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
+    # "anthropic" (default) or "fake" — deterministic keyword moderation
+    # for tests and offline development.
+    MODERATION_BACKEND: str = os.getenv("MODERATION_BACKEND", "anthropic")
 
     # Community: when True, trialing users can NOT post or comment (only
     # status=ACTIVE on Advanced/Performer can). Default False = trial users
@@ -164,6 +173,16 @@ class Settings:
     # AI Rate Limiting Configuration
     AI_RATE_LIMIT_REQUESTS: int = int(os.getenv("AI_RATE_LIMIT_REQUESTS", "20"))  # requests per window
     AI_RATE_LIMIT_WINDOW_SECONDS: int = int(os.getenv("AI_RATE_LIMIT_WINDOW_SECONDS", "60"))  # window in seconds
+    # Chats streaming from the model at once, per worker (also the size of
+    # the shared client's connection pool).
+    AI_CHAT_MAX_CONCURRENT: int = int(os.getenv("AI_CHAT_MAX_CONCURRENT", "50"))
+
+    # Background jobs (services/job_queue). Each API process runs
+    # JOB_WORKERS_IN_API worker threads; set 0 when scripts/job_worker.py
+    # runs as its own service. JOB_QUEUE_EAGER runs jobs inline at enqueue
+    # time (tests, offline development).
+    JOB_WORKERS_IN_API: int = int(os.getenv("JOB_WORKERS_IN_API", "1"))
+    JOB_QUEUE_EAGER: bool = os.getenv("JOB_QUEUE_EAGER", "false").lower() == "true"
 
     # Meta Conversions API (server-side ad event tracking)
     # Pixel ID is also safe to expose client-side via NEXT_PUBLIC_META_PIXEL_ID.
@@ -173,5 +192,7 @@ class Settings:
     META_CAPI_ACCESS_TOKEN: Optional[str] = os.getenv("META_CAPI_ACCESS_TOKEN")
     META_TEST_EVENT_CODE: Optional[str] = os.getenv("META_TEST_EVENT_CODE")
     META_API_VERSION: str = os.getenv("META_API_VERSION", "v20.0")
+    # Override only to point CAPI at a local stub (scripts/meta_capi_stub.py).
+    META_GRAPH_BASE_URL: str = os.getenv("META_GRAPH_BASE_URL", "https://graph.facebook.com")
 
 settings = Settings()
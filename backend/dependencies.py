@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from models import get_db
 from models.user import User, UserRole
 from services.auth_service import decode_access_token
+from services import principal_service
+from services.principal_service import Principal
 from services.redis_service import is_token_blacklisted
 import uuid
 
@@ -30,13 +32,27 @@ def _extract_token(request: Request, bearer_token: Optional[str]) -> Optional[st
     return None
 
 
-def get_current_user(
+def _user_id_from_token(token: str) -> Optional[uuid.UUID]:
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    user_id_str: Optional[str] = payload.get("sub")
+    if user_id_str is None:
+        return None
+    try:
+        return uuid.UUID(user_id_str)
+    except ValueError:
+        return None
+
+
+def get_principal(
     request: Request,
     bearer_token: Optional[str] = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     """
-    Get current authenticated user from Bearer token or httpOnly cookie.
+    Authenticate the request and return its Principal (user + subscription
+    state), resolved once and memoized for the rest of the request.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,24 +68,26 @@ def get_current_user(
     if is_token_blacklisted(token):
         raise credentials_exception
 
-    payload = decode_access_token(token)
-    if payload is None:
+    user_id = _user_id_from_token(token)
+    if user_id is None:
         raise credentials_exception
 
-    user_id_str: str = payload.get("sub")
-    if user_id_str is None:
+    principal = principal_service.resolve(db, user_id)
+    if principal is None:
         raise credentials_exception
 
-    try:
-        user_id = uuid.UUID(user_id_str)
-    except ValueError:
-        raise credentials_exception
+    return principal
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
 
-    return user
+def get_current_user(
+    request: Request,
+    bearer_token: Optional[str] = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Get current authenticated user from Bearer token or httpOnly cookie.
+    """
+    return get_principal(request, bearer_token, db).user
 
 
 def get_current_user_optional(
@@ -83,21 +101,11 @@ def get_current_user_optional(
         return None
     
     try:
-        payload = decode_access_token(token)
-        if payload is None:
-            return None
-        
-        user_id_str: str = payload.get("sub")
-        if user_id_str is None:
+        user_id = _user_id_from_token(token)
+        if user_id is None:
             return None
-        
-        try:
-            user_id = uuid.UUID(user_id_str)
-        except ValueError:
-            return None
-        
-        user = db.query(User).filter(User.id == user_id).first()
-        return user
+        principal = principal_service.resolve(db, user_id)
+        return principal.user if principal else None
     except Exception:
         return None
 
@@ -116,3 +124,13 @@ def get_admin_user(
         )
     return current_user
 
+
+
+def get_token_expiry(
+    request: Request,
+    bearer_token: Optional[str] = Depends(oauth2_scheme),
+) -> Optional[float]:
+    """Expiry (epoch seconds) of the request's access token, for long-lived responses."""
+    token = _extract_token(request, bearer_token)
+    payload = decode_access_token(token) if token else None
+    return payload.get("exp") if payload else None
@@ -9,6 +9,7 @@ from routers import api_router
 from routers.mux import mux_webhook_handler
 from config import settings
 from models import get_db
+from utils.rate_limit_headers import RateLimitHeadersMiddleware
 from sqlalchemy.orm import Session
 from typing import Optional
 
@@ -88,7 +89,11 @@ app = FastAPI(
     redoc_url="/redoc" if not settings._is_production else None,
 )
 
-# Security headers middleware (innermost - runs last)
+# X-RateLimit-* headers for requests that went through a rate limiter
+# (innermost, so it sees the endpoint's own context)
+app.add_middleware(RateLimitHeadersMiddleware)
+
+# Security headers middleware
 app.add_middleware(SecurityHeadersMiddleware)
 
 # Session middleware - Required for OAuth state management and session support
@@ -175,6 +180,115 @@ def _ensure_tables() -> None:
             "post_replies thread flatten skipped: %s", exc
         )
 
+    # Community search: tsvector column + trigger and trigram indexes.
+    # The model declares posts.search_vector (deferred, so feeds don't
+    # touch it) — without this migration only /community/search fails.
+    try:
+        from migrations.migration_031_post_search import run as _post_search
+        _post_search()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").error(
+            "post search migration FAILED: %s (/community/search will 500 "
+            "until `python -m migrations.migration_031_post_search` succeeds).",
+            exc,
+        )
+
+    # Materialized per-user counters on user_stats. The model declares the
+    # columns, so every badge/profile stats read fails until this has run.
+    try:
+        from migrations.migration_032_user_stats_counters import run as _user_stats_counters
+        _user_stats_counters()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").error(
+            "user_stats counters migration FAILED: %s (badge and profile stats "
+            "will 500 until `python -m migrations.migration_032_user_stats_counters` succeeds).",
+            exc,
+        )
+
+    # Broadcast notifications: collapse legacy per-user course_published
+    # rows into one broadcast each, and add the retention indexes.
+    try:
+        from migrations.migration_033_broadcast_notifications import run as _broadcast_notifications
+        _broadcast_notifications()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "broadcast notifications migration skipped: %s", exc
+        )
+
+    # Shop stock counters. The model declares the table (create_all makes
+    # it); this seeds counters for periods already sold in.
+    try:
+        from migrations.migration_034_shop_stock_counters import run as _shop_stock_counters
+        _shop_stock_counters()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "shop stock counters migration skipped: %s", exc
+        )
+
+    # Clave ledger: balance snapshots for reconciliation and the
+    # (user_id, created_at) index behind paged wallet history.
+    try:
+        from migrations.migration_035_clave_ledger import run as _clave_ledger
+        _clave_ledger()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "clave ledger migration skipped: %s", exc
+        )
+
+    # Email send ledger: per-recipient status for resumable broadcasts.
+    try:
+        from migrations.migration_036_email_send_ledger import run as _email_send_ledger
+        _email_send_ledger()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "email send ledger migration skipped: %s", exc
+        )
+
+    # AI moderation runs on a background pipeline; starting it here also
+    # sweeps posts/replies a previous process left 'pending'.
+    try:
+        from services import moderation_service
+        moderation_service.start()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "moderation pipeline start skipped: %s", exc
+        )
+
+    # Request side effects (badges, reply notifications, Mux cleanup,
+    # transactional email) run on the Redis job queue; each API process
+    # also drains it unless JOB_WORKERS_IN_API=0 (scripts/job_worker.py).
+    try:
+        from services import job_queue
+        job_queue.start()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "job workers start skipped: %s", exc
+        )
+
+    # Admin dashboard stats are served from a snapshot this refresher
+    # keeps warm (only one worker recomputes per interval).
+    try:
+        from services import dashboard_stats_service
+        dashboard_stats_service.start()
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "dashboard stats refresher start skipped: %s", exc
+        )
+
+    # Leaderboards are served from Redis sorted sets maintained by the
+    # community write paths. On a cold Redis (fresh deploy, flush) build
+    # them from SQL once; the rebuild takes a Redis lock so only one
+    # worker does the work. Reads fall back to SQL until it finishes.
+    try:
+        from models import get_session_local
+        from services import leaderboard_service
+        with get_session_local()() as session:
+            leaderboard_service.ensure_built(session)
+    except Exception as exc:
+        logging.getLogger("uvicorn.error").warning(
+            "leaderboard warm-up skipped: %s", exc
+        )
+
     # Seed release_schedule_items with the launch lineup so the admin
     # editor and the landing page agree on day one. Only inserts when
     # the table is empty — never overwrites later edits.
@@ -214,6 +328,41 @@ def _ensure_tables() -> None:
         )
 
 
+@app.on_event("startup")
+def _load_knowledge_base() -> None:
+    # Map the AI chat's course-notes index (scripts/build_kb_index.py).
+    from services import knowledge_base
+    knowledge_base.load()
+
+
+@app.on_event("shutdown")
+def _flush_analytics() -> None:
+    # Drain the write-behind analytics buffer so events accepted by this
+    # worker aren't lost on deploy / scale-down, then send queued CAPI
+    # events (their status stamps need the rows to exist first).
+    from services import analytics_buffer, meta_capi_service
+    analytics_buffer.shutdown()
+    meta_capi_service.shutdown()
+    # Unfinished moderation jobs stay 'pending' and are swept on next boot.
+    from services import moderation_service
+    moderation_service.stop()
+    from services import dashboard_stats_service
+    dashboard_stats_service.stop()
+    # A job cut off mid-run is re-queued when its lease expires.
+    from services import job_queue
+    job_queue.stop()
+    # Open notification streams end at their next heartbeat; EventSource
+    # reconnects to another worker with Last-Event-ID.
+    from services import notification_stream
+    notification_stream.stop()
+
+
+@app.on_event("shutdown")
+async def _close_ai_client() -> None:
+    from routers.ai_chat import close_anthropic_client
+    await close_anthropic_client()
+
+
 # Include routers
 app.include_router(api_router, prefix="/api")
 
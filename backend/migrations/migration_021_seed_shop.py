@@ -72,6 +72,10 @@ def run():
             trans.rollback()
             raise
 
+    # Raw SQL skips the ORM hooks that refresh running workers' catalogs.
+    from services import shop_service
+    shop_service.invalidate_catalog()
+
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,46 @@
+"""
+Migration 030: composite indexes for keyset (cursor) pagination.
+
+The community feed, search, saved posts and notifications now page with
+an opaque (created_at, id) cursor instead of OFFSET. Each list needs an
+index whose column order matches its ORDER BY so that "rows strictly
+after the cursor" is a single index range scan:
+
+  posts         (created_at DESC, id DESC)            — unfiltered feed / search
+  posts         (post_type, created_at DESC, id DESC) — Stage / Lab tabs
+  saved_posts   (user_id, created_at DESC, post_id DESC)
+  notifications (user_id, created_at DESC, id DESC)
+
+Built CONCURRENTLY so the posts table isn't write-locked during the build;
+that can't run inside a transaction, hence AUTOCOMMIT.
+
+Idempotent: CREATE INDEX ... IF NOT EXISTS. Safe to re-run. If a
+concurrent build was interrupted, drop the INVALID index and re-run.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import get_engine
+
+
+INDEXES = [
+    ("idx_posts_created_id", "posts (created_at DESC, id DESC)"),
+    ("idx_posts_type_created_id", "posts (post_type, created_at DESC, id DESC)"),
+    ("idx_saved_posts_user_created", "saved_posts (user_id, created_at DESC, post_id DESC)"),
+    ("idx_notifications_user_created", "notifications (user_id, created_at DESC, id DESC)"),
+]
+
+
+def run():
+    engine = get_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, target in INDEXES:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target};"))
+            print(f"Migration 030: {name} ready.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,121 @@
+"""
+Migration 031: full-text + trigram search for community posts.
+
+Replaces the old ILIKE '%q%' search (sequential scan, no ranking) with:
+
+  posts.search_vector  TSVECTOR
+      setweight(title, 'A') || setweight(tags, 'A') || setweight(body, 'B')
+      maintained by a BEFORE INSERT/UPDATE trigger (a GENERATED column
+      can't be used: array_to_string is not IMMUTABLE).
+  idx_posts_search_vector             GIN (search_vector)
+  idx_posts_title_trgm                GIN (title gin_trgm_ops)      — fuzzy title
+  idx_user_profiles_username_trgm     GIN (username gin_trgm_ops)   — ILIKE / fuzzy handle
+
+The text search config ('english') must match search_service.TS_CONFIG.
+
+Runs at every API startup, so the steady state takes no lock on posts:
+the column and trigger are only added when the catalog says they're
+missing (ALTER TABLE / CREATE TRIGGER take an ACCESS EXCLUSIVE lock even
+when there's nothing to do), the backfill commits in batches, and the
+indexes are built CONCURRENTLY in AUTOCOMMIT, like migrations 030 / 033.
+
+Idempotent: catalog checks, CREATE OR REPLACE for the functions, IF NOT
+EXISTS for the indexes, backfill only touches NULL vectors. Safe to
+re-run. If a concurrent build was interrupted, drop the INVALID index
+and re-run.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import get_engine
+
+
+BACKFILL_BATCH = 5000
+
+INDEXES = [
+    ("idx_posts_search_vector", "posts USING gin (search_vector)"),
+    ("idx_posts_title_trgm", "posts USING gin (title gin_trgm_ops)"),
+    ("idx_user_profiles_username_trgm", "user_profiles USING gin (username gin_trgm_ops)"),
+]
+
+
+def _column_exists(conn) -> bool:
+    return conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'posts' AND column_name = 'search_vector'
+    """)).first() is not None
+
+
+def _trigger_exists(conn) -> bool:
+    return conn.execute(text("""
+        SELECT 1 FROM pg_trigger
+        WHERE tgrelid = 'posts'::regclass AND tgname = 'posts_search_vector' AND NOT tgisinternal
+    """)).first() is not None
+
+
+def run():
+    engine = get_engine()
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+            if not _column_exists(conn):
+                conn.execute(text("ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;"))
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION post_search_document(
+                    p_title TEXT, p_body TEXT, p_tags TEXT[]
+                ) RETURNS TSVECTOR AS $$
+                    SELECT
+                        setweight(to_tsvector('english', coalesce(p_title, '')), 'A') ||
+                        setweight(to_tsvector('english', coalesce(array_to_string(p_tags, ' '), '')), 'A') ||
+                        setweight(to_tsvector('english', coalesce(p_body, '')), 'B');
+                $$ LANGUAGE sql STABLE;
+            """))
+            conn.execute(text("""
+                CREATE OR REPLACE FUNCTION posts_search_vector_update() RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.search_vector := post_search_document(NEW.title, NEW.body, NEW.tags);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            # The trigger calls the function by name, so replacing the
+            # function above is enough to change an existing trigger.
+            if not _trigger_exists(conn):
+                conn.execute(text("""
+                    CREATE TRIGGER posts_search_vector
+                    BEFORE INSERT OR UPDATE OF title, body, tags ON posts
+                    FOR EACH ROW EXECUTE FUNCTION posts_search_vector_update();
+                """))
+            trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+
+    # Backfill rows written before the trigger existed, a batch per commit
+    # so no long transaction holds row locks on posts.
+    indexed = 0
+    while True:
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                UPDATE posts
+                SET search_vector = post_search_document(title, body, tags)
+                WHERE id IN (
+                    SELECT id FROM posts WHERE search_vector IS NULL LIMIT :batch
+                );
+            """), {"batch": BACKFILL_BATCH})
+        indexed += result.rowcount or 0
+        if (result.rowcount or 0) < BACKFILL_BATCH:
+            break
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, target in INDEXES:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target};"))
+    print(f"Migration 031: post search ready ({indexed} posts indexed).")
+
+
+if __name__ == "__main__":
+    run()
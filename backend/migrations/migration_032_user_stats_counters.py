@@ -0,0 +1,79 @@
+"""
+Migration 032: materialized per-user stats on user_stats.
+
+Adds the counters services/user_stats_service.py maintains from the
+community write paths, so profile and badge views read one row instead of
+running COUNTs over posts / post_reactions / post_replies:
+
+  videos_posted, questions_posted, {motw,original,guild}_videos
+  {motw,original,guild}_likes, fires_received, claps_received,
+  metronomes_received, comments_posted
+
+All INTEGER NOT NULL DEFAULT 0. When the columns are first added, every
+user's row is backfilled from the source tables (user_stats_service.reconcile,
+in batches), which also creates rows for active users who had none.
+
+Idempotent: IF NOT EXISTS on the columns, and the backfill only runs on
+the boot that added them. Safe to re-run (also runs at API startup); run
+scripts/reconcile_user_stats.py to repair drift later.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import get_engine
+
+COLUMNS = (
+    "videos_posted",
+    "questions_posted",
+    "motw_videos",
+    "original_videos",
+    "guild_videos",
+    "motw_likes",
+    "original_likes",
+    "guild_likes",
+    "fires_received",
+    "claps_received",
+    "metronomes_received",
+    "comments_posted",
+)
+
+
+def run():
+    engine = get_engine()
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            existing = {
+                row[0] for row in conn.execute(text("""
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_name = 'user_stats';
+                """))
+            }
+            missing = [c for c in COLUMNS if c not in existing]
+            for column in missing:
+                conn.execute(text(
+                    f"ALTER TABLE user_stats ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0;"
+                ))
+            trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+
+    if not missing:
+        return
+
+    from services import user_stats_service
+    changed = 0
+    with Session(engine) as db:
+        for batch in user_stats_service.iter_user_batches(db):
+            changed += len(user_stats_service.reconcile(db, batch))
+            db.commit()
+    print(f"Migration 032: user_stats counters added ({changed} rows backfilled).")
+
+
+if __name__ == "__main__":
+    run()
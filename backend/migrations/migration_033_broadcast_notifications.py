@@ -0,0 +1,164 @@
+"""
+Migration 033: broadcast notifications and notification retention indexes.
+
+Course launches used to insert one `notifications` row per user. They are
+now one `broadcast_notifications` row, merged into each user's list at
+read time, with per-user read state in `notification_watermarks` (mark all
+read) and `broadcast_notification_reads` (read one by one).
+
+This migration:
+  1. creates the three tables (create_all also does at startup);
+  2. collapses existing per-user `course_published` rows into one broadcast
+     per world (earliest row's title/message/time), recovers the publishing
+     admin the fan-out skipped as `exclude_user_id` (or, when that can't be
+     told, marks it read for admins), keeps who had read it as individual
+     reads, then deletes the per-user rows;
+  3. builds two indexes on notifications, CONCURRENTLY (AUTOCOMMIT):
+       idx_notifications_user_unread  (user_id) WHERE is_read = false
+       idx_notifications_created_brin BRIN (created_at) — for the
+         retention sweep (scripts/prune_notifications.py)
+
+Idempotent: IF NOT EXISTS / ON CONFLICT DO NOTHING, and step 2 finds no
+per-user rows once they're collapsed. Safe to re-run (also runs at API
+startup).
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import get_engine
+
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS broadcast_notifications (
+        id UUID PRIMARY KEY,
+        type VARCHAR(50) NOT NULL,
+        title VARCHAR(200) NOT NULL,
+        message TEXT NOT NULL,
+        reference_type VARCHAR(50),
+        reference_id VARCHAR(100),
+        exclude_user_id UUID,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        CONSTRAINT unique_broadcast_reference UNIQUE (type, reference_id)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_broadcast_notifications_created
+        ON broadcast_notifications (created_at DESC, id DESC);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS notification_watermarks (
+        user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        broadcasts_read_until TIMESTAMP NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS broadcast_notification_reads (
+        user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        broadcast_id UUID NOT NULL REFERENCES broadcast_notifications(id) ON DELETE CASCADE,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (user_id, broadcast_id)
+    );
+    """,
+]
+
+COLLAPSE = [
+    """
+    INSERT INTO broadcast_notifications (
+        id, type, title, message, reference_type, reference_id, created_at
+    )
+    SELECT DISTINCT ON (reference_id)
+           gen_random_uuid(), type, title, message, reference_type, reference_id, created_at
+    FROM notifications
+    WHERE type = 'course_published'
+    ORDER BY reference_id, created_at
+    ON CONFLICT ON CONSTRAINT unique_broadcast_reference DO NOTHING;
+    """,
+    # The old fan-out skipped the publishing admin: the one user who existed
+    # at launch but has no row becomes the broadcast's exclude_user_id.
+    """
+    UPDATE broadcast_notifications b
+    SET exclude_user_id = missing.user_id
+    FROM (
+        SELECT b2.id AS broadcast_id, MIN(u.id::text)::uuid AS user_id, COUNT(*) AS users
+        FROM broadcast_notifications b2
+        JOIN users u ON u.created_at <= b2.created_at
+        WHERE b2.type = 'course_published'
+          AND b2.exclude_user_id IS NULL
+          AND EXISTS (
+              SELECT 1 FROM notifications n
+              WHERE n.type = b2.type AND n.reference_id = b2.reference_id
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM notifications n
+              WHERE n.type = b2.type AND n.reference_id = b2.reference_id AND n.user_id = u.id
+          )
+        GROUP BY b2.id
+    ) missing
+    WHERE b.id = missing.broadcast_id AND missing.users = 1;
+    """,
+    # Publisher not derivable (no user or several without a row): admins
+    # without a row get it as already read rather than as a new item.
+    """
+    INSERT INTO broadcast_notification_reads (user_id, broadcast_id, created_at)
+    SELECT u.id, b.id, NOW()
+    FROM broadcast_notifications b
+    JOIN users u ON u.role = 'ADMIN'
+    WHERE b.type = 'course_published'
+      AND b.exclude_user_id IS NULL
+      AND EXISTS (
+          SELECT 1 FROM notifications n
+          WHERE n.type = b.type AND n.reference_id = b.reference_id
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM notifications n
+          WHERE n.type = b.type AND n.reference_id = b.reference_id AND n.user_id = u.id
+      )
+    ON CONFLICT DO NOTHING;
+    """,
+    """
+    INSERT INTO broadcast_notification_reads (user_id, broadcast_id, created_at)
+    SELECT n.user_id, b.id, NOW()
+    FROM notifications n
+    JOIN broadcast_notifications b
+      ON b.type = n.type AND b.reference_id = n.reference_id
+    WHERE n.type = 'course_published' AND n.is_read = true
+    ON CONFLICT DO NOTHING;
+    """,
+    "DELETE FROM notifications WHERE type = 'course_published';",
+]
+
+INDEXES = [
+    ("idx_notifications_user_unread", "notifications (user_id) WHERE is_read = false"),
+    ("idx_notifications_created_brin", "notifications USING brin (created_at)"),
+]
+
+
+def run():
+    engine = get_engine()
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            for statement in TABLES:
+                conn.execute(text(statement))
+            collapsed = 0
+            for statement in COLLAPSE:
+                collapsed = conn.execute(text(statement)).rowcount or 0
+            trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+    if collapsed:
+        print(f"Migration 033: {collapsed} per-user course_published rows collapsed into broadcasts.")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, target in INDEXES:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target};"))
+    print("Migration 033: broadcast notifications ready.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,58 @@
+"""
+Migration 034: per-period stock counters for limited shop items.
+
+Purchases of a limited SKU used to lock its shop_items row and COUNT
+shop_purchases under the lock, serializing every buyer. They now take a
+unit with a conditional UPDATE on a counter row:
+
+  shop_stock_counters (sku, period_key) -> sold
+
+period_key is the purchase's stock_period_key ('2026-04', 'lifetime'), or
+'all' for limited SKUs without a period. This creates the table and seeds
+it from the fulfilled purchases of limited SKUs; periods first sold in
+later are seeded by shop_service on demand the same way.
+
+Idempotent: IF NOT EXISTS / ON CONFLICT DO NOTHING. Safe to re-run (also
+runs at API startup).
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import get_engine
+
+
+def run():
+    engine = get_engine()
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS shop_stock_counters (
+                    sku         VARCHAR(64) NOT NULL REFERENCES shop_items(sku) ON DELETE CASCADE,
+                    period_key  VARCHAR(20) NOT NULL,
+                    sold        INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (sku, period_key),
+                    CONSTRAINT ck_shop_stock_counters_sold_nonneg CHECK (sold >= 0)
+                );
+            """))
+            seeded = conn.execute(text("""
+                INSERT INTO shop_stock_counters (sku, period_key, sold)
+                SELECT p.sku, COALESCE(p.stock_period_key, 'all'), COUNT(*)
+                FROM shop_purchases p
+                JOIN shop_items i ON i.sku = p.sku
+                WHERE p.status = 'fulfilled' AND i.stock_total IS NOT NULL
+                GROUP BY p.sku, COALESCE(p.stock_period_key, 'all')
+                ON CONFLICT DO NOTHING;
+            """)).rowcount
+            trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+    print(f"Migration 034: shop_stock_counters ready ({seeded or 0} counters seeded).")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+"""
+Migration 035: clave ledger snapshots and history index.
+
+  clave_balance_snapshots (user_id, as_of) -> balance
+      each user's ledger balance as of a point in time, written by
+      scripts/reconcile_claves.py --snapshot; reconciliation checks
+      current_claves against the last one plus later transactions.
+  idx_clave_transactions_user_created (user_id, created_at DESC, id DESC)
+      keyset-paged wallet history and per-user sums since a snapshot;
+      built CONCURRENTLY (AUTOCOMMIT) since clave_transactions is
+      written on every earn / spend.
+
+Idempotent: IF NOT EXISTS. Safe to re-run (also runs at API startup).
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import get_engine
+
+
+def run():
+    engine = get_engine()
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS clave_balance_snapshots (
+                    user_id  UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    as_of    TIMESTAMP NOT NULL,
+                    balance  INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, as_of)
+                );
+            """))
+            trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clave_transactions_user_created
+            ON clave_transactions (user_id, created_at DESC, id DESC);
+        """))
+    print("Migration 035: clave ledger ready.")
+
+
+if __name__ == "__main__":
+    run()
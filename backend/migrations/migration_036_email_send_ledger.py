@@ -0,0 +1,55 @@
+"""
+Migration 036: email send ledger.
+
+  email_sends (campaign, email) -> status, attempts, provider_id, ...
+      one row per recipient of a broadcast campaign, claimed before the
+      email is sent and marked sent/failed after; replaces the
+      scripts/already_sent_*.txt resume files (services/email_broadcast
+      imports those on a campaign's first run).
+  idx_email_sends_open (campaign, status) WHERE status <> 'sent'
+      the claimed / failed rows a resumed or --status run looks at.
+
+Idempotent: IF NOT EXISTS. Safe to re-run (also runs at API startup).
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import get_engine
+
+
+def run():
+    engine = get_engine()
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS email_sends (
+                    campaign     VARCHAR(100) NOT NULL,
+                    email        VARCHAR(320) NOT NULL,
+                    user_id      UUID,
+                    status       VARCHAR(20) NOT NULL,
+                    attempts     INTEGER NOT NULL DEFAULT 0,
+                    provider_id  VARCHAR(100),
+                    error        TEXT,
+                    claimed_by   VARCHAR(100),
+                    claimed_at   TIMESTAMP,
+                    sent_at      TIMESTAMP,
+                    PRIMARY KEY (campaign, email)
+                );
+            """))
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_email_sends_open
+                ON email_sends (campaign, status) WHERE status <> 'sent';
+            """))
+            trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+    print("Migration 036: email send ledger ready.")
+
+
+if __name__ == "__main__":
+    run()
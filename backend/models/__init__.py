@@ -48,12 +48,15 @@ from models.user import User, UserProfile, Subscription
 from models.course import World, Level, Lesson
 from models.progress import UserProgress, BossSubmission, Comment
 from models.community import (
-    ClaveTransaction,
+    ClaveTransaction, ClaveBalanceSnapshot,
     Post, PostReply, PostReaction,
     BadgeDefinition, UserBadge,
     CommunityTag
 )
-from models.notification import Notification
+from models.notification import (
+    Notification, BroadcastNotification, NotificationWatermark, BroadcastNotificationRead,
+)
+from models.email import EmailSend
 from models.premium import (
     LiveCall, LiveCallStatus,
     WeeklyArchive,
@@ -64,7 +67,7 @@ from models.premium import (
 )
 from models.payment import StripeWebhookEvent, MuxWebhookEvent, XPAuditLog, PaymentCardFingerprint
 from models.analytics import UserEvent
-from models.shop import ShopItem, ShopPurchase
+from models.shop import ShopItem, ShopPurchase, ShopStockCounter
 
 # Dependency to get database session
 def get_db():
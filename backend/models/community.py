@@ -6,9 +6,9 @@ Community Models for Mambo Guild v4.0
 - Badges
 - Tags
 """
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey, ARRAY, CheckConstraint, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey, ARRAY, CheckConstraint, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 import uuid
 from datetime import datetime
 import enum
@@ -18,6 +18,8 @@ class ModerationStatus(str, enum.Enum):
     ACTIVE = "active"
     FLAGGED_BY_AI = "flagged_by_ai"
     GHOSTED = "ghosted"
+    # Awaiting the async AI verdict; visible only to its author meanwhile.
+    PENDING = "pending"
 
 from models import Base
 
@@ -40,6 +42,22 @@ class ClaveTransaction(Base):
     # Relationships
     user = relationship("User", backref="clave_transactions")
 
+    __table_args__ = (
+        # Keyset-paged wallet history and ledger sums since a snapshot
+        Index("idx_clave_transactions_user_created", "user_id", created_at.desc(), id.desc()),
+    )
+
+
+class ClaveBalanceSnapshot(Base):
+    """A user's ledger balance as of `as_of`: the sum of every clave
+    transaction created at or before it. Balances are checked as the last
+    snapshot plus later transactions (see services/ledger_service.py)."""
+    __tablename__ = "clave_balance_snapshots"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    as_of = Column(DateTime, primary_key=True)
+    balance = Column(Integer, nullable=False)
+
 
 # ============================================
 # Community Posts
@@ -105,6 +123,11 @@ class Post(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    # Full-text search document (title + tags + body). Written only by the
+    # posts_search_vector trigger (migration_031); deferred so feed queries
+    # never load it.
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+
     # Relationships
     user = relationship("User", backref="posts")
     replies = relationship("PostReply", back_populates="post", foreign_keys="PostReply.post_id", cascade="all, delete-orphan")
@@ -115,6 +138,10 @@ class Post(Base):
     __table_args__ = (
         CheckConstraint("post_type IN ('stage', 'lab')", name="check_post_type"),
         CheckConstraint("feedback_type IN ('hype', 'coach')", name="check_feedback_type"),
+        # Keyset pagination (newest first) for the feed and search
+        Index("idx_posts_created_id", created_at.desc(), id.desc()),
+        Index("idx_posts_type_created_id", "post_type", created_at.desc(), id.desc()),
+        Index("idx_posts_search_vector", "search_vector", postgresql_using="gin"),
     )
 
 
@@ -267,7 +294,21 @@ class UserStats(Base):
     reactions_given_count = Column(Integer, default=0)
     reactions_received_count = Column(Integer, default=0)
     solutions_accepted_count = Column(Integer, default=0)
-    
+
+    # Materialized by services/user_stats_service (visible posts only).
+    videos_posted = Column(Integer, default=0, nullable=False)
+    questions_posted = Column(Integer, default=0, nullable=False)
+    motw_videos = Column(Integer, default=0, nullable=False)
+    original_videos = Column(Integer, default=0, nullable=False)
+    guild_videos = Column(Integer, default=0, nullable=False)
+    motw_likes = Column(Integer, default=0, nullable=False)
+    original_likes = Column(Integer, default=0, nullable=False)
+    guild_likes = Column(Integer, default=0, nullable=False)
+    fires_received = Column(Integer, default=0, nullable=False)
+    claps_received = Column(Integer, default=0, nullable=False)
+    metronomes_received = Column(Integer, default=0, nullable=False)
+    comments_posted = Column(Integer, default=0, nullable=False)
+
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -293,6 +334,7 @@ class SavedPost(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "post_id", name="unique_user_saved_post"),
+        Index("idx_saved_posts_user_created", "user_id", created_at.desc(), post_id.desc()),
     )
 
 
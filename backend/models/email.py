@@ -0,0 +1,31 @@
+"""
+Email Models - the send ledger for bulk email campaigns.
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from sqlalchemy.dialects.postgresql import UUID
+
+from models import Base
+
+
+class EmailSend(Base):
+    """One recipient of one email campaign: the send ledger behind
+    services/email_broadcast. A row is claimed by exactly one sender
+    before the email goes out, so campaigns resume (and split across
+    machines) without sending anyone the same campaign twice."""
+    __tablename__ = "email_sends"
+
+    campaign = Column(String(100), primary_key=True)  # e.g. the email_id of scripts/broadcast.py
+    email = Column(String(320), primary_key=True)     # lowercased
+    user_id = Column(UUID(as_uuid=True), nullable=True)
+    status = Column(String(20), nullable=False)       # 'claimed', 'sent', 'failed'
+    attempts = Column(Integer, default=0, nullable=False)
+    provider_id = Column(String(100), nullable=True)  # Resend email id
+    error = Column(Text, nullable=True)
+    claimed_by = Column(String(100), nullable=True)   # host:pid of the sender
+    claimed_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Claimed / failed rows, for resume and --status
+        Index("idx_email_sends_open", "campaign", "status", postgresql_where=(status != "sent")),
+    )
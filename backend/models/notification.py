@@ -1,7 +1,7 @@
 """
 Notification Model - In-app notifications for community events.
 """
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -35,3 +35,59 @@ class Notification(Base):
 
     # Relationships
     user = relationship("User", backref="notifications")
+
+    __table_args__ = (
+        # Keyset pagination of a user's inbox, newest first
+        Index("idx_notifications_user_created", "user_id", created_at.desc(), id.desc()),
+        # Unread count: only the (few) unread rows are indexed
+        Index("idx_notifications_user_unread", "user_id", postgresql_where=(is_read == False)),
+        # Retention sweeps by age (rows arrive in created_at order, so BRIN stays tiny)
+        Index("idx_notifications_created_brin", "created_at", postgresql_using="brin"),
+    )
+
+
+class BroadcastNotification(Base):
+    """One announcement shown to every user (e.g. a course going live).
+
+    Stored once instead of once per user; merged into each user's list at
+    read time. Users see broadcasts made after they signed up, except the
+    one who triggered it (`exclude_user_id`).
+    """
+    __tablename__ = "broadcast_notifications"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    type = Column(String(50), nullable=False)  # 'course_published'
+    title = Column(String(200), nullable=False)
+    message = Column(Text, nullable=False)
+    reference_type = Column(String(50), nullable=True)
+    reference_id = Column(String(100), nullable=True)
+    exclude_user_id = Column(UUID(as_uuid=True), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # One broadcast per announced entity (re-publishing doesn't re-announce)
+        UniqueConstraint("type", "reference_id", name="unique_broadcast_reference"),
+        Index("idx_broadcast_notifications_created", created_at.desc(), id.desc()),
+    )
+
+
+class NotificationWatermark(Base):
+    """Per-user read position for broadcasts: everything created at or
+    before `broadcasts_read_until` counts as read ("mark all read")."""
+    __tablename__ = "notification_watermarks"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    broadcasts_read_until = Column(DateTime, nullable=False)
+
+
+class BroadcastNotificationRead(Base):
+    """A broadcast read individually, above the user's watermark. Rows at or
+    below the watermark are dropped when it advances."""
+    __tablename__ = "broadcast_notification_reads"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    broadcast_id = Column(
+        UUID(as_uuid=True), ForeignKey("broadcast_notifications.id", ondelete="CASCADE"), primary_key=True
+    )
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
@@ -4,6 +4,7 @@ Shop models — The Guild Shop.
 `ShopItem` is the catalog row (price, rarity, stock rules, grants payload).
 `ShopPurchase` is the audit log of what a user bought, the price they paid,
 and the fulfilment pointer (e.g. coaching_submissions.id for Golden Tickets).
+`ShopStockCounter` is the units sold per limited SKU and stock period.
 """
 from sqlalchemy import (
     Column,
@@ -72,3 +73,19 @@ class ShopPurchase(Base):
         # declarative `Index(postgresql_where=...)` needs a Column ref, and
         # we don't use create_all() for this project anyway.
     )
+
+
+class ShopStockCounter(Base):
+    """Units sold of a limited SKU in one stock period ('2026-04',
+    'lifetime', or 'all' for SKUs without a period). Purchases reserve a
+    unit with a conditional UPDATE on this row instead of locking the
+    catalog row and counting shop_purchases."""
+    __tablename__ = "shop_stock_counters"
+
+    sku = Column(String(64), ForeignKey("shop_items.sku", ondelete="CASCADE"), primary_key=True)
+    period_key = Column(String(20), primary_key=True)
+    sold = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        CheckConstraint("sold >= 0", name="ck_shop_stock_counters_sold_nonneg"),
+    )
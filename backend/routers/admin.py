@@ -1,30 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
 from typing import List, Optional, Any, Dict
 from pydantic import BaseModel
 from datetime import datetime, timezone, timedelta
 from models import get_db
 from models.user import User, UserProfile, Subscription, SubscriptionStatus, SubscriptionTier
 from models.progress import BossSubmission, SubmissionStatus, UserProgress
-from models.course import World, Level, Lesson
+from models.course import Lesson
 from schemas.submissions import SubmissionResponse, GradeSubmissionRequest
 from services.gamification_service import award_xp
 from services.clave_service import earn_claves
+from services import dashboard_stats_service, post_service
 from dependencies import get_admin_user
 import uuid
 
 router = APIRouter()
 
-# ---------------------------------------------------------------------------
-# Tier prices used for estimated MRR (update if pricing changes)
-# ---------------------------------------------------------------------------
-TIER_PRICES: Dict[str, float] = {
-    "rookie": 0.0,
-    "advanced": 39.0,
-    "performer": 59.0,
-}
-
 
 @router.get("/submissions", response_model=List[SubmissionResponse])
 def get_pending_submissions(
@@ -103,6 +94,18 @@ def get_admin_stats(
     }
 
 
+@router.get("/cache-stats")
+def get_cache_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Hit/miss counters for the read-through caches (cluster-wide)."""
+    from services import feed_cache_service
+
+    return {
+        "feed": feed_cache_service.get_stats(),
+    }
+
+
 class StudentResponse(BaseModel):
     id: str
     email: str
@@ -176,213 +179,16 @@ def get_all_students(
 
 @router.get("/dashboard-stats")
 def get_dashboard_stats(
+    refresh: bool = Query(False, description="Recompute instead of serving the cached snapshot"),
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db),
 ):
-    """Return all stats needed by the admin dashboard in a single call."""
-    from models.premium import CoachingSubmission, CoachingSubmissionStatus
-
-    now = datetime.now(timezone.utc)
-    week_ago = now - timedelta(days=7)
-    two_weeks_ago = now - timedelta(days=14)
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    # ── Users ──────────────────────────────────────────────────────────────
-    total_users = db.query(User).count()
-    users_this_week = db.query(User).filter(User.created_at >= week_ago).count()
-    users_last_week = db.query(User).filter(
-        User.created_at >= two_weeks_ago,
-        User.created_at < week_ago,
-    ).count()
-
-    if users_last_week > 0:
-        user_growth_pct = round(
-            ((users_this_week - users_last_week) / users_last_week) * 100, 1
-        )
-    elif users_this_week > 0:
-        user_growth_pct = 100.0
-    else:
-        user_growth_pct = 0.0
-
-    # ── Subscriptions ──────────────────────────────────────────────────────
-    rookie_count = db.query(Subscription).filter(
-        Subscription.status == SubscriptionStatus.ACTIVE,
-        Subscription.tier == SubscriptionTier.ROOKIE,
-    ).count()
-    advanced_count = db.query(Subscription).filter(
-        Subscription.status == SubscriptionStatus.ACTIVE,
-        Subscription.tier == SubscriptionTier.ADVANCED,
-    ).count()
-    performer_count = db.query(Subscription).filter(
-        Subscription.status == SubscriptionStatus.ACTIVE,
-        Subscription.tier == SubscriptionTier.PERFORMER,
-    ).count()
-    active_subscriptions = rookie_count + advanced_count + performer_count
-    canceled_count = db.query(Subscription).filter(
-        Subscription.status == SubscriptionStatus.CANCELED,
-    ).count()
-    estimated_mrr = (
-        rookie_count * TIER_PRICES["rookie"]
-        + advanced_count * TIER_PRICES["advanced"]
-        + performer_count * TIER_PRICES["performer"]
-    )
-
-    # ── Boss Submissions ───────────────────────────────────────────────────
-    total_submissions = db.query(BossSubmission).count()
-    pending_submissions = db.query(BossSubmission).filter(
-        BossSubmission.status == SubmissionStatus.PENDING
-    ).count()
-    approved_this_week = db.query(BossSubmission).filter(
-        BossSubmission.status == SubmissionStatus.APPROVED,
-        BossSubmission.reviewed_at >= week_ago,
-    ).count()
-    rejected_this_week = db.query(BossSubmission).filter(
-        BossSubmission.status == SubmissionStatus.REJECTED,
-        BossSubmission.reviewed_at >= week_ago,
-    ).count()
-    total_reviewed = db.query(BossSubmission).filter(
-        BossSubmission.status.in_([SubmissionStatus.APPROVED, SubmissionStatus.REJECTED])
-    ).count()
-    total_approved_all = db.query(BossSubmission).filter(
-        BossSubmission.status == SubmissionStatus.APPROVED
-    ).count()
-    boss_pass_rate = (
-        round((total_approved_all / total_reviewed) * 100, 1) if total_reviewed > 0 else 0.0
-    )
-
-    # ── Coaching ───────────────────────────────────────────────────────────
-    coaching_pending = db.query(CoachingSubmission).filter(
-        CoachingSubmission.status == CoachingSubmissionStatus.PENDING
-    ).count()
-    coaching_completed_month = db.query(CoachingSubmission).filter(
-        CoachingSubmission.status == CoachingSubmissionStatus.COMPLETED,
-        CoachingSubmission.reviewed_at >= month_start,
-    ).count()
-
-    # ── Recent Signups ─────────────────────────────────────────────────────
-    recent_rows = (
-        db.query(User, UserProfile, Subscription)
-        .outerjoin(UserProfile, UserProfile.user_id == User.id)
-        .outerjoin(Subscription, Subscription.user_id == User.id)
-        .order_by(User.created_at.desc())
-        .limit(10)
-        .all()
-    )
-    recent_signups = [
-        {
-            "id": str(u.id),
-            "email": u.email,
-            "first_name": p.first_name if p else "",
-            "last_name": p.last_name if p else "",
-            "avatar_url": p.avatar_url if p else None,
-            "tier": s.tier.value if s else None,
-            "sub_status": s.status.value if s else None,
-            "created_at": u.created_at.isoformat(),
-            "xp": p.xp if p else 0,
-            "level": p.level if p else 1,
-        }
-        for u, p, s in recent_rows
-    ]
+    """Return all stats needed by the admin dashboard in a single call.
 
-    # ── Top Lessons by Completions ─────────────────────────────────────────
-    top_lessons_rows = (
-        db.query(
-            Lesson.id,
-            Lesson.title,
-            Lesson.is_boss_battle,
-            Level.title.label("level_title"),
-            World.title.label("world_title"),
-            func.count(UserProgress.id).label("completions"),
-        )
-        .join(UserProgress, UserProgress.lesson_id == Lesson.id)
-        .join(Level, Level.id == Lesson.level_id)
-        .join(World, World.id == Level.world_id)
-        .filter(UserProgress.is_completed == True)
-        .group_by(Lesson.id, Lesson.title, Lesson.is_boss_battle, Level.title, World.title)
-        .order_by(func.count(UserProgress.id).desc())
-        .limit(5)
-        .all()
-    )
-    top_lessons = [
-        {
-            "id": str(r.id),
-            "title": r.title,
-            "is_boss_battle": r.is_boss_battle,
-            "level_title": r.level_title,
-            "world_title": r.world_title,
-            "completions": r.completions,
-        }
-        for r in top_lessons_rows
-    ]
-
-    # ── World Stats ────────────────────────────────────────────────────────
-    worlds = (
-        db.query(World)
-        .filter(World.is_published == True)
-        .order_by(World.order_index)
-        .all()
-    )
-    world_stats = []
-    for world in worlds:
-        total_lessons_count = (
-            db.query(func.count(Lesson.id))
-            .join(Level, Level.id == Lesson.level_id)
-            .filter(Level.world_id == world.id)
-            .scalar()
-            or 0
-        )
-        total_completions = (
-            db.query(func.count(UserProgress.id))
-            .join(Lesson, Lesson.id == UserProgress.lesson_id)
-            .join(Level, Level.id == Lesson.level_id)
-            .filter(Level.world_id == world.id, UserProgress.is_completed == True)
-            .scalar()
-            or 0
-        )
-        students_started = (
-            db.query(func.count(func.distinct(UserProgress.user_id)))
-            .join(Lesson, Lesson.id == UserProgress.lesson_id)
-            .join(Level, Level.id == Lesson.level_id)
-            .filter(Level.world_id == world.id, UserProgress.is_completed == True)
-            .scalar()
-            or 0
-        )
-        denom = students_started * total_lessons_count
-        completion_rate = round((total_completions / denom) * 100, 1) if denom > 0 else 0.0
-        world_stats.append(
-            {
-                "id": str(world.id),
-                "title": world.title,
-                "total_lessons": total_lessons_count,
-                "total_completions": total_completions,
-                "students_started": students_started,
-                "completion_rate": completion_rate,
-            }
-        )
-
-    return {
-        "total_users": total_users,
-        "users_this_week": users_this_week,
-        "users_last_week": users_last_week,
-        "user_growth_pct": user_growth_pct,
-        "active_subscriptions": active_subscriptions,
-        "rookie_count": rookie_count,
-        "advanced_count": advanced_count,
-        "performer_count": performer_count,
-        "canceled_count": canceled_count,
-        "estimated_mrr": estimated_mrr,
-        "tier_prices": TIER_PRICES,
-        "pending_submissions": pending_submissions,
-        "approved_this_week": approved_this_week,
-        "rejected_this_week": rejected_this_week,
-        "total_submissions": total_submissions,
-        "boss_pass_rate": boss_pass_rate,
-        "coaching_pending": coaching_pending,
-        "coaching_completed_month": coaching_completed_month,
-        "recent_signups": recent_signups,
-        "top_lessons": top_lessons,
-        "world_stats": world_stats,
-    }
+    Served from a periodically refreshed snapshot; `as_of` says when it was
+    computed.
+    """
+    return dashboard_stats_service.get_snapshot(db, force_refresh=refresh)
 
 
 # ===========================================================================
@@ -669,10 +475,55 @@ def send_announcement(
     }
 
 
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+@router.get("/jobs/stats")
+def get_job_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Job queue: per-job outcome counts and run / wait latency, queue depths."""
+    from services import job_queue
+
+    return job_queue.get_stats()
+
+
+@router.get("/jobs/dead")
+def get_dead_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    admin_user: User = Depends(get_admin_user),
+):
+    """Most recent jobs that ran out of attempts, with their last error."""
+    from services import job_queue
+
+    return {"jobs": job_queue.dead_jobs(limit)}
+
+
+@router.post("/jobs/dead/retry")
+def retry_dead_jobs(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Put every dead-lettered job back on the queue with fresh attempts."""
+    from services import job_queue
+
+    return {"requeued": job_queue.retry_dead()}
+
+
 # ---------------------------------------------------------------------------
 # Community Moderation (AI Gatekeeper)
 # ---------------------------------------------------------------------------
 
+@router.get("/moderation/stats")
+def get_moderation_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """AI moderation pipeline: per-stage latency, outcome counts, queue depth."""
+    from services import moderation_service
+
+    return moderation_service.get_stats()
+
+
 @router.get("/moderation/flagged")
 def get_flagged_replies(
     admin_user: User = Depends(get_admin_user),
@@ -853,8 +704,7 @@ def backfill_mux_posts(
                 continue
 
             if not dry_run:
-                post.mux_asset_id = asset.id
-                post.mux_playback_id = playback_id
+                post_service.attach_post_video(post, asset.id, playback_id, db)
                 db.commit()
 
                 reward_info = None
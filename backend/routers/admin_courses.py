@@ -12,7 +12,7 @@ from models.course import World, Level, Lesson, Difficulty
 from models.progress import UserProgress, BossSubmission, Comment
 from schemas.course import WorldResponse, LessonResponse
 from dependencies import get_admin_user, get_current_user_optional
-from services import notification_service
+from services import notification_service, progress_service
 import uuid
 import logging
 
@@ -591,23 +591,15 @@ def get_level_lessons(
     current_user: Optional[User] = Depends(get_current_user_optional),
 ):
     """Get all lessons for a specific level. Open endpoint for skill tree modal."""
-    from models.progress import UserProgress
-
     level = db.query(Level).filter(Level.id == level_id).first()
     if not level:
         raise HTTPException(status_code=404, detail="Level not found")
 
     lessons = sorted(level.lessons, key=lambda l: l.order_index)
 
-    completed_lesson_ids: set = set()
-    lesson_ids = [str(l.id) for l in lessons]
-    if current_user and lesson_ids:
-        completed = db.query(UserProgress.lesson_id).filter(
-            UserProgress.user_id == current_user.id,
-            UserProgress.is_completed == True,
-            UserProgress.lesson_id.in_(lesson_ids)
-        ).all()
-        completed_lesson_ids = {str(lid) for (lid,) in completed}
+    completed_lesson_ids = (
+        progress_service.completed_lessons(str(current_user.id), db) if current_user else frozenset()
+    )
 
     result = []
     for lesson in lessons:
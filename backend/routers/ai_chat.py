@@ -8,12 +8,25 @@ Security Features:
 - Rate limiting per user via Redis
 - Input sanitization and validation
 - No PII in logs
+
+Concurrency (per worker):
+- One shared AsyncAnthropic client with a bounded connection pool, so
+  streaming tokens never blocks the event loop for other requests.
+- At most AI_CHAT_MAX_CONCURRENT chats talk to the model at once; a chat
+  that can't get a slot within CHAT_SLOT_WAIT_SECONDS is told to retry.
+- Tools run in the thread pool (they query the database).
+- A chat whose client has gone stops before the next model call.
+
+scripts/anthropic_stub.py + scripts/bench_ai_chat.py load-test this path.
 """
 
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List, AsyncGenerator, Literal
+from typing import Awaitable, Callable, Optional, List, AsyncGenerator, Literal
+import asyncio
 import hashlib
 import time
 import json
@@ -246,7 +259,7 @@ def execute_recommend_membership(tier: str, reasoning: str) -> dict:
     }
 
 def execute_search_knowledge_base(query: str, db: Optional[Session] = None) -> dict:
-    """Search published courses and lessons for content relevant to the query."""
+    """Top passages for the query from the course notes and published catalog."""
     if db is None:
         return {
             "type": "knowledge_base",
@@ -255,47 +268,11 @@ def execute_search_knowledge_base(query: str, db: Optional[Session] = None) -> d
         }
 
     try:
-        from models.course import World, Lesson, Level
-
-        terms = [t.lower() for t in query.split() if len(t) >= 3]
-        if not terms:
-            terms = [query.lower()]
-
-        all_worlds = db.query(World).filter(World.is_published == True).all()
-        matching_worlds = [
-            w for w in all_worlds
-            if any(
-                t in (w.title or "").lower() or t in (w.description or "").lower()
-                for t in terms
-            )
-        ]
-
-        all_lessons = (
-            db.query(Lesson)
-            .join(Level, Lesson.level_id == Level.id)
-            .join(World, Level.world_id == World.id)
-            .filter(World.is_published == True)
-            .limit(100)
-            .all()
-        )
-        matching_lessons = [
-            l for l in all_lessons
-            if any(
-                t in (l.title or "").lower() or t in (l.description or "").lower()
-                for t in terms
-            )
-        ]
-
-        results: List[str] = []
-        for w in matching_worlds[:3]:
-            desc = (w.description or "").strip()
-            results.append(f"Course - {w.title}: {desc[:120]}" if desc else f"Course - {w.title}")
-        for l in matching_lessons[:5]:
-            desc = (l.description or "").strip()
-            results.append(f"Lesson - {l.title}: {desc[:120]}" if desc else f"Lesson - {l.title}")
-
-        if results:
-            summary = " | ".join(results)
+        from services import knowledge_base
+
+        hits = knowledge_base.search(query, db=db, k=5)
+        if hits:
+            summary = " | ".join(f"{hit.title}: {hit.snippet}" for hit in hits)
             return {
                 "type": "knowledge_base",
                 "query": query,
@@ -332,14 +309,25 @@ def execute_tool(name: str, args: dict, db: Optional[Session] = None) -> dict:
 # Anthropic Client Setup
 # =============================================================================
 
+CHAT_MODEL = "claude-sonnet-4-20250514"
+# How long a chat waits for a free slot before being told to retry.
+CHAT_SLOT_WAIT_SECONDS = 5.0
+
 _anthropic_client = None
+_chat_slots = asyncio.Semaphore(settings.AI_CHAT_MAX_CONCURRENT)
+
+
+class ChatBusy(Exception):
+    """Every chat slot on this worker stayed taken for CHAT_SLOT_WAIT_SECONDS."""
+
 
 def get_anthropic_client():
-    """Get or create the Anthropic client."""
+    """Get or create the shared AsyncAnthropic client (one pool per worker)."""
     global _anthropic_client
     if _anthropic_client is None:
         try:
             import anthropic
+            import httpx
         except ImportError:
             raise HTTPException(
                 status_code=503,
@@ -353,9 +341,58 @@ def get_anthropic_client():
                 detail="AI service not configured. ANTHROPIC_API_KEY not set."
             )
 
-        _anthropic_client = anthropic.Anthropic(api_key=api_key)
+        # Every in-flight chat holds one connection for the whole stream, so
+        # the pool matches the slot count; extra chats queue on the slots,
+        # not on the pool. ANTHROPIC_BASE_URL (read by the SDK) points this
+        # at scripts/anthropic_stub.py for load tests.
+        max_connections = settings.AI_CHAT_MAX_CONCURRENT
+        _anthropic_client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            max_retries=1,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=30.0,
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
     return _anthropic_client
 
+
+async def close_anthropic_client() -> None:
+    """Close the shared client's connection pool (worker shutdown)."""
+    global _anthropic_client
+    client, _anthropic_client = _anthropic_client, None
+    if client is not None:
+        await client.close()
+
+
+@asynccontextmanager
+async def chat_slot():
+    """Hold one of this worker's AI_CHAT_MAX_CONCURRENT chat slots."""
+    try:
+        await asyncio.wait_for(_chat_slots.acquire(), timeout=CHAT_SLOT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise ChatBusy()
+    try:
+        yield
+    finally:
+        _chat_slots.release()
+
+
+def _to_claude_messages(messages: List[ChatMessage]) -> List[dict]:
+    # System prompt is passed separately
+    return [
+        {"role": "user" if msg.role == "user" else "assistant", "content": msg.content}
+        for msg in messages
+    ]
+
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
 # =============================================================================
 # Streaming Response Generator
 # =============================================================================
@@ -363,110 +400,119 @@ def get_anthropic_client():
 async def stream_claude_response(
     messages: List[ChatMessage],
     db: Optional[Session] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
 ) -> AsyncGenerator[str, None]:
     """
     Stream response from Claude API with tool use support.
     Yields SSE-formatted chunks matching the existing frontend contract.
+
+    `is_disconnected` (Request.is_disconnected) is checked before the tool
+    follow-up call, so a chat whose client has gone doesn't start another
+    model request. Starlette also cancels this generator on disconnect,
+    which closes the open stream.
     """
     client = get_anthropic_client()
-
-    # Build messages for Claude (system prompt is separate)
-    claude_messages = []
-    for msg in messages:
-        role = "user" if msg.role == "user" else "assistant"
-        claude_messages.append({"role": role, "content": msg.content})
+    claude_messages = _to_claude_messages(messages)
 
     try:
-        # First call - may return text or tool_use
-        with client.messages.stream(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=DIEGO_SYSTEM_PROMPT,
-            messages=claude_messages,
-            tools=ANTHROPIC_TOOLS,
-            temperature=0.8,
-        ) as stream:
-            accumulated_text = ""
-            tool_use_block = None
-
-            for event in stream:
-                if event.type == "content_block_start":
-                    if event.content_block.type == "tool_use":
-                        tool_use_block = {
-                            "id": event.content_block.id,
-                            "name": event.content_block.name,
-                            "input_json": ""
-                        }
-                elif event.type == "content_block_delta":
-                    if event.delta.type == "text_delta":
-                        text = event.delta.text
-                        accumulated_text += text
-                        yield f"data: {json.dumps({'type': 'text', 'content': text, 'done': False})}\n\n"
-                    elif event.delta.type == "input_json_delta":
-                        if tool_use_block:
-                            tool_use_block["input_json"] += event.delta.partial_json
-                elif event.type == "content_block_stop":
-                    if tool_use_block:
-                        # Parse tool input and execute
-                        try:
-                            tool_args = json.loads(tool_use_block["input_json"])
-                        except json.JSONDecodeError:
-                            tool_args = {}
-
-                        tool_result = execute_tool(tool_use_block["name"], tool_args, db=db)
-                        yield f"data: {json.dumps({'type': 'function_call', 'name': tool_use_block['name'], 'args': tool_args, 'result': tool_result, 'done': False})}\n\n"
-
-                        # Send tool result back to Claude for a follow-up response
-                        followup_messages = claude_messages + [
-                            {
-                                "role": "assistant",
-                                "content": [
-                                    {"type": "text", "text": accumulated_text} if accumulated_text else None,
-                                    {
-                                        "type": "tool_use",
-                                        "id": tool_use_block["id"],
-                                        "name": tool_use_block["name"],
-                                        "input": tool_args,
-                                    }
-                                ]
-                            },
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "tool_result",
-                                        "tool_use_id": tool_use_block["id"],
-                                        "content": json.dumps(tool_result),
-                                    }
-                                ]
+        async with chat_slot():
+            # First call - may return text or tool_use
+            async with client.messages.stream(
+                model=CHAT_MODEL,
+                max_tokens=1024,
+                system=DIEGO_SYSTEM_PROMPT,
+                messages=claude_messages,
+                tools=ANTHROPIC_TOOLS,
+                temperature=0.8,
+            ) as stream:
+                accumulated_text = ""
+                tool_use_block = None
+
+                async for event in stream:
+                    if event.type == "content_block_start":
+                        if event.content_block.type == "tool_use":
+                            tool_use_block = {
+                                "id": event.content_block.id,
+                                "name": event.content_block.name,
+                                "input_json": ""
                             }
-                        ]
-                        # Filter None from assistant content
-                        for m in followup_messages:
-                            if isinstance(m.get("content"), list):
-                                m["content"] = [c for c in m["content"] if c is not None]
-
-                        with client.messages.stream(
-                            model="claude-sonnet-4-20250514",
-                            max_tokens=1024,
-                            system=DIEGO_SYSTEM_PROMPT,
-                            messages=followup_messages,
-                            tools=ANTHROPIC_TOOLS,
-                            temperature=0.8,
-                        ) as followup_stream:
-                            for followup_event in followup_stream:
-                                if followup_event.type == "content_block_delta" and followup_event.delta.type == "text_delta":
-                                    yield f"data: {json.dumps({'type': 'text', 'content': followup_event.delta.text, 'done': False})}\n\n"
-
-                        tool_use_block = None
-
-        yield f"data: {json.dumps({'type': 'done', 'content': '', 'done': True})}\n\n"
-
+                    elif event.type == "content_block_delta":
+                        if event.delta.type == "text_delta":
+                            text = event.delta.text
+                            accumulated_text += text
+                            yield _sse({'type': 'text', 'content': text, 'done': False})
+                        elif event.delta.type == "input_json_delta":
+                            if tool_use_block:
+                                tool_use_block["input_json"] += event.delta.partial_json
+                    elif event.type == "content_block_stop":
+                        if tool_use_block:
+                            # Parse tool input and execute
+                            try:
+                                tool_args = json.loads(tool_use_block["input_json"])
+                            except json.JSONDecodeError:
+                                tool_args = {}
+
+                            tool_result = await run_in_threadpool(
+                                execute_tool, tool_use_block["name"], tool_args, db
+                            )
+                            yield _sse({'type': 'function_call', 'name': tool_use_block['name'], 'args': tool_args, 'result': tool_result, 'done': False})
+
+                            if is_disconnected is not None and await is_disconnected():
+                                return
+
+                            # Send tool result back to Claude for a follow-up response
+                            followup_messages = claude_messages + [
+                                {
+                                    "role": "assistant",
+                                    "content": [
+                                        {"type": "text", "text": accumulated_text} if accumulated_text else None,
+                                        {
+                                            "type": "tool_use",
+                                            "id": tool_use_block["id"],
+                                            "name": tool_use_block["name"],
+                                            "input": tool_args,
+                                        }
+                                    ]
+                                },
+                                {
+                                    "role": "user",
+                                    "content": [
+                                        {
+                                            "type": "tool_result",
+                                            "tool_use_id": tool_use_block["id"],
+                                            "content": json.dumps(tool_result),
+                                        }
+                                    ]
+                                }
+                            ]
+                            # Filter None from assistant content
+                            for m in followup_messages:
+                                if isinstance(m.get("content"), list):
+                                    m["content"] = [c for c in m["content"] if c is not None]
+
+                            async with client.messages.stream(
+                                model=CHAT_MODEL,
+                                max_tokens=1024,
+                                system=DIEGO_SYSTEM_PROMPT,
+                                messages=followup_messages,
+                                tools=ANTHROPIC_TOOLS,
+                                temperature=0.8,
+                            ) as followup_stream:
+                                async for followup_event in followup_stream:
+                                    if followup_event.type == "content_block_delta" and followup_event.delta.type == "text_delta":
+                                        yield _sse({'type': 'text', 'content': followup_event.delta.text, 'done': False})
+
+                            tool_use_block = None
+
+        yield _sse({'type': 'done', 'content': '', 'done': True})
+
+    except ChatBusy:
+        yield _sse({'type': 'error', 'error': "Diego is with other guests right now. Please try again in a moment.", 'done': True})
     except Exception as e:
         error_msg = str(e)
         if "api key" in error_msg.lower() or "authentication" in error_msg.lower():
             error_msg = "AI service configuration error"
-        yield f"data: {json.dumps({'type': 'error', 'error': error_msg, 'done': True})}\n\n"
+        yield _sse({'type': 'error', 'error': error_msg, 'done': True})
 
 # =============================================================================
 # API Endpoints
@@ -492,7 +538,7 @@ async def chat_endpoint(
 
     if chat_request.stream:
         return StreamingResponse(
-            stream_claude_response(chat_request.messages, db=db),
+            stream_claude_response(chat_request.messages, db=db, is_disconnected=request.is_disconnected),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -506,19 +552,15 @@ async def chat_endpoint(
         try:
             client = get_anthropic_client()
 
-            claude_messages = []
-            for msg in chat_request.messages:
-                role = "user" if msg.role == "user" else "assistant"
-                claude_messages.append({"role": role, "content": msg.content})
-
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=1024,
-                system=DIEGO_SYSTEM_PROMPT,
-                messages=claude_messages,
-                tools=ANTHROPIC_TOOLS,
-                temperature=0.8,
-            )
+            async with chat_slot():
+                response = await client.messages.create(
+                    model=CHAT_MODEL,
+                    max_tokens=1024,
+                    system=DIEGO_SYSTEM_PROMPT,
+                    messages=_to_claude_messages(chat_request.messages),
+                    tools=ANTHROPIC_TOOLS,
+                    temperature=0.8,
+                )
 
             text_content = ""
             function_call = None
@@ -527,7 +569,7 @@ async def chat_endpoint(
                 if block.type == "text":
                     text_content += block.text
                 elif block.type == "tool_use":
-                    tool_result = execute_tool(block.name, block.input, db=db)
+                    tool_result = await run_in_threadpool(execute_tool, block.name, block.input, db)
                     function_call = {
                         "name": block.name,
                         "args": block.input,
@@ -544,6 +586,12 @@ async def chat_endpoint(
 
             return result
 
+        except ChatBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Diego is with other guests right now. Please try again in a moment.",
+                headers={"Retry-After": "5"},
+            )
         except Exception:
             raise HTTPException(
                 status_code=500,
@@ -557,7 +605,7 @@ async def ai_status():
 
     return {
         "available": available,
-        "model": "claude-sonnet-4-20250514" if available else None,
+        "model": CHAT_MODEL if available else None,
         "persona": "Diego - Head Concierge",
         "tools": [t["name"] for t in ANTHROPIC_TOOLS] if available else [],
         "rate_limit": {
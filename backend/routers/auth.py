@@ -12,13 +12,14 @@ from schemas.auth import (
 )
 from services.auth_service import verify_password, get_password_hash, create_access_token, create_refresh_token, decode_access_token
 from services.gamification_service import update_streak
-from services.email_service import send_password_reset_email, send_waitlist_welcome_email, send_email_verification_email
+from services.email_service import queue_email, send_password_reset_email, send_waitlist_welcome_email, send_email_verification_email
 from services.redis_service import set_oauth_state, verify_oauth_state, check_rate_limit
 from services.clave_service import process_daily_login, award_new_user_bonus, award_referral_bonus
 from services.analytics_service import track_event, capture_first_touch
 from services.email_validation import is_disposable_email, normalize_email_for_dedup, has_deliverable_domain
 from utils.request import client_ip as get_client_ip
-from dependencies import get_current_user
+from dependencies import get_current_user, get_principal
+from services.principal_service import Principal
 from config import settings
 import uuid
 import secrets
@@ -313,7 +314,7 @@ def register(
         # point; the content is general project onboarding, not waitlist-specific.
         try:
             referral_link = f"{settings.FRONTEND_URL}/waitlist?ref={new_referral_code}"
-            background_tasks.add_task(
+            queue_email(
                 send_waitlist_welcome_email,
                 user.email,
                 profile.username,
@@ -332,7 +333,7 @@ def register(
             verify_token = verify_email_serializer.dumps(
                 str(user_id), salt="email-verification"
             )
-            background_tasks.add_task(
+            queue_email(
                 send_email_verification_email,
                 user.email,
                 verify_token,
@@ -608,17 +609,18 @@ def logout(request: Request, response: Response):
 
 @router.get("/me", response_model=UserProfileResponse)
 def get_current_user_profile(
-    current_user: User = Depends(get_current_user),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    current_user = principal.user
+    profile = principal.profile
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
 
-    subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id).first()
+    subscription = principal.subscription
     # Only surface a paid tier when the subscription is in a billable state.
     # INCOMPLETE means checkout was created but Stripe hasn't confirmed payment
     # yet — treat it the same as ROOKIE so the frontend doesn't show "Current
@@ -975,7 +977,7 @@ async def google_callback(
                 )
                 referral_code = profile.referral_code if profile else ""
                 referral_link = f"{settings.FRONTEND_URL}/waitlist?ref={referral_code}"
-                background_tasks.add_task(
+                queue_email(
                     send_waitlist_welcome_email,
                     user.email,
                     friendly_name,
@@ -1078,12 +1080,9 @@ def forgot_password(
             salt="password-reset"
         )
         
-        # Send email
-        email_sent = send_password_reset_email(user.email, reset_token)
-        
-        if not email_sent:
-            logger.error(f"Failed to send password reset email to {user.email}")
-        
+        # Send email (job queue: retried, and the response doesn't wait on Resend)
+        queue_email(send_password_reset_email, user.email, reset_token)
+
         return {"message": "If the email exists, a password reset link has been sent."}
     
     except Exception as e:
@@ -1380,7 +1379,7 @@ def send_verification(
         token = verify_email_serializer.dumps(
             str(current_user.id), salt="email-verification"
         )
-        background_tasks.add_task(
+        queue_email(
             send_email_verification_email,
             current_user.email,
             token,
@@ -1529,7 +1528,7 @@ def join_waitlist(
         try:
             # Construct referral link
             referral_link = f"{settings.FRONTEND_URL}/waitlist?ref={new_referral_code}"
-            send_waitlist_welcome_email(email, username, referral_link)
+            queue_email(send_waitlist_welcome_email, email, username, referral_link)
         except Exception as e:
             logger.error(f"Failed to send welcome email: {e}")
 
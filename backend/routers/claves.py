@@ -2,7 +2,7 @@
 Clave Economy API Endpoints
 /api/claves - Wallet, daily claims, balance checks, streak freezes
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.orm import Session
@@ -13,6 +13,7 @@ from dependencies import get_current_user
 from services import clave_service
 from services import streak_service
 from schemas.community import WalletResponse, DailyClaimResponse, ClaveBalanceCheck
+from utils.pagination import parse_cursor_param, set_next_cursor
 
 router = APIRouter(tags=["Claves"])
 
@@ -47,13 +48,20 @@ class RepairStreakResponse(BaseModel):
 
 @router.get("/wallet", response_model=WalletResponse)
 def get_wallet(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get user's wallet state including balance and recent transactions.
+    Older transactions: pass the X-Next-Cursor header back as `cursor`.
     """
-    wallet = clave_service.get_wallet(str(current_user.id), db)
+    wallet = clave_service.get_wallet(
+        str(current_user.id), db, limit=limit, cursor=parse_cursor_param(cursor)
+    )
+    set_next_cursor(response, wallet["recent_transactions"], limit)
     return WalletResponse(**wallet)
 
 
@@ -3,15 +3,17 @@ Community API Endpoints - The Stage & The Lab
 /api/community - Posts, reactions, replies, solutions
 """
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
 from models import get_db
 from models.user import User
 from dependencies import get_current_user, get_current_user_optional
-from services import post_service, badge_service, notification_service, posting_reward_service
+from services import post_service, badge_service, notification_service, posting_reward_service, job_queue
+from services import community_jobs  # noqa: F401  (registers the jobs enqueued below)
 from services.analytics_service import track_event
+from utils.pagination import NEXT_CURSOR_HEADER, after_cursor, encode_cursor, parse_cursor_param, set_next_cursor
 
 logger = logging.getLogger(__name__)
 from schemas.community import (
@@ -86,12 +88,14 @@ def get_my_rank(
 
 @router.get("/feed", response_model=List[PostResponse])
 def get_feed(
+    response: Response,
     post_type: Optional[str] = Query(None, description="Filter by 'stage' or 'lab'"),
     tag: Optional[str] = Query(None, description="Filter by single tag slug"),
     tags: Optional[str] = Query(None, description="Comma-separated tag slugs for multi-tag filter"),
     video_type: Optional[str] = Query(None, description="Filter stage videos by 'motw', 'original', or 'guild'"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; overrides skip"),
     current_user: Optional[User] = Depends(get_current_user_optional),
     db: Session = Depends(get_db)
 ):
@@ -102,6 +106,8 @@ def get_feed(
     - post_type=lab: Q&A posts (The Lab)
     - tags: Comma-separated tag slugs for multi-tag filter
     - video_type: motw / original / guild (only meaningful for stage posts)
+    - cursor: keyset pagination; the next page's cursor is returned in the
+      X-Next-Cursor header (absent on the last page)
     """
     tags_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else None
     # Unauthenticated visitors get a 3-post preview for the community landing
@@ -114,8 +120,11 @@ def get_feed(
         skip=skip,
         limit=effective_limit,
         current_user_id=str(current_user.id) if current_user else None,
-        db=db
+        db=db,
+        cursor=parse_cursor_param(cursor),
     )
+    if current_user is not None:
+        set_next_cursor(response, posts, effective_limit)
     return posts
 
 
@@ -179,10 +188,10 @@ def create_post(
     # Enforces daily cap + cooldown internally, so calling unconditionally
     # is safe — ineligible posts just no-op.
     reward_outcome = {"awarded": False}
-    post_id_for_reward = (result.get("post") or {}).get("id")
-    if post_id_for_reward:
+    new_post_id = (result.get("post") or {}).get("id")
+    if new_post_id:
         try:
-            reward_outcome = posting_reward_service.award_post_reward(post_id_for_reward, db)
+            reward_outcome = posting_reward_service.award_post_reward(new_post_id, db)
             if reward_outcome.get("awarded"):
                 db.commit()
         except Exception:
@@ -197,49 +206,8 @@ def create_post(
             "new_balance": reward_outcome["new_balance"],
         }
 
-    # Badge triggers — only count posts that passed moderation.
-    from sqlalchemy import func
-    from models.community import Post, ModerationStatus
-    _ACTIVE = ModerationStatus.ACTIVE.value
-
-    # Stage posts: video total + per-type (motw / original / guild).
-    if result["success"] and request.post_type == "stage" and request.mux_asset_id:
-        video_count = db.query(func.count(Post.id)).filter(
-            Post.user_id == current_user.id,
-            Post.post_type == "stage",
-            Post.mux_asset_id.isnot(None),
-            Post.is_deleted == False,
-            Post.moderation_status == _ACTIVE,
-        ).scalar() or 0
-        badge_service.check_and_award_badges(str(current_user.id), "videos_posted", video_count, db)
-
-        if request.video_type in ("motw", "original", "guild"):
-            vtype_count = db.query(func.count(Post.id)).filter(
-                Post.user_id == current_user.id,
-                Post.post_type == "stage",
-                Post.video_type == request.video_type,
-                Post.mux_asset_id.isnot(None),
-                Post.is_deleted == False,
-                Post.moderation_status == _ACTIVE,
-            ).scalar() or 0
-            badge_service.check_and_award_badges(
-                str(current_user.id),
-                f"{request.video_type}_videos",
-                vtype_count,
-                db,
-            )
-        db.commit()
-
-    # Curious Mind: Track questions posted (Lab posts)
-    if result["success"] and request.post_type == "lab":
-        question_count = db.query(func.count(Post.id)).filter(
-            Post.user_id == current_user.id,
-            Post.post_type == "lab",
-            Post.is_deleted == False,
-            Post.moderation_status == _ACTIVE,
-        ).scalar() or 0
-        badge_service.check_and_award_badges(str(current_user.id), "questions_posted", question_count, db)
-        db.commit()
+    # Badge triggers: post_service queued them for after the commit, once
+    # the post is visible (now, or when moderation clears it).
 
     # ML feature: social engagement is the #1 retention predictor.
     try:
@@ -380,55 +348,15 @@ def add_reply(
 
     db.commit()
 
-    # Badge triggers
-    # The Socialite: Track comments posted. Filters soft-deleted replies so
-    # the badge count reflects real state (deleting a comment un-counts it).
-    if result["success"]:
-        from sqlalchemy import func
-        from models.community import PostReply, Post
-        comment_count = db.query(func.count(PostReply.id)).filter(
-            PostReply.user_id == current_user.id,
-            PostReply.is_deleted == False,
-        ).scalar() or 0
-        badge_service.check_and_award_badges(str(current_user.id), "comments_posted", comment_count, db)
-
-        # Notify post owner about the reply (don't notify self).
-        # For nested replies, also notify the parent reply's author (a
-        # direct reply to their comment is more relevant to them than the
-        # post owner). Both notifications are deduped against the actor
-        # so users never get pinged about their own actions.
-        post = db.query(Post).filter(Post.id == post_id).first()
-        if post:
-            notified: set[str] = {str(current_user.id)}
-            if str(post.user_id) not in notified:
-                notification_service.create_notification(
-                    user_id=str(post.user_id),
-                    type="reply_received",
-                    title="💬 New Reply",
-                    message=f"replied to your post \"{post.title[:50]}\"",
-                    reference_type="post",
-                    reference_id=str(post.id),
-                    actor_id=str(current_user.id),
-                    db=db
-                )
-                notified.add(str(post.user_id))
-
-            if request.parent_reply_id:
-                from models.community import PostReply
-                parent = db.query(PostReply).filter(PostReply.id == request.parent_reply_id).first()
-                if parent and str(parent.user_id) not in notified:
-                    notification_service.create_notification(
-                        user_id=str(parent.user_id),
-                        type="reply_received",
-                        title="💬 New Reply",
-                        message=f"replied to your comment on \"{post.title[:50]}\"",
-                        reference_type="post",
-                        reference_id=str(post.id),
-                        actor_id=str(current_user.id),
-                        db=db
-                    )
-
-        db.commit()
+    # Comment badge + reply notifications run on the job queue.
+    reply_id = (result.get("reply") or {}).get("id")
+    job_queue.enqueue(
+        "community.reply_created",
+        key=f"reply_created:{reply_id}" if reply_id else None,
+        user_id=str(current_user.id),
+        post_id=str(post_id),
+        parent_reply_id=str(request.parent_reply_id) if request.parent_reply_id else None,
+    )
 
     try:
         track_event(
@@ -674,25 +602,38 @@ def unsave_post(
 
 @router.get("/saved")
 def get_saved_posts(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; overrides skip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get the current user's saved/bookmarked posts."""
+    """Get the current user's saved/bookmarked posts, most recently saved first.
+
+    Each item carries `saved_at`. Keyset position is (saved_at, post_id) —
+    post_id is unique per user's saves, so it's a total order.
+    """
     from models.community import Post, SavedPost
 
-    saved_post_ids = (
-        db.query(SavedPost.post_id)
-        .filter(SavedPost.user_id == current_user.id)
-        .order_by(SavedPost.created_at.desc())
-        .offset(skip)
+    position = parse_cursor_param(cursor)
+    saved_query = db.query(SavedPost.post_id, SavedPost.created_at).filter(
+        SavedPost.user_id == current_user.id
+    )
+    if position:
+        saved_query = saved_query.filter(after_cursor(SavedPost.created_at, SavedPost.post_id, position))
+    else:
+        saved_query = saved_query.offset(skip)
+    saved_rows = (
+        saved_query
+        .order_by(SavedPost.created_at.desc(), SavedPost.post_id.desc())
         .limit(limit)
         .all()
     )
-    post_ids = [row[0] for row in saved_post_ids]
+    post_ids = [row[0] for row in saved_rows]
     if not post_ids:
         return []
+    saved_at = {str(post_id): created_at for post_id, created_at in saved_rows}
 
     from sqlalchemy import or_ as _or
     from models.community import ModerationStatus as _ModStatus
@@ -710,7 +651,17 @@ def get_saved_posts(
     post_map = {p.id: p for p in posts}
     ordered = [post_map[pid] for pid in post_ids if pid in post_map]
 
-    return post_service.format_posts_bulk_public(ordered, str(current_user.id), db)
+    results = post_service.format_posts_bulk_public(ordered, str(current_user.id), db)
+    for item in results:
+        item["saved_at"] = saved_at.get(item["id"])
+
+    # The cursor must come from the last *saved row*, not the last visible
+    # post — a deleted/hidden post at the end of the page would otherwise
+    # make the next page repeat rows.
+    if len(saved_rows) == limit:
+        last_post_id, last_saved_at = saved_rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_saved_at, last_post_id)
+    return results
 
 
 @router.get("/upload-check-lab", response_model=UploadCheckResponse)
@@ -772,6 +723,7 @@ def get_tags(
 
 @router.get("/search")
 def search_posts(
+    response: Response,
     q: str = Query(..., min_length=2, max_length=200, description="Search query"),
     post_type: Optional[str] = Query(None),
     tag: Optional[str] = Query(None, description="Filter by single tag slug"),
@@ -779,11 +731,16 @@ def search_posts(
     video_type: Optional[str] = Query(None, description="Filter stage videos by 'motw', 'original', or 'guild'"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
+    sort: str = Query("relevance", pattern=r"^(relevance|new)$"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor (sort=new); overrides skip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Search posts by title, username, and/or tags.
+    Search posts by text, author username, and/or tags.
+    - sort=relevance (default): ranked by text match, reactions and recency; page with skip
+    - sort=new: newest first; next-page cursor is returned in the X-Next-Cursor header
+    Results include `highlight` snippets (HTML-escaped, matches wrapped in <mark>).
     """
     tags_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else None
     posts = post_service.search_posts(
@@ -795,6 +752,10 @@ def search_posts(
         skip=skip,
         limit=limit,
         current_user_id=str(current_user.id),
-        db=db
+        db=db,
+        cursor=parse_cursor_param(cursor),
+        sort=sort,
     )
+    if sort == "new" or cursor:
+        set_next_cursor(response, posts, limit)
     return posts
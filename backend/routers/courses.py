@@ -1,14 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from typing import List, Dict
-import re
+from typing import AbstractSet, List
 from models import get_db
 from models.user import User, UserRole, Subscription, SubscriptionStatus
 from models.course import World, Lesson, Level
-from models.progress import UserProgress
 from schemas.course import WorldResponse, LessonResponse, LessonDetailResponse, WorldDetailResponse, LevelResponse, LevelEdgeResponse
-from services.skill_tree_access import compute_level_unlock_map, is_lesson_accessible
+from services import catalog_service, progress_service
+from services.skill_tree_access import is_world_accessible, level_completion, resolve_level_unlocks
 from dependencies import get_current_user, get_current_user_optional
 from typing import Optional
 from datetime import datetime
@@ -16,44 +14,12 @@ from datetime import datetime
 router = APIRouter()
 
 
-# Grabs the body of a `## TL;DR` section from a lesson's markdown notes.
-# Matches from the TL;DR heading up to the next `## ` heading or end of string.
-_TLDR_PATTERN = re.compile(
-    r"^\s*##\s+TL;?DR\s*\n+(.*?)(?=^\s*##\s+|\Z)",
-    re.MULTILINE | re.DOTALL | re.IGNORECASE,
-)
-
-
-def _extract_tldr_for_level(level: Level, locale: str = "en") -> Optional[str]:
-    """Return the TL;DR text from the first lesson's markdown notes, or None.
-
-    When locale != "en" and translated notes exist at
-    content_json.translations[locale].notes, the TL;DR is pulled from there.
-    Falls back to the English notes if the locale is missing or malformed.
-    The `## TL;DR` heading itself is preserved verbatim across all 14 locales,
-    so the same regex works for every language.
-    """
-    if not level.lessons:
-        return None
-    first_lesson = min(level.lessons, key=lambda l: (l.order_index or 0))
-    content = first_lesson.content_json or {}
-    if not isinstance(content, dict):
-        return None
-    notes: Optional[str] = None
-    if locale and locale != "en":
-        trans = content.get("translations")
-        if isinstance(trans, dict):
-            block = trans.get(locale)
-            if isinstance(block, dict) and isinstance(block.get("notes"), str):
-                notes = block["notes"]
-    if not isinstance(notes, str):
-        notes = content.get("notes") if isinstance(content.get("notes"), str) else None
-    if not isinstance(notes, str):
-        return None
-    match = _TLDR_PATTERN.search(notes)
-    if not match:
-        return None
-    return match.group(1).strip() or None
+def _completed_lesson_ids(db: Session, user: Optional[User]) -> AbstractSet[str]:
+    """Every lesson the user has completed (empty when anonymous); cached per
+    user in Redis, see progress_service.completed_lessons."""
+    if not user:
+        return frozenset()
+    return progress_service.completed_lessons(str(user.id), db)
 
 
 @router.get("/worlds", response_model=List[WorldResponse])
@@ -70,9 +36,7 @@ def get_worlds(
     - Logged in (Rookie/Free): Only free courses unlocked
     - Logged in (Paid): All courses unlocked
     """
-    worlds = db.query(World).filter(World.is_published == True).options(
-        joinedload(World.levels).joinedload(Level.lessons)
-    ).order_by(World.order_index).all()
+    worlds = catalog_service.get_catalog(db).published
     
     # Check subscription if user is authenticated
     is_subscribed = False
@@ -80,41 +44,9 @@ def get_worlds(
         subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id).first()
         is_subscribed = subscription and subscription.status in (SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING)
     
-    # PERFORMANCE FIX: Pre-fetch all user progress in a single query
-    # Build a map of world_id -> (completed_count, total_lessons)
-    world_progress_map: Dict[str, tuple] = {}
-    if current_user:
-        # First, build a mapping of lesson_id -> world_id for all lessons
-        lesson_to_world: Dict[str, str] = {}
-        world_lesson_counts: Dict[str, int] = {}
-        
-        for world in worlds:
-            world_lesson_counts[str(world.id)] = 0
-            for level in world.levels:
-                for lesson in level.lessons:
-                    lesson_to_world[str(lesson.id)] = str(world.id)
-                    world_lesson_counts[str(world.id)] += 1
-        
-        # Get all completed lesson IDs for this user in a single query
-        all_lesson_ids = list(lesson_to_world.keys())
-        if all_lesson_ids:
-            completed_progress = db.query(UserProgress.lesson_id).filter(
-                UserProgress.user_id == current_user.id,
-                UserProgress.is_completed == True,
-                UserProgress.lesson_id.in_(all_lesson_ids)
-            ).all()
-            
-            # Count completions per world
-            world_completed_counts: Dict[str, int] = {str(w.id): 0 for w in worlds}
-            for (lesson_id,) in completed_progress:
-                world_id = lesson_to_world.get(str(lesson_id))
-                if world_id:
-                    world_completed_counts[world_id] += 1
-            
-            # Build the progress map
-            for world_id, completed in world_completed_counts.items():
-                total = world_lesson_counts.get(world_id, 0)
-                world_progress_map[world_id] = (completed, total)
+    # The catalog snapshot carries the structure; the user's completed
+    # lessons come from their cached set.
+    completed_lesson_ids = _completed_lesson_ids(db, current_user)
     
     result = []
     for world in worlds:
@@ -135,46 +67,28 @@ def get_worlds(
             # Paid course - requires active subscription
             is_locked = not is_subscribed
         
-        # Calculate progress from pre-fetched data
         progress_percentage = 0
-        if current_user:
-            completed, total = world_progress_map.get(str(world.id), (0, 0))
-            progress_percentage = (completed / total * 100) if total > 0 else 0
-        
-        # Convert enum to string value
-        difficulty_str = world.difficulty.value if hasattr(world.difficulty, 'value') else str(world.difficulty)
-        
-        # Calculate module and lesson counts
-        module_count = len(world.levels)
-        lesson_count = sum(len(level.lessons) for level in world.levels)
-
-        # Calculate total duration if not set
-        calculated_duration = sum(
-            sum((lesson.duration_minutes or 0) for lesson in level.lessons)
-            for level in world.levels
-        )
-        total_duration = world.total_duration_minutes if world.total_duration_minutes else calculated_duration
-
-        # Get objectives (ensure it's a list)
-        objectives = world.objectives if world.objectives else []
+        if current_user and world.lesson_count > 0:
+            completed = sum(1 for lesson in world.lessons if lesson.id in completed_lesson_ids)
+            progress_percentage = completed / world.lesson_count * 100
 
         result.append(WorldResponse(
-            id=str(world.id),
+            id=world.id,
             slug=world.slug,
             title=world.title,
             description=world.description,
             image_url=world.image_url,
             thumbnail_url=world.thumbnail_url,
             mux_preview_playback_id=world.mux_preview_playback_id,  # Include preview playback ID
-            difficulty=difficulty_str,
-            course_type=world.course_type or "course",
+            difficulty=world.difficulty,
+            course_type=world.course_type,
             progress_percentage=progress_percentage,
             is_locked=is_locked,
             # Course metadata
-            total_duration_minutes=total_duration,
-            objectives=objectives,
-            module_count=module_count,
-            lesson_count=lesson_count
+            total_duration_minutes=world.total_duration_minutes,
+            objectives=list(world.objectives),
+            module_count=world.module_count,
+            lesson_count=world.lesson_count
         ))
     
     return result
@@ -192,15 +106,14 @@ def get_lesson(
     - Free courses: Accessible to all logged in users
     - Paid courses: Requires active subscription
     """
-    lesson = db.query(Lesson).filter(Lesson.id == lesson_id).options(
-        joinedload(Lesson.level).joinedload(Level.world).joinedload(World.levels).joinedload(Level.lessons)
-    ).first()
+    lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
-    # Get the level and world this lesson belongs to (already eager-loaded)
-    level = lesson.level
-    world = level.world if level else None
+    # World, level title and next/prev come from the catalog's lesson index.
+    catalog = catalog_service.get_catalog(db)
+    position = catalog.position(lesson.id)
+    world = catalog.world(position.world_id) if position else None
 
     if not world:
         raise HTTPException(status_code=404, detail="World not found")
@@ -209,7 +122,7 @@ def get_lesson(
     # - Admins: Full access to everything
     # - Free courses: Accessible to all logged in users
     # - Paid courses: Requires active subscription
-    accessible, reason = is_lesson_accessible(db, lesson, current_user)
+    accessible, reason = is_world_accessible(db, world, current_user)
     if not accessible:
         if reason == "subscription":
             raise HTTPException(
@@ -218,34 +131,6 @@ def get_lesson(
             )
         raise HTTPException(status_code=403, detail="Access denied.")
 
-    # Get all lessons in the world, sorted by week_number, day_number, and order_index
-    all_lessons = []
-    if world:
-        for w_level in world.levels:
-            all_lessons.extend(w_level.lessons)
-        
-        # Sort lessons by week_number, day_number, and order_index
-        all_lessons.sort(key=lambda l: (
-            l.week_number if l.week_number is not None else 0,
-            l.day_number if l.day_number is not None else 0,
-            l.order_index
-        ))
-    
-    # Find current lesson index and get next/prev
-    current_index = None
-    for i, l in enumerate(all_lessons):
-        if l.id == lesson.id:
-            current_index = i
-            break
-    
-    next_lesson = None
-    prev_lesson = None
-    if current_index is not None:
-        if current_index + 1 < len(all_lessons):
-            next_lesson = all_lessons[current_index + 1]
-        if current_index > 0:
-            prev_lesson = all_lessons[current_index - 1]
-    
     # lesson_type is now a string, use it directly
     lesson_type_str = lesson.lesson_type or "video"
 
@@ -255,8 +140,8 @@ def get_lesson(
         description=lesson.description,
         video_url=lesson.video_url,
         xp_value=lesson.xp_value,
-        next_lesson_id=str(next_lesson.id) if next_lesson else None,
-        prev_lesson_id=str(prev_lesson.id) if prev_lesson else None,
+        next_lesson_id=position.next_id,
+        prev_lesson_id=position.prev_id,
         comments=[],  # TODO: Implement comments
         week_number=lesson.week_number,
         day_number=lesson.day_number,
@@ -266,7 +151,7 @@ def get_lesson(
         thumbnail_url=lesson.thumbnail_url,
         lesson_type=lesson_type_str,
         level_id=str(lesson.level_id) if lesson.level_id else None,
-        level_title=level.title if level else None
+        level_title=position.level_title
     )
 
 
@@ -312,16 +197,7 @@ def get_level_lessons(
         l.order_index
     ))
 
-    # Pre-fetch user progress for this level's lessons
-    completed_lesson_ids: set = set()
-    if current_user and lessons:
-        lesson_ids = [str(l.id) for l in lessons]
-        completed = db.query(UserProgress.lesson_id).filter(
-            UserProgress.user_id == current_user.id,
-            UserProgress.is_completed == True,
-            UserProgress.lesson_id.in_(lesson_ids)
-        ).all()
-        completed_lesson_ids = {str(lid) for (lid,) in completed}
+    completed_lesson_ids = _completed_lesson_ids(db, current_user)
 
     result = []
     for lesson in lessons:
@@ -403,16 +279,7 @@ def get_world_lessons(
         l.order_index
     ))
 
-    # PERFORMANCE FIX: Pre-fetch all user progress for this world's lessons in a single query
-    completed_lesson_ids: set = set()
-    if current_user and all_lessons:
-        lesson_ids = [str(l.id) for l in all_lessons]
-        completed_progress = db.query(UserProgress.lesson_id).filter(
-            UserProgress.user_id == current_user.id,
-            UserProgress.is_completed == True,
-            UserProgress.lesson_id.in_(lesson_ids)
-        ).all()
-        completed_lesson_ids = {str(lesson_id) for (lesson_id,) in completed_progress} if completed_progress else set()
+    completed_lesson_ids = _completed_lesson_ids(db, current_user)
 
     lessons = []
     for lesson in all_lessons:
@@ -457,81 +324,27 @@ def get_world_skill_tree(
     Get skill tree graph structure for a course with nodes (levels), edges, and unlock logic.
     Each node shows completion percentage and unlock status based on prerequisites.
     """
-    from models.course import LevelEdge
-
-    world = db.query(World).filter(World.id == world_id).options(
-        joinedload(World.levels).joinedload(Level.lessons)
-    ).first()
+    world = catalog_service.get_catalog(db).world(world_id)
     if not world:
         raise HTTPException(status_code=404, detail="World not found")
     
-    # Get all edges for this world
-    edges = db.query(LevelEdge).filter(LevelEdge.world_id == world_id).all()
-    
-    # Build prerequisite map (level_id -> list of prerequisite level_ids)
-    prerequisites_map: Dict[str, List[str]] = {}
-    for edge in edges:
-        to_level_id = str(edge.to_level_id)
-        from_level_id = str(edge.from_level_id)
-        if to_level_id not in prerequisites_map:
-            prerequisites_map[to_level_id] = []
-        prerequisites_map[to_level_id].append(from_level_id)
-    
-    # Pre-fetch user progress for all lessons in this course
-    completed_lesson_ids: set = set()
-    if current_user:
-        all_lesson_ids = []
-        for level in world.levels:
-            all_lesson_ids.extend([str(l.id) for l in level.lessons])
-        
-        if all_lesson_ids:
-            completed_progress = db.query(UserProgress.lesson_id).filter(
-                UserProgress.user_id == current_user.id,
-                UserProgress.is_completed == True,
-                UserProgress.lesson_id.in_(all_lesson_ids)
-            ).all()
-            completed_lesson_ids = {str(lesson_id) for (lesson_id,) in completed_progress}
-    
-    # Calculate completion percentage for each level
-    level_completion_map: Dict[str, float] = {}
-    for level in world.levels:
-        total_lessons = len(level.lessons)
-        if total_lessons == 0:
-            level_completion_map[str(level.id)] = 0.0
-        else:
-            completed_count = sum(1 for lesson in level.lessons if str(lesson.id) in completed_lesson_ids)
-            level_completion_map[str(level.id)] = (completed_count / total_lessons) * 100
+    # Overlay the user's progress on the catalog snapshot's structure.
+    completed_lesson_ids = _completed_lesson_ids(db, current_user)
+    level_lessons = world.level_lessons
+    level_completion_map = level_completion(level_lessons, completed_lesson_ids)
     
     # Determine which levels are unlocked (shared logic with get_lesson access check)
-    level_unlocked_map = compute_level_unlock_map(db, world, current_user)
+    level_unlocked_map = resolve_level_unlocks(list(level_lessons), world.prerequisites, level_completion_map)
 
     # For topic-type worlds, the tooltip/modal shows the first lesson's TL;DR
     # instead of a video preview. Regular courses and choreos skip this.
-    is_topic_world = (world.course_type or "course") == "topic"
+    is_topic_world = world.course_type == "topic"
 
     # Build level responses
     level_responses = []
     for level in world.levels:
-        level_id = str(level.id)
-        is_unlocked = level_unlocked_map.get(level_id, False)
-        completion_pct = level_completion_map.get(level_id, 0.0)
-
-        # Calculate total XP from lessons if not set on level
-        calculated_xp = sum(lesson.xp_value for lesson in level.lessons)
-        total_xp = level.total_xp if level.total_xp else calculated_xp
-
-        # Calculate duration from lessons if not set on level
-        calculated_duration = sum((lesson.duration_minutes or 0) for lesson in level.lessons)
-        duration = level.duration_minutes if level.duration_minutes else calculated_duration
-
-        tldr = _extract_tldr_for_level(level, locale) if is_topic_world else None
-
-        # B5: Sidebar shows boss-battle lessons separately, so the count
-        # the user sees in the module label must exclude boss-battle.
-        visible_lesson_count = sum(1 for l in level.lessons if not l.is_boss_battle)
-
         level_responses.append(LevelResponse(
-            id=level_id,
+            id=level.id,
             title=level.title,
             description=level.description,
             order_index=level.order_index,
@@ -539,32 +352,31 @@ def get_world_skill_tree(
             y_position=level.y_position,
             thumbnail_url=level.thumbnail_url,
             mux_preview_playback_id=level.mux_preview_playback_id,
-            is_unlocked=is_unlocked,
-            completion_percentage=completion_pct,
-            lesson_count=visible_lesson_count,
-            total_lesson_count=len(level.lessons),
+            is_unlocked=level_unlocked_map.get(level.id, False),
+            completion_percentage=level_completion_map.get(level.id, 0.0),
+            # B5: Sidebar shows boss-battle lessons separately, so the count
+            # the user sees in the module label must exclude boss-battle.
+            lesson_count=level.visible_lesson_count,
+            total_lesson_count=len(level.lesson_ids),
             # Module metadata
             outcome=level.outcome,
-            duration_minutes=duration,
-            total_xp=total_xp,
-            status=level.status or "active",
-            tldr=tldr,
+            duration_minutes=level.duration_minutes,
+            total_xp=level.total_xp,
+            status=level.status,
+            tldr=level.tldr(locale) if is_topic_world else None,
         ))
     
     # Build edge responses
     edge_responses = [
         LevelEdgeResponse(
-            id=str(edge.id),
-            from_level_id=str(edge.from_level_id),
-            to_level_id=str(edge.to_level_id),
-            world_id=str(edge.world_id)
+            id=edge.id,
+            from_level_id=edge.from_level_id,
+            to_level_id=edge.to_level_id,
+            world_id=edge.world_id
         )
-        for edge in edges
+        for edge in world.edges
     ]
     
-    # Convert difficulty enum to string
-    difficulty_str = world.difficulty.value if hasattr(world.difficulty, 'value') else str(world.difficulty)
-    
     # Determine lock status
     if not current_user:
         is_locked = True
@@ -578,11 +390,11 @@ def get_world_skill_tree(
         is_locked = not subscription or subscription.status not in (SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING)
 
     return WorldDetailResponse(
-        id=str(world.id),
+        id=world.id,
         title=world.title,
         description=world.description,
-        difficulty=difficulty_str,
-        course_type=world.course_type or "course",
+        difficulty=world.difficulty,
+        course_type=world.course_type,
         is_free=world.is_free,
         is_published=world.is_published,
         is_locked=is_locked,
@@ -20,6 +20,8 @@ from services.download_service import (
     DOWNLOAD_URL_EXPIRATION_SECONDS
 )
 from services.mux_service import get_mux_download_url
+from services import catalog_service
+from services.skill_tree_access import is_world_accessible
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +46,17 @@ class DownloadUrlResponse(BaseModel):
     warning: str
 
 
+def _require_lesson_access(lesson: Lesson, user: User, db: Session) -> None:
+    """Same gate as viewing the lesson: paid worlds need a subscription."""
+    found = catalog_service.get_catalog(db).lesson(lesson.id)
+    accessible, _ = is_world_accessible(db, found[0] if found else None, user)
+    if not accessible:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Subscription required. Please upgrade to access this course."
+        )
+
+
 @router.get("/status", response_model=DownloadStatusResponse)
 def get_user_download_status(
     current_user: User = Depends(get_current_user),
@@ -86,6 +99,7 @@ def get_lesson_download_url(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Lesson not found"
         )
+    _require_lesson_access(lesson, current_user, db)
     
     # Check if lesson has a video
     if not lesson.mux_asset_id:
@@ -233,6 +247,7 @@ async def stream_lesson_download(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Lesson not found"
         )
+    _require_lesson_access(lesson, current_user, db)
     
     # Check if lesson has a video
     if not lesson.mux_asset_id:
@@ -10,6 +10,7 @@ from models.course import Lesson, World, Level
 from models import get_db
 from sqlalchemy.orm import Session
 from services.mux_service import create_direct_upload
+from services import post_service
 from services.auth_service import (
     decode_access_token,
     decode_mux_upload_token,
@@ -607,8 +608,7 @@ def delete_mux_asset(
         
         # Clear Mux IDs from all posts using this asset
         for post in posts:
-            post.mux_asset_id = None
-            post.mux_playback_id = None
+            post_service.detach_post_video(post, db)
         
         db.commit()
         
@@ -829,8 +829,7 @@ def check_upload_status(
 
                 if found_asset and found_asset.playback_ids and len(found_asset.playback_ids) > 0:
                     playback_id = found_asset.playback_ids[0].id
-                    post.mux_playback_id = playback_id
-                    post.mux_asset_id = found_asset.id
+                    post_service.attach_post_video(post, found_asset.id, playback_id, db)
                     db.commit()
 
                     # Stage posts are created BEFORE the Mux upload completes,
@@ -1091,8 +1090,7 @@ async def mux_webhook_handler(
                             from models.community import Post
                             post = db.query(Post).filter(Post.id == post_id).first()
                             if post:
-                                post.mux_asset_id = asset_id
-                                post.mux_playback_id = playback_id
+                                post_service.attach_post_video(post, asset_id, playback_id, db)
                                 db.commit()
                                 logger.info(f"Updated post {post_id} with video")
 
@@ -2,32 +2,43 @@
 Notification API Endpoints
 /api/notifications - In-app notifications
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from models import get_db
 from models.user import User
-from dependencies import get_current_user
-from services import notification_service
+from dependencies import get_admin_user, get_current_user, get_token_expiry
+from services import notification_service, notification_stream
+from utils.pagination import decode_cursor, parse_cursor_param, set_next_cursor
 
 router = APIRouter(tags=["Notifications"])
 
 
 @router.get("")
 def get_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; overrides skip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all notifications for the current user."""
-    return notification_service.get_notifications(
+    """Get all notifications for the current user.
+    Next-page cursor is returned in the X-Next-Cursor header."""
+    notifications = notification_service.get_notifications(
         user_id=str(current_user.id),
         skip=skip,
         limit=limit,
-        db=db
+        db=db,
+        cursor=parse_cursor_param(cursor),
     )
+    set_next_cursor(response, notifications, limit)
+    return notifications
 
 
 @router.get("/unread-count")
@@ -40,6 +51,74 @@ def get_unread_count(
     return {"unread_count": count}
 
 
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    token_expires_at: Optional[float] = Depends(get_token_expiry),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events: `notification` (a new notification plus the new
+    unread_count), `unread` (count changed, e.g. read in another tab) and
+    `resync` (events may have been missed — refetch). Reconnects resume
+    from Last-Event-ID. The stream ends when the access token expires, so
+    the reconnect re-authenticates (and a revoked session stops here).
+    """
+    user_id = str(current_user.id)
+    hub = notification_stream.get_hub()
+    # Subscribe before reading the backlog so nothing falls in between; an
+    # event seen twice is harmless (each carries the absolute unread count).
+    queue = hub.subscribe(user_id)
+    try:
+        position = None
+        if last_event_id:
+            try:
+                position = decode_cursor(last_event_id)
+            except ValueError:
+                position = None
+
+        def _initial_state():
+            backlog = (
+                notification_service.get_notifications_since(user_id, position, db)
+                if position else []
+            )
+            unread = notification_service.get_unread_count(user_id, db)
+            # Don't hold a pooled connection for the life of the stream.
+            db.close()
+            return backlog, unread
+
+        backlog, unread = await run_in_threadpool(_initial_state)
+    except Exception:
+        hub.unsubscribe(user_id, queue)
+        raise
+
+    return StreamingResponse(
+        notification_stream.event_stream(
+            user_id, queue, request.is_disconnected, backlog, unread,
+            expires_at=token_expires_at,
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/stream/stats")
+def stream_stats(admin: User = Depends(get_admin_user)):
+    """Open SSE connections on the worker that served this request."""
+    hub = notification_stream.get_hub()
+    return {
+        "worker_pid": os.getpid(),
+        "connections": hub.connection_count,
+        "users": hub.user_count,
+    }
+
+
 @router.post("/{notification_id}/read")
 def mark_notification_read(
     notification_id: str,
@@ -22,6 +22,7 @@ from services.clave_service import award_subscription_bonus
 from services.badge_service import award_subscription_badge, revoke_subscription_badges
 from services.analytics_service import track_event
 from services.email_service import (
+    queue_email,
     send_payment_failed_email,
     send_subscription_canceled_email,
 )
@@ -1237,12 +1238,13 @@ async def stripe_webhook(
                 ).first()
                 if cancelled_user and cancelled_user.email:
                     reactivate_url = f"{settings.FRONTEND_URL}/pricing"
-                    background_tasks.add_task(
+                    queue_email(
                         send_subscription_canceled_email,
                         cancelled_user.email,
                         cancelled_profile.first_name if cancelled_profile else "",
                         (cancelled_tier or "premium").capitalize(),
                         reactivate_url,
+                        key=f"email:{event['id']}",
                     )
             except Exception:
                 logger.exception("webhook: queue cancellation email failed (non-fatal)")
@@ -1290,12 +1292,13 @@ async def stripe_webhook(
                         if db_subscription.tier == SubscriptionTier.PERFORMER
                         else "Pro"
                     )
-                    background_tasks.add_task(
+                    queue_email(
                         send_payment_failed_email,
                         failed_user.email,
                         failed_profile.first_name if failed_profile else "",
                         portal_url,
                         tier_label,
+                        key=f"email:{event['id']}",
                     )
             except Exception:
                 logger.exception("webhook: queue payment_failed email failed (non-fatal)")
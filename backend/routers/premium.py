@@ -43,7 +43,7 @@ from schemas.premium import (
     ReleaseScheduleItemCreate, ReleaseScheduleItemUpdate, ReleaseScheduleItemResponse,
 )
 from services.r2_service import generate_r2_signed_url
-from services.email_service import send_coaching_feedback_email
+from services.email_service import queue_email, send_coaching_feedback_email
 from services.notification_service import create_notification
 
 router = APIRouter(prefix="/premium", tags=["premium"])
@@ -790,10 +790,12 @@ def update_coaching_submission(
         student_profile = db.query(UserProfile).filter(UserProfile.user_id == submission.user_id).first()
         if student_user:
             student_name = student_profile.first_name if student_profile else "there"
-            send_coaching_feedback_email(
+            queue_email(
+                send_coaching_feedback_email,
                 student_email=student_user.email,
                 student_name=student_name,
-                feedback_url=submission.feedback_video_url
+                feedback_url=submission.feedback_video_url,
+                key=f"email:coaching_feedback:{submission.id}:{submission.feedback_video_url}",
             )
             try:
                 create_notification(
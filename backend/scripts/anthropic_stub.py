@@ -0,0 +1,114 @@
+"""
+Local stand-in for the Anthropic Messages API.
+
+Answers POST /v1/messages like the real API does: a streamed reply
+(message_start, content blocks, message_delta, message_stop) when the
+body asks for "stream": true, a plain message otherwise. Replies are
+--tokens text deltas, --token-ms apart; with --tool-rate a fraction of
+first turns call search_knowledge_base instead, so the tool path and its
+follow-up call are exercised too. Nothing is checked but the body shape.
+
+Point the API at it with:
+  ANTHROPIC_BASE_URL=http://127.0.0.1:8788 ANTHROPIC_API_KEY=stub
+
+Usage:
+  python -m scripts.anthropic_stub                                 # port 8788
+  python -m scripts.anthropic_stub --tokens 120 --token-ms 25 --tool-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps({'type': event, **data})}\n\n"
+
+
+def _message(model: str, content: list, stop_reason) -> dict:
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "role": "assistant",
+        "model": model, "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 0},
+    }
+
+
+def build_app(tokens: int = 60, token_ms: float = 20.0, tool_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Anthropic stub")
+    app.state.requests = 0
+    app.state.open_streams = 0
+
+    def wants_tool(body: dict) -> bool:
+        # Only first turns call a tool; the follow-up carries the tool_result.
+        last = body["messages"][-1]
+        return isinstance(last.get("content"), str) and random.random() < tool_rate
+
+    async def stream(body: dict):
+        app.state.open_streams += 1
+        try:
+            yield _sse("message_start", {"message": _message(body["model"], [], None)})
+            yield _sse("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for i in range(tokens):
+                await asyncio.sleep(token_ms / 1000.0)
+                yield _sse("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": f"tok{i} "}})
+            yield _sse("content_block_stop", {"index": 0})
+            stop_reason = "end_turn"
+            if wants_tool(body):
+                stop_reason = "tool_use"
+                yield _sse("content_block_start", {"index": 1, "content_block": {
+                    "type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                    "name": "search_knowledge_base", "input": {},
+                }})
+                yield _sse("content_block_delta", {"index": 1, "delta": {
+                    "type": "input_json_delta", "partial_json": json.dumps({"query": "cross body lead"}),
+                }})
+                yield _sse("content_block_stop", {"index": 1})
+            yield _sse("message_delta", {"delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                         "usage": {"output_tokens": tokens}})
+            yield _sse("message_stop", {})
+        finally:
+            app.state.open_streams -= 1
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        if body.get("stream"):
+            return StreamingResponse(stream(body), media_type="text/event-stream")
+        await asyncio.sleep(tokens * token_ms / 1000.0)
+        text = " ".join(f"tok{i}" for i in range(tokens))
+        return _message(body["model"], [{"type": "text", "text": text}], "end_turn")
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "open_streams": app.state.open_streams}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--tokens", type=int, default=60, help="text deltas per reply")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="delay between deltas")
+    parser.add_argument("--tool-rate", type=float, default=0.0, help="fraction of first turns that call a tool")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        build_app(args.tokens, args.token_ms, args.tool_rate),
+        host=args.host, port=args.port, log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,7 @@ logger = logging.getLogger(__name__)
 
 from models import get_session_local
 from models.community import Post
+from services import post_service
 from config import settings
 
 
@@ -105,8 +106,7 @@ def run(dry_run: bool = False):
                 )
 
                 if not dry_run:
-                    post.mux_asset_id = asset.id
-                    post.mux_playback_id = playback_id
+                    post_service.attach_post_video(post, asset.id, playback_id, db)
                     db.commit()
 
                     # Award claves if not already rewarded (idempotent)
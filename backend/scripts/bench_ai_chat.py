@@ -0,0 +1,131 @@
+"""
+Load test: latency of unrelated endpoints while AI chats stream.
+
+Start the stub model and point the API at it first:
+
+  python -m scripts.anthropic_stub --tokens 100 --token-ms 20 --tool-rate 0.2
+  ANTHROPIC_BASE_URL=http://127.0.0.1:8788 ANTHROPIC_API_KEY=stub uvicorn main:app
+
+Then this probes --probe (default /health) at a steady rate, first on its
+own for --baseline seconds, then while --chats concurrent streams run on
+/api/ai/chat, and prints the probe's p50/p99 for both phases plus each
+chat's time to first token and total time. A worker whose event loop is
+blocked by the chats shows up as a probe p99 in the hundreds of ms.
+
+Each chat sends its own X-Forwarded-For, so the per-client AI rate limit
+doesn't refuse them; needs Redis on the API side as usual. Nothing is
+written to the database.
+
+Usage:
+  python -m scripts.bench_ai_chat                                  # 50 chats on localhost:8000
+  python -m scripts.bench_ai_chat --chats 100 --probe /api/courses/worlds --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+def _summary(samples) -> str:
+    samples = sorted(samples)
+    if not samples:
+        return "no samples"
+    return (
+        f"mean {statistics.fmean(samples):8.2f}  p50 {samples[len(samples) // 2]:8.2f}  "
+        f"p99 {samples[min(len(samples) - 1, int(len(samples) * 0.99))]:8.2f}"
+    )
+
+
+async def _probe(client, path: str, interval: float, stop: asyncio.Event, samples: list, errors: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            r = await client.get(path)
+            if r.status_code >= 500:
+                errors.append(r.status_code)
+            samples.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError as e:
+            errors.append(repr(e))
+        await asyncio.sleep(interval)
+
+
+async def _chat(client, i: int, first_ms: list, total_ms: list, errors: list) -> None:
+    body = {"messages": [{"role": "user", "content": "How do I keep timing on the 2?"}], "stream": True}
+    headers = {"X-Forwarded-For": f"10.1.{i // 250}.{i % 250}"}
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/api/ai/chat", json=body, headers=headers) as response:
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            return
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = json.loads(line[len("data: "):])
+            if data["type"] == "error":
+                errors.append(data["error"])
+                return
+            if first is None and data["type"] == "text":
+                first = (time.perf_counter() - start) * 1000
+    if first is not None:
+        first_ms.append(first)
+    total_ms.append((time.perf_counter() - start) * 1000)
+
+
+async def _run(args) -> int:
+    limits = httpx.Limits(max_connections=args.chats + 20)
+    timeout = httpx.Timeout(30.0, read=120.0)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        interval = 1.0 / args.probe_rate
+
+        stop, baseline, probe_errors = asyncio.Event(), [], []
+        probe = asyncio.create_task(_probe(client, args.probe, interval, stop, baseline, probe_errors))
+        await asyncio.sleep(args.baseline)
+        stop.set()
+        await probe
+
+        stop, loaded = asyncio.Event(), []
+        probe = asyncio.create_task(_probe(client, args.probe, interval, stop, loaded, probe_errors))
+        first_ms, total_ms, chat_errors = [], [], []
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(_chat(client, i, first_ms, total_ms, chat_errors) for i in range(args.chats)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    print(f"{args.probe} (ms):")
+    print(f"  idle               {_summary(baseline)}")
+    print(f"  during {args.chats:>3} chats    {_summary(loaded)}")
+    print(f"{len(total_ms)}/{args.chats} chats completed in {elapsed:.1f}s ({len(chat_errors)} errors)")
+    if chat_errors:
+        print(f"  first error: {chat_errors[0]!r}")
+    print(f"  first token (ms)   {_summary(first_ms)}")
+    print(f"  whole chat (ms)    {_summary(total_ms)}")
+    if probe_errors:
+        print(f"{len(probe_errors)} probe errors, first: {probe_errors[0]!r}")
+    return 0 if not chat_errors and not probe_errors else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--chats", type=int, default=50, help="concurrent chat streams")
+    parser.add_argument("--probe", default="/health", help="unrelated endpoint to time")
+    parser.add_argument("--probe-rate", type=float, default=20.0, help="probe requests per second")
+    parser.add_argument("--baseline", type=float, default=5.0, help="seconds of probing before the chats")
+    args = parser.parse_args()
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark OFFSET vs keyset (cursor) pagination on the community feed.
+
+Seeds N synthetic lab posts inside a transaction, times fetching page 1
+and a deep page both ways, then ROLLS BACK — nothing is persisted. Run
+against a staging copy; it needs at least one existing user to own the
+synthetic posts.
+
+Usage:
+  python -m scripts.bench_feed_pagination                 # 5000 posts, page 200
+  python -m scripts.bench_feed_pagination --posts 20000 --page 500 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_session_local
+from models.community import Post
+from models.user import User
+from services.post_service import _feed_query, _paginate_newest_first
+
+PAGE_SIZE = 20
+
+
+def _seed(db, owner_id, count: int) -> None:
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(Post, [
+        {
+            "id": uuid.uuid4(),
+            "user_id": owner_id,
+            "post_type": "lab",
+            "title": f"bench post {i}",
+            "body": "synthetic",
+            "tags": [],
+            # Every 7th post shares its neighbour's timestamp so ties exercise
+            # the id tie-breaker.
+            "created_at": now - timedelta(seconds=i - (i % 7 == 0)),
+        }
+        for i in range(count)
+    ])
+    db.flush()
+
+
+def _time(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--page", type=int, default=200, help="Deep page number (1-based)")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        owner = db.query(User.id).first()
+        if owner is None:
+            print("No users in this database; create one first.")
+            return 1
+        _seed(db, owner[0], args.posts)
+
+        base = lambda: _feed_query("lab", None, None, db)
+        skip = (args.page - 1) * PAGE_SIZE
+
+        # Walk to the deep page once to get the cursor a client would hold.
+        cursor = None
+        for _ in range(args.page - 1):
+            rows = _paginate_newest_first(base(), 0, PAGE_SIZE, cursor).all()
+            cursor = (rows[-1].created_at, rows[-1].id)
+        offset_rows = _paginate_newest_first(base(), skip, PAGE_SIZE, None).all()
+        keyset_rows = _paginate_newest_first(base(), 0, PAGE_SIZE, cursor).all()
+        if [r.id for r in offset_rows] != [r.id for r in keyset_rows]:
+            print("WARNING: offset and keyset pages differ (concurrent writes?)")
+
+        results = {
+            "offset page 1": _time(lambda: _paginate_newest_first(base(), 0, PAGE_SIZE, None).all(), args.runs),
+            f"offset page {args.page}": _time(lambda: _paginate_newest_first(base(), skip, PAGE_SIZE, None).all(), args.runs),
+            f"keyset page {args.page}": _time(lambda: _paginate_newest_first(base(), 0, PAGE_SIZE, cursor).all(), args.runs),
+        }
+        print(f"{args.posts} posts, page size {PAGE_SIZE}, median of {args.runs} runs:")
+        for label, ms in results.items():
+            print(f"  {label:<20} {ms:8.2f} ms")
+        return 0
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Benchmark: SQL statements and latency per lesson completion.
+
+Completes --lesson (default: the first lesson of a free world) for the
+first user with a profile, -n times, each in its own transaction that is
+rolled back afterwards, so progress, XP and streak are left as they were.
+Statements are counted on the request's own connection:
+
+  pipeline   progress_service.complete_lesson (upsert + one locked
+             profile read; written by the commit)
+  legacy     the handler as it was: lesson/level/world, subscription and
+             progress reads, award_xp, update_streak, then track_event
+
+--broken-streak puts the user's last login three days back first, which
+takes the freeze path. (Before the pipeline, that path also re-read the
+profile three more times; update_streak no longer does, so "legacy" here
+understates the old cost of that case.)
+
+Analytics events go through the write-behind buffer for real; run it
+against a scratch database. Needs DATABASE_URL (REDIS_URL optional).
+
+Usage:
+  python -m scripts.bench_lesson_completion
+  python -m scripts.bench_lesson_completion -n 200 --broken-streak
+  python -m scripts.bench_lesson_completion --lesson <lesson-uuid>
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from models import get_session_local
+from models.course import Lesson, Level, World
+from models.progress import UserProgress
+from models.user import Subscription, UserProfile
+from services import principal_service, progress_service
+from services.analytics_service import track_event
+from services.gamification_service import award_xp, update_streak
+
+
+def _legacy(user_id: str, lesson_id: str, db) -> None:
+    lesson = (
+        db.query(Lesson)
+        .options(joinedload(Lesson.level).joinedload(Level.world))
+        .filter(Lesson.id == lesson_id)
+        .first()
+    )
+    db.query(Subscription).filter(Subscription.user_id == user_id).first()
+    db.query(UserProgress).filter(
+        UserProgress.user_id == user_id, UserProgress.lesson_id == lesson.id
+    ).first()
+    db.add(UserProgress(
+        id=uuid.uuid4(), user_id=user_id, lesson_id=lesson.id,
+        is_completed=True, completed_at=datetime.now(timezone.utc),
+    ))
+    award_xp(user_id, lesson.xp_value, db)
+    update_streak(user_id, db)
+    db.flush()  # the commit
+    track_event(db=db, event_name="LessonCompleted", user_id=uuid.UUID(user_id),
+                properties={"lesson_id": str(lesson.id), "bench": True})
+
+
+def _pipeline(user_id: str, lesson_id: str, db) -> None:
+    principal = principal_service.resolve(db, uuid.UUID(user_id))
+    progress_service.complete_lesson(principal, lesson_id, db)
+    db.flush()  # the commit
+
+
+def _run(fn, user_id: str, lesson_id: str, n: int, broken_streak: bool) -> dict:
+    counts, samples = [], []
+    for _ in range(n):
+        db = get_session_local()()
+        try:
+            db.query(UserProgress).filter(
+                UserProgress.user_id == user_id, UserProgress.lesson_id == lesson_id
+            ).delete(synchronize_session=False)
+            if broken_streak:
+                db.query(UserProfile).filter(UserProfile.user_id == user_id).update(
+                    {"last_login_date": datetime.now(timezone.utc) - timedelta(days=3)},
+                    synchronize_session=False,
+                )
+            principal_service.resolve(db, uuid.UUID(user_id))  # done by auth, not counted
+
+            statements = []
+            conn = db.connection()
+            listener = lambda *args: statements.append(args[2])
+            event.listen(conn, "before_cursor_execute", listener)
+            start = time.perf_counter()
+            fn(user_id, lesson_id, db)
+            samples.append((time.perf_counter() - start) * 1000)
+            event.remove(conn, "before_cursor_execute", listener)
+            counts.append(len(statements))
+        finally:
+            db.rollback()
+            db.close()
+    samples.sort()
+    return {
+        "statements": statistics.fmean(counts),
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lesson", help="lesson id (default: first lesson of a free world)")
+    parser.add_argument("-n", type=int, default=100, help="completions per mode")
+    parser.add_argument("--broken-streak", action="store_true", help="exercise the streak-freeze path")
+    args = parser.parse_args()
+
+    db = get_session_local()()
+    try:
+        profile = db.query(UserProfile).first()
+        lesson_id = args.lesson
+        if lesson_id is None:
+            lesson = (
+                db.query(Lesson).join(Level).join(World)
+                .filter(World.is_free.is_(True), Lesson.xp_value > 0)
+                .first()
+            )
+            lesson_id = str(lesson.id) if lesson else None
+    finally:
+        db.close()
+    if profile is None or lesson_id is None:
+        print("Need at least one user profile and one lesson in a free world.")
+        return 1
+    user_id = str(profile.user_id)
+
+    print(f"{args.n} completions per mode, user {user_id}, lesson {lesson_id}"
+          f"{' (broken streak)' if args.broken_streak else ''}:")
+    for label, fn in (("legacy", _legacy), ("pipeline", _pipeline)):
+        _run(fn, user_id, lesson_id, 3, args.broken_streak)  # warm caches
+        r = _run(fn, user_id, lesson_id, args.n, args.broken_streak)
+        print(f"  {label:<9} {r['statements']:5.1f} statements + COMMIT   "
+              f"ms: mean {r['mean']:7.3f}  p50 {r['p50']:7.3f}  p99 {r['p99']:7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
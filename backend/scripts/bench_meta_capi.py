@@ -0,0 +1,95 @@
+"""
+Benchmark CAPI dispatcher throughput against the local Graph stub.
+
+Starts scripts.meta_capi_stub in-process (or uses --url), pushes N
+synthetic events through a CapiDispatcher and reports events/second and
+requests made. Status stamps are counted in memory — no database needed.
+
+Usage:
+  python -m scripts.bench_meta_capi                       # 20000 events
+  python -m scripts.bench_meta_capi --events 50000 --latency-ms 120 --error-rate 0.02
+  python -m scripts.bench_meta_capi --url http://127.0.0.1:8787/v20.0/stub/events
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from services.meta_capi_service import CapiDispatcher, _build_event
+from scripts.meta_capi_stub import build_app
+
+
+def _start_stub(port: int, latency_ms: float, error_rate: float) -> str:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(
+        build_app(latency_ms, error_rate), host="127.0.0.1", port=port, log_level="warning",
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v20.0/stub/events"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--url", default=None, help="Existing stub endpoint (skips starting one)")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--linger", type=float, default=0.2)
+    args = parser.parse_args()
+
+    url = args.url or _start_stub(args.port, args.latency_ms, args.error_rate)
+
+    done = threading.Event()
+    stamped = {"ok": 0, "error": 0, "skipped": 0}
+    lock = threading.Lock()
+
+    def status_writer(statuses):
+        with lock:
+            for status in statuses.values():
+                stamped[status] += 1
+            if sum(stamped.values()) >= args.events:
+                done.set()
+
+    dispatcher = CapiDispatcher(
+        endpoint=lambda: url,
+        access_token=lambda: "stub",
+        status_writer=status_writer,
+        linger=args.linger,
+    )
+    now = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    for _ in range(args.events):
+        dispatcher.submit(_build_event(
+            event_id=str(uuid.uuid4()),
+            event_name="PageView",
+            event_time=now,
+            user_data={"client_user_agent": "bench"},
+            custom_data={},
+            page_url="https://example.test/",
+        ))
+    enqueued = time.perf_counter() - start
+    done.wait(timeout=600)
+    elapsed = time.perf_counter() - start
+    dispatcher.shutdown()
+
+    print(f"{args.events} events in {elapsed:.2f}s ({args.events / elapsed:,.0f} events/s); "
+          f"enqueue took {enqueued * 1000:.0f} ms")
+    print(f"  statuses: {stamped}")
+    if not args.url:
+        stats_url = url.split("/v20.0")[0] + "/stats"
+        print(f"  stub: {httpx.get(stats_url).json()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Load test: concurrent notification streams against a running API.
+
+Opens --connections SSE streams on /api/notifications/stream (spread over
+the first users in the database, tokens minted locally, so SECRET_KEY must
+match the server), then publishes one event per connected user through
+Redis and times delivery. Finally samples /api/notifications/stream/stats
+to show how the connections landed on the server's workers. Needs
+DATABASE_URL, REDIS_URL and SECRET_KEY of the target deployment. The
+published events are `unread` count refreshes, so nothing is written to
+the database.
+
+Usage:
+  python -m scripts.bench_notification_stream                       # 200 streams on localhost:8000
+  python -m scripts.bench_notification_stream -c 1000 --users 250 --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from models import get_session_local
+from models.user import User, UserRole
+from services import notification_stream
+from services.auth_service import create_access_token
+
+
+def _summary(samples) -> str:
+    samples = sorted(samples)
+    if not samples:
+        return "no samples"
+    return (
+        f"mean {statistics.fmean(samples):8.2f}  p50 {samples[len(samples) // 2]:8.2f}  "
+        f"p99 {samples[min(len(samples) - 1, int(len(samples) * 0.99))]:8.2f}"
+    )
+
+
+async def _stream(client, token, ready: asyncio.Event, received: asyncio.Queue, connect_ms: list) -> None:
+    start = time.perf_counter()
+    async with client.stream(
+        "GET", "/api/notifications/stream", headers={"Authorization": f"Bearer {token}"},
+    ) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "unread":
+                data = json.loads(line[len("data: "):])
+                if "bench_sent" not in data:
+                    # The stream's opening count: we're live.
+                    connect_ms.append((time.perf_counter() - start) * 1000)
+                    ready.set()
+                else:
+                    received.put_nowait((time.time() - data["bench_sent"]) * 1000)
+
+
+async def _run(args, user_ids, admin_token) -> int:
+    limits = httpx.Limits(max_connections=args.connections + 10)
+    timeout = httpx.Timeout(30.0, read=None)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        connect_ms, received = [], asyncio.Queue()
+        readies, tasks = [], []
+        for i in range(args.connections):
+            token = create_access_token({"sub": user_ids[i % len(user_ids)]})
+            ready = asyncio.Event()
+            readies.append(ready)
+            tasks.append(asyncio.create_task(_stream(client, token, ready, received, connect_ms)))
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(r.wait() for r in readies)), timeout=args.connect_timeout)
+        except asyncio.TimeoutError:
+            pass
+        failed = [t for t in tasks if t.done() and t.exception()]
+        print(f"{len(connect_ms)}/{args.connections} streams live ({len(failed)} failed)")
+        if failed:
+            print(f"  first failure: {failed[0].exception()!r}")
+        print(f"  connect to first event (ms): {_summary(connect_ms)}")
+
+        if admin_token:
+            # Each request lands on whichever worker accepts it, so sample a few.
+            workers = {}
+            for _ in range(args.stats_samples):
+                r = await client.get(
+                    "/api/notifications/stream/stats", headers={"Authorization": f"Bearer {admin_token}"},
+                )
+                if r.status_code == 200:
+                    stats = r.json()
+                    workers[stats["worker_pid"]] = stats
+            print(f"  connections per worker ({len(workers)} seen):")
+            for pid, stats in sorted(workers.items()):
+                print(f"    pid {pid}: {stats['connections']} connections, {stats['users']} users")
+
+        users = Counter(user_ids[i % len(user_ids)] for i in range(args.connections))
+        for user_id in users:
+            notification_stream._publish(user_id, "unread", {"unread_count": 0, "bench_sent": time.time()})
+        expected = sum(users.values())
+        delivery_ms = []
+        deadline = time.perf_counter() + args.delivery_timeout
+        while len(delivery_ms) < expected and time.perf_counter() < deadline:
+            try:
+                delivery_ms.append(await asyncio.wait_for(received.get(), timeout=deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                break
+        print(f"{len(delivery_ms)}/{expected} events delivered")
+        print(f"  publish to delivery (ms):    {_summary(delivery_ms)}")
+
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return 0 if len(delivery_ms) == expected else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("-c", "--connections", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50, help="distinct users to spread the streams over")
+    parser.add_argument("--connect-timeout", type=float, default=30.0)
+    parser.add_argument("--delivery-timeout", type=float, default=10.0)
+    parser.add_argument("--stats-samples", type=int, default=20)
+    args = parser.parse_args()
+
+    db = get_session_local()()
+    try:
+        user_ids = [str(uid) for (uid,) in db.query(User.id).order_by(User.id).limit(args.users).all()]
+        admin = db.query(User.id).filter(User.role == UserRole.ADMIN).first()
+    finally:
+        db.close()
+    if not user_ids:
+        print("No users in this database; create one first.")
+        return 1
+    admin_token = create_access_token({"sub": str(admin[0])}) if admin else None
+    if admin_token is None:
+        print("No admin user: skipping the per-worker breakdown.")
+
+    return asyncio.run(_run(args, user_ids, admin_token))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Benchmark: notification list and unread-count latency on a large table.
+
+Seeds --rows synthetic notifications (default 1,000,000, type 'bench') over
+the first --users users, plus --broadcasts broadcast rows, then times for
+one of those users:
+
+  list page 1            get_notifications (personal + broadcasts merged)
+  list page via cursor   the same, 10 pages deep
+  unread (SQL)           count_unread — the full count in SQL; a Redis miss
+                         runs only its personal half
+  unread (Redis)         get_unread_count once the counter is seeded
+                         (same as SQL if Redis is down)
+
+Needs DATABASE_URL (and REDIS_URL for the last line). Everything seeded is
+deleted afterwards unless --keep; run it against a scratch database.
+
+Usage:
+  python -m scripts.bench_notifications                     # 1M rows over 200 users
+  python -m scripts.bench_notifications --rows 200000 -n 50 --keep
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from models import get_session_local
+from services import notification_service
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def _measure(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+SEED_NOTIFICATIONS = """
+INSERT INTO notifications (id, user_id, type, title, message, is_read, created_at)
+SELECT gen_random_uuid(), ids[1 + g % cardinality(ids)], 'bench', 'Bench', 'bench',
+       random() < 0.9, NOW() - g * INTERVAL '1 second'
+FROM generate_series(1, :rows) AS g,
+     (SELECT array_agg(id) AS ids FROM (SELECT id FROM users ORDER BY id LIMIT :users) u) AS s
+"""
+
+SEED_BROADCASTS = """
+INSERT INTO broadcast_notifications (id, type, title, message, reference_id, created_at)
+SELECT gen_random_uuid(), 'bench', 'Bench', 'bench', 'bench-' || g, NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, :broadcasts) AS g
+ON CONFLICT DO NOTHING
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--broadcasts", type=int, default=20)
+    parser.add_argument("-n", type=int, default=200, help="iterations per measurement")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in place")
+    args = parser.parse_args()
+
+    db = get_session_local()()
+    try:
+        row = db.execute(text("SELECT id FROM users ORDER BY id LIMIT 1")).first()
+        if row is None:
+            print("No users in this database; create one first.")
+            return 1
+        user_id = str(row[0])
+
+        start = time.perf_counter()
+        db.execute(text(SEED_NOTIFICATIONS), {"rows": args.rows, "users": args.users})
+        db.execute(text(SEED_BROADCASTS), {"broadcasts": args.broadcasts})
+        db.commit()
+        db.execute(text("ANALYZE notifications; ANALYZE broadcast_notifications;"))
+        total = db.execute(text("SELECT count(*) FROM notifications")).scalar()
+        print(f"Seeded {args.rows} rows in {time.perf_counter() - start:.1f}s ({total} in table).")
+
+        cursor = None
+        for _ in range(10):
+            page = notification_service.get_notifications(user_id, limit=20, db=db, cursor=cursor)
+            if not page:
+                break
+            cursor = decode_cursor(encode_cursor(page[-1]["created_at"], page[-1]["id"]))
+
+        results = {
+            "list page 1": _measure(lambda: notification_service.get_notifications(user_id, limit=20, db=db), args.n),
+            "list page 10 (cursor)": _measure(
+                lambda: notification_service.get_notifications(user_id, limit=20, db=db, cursor=cursor), args.n,
+            ),
+            "unread count (SQL)": _measure(lambda: notification_service.count_unread(user_id, db), args.n),
+        }
+        notification_service.get_unread_count(user_id, db)  # seed the counter
+        results["unread count (Redis)"] = _measure(
+            lambda: notification_service.get_unread_count(user_id, db), args.n,
+        )
+        db.rollback()
+    finally:
+        if not args.keep:
+            db.execute(text("DELETE FROM notifications WHERE type = 'bench'"))
+            db.execute(text("DELETE FROM broadcast_notifications WHERE type = 'bench'"))
+            db.commit()
+        db.close()
+
+    print(f"{args.n} iterations, user {user_id} (ms):")
+    for label, r in results.items():
+        print(f"  {label:<24} mean {r['mean']:7.3f}  p50 {r['p50']:7.3f}  p99 {r['p99']:7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: per-request cost of the community rate-limit check.
+
+Compares the previous implementation (Subscription query for the tier +
+COUNT(*) over the action's table for the last hour — still used as the
+Redis-down fallback) against the Redis path (cached tier + one atomic
+sliding-window script call). Needs DATABASE_URL and REDIS_URL; uses the
+first user in the database and a throwaway limiter key, so no real
+allowance is consumed.
+
+Usage:
+  python -m scripts.bench_rate_limit                  # 500 iterations, action=reaction
+  python -m scripts.bench_rate_limit -n 2000 --action post
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_session_local
+from models.user import User
+from services import rate_limit_service, redis_service
+from services.clave_service import is_user_pro
+
+
+def _measure(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=500)
+    parser.add_argument("--action", default="reaction", choices=sorted(rate_limit_service.POLICIES))
+    args = parser.parse_args()
+
+    policy = rate_limit_service.POLICIES[args.action]
+    db = get_session_local()()
+    try:
+        row = db.query(User.id).first()
+        if row is None:
+            print("No users in this database; create one first.")
+            return 1
+        user_id = str(row[0])
+        bench_key = f"bench:{uuid.uuid4().hex}"
+
+        def legacy():
+            is_user_pro(user_id, db)
+            policy.count_since(db, user_id, datetime.utcnow() - timedelta(seconds=policy.window_seconds))
+
+        def sliding_window():
+            rate_limit_service._limit_for(policy, user_id, db)
+            redis_service.sliding_window_hit(bench_key, 10 ** 9, policy.window_seconds)
+
+        sliding_window()  # warm the tier cache and load the script
+        results = {
+            "SQL (tier query + COUNT)": _measure(legacy, args.n),
+            "Redis (cached tier + Lua)": _measure(sliding_window, args.n),
+        }
+        client = redis_service.get_redis_client()
+        for key in client.scan_iter(f"rl:{{{bench_key}}}:*"):
+            client.delete(key)
+    finally:
+        db.close()
+
+    print(f"{args.n} checks, action={args.action} (ms per check):")
+    for label, r in results.items():
+        print(f"  {label:<28} mean {r['mean']:7.3f}  p50 {r['p50']:7.3f}  p99 {r['p99']:7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Benchmark: a limited-drop rush on the shop purchase path.
+
+Creates a throwaway limited SKU (--stock units), tops up --buyers users
+with enough claves, and has them all buy it at once from --threads
+threads, each buyer in its own session and transaction. Reports
+throughput, latency, and how many sales committed (must equal the stock:
+no overselling) versus buyers turned away.
+
+--legacy additionally locks the shop_items row FOR UPDATE before buying,
+as every purchase did before stock counters, for a side-by-side number.
+
+Writes real rows (purchases, clave transactions) and restores balances
+afterwards; run it against a scratch database. Needs DATABASE_URL and
+REDIS_URL.
+
+Usage:
+  python -m scripts.bench_shop_drop                          # 200 buyers, 10 units
+  python -m scripts.bench_shop_drop --buyers 500 --stock 25 --threads 64
+  python -m scripts.bench_shop_drop --legacy
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from models import get_session_local
+from models.community import ClaveTransaction
+from models.shop import ShopItem, ShopPurchase, ShopStockCounter
+from models.user import UserProfile
+from services import shop_service
+
+PRICE = 10
+
+
+def _buy(user_id: str, sku: str, legacy: bool) -> tuple:
+    db = get_session_local()()
+    start = time.perf_counter()
+    try:
+        if legacy:
+            db.query(ShopItem).filter(ShopItem.sku == sku).with_for_update().first()
+        shop_service.purchase(user_id, sku, db)
+        db.commit()
+        outcome = "sold"
+    except shop_service.OutOfStock:
+        db.rollback()
+        outcome = "sold_out"
+    except shop_service.ShopError as e:
+        db.rollback()
+        outcome = e.code
+    finally:
+        db.close()
+    return outcome, (time.perf_counter() - start) * 1000
+
+
+def _rush(user_ids, sku: str, threads: int, legacy: bool) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda u: _buy(u, sku, legacy), user_ids))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(ms for _, ms in results)
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        "elapsed": elapsed,
+        "outcomes": outcomes,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "mean": statistics.fmean(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--legacy", action="store_true", help="also run with the old catalog-row lock")
+    args = parser.parse_args()
+
+    db = get_session_local()()
+    profiles = db.query(UserProfile.user_id, UserProfile.current_claves).limit(args.buyers).all()
+    if not profiles:
+        print("No user profiles in this database; create some first.")
+        return 1
+    balances = {str(uid): claves for uid, claves in profiles}
+    user_ids = list(balances)
+    modes = [False, True] if args.legacy else [False]
+    skus = []
+    try:
+        for legacy in modes:
+            sku = f"bench_drop_{uuid.uuid4().hex[:8]}"
+            skus.append(sku)
+            db.add(ShopItem(
+                sku=sku, kind="border", name="Bench drop", price_claves=PRICE,
+                stock_total=args.stock, stock_period="lifetime", max_per_user=1,
+                grants={}, metadata_json={}, is_active=True,
+            ))
+            db.query(UserProfile).filter(UserProfile.user_id.in_(user_ids)).update(
+                {"current_claves": UserProfile.current_claves + PRICE}, synchronize_session=False,
+            )
+            db.commit()
+
+            r = _rush(user_ids, sku, args.threads, legacy)
+            sold = db.query(ShopPurchase).filter(ShopPurchase.sku == sku).count()
+            label = "catalog-row lock (legacy)" if legacy else "stock counters"
+            print(f"{label}: {len(user_ids)} buyers, {args.stock} units, {args.threads} threads")
+            print(f"  {r['elapsed']:.2f}s total, {len(user_ids) / r['elapsed']:.0f} attempts/s")
+            print(f"  latency ms: mean {r['mean']:.1f}  p50 {r['p50']:.1f}  p99 {r['p99']:.1f}")
+            print(f"  outcomes: {r['outcomes']}  (committed purchases: {sold})")
+            if sold > args.stock:
+                print("  OVERSOLD")
+    finally:
+        db.rollback()
+        for sku in skus:
+            db.query(ShopPurchase).filter(ShopPurchase.sku == sku).delete(synchronize_session=False)
+            db.query(ClaveTransaction).filter(
+                ClaveTransaction.reason == f"shop_purchase:{sku}"
+            ).delete(synchronize_session=False)
+            db.query(ShopStockCounter).filter(ShopStockCounter.sku == sku).delete(synchronize_session=False)
+            db.query(ShopItem).filter(ShopItem.sku == sku).delete(synchronize_session=False)
+        for user_id, claves in balances.items():
+            db.execute(
+                text("UPDATE user_profiles SET current_claves = :c WHERE user_id = :u"),
+                {"c": claves, "u": user_id},
+            )
+        db.commit()
+        db.close()
+        shop_service.invalidate_catalog()  # bulk deletes skip the ORM hooks
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
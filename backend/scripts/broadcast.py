@@ -2,7 +2,8 @@
 
 Loads pre-staged email content from scripts/email_content/{email_id}.py
 and sends it to the right segment. Wraps the body in the shared HTML
-template and Resend-sends with the standard skip-list, dry-run, limit,
+template and sends through services/email_broadcast (Resend batch API,
+rate-limited, concurrent) with the standard skip-list, dry-run, limit,
 and only-emails controls.
 
 Usage:
@@ -10,9 +11,16 @@ Usage:
     python scripts/broadcast.py --email-id a1 --apply              # live send
     python scripts/broadcast.py --email-id a1 --apply --limit 3    # smoke
     python scripts/broadcast.py --email-id b2 --apply --only x@y.z # to one address
+    python scripts/broadcast.py --email-id a1 --status             # ledger totals
 
-Each email_id has its own resume file (already_sent_{email_id}.txt) so you
-can re-run safely without re-sending to the same person.
+Each email_id is a campaign in the email_sends ledger: every recipient is
+claimed there before sending and marked sent/failed after, so re-running
+(or running the same email_id on several machines at once) never sends
+anyone the same email twice, and failed sends are retried. An existing
+already_sent_{email_id}.txt from before the ledger is imported on the
+first --apply. A sender killed mid-request leaves its batch 'claimed';
+re-send those with --retry-claimed once no other sender is running.
+Test against scripts/resend_stub.py with RESEND_BASE_URL.
 
 Segment routing (SQL filter chosen by module.SEGMENT):
   A   — waitlisters who never activated, no active/trialing sub
@@ -36,10 +44,10 @@ PASSWORD_RESET_EXPIRE_MINUTES on Railway must be >= 1440. Script will warn
 loudly if not.
 """
 import argparse
+import asyncio
 import importlib
 import os
 import sys
-import time
 
 try:
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
@@ -58,20 +66,13 @@ try:
 except ImportError:
     print("Warning: python-dotenv not installed. Env vars must be set manually.")
 
-try:
-    import resend
-except ImportError:
-    print("Error: 'resend' not installed. pip install resend")
-    sys.exit(1)
-
 from itsdangerous import URLSafeTimedSerializer
-from sqlalchemy import text
-from models import get_engine
 from config import settings
+from services import email_broadcast
 
 # Reuse the curated skip-list from the day-2 broadcast. Single source of
 # truth — adding a new bad address here propagates to every send.
-from scripts.broadcast_waitlist import SKIP_EMAILS, SKIP_DOMAINS, _should_skip
+from scripts.broadcast_waitlist import SKIP_EMAILS, SKIP_DOMAINS, _read_resume_file, _should_skip
 from scripts.email_content import _template
 
 
@@ -79,7 +80,7 @@ from scripts.email_content import _template
 # Configuration
 # ---------------------------------------------------------------------------
 
-resend.api_key = os.environ.get("RESEND_API_KEY")
+RESEND_API_KEY = os.environ.get("RESEND_API_KEY")
 
 raw_from = os.environ.get("FROM_EMAIL", "pavlepopovic@themamboguild.com")
 FROM_EMAIL = raw_from if "<" in raw_from else f"The Mambo Guild <{raw_from}>"
@@ -239,27 +240,20 @@ def _build_magic_link(user_id: str) -> str:
     return f"{FRONTEND_URL}/reset-password?token={token}"
 
 
-def _load_users(segment: str, only_emails: set = None):
-    """Pull recipients from prod DB. With --only, the segment filter is
-    bypassed in favor of an explicit email list (useful for sending a test
-    to your own admin account, which doesn't fit any of A/B/C buckets)."""
-    engine = get_engine()
-    with engine.connect() as conn:
-        if only_emails:
-            rows = conn.execute(text("""
-                SELECT u.id, u.email, up.username
-                FROM users u
-                JOIN user_profiles up ON up.user_id = u.id
-                WHERE LOWER(u.email) = ANY(:emails)
-                  AND u.email IS NOT NULL
-                  AND u.email <> ''
-            """), {"emails": list(only_emails)}).all()
-        else:
-            rows = conn.execute(text(_SEGMENT_SQL[segment])).all()
-    return [
-        {"id": str(r.id), "email": r.email, "username": r.username or "Dancer"}
-        for r in rows
-    ]
+def _recipient_query(segment: str, only_emails: set = None) -> tuple[str, dict]:
+    """Segment SQL (and params) for the recipients. With --only, the segment
+    filter is bypassed in favor of an explicit email list (useful for sending
+    a test to your own admin account, which doesn't fit any of A/B/C buckets)."""
+    if only_emails:
+        return """
+            SELECT u.id, u.email, up.username
+            FROM users u
+            JOIN user_profiles up ON up.user_id = u.id
+            WHERE LOWER(u.email) = ANY(:emails)
+              AND u.email IS NOT NULL
+              AND u.email <> ''
+        """, {"emails": list(only_emails)}
+    return _SEGMENT_SQL[segment], {}
 
 
 def _render(module, username: str, magic_link: str) -> tuple[str, str]:
@@ -286,12 +280,14 @@ def _render(module, username: str, magic_link: str) -> tuple[str, str]:
     return html, text_full
 
 
-# ---------------------------------------------------------------------------
-# Main
-# ---------------------------------------------------------------------------
+def _payload(module, recipient) -> dict:
+    """Resend email body for one recipient (the engine adds "to")."""
+    html, text_body = _render(module, recipient.username, _build_magic_link(recipient.user_id))
+    return {"from": FROM_EMAIL, "subject": module.SUBJECT, "html": html, "text": text_body}
+
 
 def main():
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--email-id", required=True,
                         help="Email module name in scripts/email_content/ (e.g. a1, b2, c3)")
     parser.add_argument("--apply", action="store_true",
@@ -300,12 +296,25 @@ def main():
                         help="Cap at N sends (0 = no cap).")
     parser.add_argument("--only", default="",
                         help="Comma-separated email list — only send to these (testing).")
-    parser.add_argument("--sleep-ms", type=int, default=600,
-                        help="Throttle between sends (default 600ms = ~100/min).")
+    parser.add_argument("--rate", type=float, default=email_broadcast.DEFAULT_RATE,
+                        help="Batch requests per second (default 2 = Resend's team limit).")
+    parser.add_argument("--concurrency", type=int, default=email_broadcast.DEFAULT_CONCURRENCY,
+                        help="Batch requests in flight.")
+    parser.add_argument("--batch-size", type=int, default=email_broadcast.BATCH_SIZE,
+                        help="Emails per request (max 100).")
+    parser.add_argument("--retry-claimed", action="store_true",
+                        help="Also re-send recipients a dead sender left claimed. Only when no other sender is running.")
+    parser.add_argument("--status", action="store_true",
+                        help="Print the campaign's ledger totals and exit.")
     args = parser.parse_args()
 
     module = load_email_module(args.email_id)
     segment = module.SEGMENT
+    ledger = email_broadcast.SendLedger(args.email_id)
+    if args.status:
+        print(f"{args.email_id}: {ledger.summary() or 'nothing sent yet'}")
+        return
+
     resume_file = os.path.join(SCRIPT_DIR, f"already_sent_{args.email_id}.txt")
 
     print(f"From:        {FROM_EMAIL}")
@@ -315,7 +324,7 @@ def main():
     print(f"Preheader:   {module.PREHEADER[:80]}{'...' if len(module.PREHEADER) > 80 else ''}")
     print(f"Send-at:     {getattr(module, 'SEND_AT_UTC', 'n/a')}")
     print(f"Frontend:    {FRONTEND_URL}")
-    print(f"Resume file: {os.path.basename(resume_file)}")
+    print(f"Provider:    {settings.RESEND_BASE_URL}  ({args.rate}/s, {args.concurrency} in flight)")
     print(f"Mode:        {'APPLY' if args.apply else 'DRY-RUN'}")
     if args.limit:
         print(f"Limit:       {args.limit}")
@@ -335,80 +344,54 @@ def main():
                   f"expire before recipients click.")
             print()
 
-    if args.apply and not resend.api_key:
+    if args.apply and not RESEND_API_KEY:
         sys.exit("Error: RESEND_API_KEY env var not set.")
 
+    already_sent = _read_resume_file(resume_file)
+    if already_sent and args.apply:
+        imported = ledger.import_sent(already_sent)
+        print(f"Resume file: imported {imported} of {len(already_sent)} into the ledger")
+
+    def skip(email: str):
+        reason = _should_skip(email)
+        if reason:
+            print(f"  SKIP  {email}  ({reason})")
+        elif email in already_sent and not args.apply:
+            reason = "resume file"
+        return reason
+
     only_set = {e.strip().lower() for e in args.only.split(",") if e.strip()}
-    users = _load_users(segment, only_emails=only_set if only_set else None)
+    sql, params = _recipient_query(segment, only_emails=only_set if only_set else None)
     if only_set:
-        print(f"--only override active: loaded {len(users)} matching user(s) "
-              f"regardless of segment filter")
-    else:
-        print(f"Segment {segment} recipients in DB: {len(users)}")
-
-    already_sent = set()
-    if os.path.exists(resume_file):
-        with open(resume_file, "r", encoding="utf-8") as f:
-            already_sent = {ln.strip().lower() for ln in f if ln.strip()}
-        print(f"Resume: {len(already_sent)} already sent — will skip")
+        print("--only override active: segment filter bypassed")
     print("-" * 60)
 
-    sent = 0
-    failed = 0
-    skipped_skiplist = 0
-    skipped_resume = 0
-
-    for user in users:
-        email = user["email"].strip()
-        if not email:
-            continue
-        email_lc = email.lower()
-
-        skip_reason = _should_skip(email_lc)
-        if skip_reason:
-            skipped_skiplist += 1
-            print(f"  SKIP  {email}  ({skip_reason})")
-            continue
-
-        if email_lc in already_sent:
-            skipped_resume += 1
-            continue
-
-        if args.limit and sent >= args.limit:
-            print(f"  HIT --limit {args.limit}, stopping")
-            break
-
-        magic_link = _build_magic_link(user["id"])
-        html, text_body = _render(module, user["username"], magic_link)
-
-        if not args.apply:
-            print(f"  [DRY] would send to {email}")
-            sent += 1
-            continue
-
-        try:
-            resend.Emails.send({
-                "from": FROM_EMAIL,
-                "to": [email],
-                "subject": module.SUBJECT,
-                "html": html,
-                "text": text_body,
-            })
-            print(f"  SENT  {email}")
-            sent += 1
-            try:
-                with open(resume_file, "a", encoding="utf-8") as asf:
-                    asf.write(email + "\n")
-            except Exception:
-                pass
-            time.sleep(args.sleep_ms / 1000.0)
-        except Exception as e:
-            print(f"  FAIL  {email}: {e}")
-            failed += 1
+    broadcast = email_broadcast.Broadcast(
+        args.email_id,
+        lambda recipient: _payload(module, recipient),
+        ledger=ledger,
+        skip=skip,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        retry_claimed=args.retry_claimed,
+        dry_run=not args.apply,
+        api_key=RESEND_API_KEY,
+        on_progress=lambda stats: print(f"  {stats.line()}"),
+    )
+    stats = asyncio.run(broadcast.run(email_broadcast.stream_recipients(sql, params)))
 
     print("-" * 60)
-    print(f"Done. sent={sent} failed={failed} "
-          f"skipped_list={skipped_skiplist} skipped_resume={skipped_resume}")
+    if args.apply:
+        print(f"Done. sent={stats.sent} failed={stats.failed} skipped={stats.skipped} "
+              f"already_sent={stats.already_done} ({stats.per_second:.1f}/s)")
+        print(f"Campaign {args.email_id} totals: {ledger.summary()}")
+        if stats.aborted:
+            sys.exit(f"Aborted: {stats.aborted}")
+    else:
+        print(f"Dry run. would_send={stats.claimed} skipped={stats.skipped} "
+              f"already_sent={stats.already_done}")
 
 
 if __name__ == "__main__":
@@ -14,8 +14,10 @@ auto-logs in waitlist claimants). No backend changes needed.
 Different from day-1:
   - New SUBJECT/PREHEADER/copy focused on the 7-day free trial promise
   - SQL skips users already on ACTIVE/TRIALING (don't pester paying users)
-  - New resume file (already_sent_launch_day2.txt) so day-1 recipients
-    are NOT auto-skipped — every non-converted waitlister gets day 2
+  - Own campaign in the email_sends ledger ("launch_day2") so day-1
+    recipients are NOT auto-skipped — every non-converted waitlister gets
+    day 2. Re-runs (and parallel runs) skip anyone already sent; the old
+    already_sent_launch_day2.txt resume file is imported on --apply.
 
 CRITICAL OPERATIONAL NOTE:
   PASSWORD_RESET_EXPIRE_MINUTES=10080 (7 days) must already be set on
@@ -27,11 +29,15 @@ Modes:
   --apply               actually send
   --limit N             cap at N sends (smoke-test with --apply --limit 3)
   --only EMAIL[,EMAIL]  send only to specific addresses (testing)
+  --rate / --concurrency / --batch-size
+                        Resend batch requests per second / in flight / size
+  --retry-claimed       re-send recipients a killed sender left claimed
+  --status              print the campaign's ledger totals and exit
 """
 import argparse
+import asyncio
 import os
 import sys
-import time
 
 # ---------------------------------------------------------------------------
 # Bootstrapping
@@ -54,22 +60,15 @@ try:
 except ImportError:
     print("Warning: python-dotenv not installed. Env vars must be set manually.")
 
-try:
-    import resend
-except ImportError:
-    print("Error: 'resend' not installed. pip install resend")
-    sys.exit(1)
-
 from itsdangerous import URLSafeTimedSerializer
-from sqlalchemy import text
-from models import get_engine
 from config import settings
+from services import email_broadcast
 
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
 
-resend.api_key = os.environ.get("RESEND_API_KEY")
+RESEND_API_KEY = os.environ.get("RESEND_API_KEY")
 
 raw_from = os.environ.get("FROM_EMAIL", "pavlepopovic@themamboguild.com")
 FROM_EMAIL = raw_from if "<" in raw_from else f"The Mambo Guild <{raw_from}>"
@@ -88,6 +87,7 @@ PREHEADER = (
 FRONTEND_URL = settings.FRONTEND_URL.rstrip("/")
 FORGOT_PASSWORD_URL = f"{FRONTEND_URL}/forgot-password"
 
+CAMPAIGN = "launch_day2"
 ALREADY_SENT_FILE = os.path.join(SCRIPT_DIR, "already_sent_launch_day2.txt")
 
 # Per-user signing serializer. Same secret + salt as
@@ -389,8 +389,8 @@ def _build_magic_link(user_id: str) -> str:
     return f"{FRONTEND_URL}/reset-password?token={token}"
 
 
-def _load_waitlisters(only_emails: set = None):
-    """Pull every waitlister directly from the prod DB. We use the live DB
+def _waitlister_query(only_emails: set = None) -> tuple[str, dict]:
+    """Every waitlister, straight from the prod DB. We use the live DB
     rather than a JSON snapshot because the JSON can be days old by
     launch day; getting last-minute waitlist signups too is the whole
     point of this broadcast.
@@ -400,39 +400,40 @@ def _load_waitlisters(only_emails: set = None):
     --only useful for sending tests to your own admin / paying account
     (which is by definition NOT in the waitlist bucket). The wide-blast
     filter still applies on a normal --apply with no --only."""
-    engine = get_engine()
-    with engine.connect() as conn:
-        if only_emails:
-            rows = conn.execute(text("""
-                SELECT u.id, u.email, up.username
-                FROM users u
-                JOIN user_profiles up ON up.user_id = u.id
-                WHERE LOWER(u.email) = ANY(:emails)
-                  AND u.email IS NOT NULL
-                  AND u.email <> ''
-            """), {"emails": list(only_emails)}).all()
-        else:
-            # Day-2 broadcast: skip waitlisters who have already converted
-            # (status=active or trialing). Anyone with no subscription row
-            # OR with status in (incomplete, canceled, past_due) is still
-            # a target — INCOMPLETE in particular flags people who reached
-            # checkout but bounced at the card screen, the highest-intent
-            # segment to nudge.
-            rows = conn.execute(text("""
-                SELECT u.id, u.email, up.username
-                FROM users u
-                JOIN user_profiles up ON up.user_id = u.id
-                LEFT JOIN subscriptions s ON s.user_id = u.id
-                WHERE u.auth_provider = 'waitlist'
-                  AND u.email IS NOT NULL
-                  AND u.email <> ''
-                  AND (s.status IS NULL OR s.status NOT IN ('active', 'trialing'))
-                ORDER BY u.created_at NULLS LAST
-            """)).all()
-    return [
-        {"id": str(r.id), "email": r.email, "username": r.username or "Dancer"}
-        for r in rows
-    ]
+    if only_emails:
+        return """
+            SELECT u.id, u.email, up.username
+            FROM users u
+            JOIN user_profiles up ON up.user_id = u.id
+            WHERE LOWER(u.email) = ANY(:emails)
+              AND u.email IS NOT NULL
+              AND u.email <> ''
+        """, {"emails": list(only_emails)}
+    # Day-2 broadcast: skip waitlisters who have already converted
+    # (status=active or trialing). Anyone with no subscription row
+    # OR with status in (incomplete, canceled, past_due) is still
+    # a target — INCOMPLETE in particular flags people who reached
+    # checkout but bounced at the card screen, the highest-intent
+    # segment to nudge.
+    return """
+        SELECT u.id, u.email, up.username
+        FROM users u
+        JOIN user_profiles up ON up.user_id = u.id
+        LEFT JOIN subscriptions s ON s.user_id = u.id
+        WHERE u.auth_provider = 'waitlist'
+          AND u.email IS NOT NULL
+          AND u.email <> ''
+          AND (s.status IS NULL OR s.status NOT IN ('active', 'trialing'))
+        ORDER BY u.created_at NULLS LAST
+    """, {}
+
+
+def _read_resume_file(path: str) -> set:
+    """Addresses in a pre-ledger already_sent_*.txt resume file."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {ln.strip().lower() for ln in f if ln.strip()}
 
 
 def _should_skip(email: str):
@@ -447,21 +448,34 @@ def _should_skip(email: str):
 
 
 def main():
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--apply", action="store_true",
                         help="Actually send. Default is dry-run.")
     parser.add_argument("--limit", type=int, default=0,
                         help="Cap at N sends (0 = no cap).")
     parser.add_argument("--only", default="",
                         help="Comma-separated email list — only send to these (testing).")
-    parser.add_argument("--sleep-ms", type=int, default=600,
-                        help="Throttle between sends (default 600ms = ~100/min, "
-                             "well under Resend's free-tier 100/sec ceiling).")
+    parser.add_argument("--rate", type=float, default=email_broadcast.DEFAULT_RATE,
+                        help="Batch requests per second (default 2 = Resend's team limit).")
+    parser.add_argument("--concurrency", type=int, default=email_broadcast.DEFAULT_CONCURRENCY,
+                        help="Batch requests in flight.")
+    parser.add_argument("--batch-size", type=int, default=email_broadcast.BATCH_SIZE,
+                        help="Emails per request (max 100).")
+    parser.add_argument("--retry-claimed", action="store_true",
+                        help="Also re-send recipients a dead sender left claimed. Only when no other sender is running.")
+    parser.add_argument("--status", action="store_true",
+                        help="Print the campaign's ledger totals and exit.")
     args = parser.parse_args()
 
+    ledger = email_broadcast.SendLedger(CAMPAIGN)
+    if args.status:
+        print(f"{CAMPAIGN}: {ledger.summary() or 'nothing sent yet'}")
+        return
+
     print(f"From:        {FROM_EMAIL}")
     print(f"Subject:     {SUBJECT}")
     print(f"Frontend:    {FRONTEND_URL}")
+    print(f"Provider:    {settings.RESEND_BASE_URL}  ({args.rate}/s, {args.concurrency} in flight)")
     print(f"Mode:        {'APPLY' if args.apply else 'DRY-RUN'}")
     if args.limit:
         print(f"Limit:       {args.limit}")
@@ -483,82 +497,64 @@ def main():
               f"expire before recipients click.")
         print()
 
-    if args.apply and not resend.api_key:
+    if args.apply and not RESEND_API_KEY:
         print("Error: RESEND_API_KEY env var not set.")
         sys.exit(1)
 
+    already_sent = _read_resume_file(ALREADY_SENT_FILE)
+    if already_sent and args.apply:
+        imported = ledger.import_sent(already_sent)
+        print(f"Resume file: imported {imported} of {len(already_sent)} into the ledger")
+
+    def skip(email: str):
+        reason = _should_skip(email)
+        if reason:
+            print(f"  SKIP  {email}  ({reason})")
+        elif email in already_sent and not args.apply:
+            reason = "resume file"
+        return reason
+
+    def render(recipient) -> dict:
+        magic_link = _build_magic_link(recipient.user_id)
+        return {
+            "from": FROM_EMAIL,
+            "subject": SUBJECT,
+            "html": get_html(recipient.username, magic_link),
+            "text": get_text(recipient.username, magic_link),
+        }
+
     only_set = {e.strip().lower() for e in args.only.split(",") if e.strip()}
-    users = _load_waitlisters(only_emails=only_set if only_set else None)
+    sql, params = _waitlister_query(only_emails=only_set if only_set else None)
     if only_set:
-        print(f"--only override active: loaded {len(users)} matching user(s) "
-              f"regardless of auth_provider")
-    else:
-        print(f"Waitlisters in DB: {len(users)}")
-
-    already_sent = set()
-    if os.path.exists(ALREADY_SENT_FILE):
-        with open(ALREADY_SENT_FILE, "r", encoding="utf-8") as f:
-            already_sent = {ln.strip().lower() for ln in f if ln.strip()}
-        print(f"Resume: {len(already_sent)} already sent — will skip")
+        print("--only override active: auth_provider filter bypassed")
     print("-" * 60)
 
-    sent = 0
-    failed = 0
-    skipped_skiplist = 0
-    skipped_resume = 0
-
-    for user in users:
-        email = user["email"].strip()
-        if not email:
-            continue
-        email_lc = email.lower()
-
-        skip_reason = _should_skip(email_lc)
-        if skip_reason:
-            skipped_skiplist += 1
-            print(f"  SKIP  {email}  ({skip_reason})")
-            continue
-
-        if email_lc in already_sent:
-            skipped_resume += 1
-            continue
-
-        if args.limit and sent >= args.limit:
-            print(f"  HIT --limit {args.limit}, stopping")
-            break
-
-        magic_link = _build_magic_link(user["id"])
-        html = get_html(user["username"], magic_link)
-        text_body = get_text(user["username"], magic_link)
-
-        if not args.apply:
-            print(f"  [DRY] would send to {email}  (link: {magic_link[:60]}...)")
-            sent += 1
-            continue
-
-        try:
-            resend.Emails.send({
-                "from": FROM_EMAIL,
-                "to": [email],
-                "subject": SUBJECT,
-                "html": html,
-                "text": text_body,
-            })
-            print(f"  SENT  {email}")
-            sent += 1
-            try:
-                with open(ALREADY_SENT_FILE, "a", encoding="utf-8") as asf:
-                    asf.write(email + "\n")
-            except Exception:
-                pass
-            time.sleep(args.sleep_ms / 1000.0)
-        except Exception as e:
-            print(f"  FAIL  {email}: {e}")
-            failed += 1
+    broadcast = email_broadcast.Broadcast(
+        CAMPAIGN,
+        render,
+        ledger=ledger,
+        skip=skip,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        retry_claimed=args.retry_claimed,
+        dry_run=not args.apply,
+        api_key=RESEND_API_KEY,
+        on_progress=lambda stats: print(f"  {stats.line()}"),
+    )
+    stats = asyncio.run(broadcast.run(email_broadcast.stream_recipients(sql, params)))
 
     print("-" * 60)
-    print(f"Done. sent={sent} failed={failed} "
-          f"skipped_list={skipped_skiplist} skipped_resume={skipped_resume}")
+    if args.apply:
+        print(f"Done. sent={stats.sent} failed={stats.failed} skipped={stats.skipped} "
+              f"already_sent={stats.already_done} ({stats.per_second:.1f}/s)")
+        print(f"Campaign {CAMPAIGN} totals: {ledger.summary()}")
+        if stats.aborted:
+            sys.exit(f"Aborted: {stats.aborted}")
+    else:
+        print(f"Dry run. would_send={stats.claimed} skipped={stats.skipped} "
+              f"already_sent={stats.already_done}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""
+Build the course-notes knowledge base index for the AI chat.
+
+Splits every module_*.md under the course-notes directories into
+section passages and writes the BM25 index that services.knowledge_base
+memory-maps at startup (data/knowledge_base.idx, committed with the
+backend so the image doesn't need the markdown). Re-run and commit the
+file whenever the course notes change: the index records a hash of the
+markdown it was built from, `--check` (for CI) exits non-zero when that
+no longer matches, and the API logs a warning at startup. Catalog content (worlds, levels,
+lessons, quizzes) is not in this file: it is indexed from the database by
+each worker and follows admin edits.
+
+Timing queries: each --query is run against the new file, -n times.
+
+Usage:
+  python -m scripts.build_kb_index
+  python -m scripts.build_kb_index --check                  # is the committed index current?
+  python -m scripts.build_kb_index --query "clave shift" --query "85% rule" -n 1000
+  python -m scripts.build_kb_index --source "Mambo History=../mambo_course" --out /tmp/kb.idx
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import knowledge_base
+
+def _measure(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", action="append", metavar="NAME=DIR",
+                        help="course-notes directory (repeatable; default: both courses)")
+    parser.add_argument("--out", default=knowledge_base.INDEX_PATH)
+    parser.add_argument("--query", action="append", default=[], help="query to time after building")
+    parser.add_argument("-n", type=int, default=200, help="runs per timed query")
+    parser.add_argument("--check", action="store_true",
+                        help="don't build; exit 1 if --out wasn't built from the current notes")
+    args = parser.parse_args()
+
+    sources = [tuple(s.split("=", 1)) for s in args.source] if args.source else knowledge_base.COURSE_NOTES_SOURCES
+    digest = knowledge_base.sources_digest(sources)
+    if args.check:
+        try:
+            built_from = knowledge_base.MappedSegment(args.out).sources_digest
+        except (OSError, ValueError) as e:
+            print(f"{args.out}: {e}")
+            return 1
+        if digest is None or built_from != digest:
+            print(f"{args.out} is stale: re-run `python -m scripts.build_kb_index` and commit it")
+            return 1
+        print(f"{args.out} is current")
+        return 0
+
+    passages = []
+    for name, directory in sources:
+        files = knowledge_base.course_note_files(directory)
+        if not files:
+            print(f"No module_*.md files in {directory}")
+            return 1
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                passages.extend(knowledge_base.markdown_passages(name, f.read()))
+        print(f"{name}: {len(files)} modules")
+
+    built_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    stats = knowledge_base.write_index(args.out, passages, built_at=built_at, sources=digest)
+    print(f"Wrote {args.out}: {stats['passages']} passages, {stats['terms']} terms, {stats['bytes'] / 1024:.0f} KiB")
+
+    segment = knowledge_base.MappedSegment(args.out)
+    for query in args.query:
+        hits = knowledge_base.rank([segment], query)
+        r = _measure(lambda: knowledge_base.rank([segment], query), args.n)
+        print(f"\n{query!r}  ms: mean {r['mean']:.3f}  p50 {r['p50']:.3f}  p99 {r['p99']:.3f}")
+        for hit in hits:
+            print(f"  {hit.score:6.2f}  {hit.title}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Check the per-user completed-lesson sets in Redis against user_progress.
+
+Scans up to --sample cached sets (or just --user), compares each with the
+user's completed rows, and reports lessons missing from the cache (a lost
+post-commit write) or extra in it (progress removed in SQL). --fix
+repairs the sets in place. Exits 1 when a mismatch is left unfixed.
+
+Needs DATABASE_URL and REDIS_URL.
+
+Usage:
+  python -m scripts.check_progress_cache                    # 500 cached users
+  python -m scripts.check_progress_cache --sample 5000 --fix
+  python -m scripts.check_progress_cache --user <user-uuid>
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_session_local
+from services import progress_service
+from services.redis_service import get_redis_client
+
+
+def _cached_user_ids(limit: int):
+    prefix = progress_service.COMPLETED_KEY.format(user_id="")
+    for i, key in enumerate(get_redis_client().scan_iter(match=f"{prefix}*", count=500)):
+        if i >= limit:
+            return
+        yield key[len(prefix):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=500, help="cached sets to check")
+    parser.add_argument("--user", help="check only this user")
+    parser.add_argument("--fix", action="store_true", help="repair mismatched sets")
+    args = parser.parse_args()
+
+    user_ids = [args.user] if args.user else list(_cached_user_ids(args.sample))
+    db = get_session_local()()
+    mismatched = 0
+    try:
+        for user_id in user_ids:
+            missing, extra = progress_service.check_completed_lessons(user_id, db, fix=args.fix)
+            if missing or extra:
+                mismatched += 1
+                print(f"  {user_id}: {len(missing)} missing, {len(extra)} extra")
+            db.rollback()  # end each read transaction; nothing is written
+    finally:
+        db.close()
+
+    print(f"Checked {len(user_ids)} users: {mismatched} mismatched{' (fixed)' if args.fix and mismatched else ''}.")
+    return 1 if mismatched and not args.fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
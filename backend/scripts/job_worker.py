@@ -0,0 +1,65 @@
+"""
+Run background job workers (services/job_queue) as their own process.
+
+Every API process already drains the queue on JOB_WORKERS_IN_API threads;
+run this when the side-effect load should scale separately from the web
+tier (then set JOB_WORKERS_IN_API=0 on the API). SIGTERM / Ctrl-C stop
+taking new jobs and let the running ones finish; a job cut off anyway is
+re-queued when its lease expires.
+
+Usage:
+  python -m scripts.job_worker                 # 4 worker threads
+  python -m scripts.job_worker --threads 8
+  python -m scripts.job_worker --stats         # per-job counts, latency, queue depths
+  python -m scripts.job_worker --dead          # last dead-lettered jobs
+  python -m scripts.job_worker --retry-dead    # re-queue every dead job
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import job_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--stats", action="store_true", help="print queue stats and exit")
+    parser.add_argument("--dead", action="store_true", help="print dead-lettered jobs and exit")
+    parser.add_argument("--retry-dead", action="store_true", help="re-queue dead-lettered jobs and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(job_queue.get_stats(), indent=2))
+        return 0
+    if args.dead:
+        for job in job_queue.dead_jobs():
+            print(f"{job['name']:28} attempts={job['attempt']}  {job.get('error')}")
+        return 0
+    if args.retry_dead:
+        print(f"Re-queued {job_queue.retry_dead()} dead jobs")
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(levelname)s %(message)s")
+    worker = job_queue.JobWorker(args.threads)
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    worker.start()
+    logging.info(f"Job worker running ({args.threads} threads, jobs: {', '.join(job_queue.job_names())})")
+    while not stopping.wait(1.0):
+        pass
+    logging.info("Stopping; waiting for running jobs")
+    worker.stop(timeout=job_queue.DEFAULT_TIMEOUT_SECONDS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
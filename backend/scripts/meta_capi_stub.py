@@ -0,0 +1,75 @@
+"""
+Local stand-in for the Meta Graph /events endpoint.
+
+Accepts the same POST body as Conversions API and answers like Graph does
+({"events_received": N, "fbtrace_id": ...}), with optional latency and
+failure injection, so the CAPI dispatcher can be exercised and benchmarked
+without network access or a real pixel.
+
+Point the API at it with:
+  META_GRAPH_BASE_URL=http://127.0.0.1:8787 META_PIXEL_ID=stub META_CAPI_ACCESS_TOKEN=stub
+
+Usage:
+  python -m scripts.meta_capi_stub                                # port 8787
+  python -m scripts.meta_capi_stub --latency-ms 150 --error-rate 0.05
+  python -m scripts.meta_capi_stub --reject-event-name BadEvent   # 400 any batch containing it
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_app(latency_ms: float = 0.0, error_rate: float = 0.0, reject_event_name: str = None) -> FastAPI:
+    app = FastAPI(title="Meta Graph stub")
+    app.state.requests = 0
+    app.state.events = 0
+
+    @app.post("/{version}/{pixel_id}/events")
+    async def events(version: str, pixel_id: str, request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        data = body.get("data") or []
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000.0)
+        if error_rate and random.random() < error_rate:
+            return JSONResponse({"error": {"message": "stub transient", "code": 2}}, status_code=503)
+        if len(data) > 1000:
+            return JSONResponse({"error": {"message": "too many events", "code": 100}}, status_code=400)
+        if reject_event_name and any(e.get("event_name") == reject_event_name for e in data):
+            return JSONResponse({"error": {"message": "invalid event", "code": 100}}, status_code=400)
+        app.state.events += len(data)
+        return {"events_received": len(data), "messages": [], "fbtrace_id": uuid.uuid4().hex[:11]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "events": app.state.events}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+    parser.add_argument("--reject-event-name", default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        build_app(args.latency_ms, args.error_rate, args.reject_event_name),
+        host=args.host, port=args.port, log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
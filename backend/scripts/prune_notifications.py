@@ -0,0 +1,65 @@
+"""
+Delete personal notifications past retention, so the notifications table
+(and its per-user indexes) covers a bounded window instead of all history.
+
+Read notifications are kept --read-days (default 90), unread ones
+--unread-days (default 365). Broadcasts are a row per announcement and are
+never pruned. Deletes run in batches, each committed on its own, so the job
+can be interrupted and re-run; schedule it daily.
+
+Usage:
+  python -m scripts.prune_notifications
+  python -m scripts.prune_notifications --read-days 30 --unread-days 180
+  python -m scripts.prune_notifications --dry-run        # count only
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_session_local
+from services import notification_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--read-days", type=int, default=notification_service.READ_RETENTION_DAYS)
+    parser.add_argument("--unread-days", type=int, default=notification_service.UNREAD_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="count expired rows, delete nothing")
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    db = get_session_local()()
+    try:
+        if args.dry_run:
+            expired = notification_service.expired_notifications(
+                db, args.read_days, args.unread_days, now=now,
+            ).count()
+            print(f"{expired} notifications past retention (dry run).")
+            return 0
+
+        total = 0
+        while True:
+            deleted = notification_service.prune_notifications(
+                db, args.read_days, args.unread_days, args.batch_size, now=now,
+            )
+            db.commit()
+            total += deleted
+            if deleted < args.batch_size:
+                break
+            print(f"  {total} deleted so far...")
+        print(f"{total} notifications deleted.")
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
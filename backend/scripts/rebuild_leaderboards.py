@@ -0,0 +1,60 @@
+"""
+Rebuild the Redis leaderboard sorted sets from Postgres.
+
+The sets are maintained incrementally by post_service, so this only needs
+to run on a cold Redis (the API also does it at boot when the built marker
+is missing) or to repair drift — e.g. after admins flip moderation status
+on old posts, which the incremental path doesn't track.
+
+Usage:
+  python -m scripts.rebuild_leaderboards            # rebuild now
+  python -m scripts.rebuild_leaderboards --check    # compare Redis vs SQL top 10, no write
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_session_local
+from services import leaderboard_service
+
+
+def _check(db) -> int:
+    """Print Redis vs SQL top-10 per (category, period). Returns mismatch count."""
+    mismatches = 0
+    for category in leaderboard_service.SCORING:
+        for period in leaderboard_service.PERIOD_FILTERS:
+            redis_top = leaderboard_service.get_leaderboard(period, category, 10, db)
+            sql_top = leaderboard_service._get_leaderboard_sql(period, category, 10, db)
+            redis_scores = [(e["id"], e["score"]) for e in redis_top]
+            sql_scores = [(e["id"], int(e["score"])) for e in sql_top]
+            ok = sorted(redis_scores) == sorted(sql_scores)
+            if not ok:
+                mismatches += 1
+            print(f"  {category:<9} {period:<9} {'OK' if ok else 'DRIFT'}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--check", action="store_true", help="Report drift only; don't rebuild.")
+    args = parser.parse_args()
+
+    SessionLocal = get_session_local()
+    with SessionLocal() as db:
+        if args.check:
+            mismatches = _check(db)
+            print(f"\n{mismatches} board(s) drifted." if mismatches else "\nAll boards match SQL.")
+            sys.exit(1 if mismatches else 0)
+
+        summary = leaderboard_service.rebuild_from_sql(db)
+        if summary.get("skipped"):
+            print("Another rebuild is in progress (lock held) — skipped.")
+        else:
+            print(f"✅ Leaderboards rebuilt: {summary['users_ranked']} users ranked, "
+                  f"{summary['day_buckets']} day buckets per category.")
+
+
+if __name__ == "__main__":
+    main()
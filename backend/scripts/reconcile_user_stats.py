@@ -0,0 +1,74 @@
+"""
+Recompute the materialized user_stats counters from posts / post_reactions /
+post_replies and fix the rows that drifted.
+
+The write paths in post_service keep the counters current; drift comes from
+writes that bypass them (a Mux webhook attaching a video after the post was
+created, admin edits, raw SQL). Each batch of users costs a fixed handful
+of grouped aggregates plus one UPDATE per drifted row, and is committed on
+its own, so the job can be interrupted and re-run.
+
+With --queue the batches are handed to the job workers instead
+(community.reconcile_stats), which also award any badges the corrected
+counters unlock — badge triggers read these counters, so run this once
+after deploying a change to what they count.
+
+Usage:
+  python -m scripts.reconcile_user_stats                  # every user
+  python -m scripts.reconcile_user_stats --batch-size 200
+  python -m scripts.reconcile_user_stats --dry-run        # report drift, change nothing
+  python -m scripts.reconcile_user_stats --queue          # backfill + badges on the job queue
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_session_local
+from services import job_queue, user_stats_service
+from services import community_jobs  # noqa: F401  (registers community.reconcile_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report drifted rows, then roll back")
+    parser.add_argument("--queue", action="store_true", help="enqueue batches for the job workers")
+    args = parser.parse_args()
+
+    db = get_session_local()()
+    try:
+        if args.queue:
+            batches = 0
+            for batch in user_stats_service.iter_user_batches(db, args.batch_size):
+                job_queue.enqueue("community.reconcile_stats", user_ids=[str(u) for u in batch])
+                batches += 1
+            print(f"Queued {batches} batches of up to {args.batch_size} users.")
+            return 0
+
+        users = drifted = 0
+        for batch in user_stats_service.iter_user_batches(db, args.batch_size):
+            changed = user_stats_service.reconcile(db, batch)
+            for user_id in changed:
+                print(f"  drifted: {user_id}")
+            users += len(batch)
+            drifted += len(changed)
+            if args.dry_run:
+                db.rollback()
+            else:
+                db.commit()
+
+        suffix = " (dry run, rolled back)" if args.dry_run else ""
+        print(f"\n{users} users checked, {drifted} rows reconciled{suffix}.")
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
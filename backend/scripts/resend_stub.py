@@ -0,0 +1,109 @@
+"""
+Local stand-in for Resend's batch endpoint.
+
+Accepts POST /emails/batch like Resend (a JSON list of up to 100 emails,
+answered with {"data": [{"id": ...}, ...]}), honours Idempotency-Key
+(a repeated key gets the first response back and delivers nothing), and
+can inject latency, 503s, 429s above a requests/second ceiling and 422s
+for batches containing a given domain. GET /stats reports requests,
+delivered emails and any address delivered more than once — which a
+resumed or multi-machine broadcast should never produce.
+
+Point a broadcast at it with:
+  RESEND_BASE_URL=http://127.0.0.1:8789 RESEND_API_KEY=stub
+
+Usage:
+  python -m scripts.resend_stub                                   # port 8789
+  python -m scripts.resend_stub --latency-ms 300 --max-rps 2 --error-rate 0.05
+  python -m scripts.resend_stub --reject-domain example.invalid   # 422 any batch containing it
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_app(latency_ms: float = 0.0, error_rate: float = 0.0, max_rps: float = 0.0,
+              reject_domain: str = None) -> FastAPI:
+    app = FastAPI(title="Resend stub")
+    app.state.requests = 0
+    app.state.throttled = 0
+    app.state.delivered = Counter()
+    app.state.responses = {}
+    window = {"second": 0, "count": 0}
+
+    @app.post("/emails/batch")
+    async def batch(request: Request):
+        app.state.requests += 1
+        now = int(time.monotonic())
+        if window["second"] != now:
+            window["second"], window["count"] = now, 0
+        window["count"] += 1
+        if max_rps and window["count"] > max_rps:
+            app.state.throttled += 1
+            return JSONResponse({"name": "rate_limit_exceeded", "message": "Too many requests"},
+                                status_code=429, headers={"retry-after": "1"})
+
+        key = request.headers.get("idempotency-key")
+        if key and key in app.state.responses:
+            return app.state.responses[key]
+
+        emails = await request.json()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000.0)
+        if error_rate and random.random() < error_rate:
+            return JSONResponse({"name": "application_error", "message": "stub transient"}, status_code=503)
+        if not isinstance(emails, list) or len(emails) > 100:
+            return JSONResponse({"name": "validation_error", "message": "1 to 100 emails"}, status_code=422)
+        to = [addr for email in emails for addr in email.get("to") or []]
+        if reject_domain and any(addr.endswith("@" + reject_domain) for addr in to):
+            return JSONResponse({"name": "validation_error", "message": "invalid `to` field"}, status_code=422)
+
+        app.state.delivered.update(addr.lower() for addr in to)
+        body = {"data": [{"id": str(uuid.uuid4())} for _ in emails]}
+        if key:
+            app.state.responses[key] = body
+        return body
+
+    @app.get("/stats")
+    async def stats():
+        delivered = app.state.delivered
+        return {
+            "requests": app.state.requests,
+            "throttled": app.state.throttled,
+            "delivered": sum(delivered.values()),
+            "recipients": len(delivered),
+            "duplicates": sorted(addr for addr, n in delivered.items() if n > 1),
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8789)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="429 above this many requests per second")
+    parser.add_argument("--reject-domain", default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        build_app(args.latency_ms, args.error_rate, args.max_rps, args.reject_domain),
+        host=args.host, port=args.port, log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
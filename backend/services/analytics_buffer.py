@@ -0,0 +1,253 @@
+"""Write-behind buffer for ``user_events`` rows.
+
+High-frequency analytics (VideoHeartbeat, PageView, ClaveEarned, …) used to
+cost a full INSERT + COMMIT on the *caller's* request session each. Instead
+``analytics_service.track_event`` hands the row to this buffer and returns
+immediately; one daemon thread per process drains it and bulk-inserts a
+batch every ``FLUSH_INTERVAL_SECONDS`` or ``BATCH_SIZE`` rows, whichever
+comes first, on its own session.
+
+- Bounded: the queue holds at most ``MAX_QUEUE_SIZE`` rows. ``submit`` waits
+  up to ``ENQUEUE_TIMEOUT_SECONDS`` for room, then reports the row as
+  rejected so the caller can decide (write it synchronously, or drop it).
+- Idempotent: rows are inserted ON CONFLICT (event_id) DO NOTHING, so a
+  browser retry of the same event_id can't fail a whole batch.
+- Poison rows: if a batch insert fails, the rows are retried one by one and
+  only the bad ones are dropped.
+- Ordering hook: every accepted row gets a ticket; ``wait_flushed(ticket)``
+  blocks until that row is in the database (Meta CAPI dispatch stamps its
+  status onto the row, so it must exist first).
+- Shutdown: ``shutdown()`` (wired to the FastAPI shutdown event and atexit)
+  drains whatever is queued before the process exits.
+
+The thread starts lazily on first submit, so importing this module (tests,
+scripts) never spawns it, and forked workers each get their own.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.analytics import UserEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE_SIZE = 10_000
+BATCH_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 0.25
+ENQUEUE_TIMEOUT_SECONDS = 0.05
+SHUTDOWN_TIMEOUT_SECONDS = 10.0
+
+
+def _default_session_factory() -> Session:
+    from models import get_session_local
+    return get_session_local()()
+
+
+class EventBuffer:
+    """Bounded in-process queue with a background bulk-insert flusher."""
+
+    def __init__(
+        self,
+        *,
+        max_size: int = MAX_QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        enqueue_timeout: float = ENQUEUE_TIMEOUT_SECONDS,
+        session_factory: Callable[[], Session] = _default_session_factory,
+    ) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._enqueue_timeout = enqueue_timeout
+        self._session_factory = session_factory
+
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition()
+        self._next_ticket = 0
+        self._processed_ticket = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        self.inserted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def submit(self, row: dict) -> Optional[int]:
+        """Queue one ``user_events`` row (column -> value).
+
+        Returns a ticket for ``wait_flushed``, or None if the buffer is full
+        or shutting down — the row was NOT accepted.
+        """
+        if self._stopping.is_set():
+            return None
+        self._ensure_started()
+        ticket = self._try_put(row)
+        if ticket is None:
+            # Backpressure: give the flusher one interval to make room.
+            time.sleep(self._enqueue_timeout)
+            ticket = self._try_put(row)
+        if ticket is None:
+            with self._lock:
+                self.rejected += 1
+                if self.rejected % 100 == 1:
+                    logger.warning(
+                        "analytics_buffer: queue full (%d rejected so far)", self.rejected
+                    )
+        return ticket
+
+    def _try_put(self, row: dict) -> Optional[int]:
+        # Ticket assignment and enqueue happen under one lock so tickets
+        # enter the queue in order, which is what makes "processed up to N"
+        # in wait_flushed meaningful.
+        with self._lock:
+            try:
+                self._queue.put_nowait((self._next_ticket + 1, row))
+            except queue.Full:
+                return None
+            self._next_ticket += 1
+            return self._next_ticket
+
+    def wait_flushed(self, ticket: int, timeout: float = 5.0) -> bool:
+        """Block until the row behind ``ticket`` has been written (or dropped
+        as a poison row). Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._processed_ticket < ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="analytics-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def _take_batch(self, first_wait: float) -> list:
+        """Block up to ``first_wait`` for one row, then keep collecting until
+        the batch is full or the flush interval has elapsed."""
+        try:
+            batch = [self._queue.get(timeout=first_wait)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._take_batch(self._flush_interval)
+            if batch:
+                self._write(batch)
+        # Final drain after shutdown() — no waiting, just empty the queue.
+        self.flush()
+
+    def flush(self) -> None:
+        """Synchronously write everything currently queued."""
+        while True:
+            batch = []
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        rows = [row for _, row in batch]
+        stmt = insert(UserEvent).on_conflict_do_nothing(index_elements=["event_id"])
+        session = self._session_factory()
+        try:
+            try:
+                # executemany -> SQLAlchemy batches into multi-row VALUES
+                session.execute(stmt, rows)
+                session.commit()
+                self.inserted += len(rows)
+            except Exception:
+                session.rollback()
+                logger.exception(
+                    "analytics_buffer: batch of %d failed — retrying row by row", len(rows)
+                )
+                for row in rows:
+                    try:
+                        session.execute(stmt, [row])
+                        session.commit()
+                        self.inserted += 1
+                    except Exception:
+                        session.rollback()
+                        self.failed += 1
+                        logger.exception(
+                            "analytics_buffer: dropping %s event %s",
+                            row.get("event_name"), row.get("event_id"),
+                        )
+        finally:
+            session.close()
+            with self._flushed:
+                self._processed_ticket = max(self._processed_ticket, batch[-1][0])
+                self._flushed.notify_all()
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """Stop accepting rows and drain the queue. Safe to call twice."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        else:
+            self.flush()
+        leftover = self._queue.qsize()
+        if leftover:
+            logger.error("analytics_buffer: %d events lost at shutdown", leftover)
+
+
+_buffer = EventBuffer()
+atexit.register(_buffer.shutdown)
+
+
+def get_buffer() -> EventBuffer:
+    return _buffer
+
+
+def shutdown() -> None:
+    _buffer.shutdown()
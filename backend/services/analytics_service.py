@@ -2,7 +2,10 @@
 
 All instrumentation in the codebase funnels through ``track_event``. It:
 
-1. Writes an append-only row to ``user_events`` unconditionally.
+1. Writes an append-only row to ``user_events`` unconditionally — through
+   the write-behind ``analytics_buffer`` for most events, or synchronously
+   for the conversions in ``DURABLE_EVENTS``. Either way on its own session:
+   the caller's session is never committed or rolled back here.
 2. Forwards the subset of events in ``CONVERSION_EVENTS`` to Meta CAPI via
    FastAPI BackgroundTasks (non-blocking — a Meta outage must never slow a
    Stripe webhook response or a registration request).
@@ -24,6 +27,7 @@ from sqlalchemy.orm import Session
 from config import settings
 from models.analytics import UserEvent
 from models.user import User, UserProfile
+from services import analytics_buffer, principal_service
 from utils.request import client_ip as extract_client_ip
 
 logger = logging.getLogger(__name__)
@@ -58,6 +62,20 @@ PII_EVENTS: frozenset[str] = frozenset({
 })
 
 
+# Conversions written synchronously (own session, committed before
+# track_event returns): revenue/funnel events we can't afford to lose in a
+# crash window, and whose row must exist before the CAPI dispatch stamps
+# its status on it. Everything else goes through the write-behind buffer.
+DURABLE_EVENTS: frozenset[str] = frozenset({
+    "Lead",
+    "CompleteRegistration",
+    "InitiateCheckout",
+    "StartTrial",
+    "Subscribe",
+    "Purchase",
+})
+
+
 def _read_fbp_cookie(request: Optional[Request]) -> Optional[str]:
     if request is None:
         return None
@@ -85,12 +103,17 @@ def track_event(
     page_url: Optional[str] = None,
     fbp_override: Optional[str] = None,
     fbc_override: Optional[str] = None,
+    durable: Optional[bool] = None,
 ) -> str:
     """Record an event and (for conversions) queue Meta CAPI dispatch.
 
     Returns the ``event_id`` so callers can echo it to the browser Pixel
     for server/client dedup.
 
+    ``durable`` forces (True) or skips (False) the synchronous write;
+    by default it's on for ``DURABLE_EVENTS``. For buffered events that go
+    to CAPI, the dispatcher waits for the row before stamping its status.
+
     Never raises on CAPI or DB errors — analytics must not break the flow
     that produced the event. The caller is expected to have already
     committed the business-domain work (e.g. user row created) before this.
@@ -108,7 +131,9 @@ def track_event(
     fbc = fbc_override or _read_fbc_cookie(request)
 
     if user_id is not None and (fbp is None or fbc is None):
-        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        profile = principal_service.loaded_profile(db, user_id) or (
+            db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        )
         if profile is not None:
             fbp = fbp or profile.fbp
             fbc = fbc or profile.fbc
@@ -125,31 +150,40 @@ def track_event(
     if resolved_page_url is None:
         resolved_page_url = settings.FRONTEND_URL
 
-    row = UserEvent(
-        event_id=event_id,
-        user_id=user_id,
-        anonymous_id=anonymous_id,
-        event_name=event_name,
-        value=Decimal(str(value)) if value is not None else None,
-        currency=currency.upper() if currency else None,
-        properties=props,
-        client_ip=ip,
-        user_agent=ua,
-        fbp=fbp,
-        fbc=fbc,
-        page_url=resolved_page_url,
-        referrer=referrer,
-    )
-
-    try:
-        db.add(row)
-        db.commit()
-    except Exception:
-        logger.exception("analytics_service: failed to persist %s event", event_name)
-        db.rollback()
+    created_at = datetime.now(timezone.utc)
+    row = {
+        "id": uuid.uuid4(),
+        "event_id": event_id,
+        "user_id": user_id,
+        "anonymous_id": anonymous_id,
+        "event_name": event_name,
+        "value": Decimal(str(value)) if value is not None else None,
+        "currency": currency.upper() if currency else None,
+        "properties": props,
+        "client_ip": ip,
+        "user_agent": ua,
+        "fbp": fbp,
+        "fbc": fbc,
+        "page_url": resolved_page_url,
+        "referrer": referrer,
+        "created_at": created_at,
+    }
+
+    will_dispatch = event_name in CONVERSION_EVENTS and background_tasks is not None
+    if durable is None:
+        durable = event_name in DURABLE_EVENTS
+
+    ticket = None
+    if not durable:
+        ticket = analytics_buffer.get_buffer().submit(row)
+        if ticket is None and not will_dispatch:
+            # Buffer full: shed ML-only events rather than add synchronous
+            # write load exactly when the database is already behind.
+            return event_id
+    if ticket is None and not _write_now(row):
         return event_id
 
-    if event_name in CONVERSION_EVENTS and background_tasks is not None:
+    if will_dispatch:
         # Resolve user data eagerly while the session is hot so the background
         # task doesn't have to juggle its own DB session. Only fetch PII for
         # events in PII_EVENTS — see PII_EVENTS docstring above.
@@ -167,9 +201,10 @@ def track_event(
         from services.meta_capi_service import dispatch_event  # lazy import; breaks circular
         background_tasks.add_task(
             dispatch_event,
+            flush_ticket=ticket,
             event_id=event_id,
             event_name=event_name,
-            event_time=row.created_at or datetime.now(timezone.utc),
+            event_time=created_at,
             value=value,
             currency=currency,
             properties=props,
@@ -187,6 +222,23 @@ def track_event(
     return event_id
 
 
+def _write_now(row: dict) -> bool:
+    """Synchronously insert one event on a short-lived session of its own."""
+    from models import get_session_local
+
+    session = get_session_local()()
+    try:
+        session.add(UserEvent(**row))
+        session.commit()
+        return True
+    except Exception:
+        logger.exception("analytics_service: failed to persist %s event", row["event_name"])
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
 def capture_first_touch(
     db: Session,
     profile: UserProfile,
@@ -1,16 +1,31 @@
 """
 Badge Service - The Gamification Engine
 Handles stat tracking, threshold checking, and badge awarding.
+
+Badge definitions are reference data: each worker keeps a `BadgeIndex`
+(definitions grouped by requirement_type, sorted by threshold) in a
+`VersionedCache`, so a trigger finds its eligible badges with a bisect
+instead of a query. Which badges a user already owns is read once per
+transaction and memoized on the session; awards go out as one
+INSERT .. ON CONFLICT DO NOTHING. `check_all_badges` applies the same
+machinery to batches of users for the retroactive sweep.
 """
+import bisect
 import logging
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Optional, Union
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy.dialects.postgresql import insert
 
 from models.community import UserStats, UserBadge, BadgeDefinition, BadgeTier
-from models.community import Post, PostReply, PostReaction, ClaveTransaction, ModerationStatus, FounderClaim
+from models.community import FounderClaim
 from models.user import UserProfile
+from services.user_stats_service import get_or_create_stats, iter_user_batches
+from utils.versioned_cache import VersionedCache
 
 logger = logging.getLogger(__name__)
 
@@ -40,14 +55,144 @@ TRIGGER_OP_STAR = "reactions_received"     # Category B
 TRIGGER_OP_MAESTRO = "solutions_accepted"  # Category C
 TRIGGER_OP_METRONOME = "streak"            # Category D
 
+# (requirement_type, key in get_user_stats) — every stat a badge can key on.
+_STAT_REQUIREMENTS: Tuple[Tuple[str, str], ...] = (
+    ("reactions_given", "reactions_given"),
+    ("reactions_received", "reactions_received"),
+    ("likes_received", "likes_received"),
+    ("motw_likes", "motw_likes"),
+    ("original_likes", "original_likes"),
+    ("guild_likes", "guild_likes"),
+    ("solutions_accepted", "solutions_accepted"),
+    ("videos_posted", "videos_posted"),
+    ("motw_videos", "motw_videos"),
+    ("original_videos", "original_videos"),
+    ("guild_videos", "guild_videos"),
+    ("questions_posted", "questions_posted"),
+    ("comments_posted", "comments_posted"),
+    ("daily_streak", "current_streak"),
+    ("referrals_converted", "referrals_converted"),
+)
+
+
+# ============================================
+# Definition index
+# ============================================
+
+@dataclass(frozen=True)
+class BadgeDef:
+    """Immutable copy of a badge_definitions row."""
+    id: str
+    name: str
+    description: str
+    tier: str
+    icon_url: Optional[str]
+    category: str
+    requirement_type: str
+    threshold: Optional[int]
+    is_active: bool
+
+    @classmethod
+    def from_row(cls, row: BadgeDefinition) -> "BadgeDef":
+        return cls(
+            id=row.id, name=row.name, description=row.description, tier=row.tier,
+            icon_url=row.icon_url, category=row.category,
+            requirement_type=row.requirement_type, threshold=row.threshold,
+            is_active=bool(row.is_active) if row.is_active is not None else True,
+        )
+
+
+class BadgeIndex:
+    """All badge definitions, grouped by requirement_type and sorted by threshold."""
+
+    def __init__(self, defs: Sequence[BadgeDef]) -> None:
+        self.all: Tuple[BadgeDef, ...] = tuple(defs)
+        self.by_id: Mapping[str, BadgeDef] = MappingProxyType({d.id: d for d in self.all})
+        grouped: Dict[str, List[BadgeDef]] = defaultdict(list)
+        for d in self.all:
+            if d.threshold is not None:
+                grouped[d.requirement_type].append(d)
+        self._by_type: Dict[str, Tuple[BadgeDef, ...]] = {}
+        self._thresholds: Dict[str, List[int]] = {}
+        for req_type, group in grouped.items():
+            group.sort(key=lambda d: (d.threshold, d.id))
+            self._by_type[req_type] = tuple(group)
+            self._thresholds[req_type] = [d.threshold for d in group]
+
+    def eligible(self, requirement_type: str, value: int) -> Tuple[BadgeDef, ...]:
+        """Definitions of `requirement_type` with threshold <= value."""
+        thresholds = self._thresholds.get(requirement_type)
+        if not thresholds or value is None:
+            return ()
+        return self._by_type[requirement_type][:bisect.bisect_right(thresholds, value)]
+
+
+def _build_index(db: Session) -> BadgeIndex:
+    rows = db.query(BadgeDefinition).order_by(BadgeDefinition.id).all()
+    return BadgeIndex([BadgeDef.from_row(r) for r in rows])
+
+
+_definitions: VersionedCache[BadgeIndex] = VersionedCache(
+    "Badge definitions", "badges:definitions:version", _build_index
+)
+_definitions.watch(BadgeDefinition)
+
+
+def get_badge_index(db: Session) -> BadgeIndex:
+    return _definitions.get(db)
+
+
+def invalidate_definitions() -> None:
+    """For raw-SQL edits of badge_definitions (migrations, seed scripts)."""
+    _definitions.invalidate()
+
+
+# ============================================
+# Ownership memo
+# ============================================
+
+_OWNED_INFO_KEY = "badge_owned"
 
-def get_or_create_stats(user_id: str, db: Session) -> UserStats:
-    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
-    if not stats:
-        stats = UserStats(user_id=user_id)
-        db.add(stats)
-        db.flush()
-    return stats
+
+def _owned_memo(db: Session) -> Optional[Dict[str, Set[str]]]:
+    """Per-transaction {user_id: owned badge ids}, or None if unavailable.
+
+    Keyed on the innermost transaction, so a new transaction (or leaving a
+    savepoint that may have been rolled back) starts from a fresh read.
+    """
+    info = getattr(db, "info", None)
+    if not isinstance(info, dict):  # MagicMock sessions in unit tests
+        return None
+    txn = db.get_nested_transaction() or db.get_transaction()
+    if txn is None:
+        return None
+    memo = info.get(_OWNED_INFO_KEY)
+    if memo is None or memo[0] is not txn:
+        memo = (txn, {})
+        info[_OWNED_INFO_KEY] = memo
+    return memo[1]
+
+
+def _owned_badges(user_id: str, db: Session) -> Set[str]:
+    user_id = str(user_id)
+    memo = _owned_memo(db)
+    if memo is not None and user_id in memo:
+        return memo[user_id]
+    owned = {
+        badge_id for (badge_id,) in
+        db.query(UserBadge.badge_id).filter(UserBadge.user_id == user_id).all()
+    }
+    # The query itself may have begun the transaction the memo keys on.
+    memo = _owned_memo(db)
+    if memo is not None:
+        memo[user_id] = owned
+    return owned
+
+
+def _forget_owned(user_id: str, badge_ids: Iterable[str], db: Session) -> None:
+    memo = _owned_memo(db)
+    if memo is not None and str(user_id) in memo:
+        memo[str(user_id)].difference_update(badge_ids)
 
 
 def increment_reaction_given(user_id: str, db: Session):
@@ -78,23 +223,19 @@ def increment_reaction_received(user_id: str, db: Session, video_type: Optional[
     check_and_award_badges(user_id, "reactions_received", stats.reactions_received_count, db)
     check_and_award_badges(user_id, "likes_received", stats.reactions_received_count, db)
 
-    # Per-video-type like families live on live counts rather than a
-    # persisted counter (we never counted them before). Query once, check.
+    # Per-video-type like families read the materialized counter that
+    # post_service.add_reaction already bumped on this row.
     if video_type in ("motw", "original", "guild"):
-        per_type_count = _count_likes_on_video_type(user_id, video_type, db)
+        per_type_count = _count_likes_on_video_type(user_id, video_type, db, stats)
         check_and_award_badges(user_id, f"{video_type}_likes", per_type_count, db)
 
 
-def _count_likes_on_video_type(user_id: str, video_type: str, db: Session) -> int:
-    """Live count of likes on this user's posts of the given video_type."""
-    return db.query(func.count(PostReaction.id)).join(
-        Post, Post.id == PostReaction.post_id
-    ).filter(
-        Post.user_id == user_id,
-        Post.video_type == video_type,
-        Post.is_deleted == False,
-        Post.moderation_status == ModerationStatus.ACTIVE.value,
-    ).scalar() or 0
+def _count_likes_on_video_type(
+    user_id: str, video_type: str, db: Session, stats: Optional[UserStats] = None
+) -> int:
+    """Likes on this user's visible posts of the given video_type."""
+    stats = stats or get_or_create_stats(user_id, db)
+    return getattr(stats, f"{video_type}_likes") or 0
 
 
 def increment_solution_accepted(user_id: str, db: Session):
@@ -126,176 +267,251 @@ def check_streak_badges(user_id: str, streak_count: int, db: Session):
 
 def check_and_award_badges(user_id: str, requirement_type: str, current_value: int, db: Session):
     """
-    Generic logic to check if user qualifies for new badges in a category.
+    Award every badge of `requirement_type` whose threshold `current_value`
+    has reached and the user doesn't own yet. Costs no query at all when
+    nothing new is in reach.
     """
-    # 1. Fetch potential badges in this category/type that user doesn't have
-    # Map our trigger strings to DB requirement_type strings if needed
-    # (Assuming we seeded DB with types: 'reactions_given', 'reactions_received', 'solutions_accepted', 'streak')
-    
-    # Find all badges of this type where threshold <= current_value
-    eligible_badges = db.query(BadgeDefinition).filter(
-        BadgeDefinition.requirement_type == requirement_type,
-        BadgeDefinition.threshold <= current_value
-    ).all()
-    
-    for badge in eligible_badges:
-        # Check if already owned
-        has_badge = db.query(UserBadge).filter(
-            UserBadge.user_id == user_id,
-            UserBadge.badge_id == badge.id
-        ).first()
-        
-        if not has_badge:
-            award_badge(user_id, badge, db)
+    eligible = get_badge_index(db).eligible(requirement_type, current_value)
+    if not eligible:
+        return
+    owned = _owned_badges(user_id, db)
+    missing = [d for d in eligible if d.id not in owned]
+    if missing:
+        award_badges(user_id, missing, db)
+
+
+def _as_def(badge: Union[BadgeDef, BadgeDefinition, str], db: Session) -> Optional[BadgeDef]:
+    if isinstance(badge, BadgeDef):
+        return badge
+    if isinstance(badge, BadgeDefinition):
+        return BadgeDef.from_row(badge)
+    badge_def = get_badge_index(db).by_id.get(badge)
+    if badge_def is None:
+        # Not in this worker's snapshot: could have been seeded a moment ago.
+        row = db.query(BadgeDefinition).get(badge)
+        badge_def = BadgeDef.from_row(row) if row else None
+    return badge_def
 
 
 def award_badge(user_id: str, badge: Union[BadgeDefinition, str], db: Session):
     """
     Grant badge and log it.
-    Can pass BadgeDefinition object or badge_id string.
+    Can pass BadgeDefinition object or badge_id string. Idempotent: a badge
+    the user already holds is left alone.
     """
-    badge_def = badge
-    if isinstance(badge, str):
-        badge_def = db.query(BadgeDefinition).get(badge)
-        if not badge_def:
-            # Loud, actionable log. If this fires on the signup path,
-            # the protected specials are missing from badge_definitions.
-            # Run migration 025 to seed + backfill.
-            logger.error(
-                "BADGE_DEF_MISSING: cannot award '%s'. "
-                "Definition row not in badge_definitions. "
-                "Run migration_025_seed_protected_badges.",
-                badge,
-            )
-            return
-
-    logger.info(f"🏆 Awarding Badge {badge_def.id} to user {user_id}")
-    
-    # Determine order (simple append logic for now, or based on tier rank?)
-    # DB default is 0. We can just insert.
-    new_badge = UserBadge(
-        user_id=user_id,
-        badge_id=badge_def.id,
-        earned_at=datetime.now(timezone.utc)
-    )
-    db.add(new_badge)
-    db.flush()
-    
-    # Create notification for badge earned
-    from services.notification_service import create_notification
-    create_notification(
-        user_id=user_id,
-        type="badge_earned",
-        title="Badge Earned!",
-        message=f"You earned the {badge_def.name} badge!",
-        reference_type="badge",
-        reference_id=badge_def.id,
-        db=db
+    badge_def = _as_def(badge, db)
+    if badge_def is None:
+        # Loud, actionable log. If this fires on the signup path,
+        # the protected specials are missing from badge_definitions.
+        # Run migration 025 to seed + backfill.
+        logger.error(
+            "BADGE_DEF_MISSING: cannot award '%s'. "
+            "Definition row not in badge_definitions. "
+            "Run migration_025_seed_protected_badges.",
+            badge,
+        )
+        return
+    award_badges(str(user_id), [badge_def], db)
+
+
+def _insert_awards(rows: List[dict], db: Session) -> List[Tuple[str, str]]:
+    """Bulk-insert user_badges rows; returns the (user_id, badge_id) pairs
+    actually inserted (rows that already existed are skipped)."""
+    if not rows:
+        return []
+    stmt = (
+        insert(UserBadge)
+        .values(rows)
+        .on_conflict_do_nothing(constraint="unique_user_badge")
+        .returning(UserBadge.user_id, UserBadge.badge_id)
     )
+    return [(str(uid), badge_id) for uid, badge_id in db.execute(stmt).all()]
+
+
+def _announce(awards: List[Tuple[str, BadgeDef]], db: Session) -> None:
+    """Notification + BadgeEarned event for each newly inserted badge."""
+    from services.notification_service import create_notifications
+    create_notifications([
+        {
+            "user_id": user_id,
+            "type": "badge_earned",
+            "title": "Badge Earned!",
+            "message": f"You earned the {badge_def.name} badge!",
+            "reference_type": "badge",
+            "reference_id": badge_def.id,
+        }
+        for user_id, badge_def in awards
+    ], db)
 
     # ML feature: badges earned in first 7 days is the #1 retention predictor.
-    try:
-        import uuid as _uuid
-        from services.analytics_service import track_event
-        track_event(
-            db=db,
-            event_name="BadgeEarned",
-            user_id=_uuid.UUID(str(user_id)),
-            properties={
-                "badge_id": badge_def.id,
-                "badge_name": badge_def.name,
-                "badge_tier": getattr(badge_def, "tier", None),
-                "badge_category": getattr(badge_def, "category", None),
-            },
-        )
-    except Exception:
-        logger.exception("award_badge: analytics track failed (non-fatal)")
+    from services.analytics_service import track_event
+    for user_id, badge_def in awards:
+        try:
+            track_event(
+                db=db,
+                event_name="BadgeEarned",
+                user_id=uuid.UUID(str(user_id)),
+                properties={
+                    "badge_id": badge_def.id,
+                    "badge_name": badge_def.name,
+                    "badge_tier": badge_def.tier,
+                    "badge_category": badge_def.category,
+                },
+            )
+        except Exception:
+            logger.exception("award_badge: analytics track failed (non-fatal)")
+
+
+def award_badges(user_id: str, badge_defs: Sequence[BadgeDef], db: Session) -> List[BadgeDef]:
+    """Grant several badges to one user in a single INSERT; returns those newly granted."""
+    user_id = str(user_id)
+    now = datetime.now(timezone.utc)
+    inserted = _insert_awards([
+        {"id": uuid.uuid4(), "user_id": user_id, "badge_id": d.id, "earned_at": now, "display_order": 0}
+        for d in badge_defs
+    ], db)
+    by_id = {d.id: d for d in badge_defs}
+    granted = [by_id[badge_id] for _, badge_id in inserted]
+
+    memo = _owned_memo(db)
+    if memo is not None and user_id in memo:
+        memo[user_id].update(by_id)  # inserted now, or already there
+    for badge_def in granted:
+        logger.info(f"🏆 Awarding Badge {badge_def.id} to user {user_id}")
+    _announce([(user_id, d) for d in granted], db)
+    return granted
+
+
+# ============================================
+# Stats and the bulk sweep
+# ============================================
+
+def _stats_query(db: Session):
+    return db.query(UserStats, UserProfile.streak_count, UserProfile.referral_count).outerjoin(
+        UserProfile, UserProfile.user_id == UserStats.user_id
+    )
+
+
+def _stats_dict(stats: UserStats, streak: Optional[int], referrals: Optional[int]) -> dict:
+    received = stats.reactions_received_count or 0
+    return {
+        "reactions_given": stats.reactions_given_count or 0,
+        "reactions_received": received,
+        "likes_received": received,
+        "motw_likes": stats.motw_likes or 0,
+        "original_likes": stats.original_likes or 0,
+        "guild_likes": stats.guild_likes or 0,
+        "fires_received": stats.fires_received or 0,
+        "claps_received": stats.claps_received or 0,
+        "metronomes_received": stats.metronomes_received or 0,
+        "solutions_accepted": stats.solutions_accepted_count or 0,
+        "questions_posted": stats.questions_posted or 0,
+        "videos_posted": stats.videos_posted or 0,
+        "motw_videos": stats.motw_videos or 0,
+        "original_videos": stats.original_videos or 0,
+        "guild_videos": stats.guild_videos or 0,
+        "comments_posted": stats.comments_posted or 0,
+        "current_streak": streak or 0,
+        "referrals_converted": referrals or 0,
+    }
+
+
+def _collect_stats(db: Session, user_ids: Sequence[str]) -> Dict[str, dict]:
+    """Badge stats for many users from their user_stats rows, in one query.
+    Users without a row count as all zeros."""
+    ids = [str(u) for u in user_ids]
+    rows = {
+        str(stats.user_id): _stats_dict(stats, streak, referrals)
+        for stats, streak, referrals in _stats_query(db).filter(UserStats.user_id.in_(ids)).all()
+    }
+    zeros = _stats_dict(UserStats(), 0, 0)
+    return {uid: rows.get(uid, zeros) for uid in ids}
 
 
 def get_user_stats(user_id: str, db: Session) -> dict:
     """
-    Calculate and return all badge-related stats for a user.
-    Consolidated using conditional aggregation.
+    All badge-related stats for a user: one primary-key lookup of the
+    materialized user_stats row (see services/user_stats_service.py),
+    joined to the profile for streak and referrals.
     """
-    from models.user import UserProfile
+    row = _stats_query(db).filter(UserStats.user_id == user_id).first()
+    if row is None:
+        get_or_create_stats(user_id, db)
+        row = _stats_query(db).filter(UserStats.user_id == user_id).first()
+    return _stats_dict(*row)
 
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-    stats = get_or_create_stats(user_id, db)
 
-    # Legacy per-type reaction counts — only preserved so old trophy tiles
-    # keep displaying accurate numbers. With migration 017 collapsing all
-    # reactions to 'like' these will be zero for new data.
-    reaction_row = db.query(
-        func.count(case((PostReaction.reaction_type == "fire", 1))).label("fires"),
-        func.count(case((PostReaction.reaction_type == "clap", 1))).label("claps"),
-        func.count(case((PostReaction.reaction_type == "ruler", 1))).label("metronomes"),
-    ).join(Post, Post.id == PostReaction.post_id).filter(
-        Post.user_id == user_id,
-        Post.is_deleted == False,
-        Post.moderation_status == ModerationStatus.ACTIVE.value,
-    ).first()
-
-    # Post counts, including per video_type for the new badge families.
-    post_row = db.query(
-        func.count(case((
-            (Post.post_type == "stage") & Post.mux_asset_id.isnot(None), 1
-        ))).label("videos"),
-        func.count(case((Post.post_type == "lab", 1))).label("questions"),
-        func.count(case(((Post.video_type == "motw") & Post.mux_asset_id.isnot(None), 1))).label("motw"),
-        func.count(case(((Post.video_type == "original") & Post.mux_asset_id.isnot(None), 1))).label("original"),
-        func.count(case(((Post.video_type == "guild") & Post.mux_asset_id.isnot(None), 1))).label("guild"),
-    ).filter(
-        Post.user_id == user_id,
-        Post.is_deleted == False,
-        Post.moderation_status == ModerationStatus.ACTIVE.value,
-    ).first()
-
-    # Likes broken down by the post's video_type (Move Magnet / Fan Favorite /
-    # Guild Applause families).
-    likes_row = db.query(
-        func.count(case(((Post.video_type == "motw", 1)))).label("motw"),
-        func.count(case(((Post.video_type == "original", 1)))).label("original"),
-        func.count(case(((Post.video_type == "guild", 1)))).label("guild"),
-    ).select_from(PostReaction).join(
-        Post, Post.id == PostReaction.post_id
-    ).filter(
-        Post.user_id == user_id,
-        Post.is_deleted == False,
-        Post.moderation_status == ModerationStatus.ACTIVE.value,
-    ).first()
-
-    comments_posted = db.query(func.count(PostReply.id)).filter(
-        PostReply.user_id == user_id,
-        PostReply.is_deleted == False,
-    ).scalar() or 0
+def check_stat_badges(user_id: str, requirement_types: Iterable[str], db: Session) -> None:
+    """
+    Award the `requirement_types` badges the user's counters have reached:
+    one read of their user_stats row, however much content they've posted.
+    """
+    keys = dict(_STAT_REQUIREMENTS)
+    stats = get_user_stats(user_id, db)
+    for requirement_type in requirement_types:
+        check_and_award_badges(user_id, requirement_type, stats[keys[requirement_type]], db)
 
-    return {
-        "reactions_given": stats.reactions_given_count,
-        "reactions_received": stats.reactions_received_count,
-        "likes_received": stats.reactions_received_count,
-        "motw_likes": likes_row.motw if likes_row else 0,
-        "original_likes": likes_row.original if likes_row else 0,
-        "guild_likes": likes_row.guild if likes_row else 0,
-        "fires_received": reaction_row.fires if reaction_row else 0,
-        "claps_received": reaction_row.claps if reaction_row else 0,
-        "metronomes_received": reaction_row.metronomes if reaction_row else 0,
-        "solutions_accepted": stats.solutions_accepted_count,
-        "questions_posted": post_row.questions if post_row else 0,
-        "videos_posted": post_row.videos if post_row else 0,
-        "motw_videos": post_row.motw if post_row else 0,
-        "original_videos": post_row.original if post_row else 0,
-        "guild_videos": post_row.guild if post_row else 0,
-        "comments_posted": comments_posted,
-        "current_streak": profile.streak_count if profile else 0,
-        "referrals_converted": profile.referral_count if profile and hasattr(profile, "referral_count") else 0,
-    }
+
+def check_all_badges(
+    db: Session,
+    user_ids: Optional[Sequence[str]] = None,
+    batch_size: int = 500,
+) -> Dict[str, List[dict]]:
+    """
+    Evaluate every badge requirement for `user_ids` (default: all users) and
+    award what's been earned. Per batch of users this is one read of the
+    materialized user_stats rows, one owned-badges query and one INSERT —
+    not a query per user per badge. Flushes but doesn't commit; the caller owns the
+    transaction (commit per batch by passing batches in).
+
+    Returns {user_id: [{"badge_id", "earned_at"}]} for users awarded anything.
+    """
+    index = get_badge_index(db)
+    awarded: Dict[str, List[dict]] = {}
+
+    if user_ids is not None:
+        ids = [str(u) for u in user_ids]
+        batches = (ids[i:i + batch_size] for i in range(0, len(ids), batch_size))
+    else:
+        batches = ([str(u) for u in batch] for batch in iter_user_batches(db, batch_size))
+
+    for batch in batches:
+        stats_by_user = _collect_stats(db, batch)
+        owned: Dict[str, Set[str]] = defaultdict(set)
+        for uid, badge_id in db.query(UserBadge.user_id, UserBadge.badge_id).filter(
+            UserBadge.user_id.in_(batch)
+        ).all():
+            owned[str(uid)].add(badge_id)
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for uid in batch:
+            stats = stats_by_user[uid]
+            pending = owned[uid]
+            for req_type, key in _STAT_REQUIREMENTS:
+                for badge_def in index.eligible(req_type, stats[key]):
+                    if badge_def.id not in pending:
+                        pending.add(badge_def.id)
+                        rows.append({
+                            "id": uuid.uuid4(), "user_id": uid, "badge_id": badge_def.id,
+                            "earned_at": now, "display_order": 0,
+                        })
+
+        inserted = _insert_awards(rows, db)
+        _announce([(uid, index.by_id[badge_id]) for uid, badge_id in inserted], db)
+        for uid, badge_id in inserted:
+            awarded.setdefault(uid, []).append({"badge_id": badge_id, "earned_at": now})
+        if inserted:
+            logger.info(f"🏆 Badge sweep: {len(inserted)} badges awarded to {len({u for u, _ in inserted})} users")
+
+    return awarded
 
 
 def get_all_badges_for_user(user_id: str, db: Session):
     """
     Get all badges (earned and unearned) for user profile with status.
     """
-    all_defs = db.query(BadgeDefinition).all()
+    all_defs = get_badge_index(db).all
     user_badges = db.query(UserBadge).filter(UserBadge.user_id == user_id).all()
     earned_map = {ub.badge_id: ub for ub in user_badges}
 
@@ -379,36 +595,8 @@ def check_all_badges_for_user(user_id: str, db: Session) -> list:
     Returns list of newly awarded badge dicts.
     Used by the manual /badges/check endpoint.
     """
-    # Snapshot of badges before check
-    before_ids = {ub.badge_id for ub in db.query(UserBadge).filter(UserBadge.user_id == user_id).all()}
-
-    user_stats = get_user_stats(user_id, db)
-
-    checks = [
-        ("reactions_given", user_stats["reactions_given"]),
-        ("reactions_received", user_stats["reactions_received"]),
-        ("likes_received", user_stats["likes_received"]),
-        ("motw_likes", user_stats["motw_likes"]),
-        ("original_likes", user_stats["original_likes"]),
-        ("guild_likes", user_stats["guild_likes"]),
-        ("solutions_accepted", user_stats["solutions_accepted"]),
-        ("videos_posted", user_stats["videos_posted"]),
-        ("motw_videos", user_stats["motw_videos"]),
-        ("original_videos", user_stats["original_videos"]),
-        ("guild_videos", user_stats["guild_videos"]),
-        ("questions_posted", user_stats["questions_posted"]),
-        ("comments_posted", user_stats["comments_posted"]),
-        ("daily_streak", user_stats["current_streak"]),
-        ("referrals_converted", user_stats["referrals_converted"]),
-    ]
-
-    for req_type, value in checks:
-        check_and_award_badges(user_id, req_type, value, db)
-
-    # Return newly awarded badges
-    after_badges = db.query(UserBadge).filter(UserBadge.user_id == user_id).all()
-    new_badges = [ub for ub in after_badges if ub.badge_id not in before_ids]
-    return [{"badge_id": ub.badge_id, "earned_at": ub.earned_at} for ub in new_badges]
+    get_or_create_stats(user_id, db)
+    return check_all_badges(db, [user_id]).get(str(user_id), [])
 
 
 def award_subscription_badge(user_id: str, tier: str, db: Session):
@@ -431,37 +619,24 @@ def award_subscription_badge(user_id: str, tier: str, db: Session):
         logger.warning(f"No badge defined for subscription tier: {tier}")
         return
     
-    # Check if badge definition exists
-    badge_def = db.query(BadgeDefinition).filter(BadgeDefinition.id == badge_id).first()
+    index = get_badge_index(db)
+    badge_def = index.by_id.get(badge_id)
     if not badge_def:
         logger.warning(f"Badge definition not found: {badge_id}")
         return
-    
-    # Check if user already has this badge
-    existing = db.query(UserBadge).filter(
-        UserBadge.user_id == user_id,
-        UserBadge.badge_id == badge_id
-    ).first()
-    
-    if existing:
-        logger.info(f"User {user_id} already has badge {badge_id}")
-        return
-    
-    # Award the badge
-    award_badge(user_id, badge_def, db)
-    logger.info(f"🏆 Awarded subscription badge {badge_id} to user {user_id}")
-    
+
     # If user is performer tier, also ensure they have the pro_member badge
-    if tier.lower() == "performer":
-        pro_badge = db.query(BadgeDefinition).filter(BadgeDefinition.id == "pro_member").first()
-        if pro_badge:
-            existing_pro = db.query(UserBadge).filter(
-                UserBadge.user_id == user_id,
-                UserBadge.badge_id == "pro_member"
-            ).first()
-            if not existing_pro:
-                award_badge(user_id, pro_badge, db)
-                logger.info(f"🏆 Also awarded pro_member badge to Guild Master {user_id}")
+    wanted = [badge_def]
+    if tier.lower() == "performer" and "pro_member" in index.by_id:
+        wanted.append(index.by_id["pro_member"])
+
+    owned = _owned_badges(user_id, db)
+    missing = [d for d in wanted if d.id not in owned]
+    if badge_def not in missing:
+        logger.info(f"User {user_id} already has badge {badge_id}")
+    if missing:
+        for d in award_badges(user_id, missing, db):
+            logger.info(f"🏆 Awarded subscription badge {d.id} to user {user_id}")
 
 
 def revoke_subscription_badges(user_id: str, current_tier: str, db: Session) -> int:
@@ -497,6 +672,7 @@ def revoke_subscription_badges(user_id: str, current_tier: str, db: Session) ->
         UserBadge.user_id == user_id,
         UserBadge.badge_id.in_(badges_to_remove),
     ).delete(synchronize_session=False)
+    _forget_owned(user_id, badges_to_remove, db)
 
     if removed:
         logger.info(
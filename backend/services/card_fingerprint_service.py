@@ -166,11 +166,11 @@ def check_and_record_trial_card(
         try:
             user = db.query(User).filter(User.id == user_id).first()
             if user and user.email:
-                from services.email_service import send_trial_collapsed_email
-                send_trial_collapsed_email(user.email)
+                from services.email_service import queue_email, send_trial_collapsed_email
+                queue_email(send_trial_collapsed_email, user.email)
         except Exception:
             logger.exception(
-                "card_fingerprint: trial-collapsed email send failed (non-fatal)"
+                "card_fingerprint: trial-collapsed email queue failed (non-fatal)"
             )
 
         return True
@@ -0,0 +1,363 @@
+"""
+Catalog Service - immutable in-memory snapshot of the course catalog.
+
+The World -> Level -> Lesson tree (plus skill-tree edges) only changes when
+an admin edits it, yet /courses/worlds and the skill-tree endpoint used to
+eager-load all of it on every request. Instead each worker holds one
+frozen `Catalog` built in two queries, and request handlers only overlay
+the caller's completed-lesson set on top of it.
+
+Invalidation is by version number (utils.versioned_cache):
+- Any insert/update/delete of World, Level, Lesson or LevelEdge through the
+  ORM bumps `catalog:version` in Redis once the transaction commits (admin
+  course editor, Mux webhooks, scripts all go through the ORM), and drops
+  this worker's snapshot immediately.
+- Every `get_catalog` call compares the snapshot's version with Redis (one
+  GET) and rebuilds on mismatch, so other workers pick the edit up on their
+  next request.
+- With Redis unavailable, a snapshot is trusted for LOCAL_TTL_SECONDS only.
+
+The snapshot also indexes every lesson's position in its world's course
+order (`Catalog.position`: world, level title, ordinal, prev / next ids),
+so lesson pages, downloads and completion resolve lesson -> world and
+navigation with a dict lookup.
+
+Snapshots are never mutated after construction — a rebuild swaps in a new
+object, so a request that already holds one keeps a consistent view.
+"""
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from models.course import Lesson, Level, LevelEdge, World
+from utils.versioned_cache import VersionedCache
+
+LOCAL_TTL_SECONDS = 60  # snapshot lifetime when Redis can't be asked
+
+# Grabs the body of a `## TL;DR` section from a lesson's markdown notes.
+# Matches from the TL;DR heading up to the next `## ` heading or end of string.
+_TLDR_PATTERN = re.compile(
+    r"^\s*##\s+TL;?DR\s*\n+(.*?)(?=^\s*##\s+|\Z)",
+    re.MULTILINE | re.DOTALL | re.IGNORECASE,
+)
+
+
+def _extract_tldr(content, locale: str = "en") -> Optional[str]:
+    """Return the TL;DR text from a lesson's content_json, or None.
+
+    When locale != "en" and translated notes exist at
+    content_json.translations[locale].notes, the TL;DR is pulled from there.
+    Falls back to the English notes if the locale is missing or malformed.
+    The `## TL;DR` heading itself is preserved verbatim across all 14 locales,
+    so the same regex works for every language.
+    """
+    content = content or {}
+    if not isinstance(content, dict):
+        return None
+    notes: Optional[str] = None
+    if locale and locale != "en":
+        trans = content.get("translations")
+        if isinstance(trans, dict):
+            block = trans.get(locale)
+            if isinstance(block, dict) and isinstance(block.get("notes"), str):
+                notes = block["notes"]
+    if not isinstance(notes, str):
+        notes = content.get("notes") if isinstance(content.get("notes"), str) else None
+    if not isinstance(notes, str):
+        return None
+    match = _TLDR_PATTERN.search(notes)
+    if not match:
+        return None
+    return match.group(1).strip() or None
+
+
+def _level_tldrs(level: Level) -> Mapping[str, Optional[str]]:
+    """TL;DR of the level's first lesson for English and every translated
+    locale that lesson has."""
+    if not level.lessons:
+        return MappingProxyType({})
+    first_lesson = min(level.lessons, key=lambda l: (l.order_index or 0))
+    content = first_lesson.content_json
+    locales = {"en"}
+    if isinstance(content, dict) and isinstance(content.get("translations"), dict):
+        locales.update(content["translations"])
+    return MappingProxyType({loc: _extract_tldr(content, loc) for loc in locales})
+
+
+# ============================================
+# Snapshot types
+# ============================================
+
+@dataclass(frozen=True)
+class CatalogLesson:
+    id: str
+    level_id: str
+    title: str
+    is_boss_battle: bool
+    order_index: int
+    week_number: Optional[int]
+    day_number: Optional[int]
+    duration_minutes: Optional[int]
+    xp_value: int
+
+
+@dataclass(frozen=True)
+class CatalogEdge:
+    id: str
+    from_level_id: str
+    to_level_id: str
+    world_id: str
+
+
+@dataclass(frozen=True)
+class CatalogLevel:
+    id: str
+    title: str
+    description: Optional[str]
+    order_index: int
+    x_position: float
+    y_position: float
+    thumbnail_url: Optional[str]
+    mux_preview_playback_id: Optional[str]
+    outcome: Optional[str]
+    status: str
+    duration_minutes: int          # explicit value, else the sum of its lessons
+    total_xp: int                  # explicit value, else the sum of its lessons
+    lesson_ids: Tuple[str, ...]
+    visible_lesson_count: int      # excludes boss battles (shown separately)
+    tldrs: Mapping[str, Optional[str]]
+
+    def tldr(self, locale: str = "en") -> Optional[str]:
+        if locale in self.tldrs:
+            return self.tldrs[locale]
+        return self.tldrs.get("en")
+
+
+@dataclass(frozen=True)
+class CatalogWorld:
+    id: str
+    slug: str
+    title: str
+    description: Optional[str]
+    image_url: Optional[str]
+    thumbnail_url: Optional[str]
+    mux_preview_playback_id: Optional[str]
+    difficulty: str
+    course_type: str
+    is_free: bool
+    is_published: bool
+    order_index: int
+    total_duration_minutes: int    # explicit value, else the sum of its lessons
+    objectives: Tuple[str, ...]
+    levels: Tuple[CatalogLevel, ...]
+    edges: Tuple[CatalogEdge, ...]
+    # Every lesson, in course order (week, day, order_index).
+    lessons: Tuple[CatalogLesson, ...]
+    prerequisites: Mapping[str, Tuple[str, ...]]
+
+    @property
+    def module_count(self) -> int:
+        return len(self.levels)
+
+    @property
+    def lesson_count(self) -> int:
+        return len(self.lessons)
+
+    @property
+    def lesson_ids(self) -> FrozenSet[str]:
+        return frozenset(l.id for l in self.lessons)
+
+    @property
+    def level_lessons(self) -> Dict[str, Tuple[str, ...]]:
+        return {level.id: level.lesson_ids for level in self.levels}
+
+
+@dataclass(frozen=True)
+class LessonPosition:
+    """Where a lesson sits in its world's course order."""
+    world_id: str
+    level_id: str
+    level_title: str
+    ordinal: int                   # index into CatalogWorld.lessons
+    prev_id: Optional[str]
+    next_id: Optional[str]
+
+
+@dataclass(frozen=True)
+class Catalog:
+    worlds: Mapping[str, CatalogWorld]
+    published: Tuple[CatalogWorld, ...]     # by order_index
+    # Every lesson id -> its position (the lesson navigation index).
+    positions: Mapping[str, LessonPosition]
+
+    def world(self, world_id: str) -> Optional[CatalogWorld]:
+        return self.worlds.get(str(world_id))
+
+    def position(self, lesson_id: str) -> Optional[LessonPosition]:
+        return self.positions.get(str(lesson_id))
+
+    def lesson(self, lesson_id: str) -> Optional[Tuple[CatalogWorld, CatalogLesson]]:
+        """The lesson and its world, or None if it isn't in the catalog."""
+        position = self.positions.get(str(lesson_id))
+        if position is None:
+            return None
+        world = self.worlds[position.world_id]
+        return world, world.lessons[position.ordinal]
+
+
+# ============================================
+# Build
+# ============================================
+
+def _lesson_sort_key(lesson: Lesson):
+    return (
+        lesson.week_number if lesson.week_number is not None else 0,
+        lesson.day_number if lesson.day_number is not None else 0,
+        lesson.order_index,
+    )
+
+
+def _build_level(level: Level, with_tldr: bool) -> CatalogLevel:
+    lessons = level.lessons
+    calculated_xp = sum(lesson.xp_value for lesson in lessons)
+    calculated_duration = sum((lesson.duration_minutes or 0) for lesson in lessons)
+    return CatalogLevel(
+        id=str(level.id),
+        title=level.title,
+        description=level.description,
+        order_index=level.order_index,
+        x_position=level.x_position,
+        y_position=level.y_position,
+        thumbnail_url=level.thumbnail_url,
+        mux_preview_playback_id=level.mux_preview_playback_id,
+        outcome=level.outcome,
+        status=level.status or "active",
+        duration_minutes=level.duration_minutes or calculated_duration,
+        total_xp=level.total_xp or calculated_xp,
+        lesson_ids=tuple(str(l.id) for l in lessons),
+        visible_lesson_count=sum(1 for l in lessons if not l.is_boss_battle),
+        tldrs=_level_tldrs(level) if with_tldr else MappingProxyType({}),
+    )
+
+
+def _build_world(world: World, edges: List[LevelEdge]) -> CatalogWorld:
+    # Only topic worlds show a TL;DR; don't hold the rest in memory.
+    is_topic = (world.course_type or "course") == "topic"
+    levels = [_build_level(level, with_tldr=is_topic) for level in world.levels]
+
+    all_lessons = sorted(
+        (lesson for level in world.levels for lesson in level.lessons),
+        key=_lesson_sort_key,
+    )
+    lessons = tuple(
+        CatalogLesson(
+            id=str(l.id),
+            level_id=str(l.level_id),
+            title=l.title,
+            is_boss_battle=l.is_boss_battle,
+            order_index=l.order_index,
+            week_number=l.week_number,
+            day_number=l.day_number,
+            duration_minutes=l.duration_minutes,
+            xp_value=l.xp_value,
+        )
+        for l in all_lessons
+    )
+
+    prerequisites: Dict[str, List[str]] = {}
+    for edge in edges:
+        prerequisites.setdefault(str(edge.to_level_id), []).append(str(edge.from_level_id))
+
+    calculated_duration = sum((l.duration_minutes or 0) for l in lessons)
+    difficulty = world.difficulty.value if hasattr(world.difficulty, "value") else str(world.difficulty)
+    return CatalogWorld(
+        id=str(world.id),
+        slug=world.slug,
+        title=world.title,
+        description=world.description,
+        image_url=world.image_url,
+        thumbnail_url=world.thumbnail_url,
+        mux_preview_playback_id=world.mux_preview_playback_id,
+        difficulty=difficulty,
+        course_type=world.course_type or "course",
+        is_free=world.is_free,
+        is_published=world.is_published,
+        order_index=world.order_index,
+        total_duration_minutes=world.total_duration_minutes or calculated_duration,
+        objectives=tuple(world.objectives or ()),
+        levels=tuple(levels),
+        edges=tuple(
+            CatalogEdge(
+                id=str(e.id),
+                from_level_id=str(e.from_level_id),
+                to_level_id=str(e.to_level_id),
+                world_id=str(e.world_id),
+            )
+            for e in edges
+        ),
+        lessons=lessons,
+        prerequisites=MappingProxyType({k: tuple(v) for k, v in prerequisites.items()}),
+    )
+
+
+def _lesson_positions(world: CatalogWorld) -> Dict[str, LessonPosition]:
+    level_titles = {level.id: level.title for level in world.levels}
+    lessons = world.lessons
+    return {
+        lesson.id: LessonPosition(
+            world_id=world.id,
+            level_id=lesson.level_id,
+            level_title=level_titles.get(lesson.level_id),
+            ordinal=i,
+            prev_id=lessons[i - 1].id if i > 0 else None,
+            next_id=lessons[i + 1].id if i + 1 < len(lessons) else None,
+        )
+        for i, lesson in enumerate(lessons)
+    }
+
+
+def build_catalog(db: Session) -> Catalog:
+    """Load the whole catalog (published or not) in two queries."""
+    worlds = (
+        db.query(World)
+        .options(joinedload(World.levels).joinedload(Level.lessons))
+        .order_by(World.order_index)
+        .all()
+    )
+    edges_by_world: Dict[str, List[LevelEdge]] = {}
+    for edge in db.query(LevelEdge).all():
+        edges_by_world.setdefault(str(edge.world_id), []).append(edge)
+
+    built = [_build_world(w, edges_by_world.get(str(w.id), [])) for w in worlds]
+    positions: Dict[str, LessonPosition] = {}
+    for world in built:
+        positions.update(_lesson_positions(world))
+    return Catalog(
+        worlds=MappingProxyType({w.id: w for w in built}),
+        published=tuple(w for w in built if w.is_published),
+        positions=MappingProxyType(positions),
+    )
+
+
+# ============================================
+# Versioned access
+# ============================================
+
+_cache: VersionedCache[Catalog] = VersionedCache(
+    "Catalog", "catalog:version", build_catalog, local_ttl=LOCAL_TTL_SECONDS
+)
+_cache.watch(World, Level, Lesson, LevelEdge)
+
+
+def get_catalog(db: Session) -> Catalog:
+    """This worker's catalog snapshot, rebuilt if another worker (or this
+    one) changed the catalog since it was built."""
+    return _cache.get(db)
+
+
+def invalidate() -> None:
+    """Drop this worker's snapshot and tell the others to rebuild theirs."""
+    _cache.invalidate()
@@ -11,6 +11,7 @@ from sqlalchemy import func
 
 from models.user import UserProfile, Subscription, SubscriptionTier, SubscriptionStatus
 from models.community import ClaveTransaction, Post, PostReply
+from services import ledger_service
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +53,11 @@ PRO_QUESTION_SLOTS = 50
 
 def is_user_pro(user_id: str, db: Session) -> bool:
     """Check if user has a pro subscription."""
+    from services import principal_service
+    principal = principal_service.cached(db, user_id)
+    if principal is not None:
+        return principal.is_pro
+
     subscription = db.query(Subscription).filter(
         Subscription.user_id == user_id,
         Subscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING]),
@@ -66,9 +72,8 @@ def get_user_profile(user_id: str, db: Session) -> Optional[UserProfile]:
 
 
 def get_balance(user_id: str, db: Session) -> int:
-    """Get user's current clave balance."""
-    profile = get_user_profile(user_id, db)
-    return profile.current_claves if profile else 0
+    """Get user's current clave balance (cached; see ledger_service)."""
+    return ledger_service.get_balance(user_id, db)
 
 
 def can_afford(user_id: str, amount: int, db: Session) -> Tuple[bool, int]:
@@ -155,9 +160,24 @@ def spend_claves(
     Uses SELECT FOR UPDATE to prevent race conditions.
     Returns: (success: bool, new_balance: int)
     """
+    success, new_balance, _ = spend_claves_with_transaction(user_id, amount, reason, db, reference_id)
+    return (success, new_balance)
+
+
+def spend_claves_with_transaction(
+    user_id: str,
+    amount: int,
+    reason: str,
+    db: Session,
+    reference_id: str = None
+) -> Tuple[bool, int, Optional[ClaveTransaction]]:
+    """
+    `spend_claves`, also returning the ClaveTransaction it wrote (None when
+    nothing was spent), so callers can link to it without re-querying.
+    """
     if amount <= 0:
         logger.warning(f"Attempted to spend {amount} claves (must be positive)")
-        return (True, get_balance(user_id, db))
+        return (True, get_balance(user_id, db), None)
 
     # Lock the row to prevent concurrent modifications
     profile = db.query(UserProfile).filter(
@@ -165,12 +185,12 @@ def spend_claves(
     ).with_for_update().first()
     if not profile:
         logger.error(f"Profile not found for user {user_id}")
-        return (False, 0)
+        return (False, 0, None)
 
     # Check balance (row is locked, so this is safe from TOCTOU)
     if profile.current_claves < amount:
         logger.warning(f"User {user_id} cannot afford {amount} claves (balance: {profile.current_claves})")
-        return (False, profile.current_claves)
+        return (False, profile.current_claves, None)
 
     # Create transaction (negative amount)
     transaction = ClaveTransaction(
@@ -204,7 +224,7 @@ def spend_claves(
     except Exception:
         logger.exception("spend_claves: analytics track failed (non-fatal)")
 
-    return (True, profile.current_claves)
+    return (True, profile.current_claves, transaction)
 
 
 def process_daily_login(user_id: str, db: Session) -> dict:
@@ -285,9 +305,10 @@ def process_daily_login(user_id: str, db: Session) -> dict:
     }
 
 
-def get_wallet(user_id: str, db: Session, limit: int = 20) -> dict:
+def get_wallet(user_id: str, db: Session, limit: int = 20, cursor: Optional[tuple] = None) -> dict:
     """
-    Get user's wallet state including balance and recent transactions.
+    Get user's wallet state including balance and a page of transactions
+    (newest first; `cursor` is the decoded position of the previous page's last one).
     """
     profile = get_user_profile(user_id, db)
     if not profile:
@@ -301,12 +322,7 @@ def get_wallet(user_id: str, db: Session, limit: int = 20) -> dict:
     
     is_pro = is_user_pro(user_id, db)
     
-    # Get recent transactions
-    transactions = db.query(ClaveTransaction).filter(
-        ClaveTransaction.user_id == user_id
-    ).order_by(
-        ClaveTransaction.created_at.desc()
-    ).limit(limit).all()
+    transactions = ledger_service.get_history(user_id, db, limit=limit, cursor=cursor)
     
     # Get video slot usage
     video_count = db.query(func.count(Post.id)).filter(
@@ -320,16 +336,7 @@ def get_wallet(user_id: str, db: Session, limit: int = 20) -> dict:
     return {
         "current_claves": profile.current_claves,
         "is_pro": is_pro,
-        "recent_transactions": [
-            {
-                "id": str(t.id),
-                "amount": t.amount,
-                "reason": t.reason,
-                "reference_id": str(t.reference_id) if t.reference_id else None,
-                "created_at": t.created_at
-            }
-            for t in transactions
-        ],
+        "recent_transactions": transactions,
         "video_slots_used": video_count,
         "video_slots_limit": slot_limit
     }
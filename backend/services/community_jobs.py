@@ -0,0 +1,92 @@
+"""
+Community Jobs - the side effects of new community content, run on the job
+queue (services/job_queue) after the request has committed and returned.
+
+- community.post_created: video / per-type / questions badge checks, for a
+  new post or a stage post whose video finished uploading.
+- community.reply_created: comments badge check and the "New Reply"
+  notifications to the post owner and the parent reply's author.
+- community.reconcile_stats: recompute a batch of users' user_stats
+  counters from their content and award the badges they unlock
+  (scripts/reconcile_user_stats.py --queue).
+
+Badge checks read the per-user counters on user_stats, which the write
+paths keep current in the same transaction as the content itself (see
+services/user_stats_service) — no COUNT over the user's post history.
+"""
+import logging
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from models.community import Post, PostReply
+from services import badge_service, job_queue, notification_service, user_stats_service
+from services.user_stats_service import VIDEO_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+@job_queue.job("community.post_created", db=True)
+def post_created(db: Session, user_id: str, post_type: str, video_type: Optional[str] = None,
+                 has_video: bool = False) -> None:
+    requirements = []
+    # Stage posts: video total + per-type (motw / original / guild).
+    if post_type == "stage" and has_video:
+        requirements.append("videos_posted")
+        if video_type in VIDEO_TYPES:
+            requirements.append(f"{video_type}_videos")
+    # Curious Mind: Track questions posted (Lab posts)
+    if post_type == "lab":
+        requirements.append("questions_posted")
+    if requirements:
+        badge_service.check_stat_badges(user_id, requirements, db)
+
+
+@job_queue.job("community.reply_created", db=True)
+def reply_created(db: Session, user_id: str, post_id: str, parent_reply_id: Optional[str] = None) -> None:
+    # The Socialite: comments posted (deleting a comment un-counts it).
+    badge_service.check_stat_badges(user_id, ["comments_posted"], db)
+
+    # Notify post owner about the reply (don't notify self).
+    # For nested replies, also notify the parent reply's author (a
+    # direct reply to their comment is more relevant to them than the
+    # post owner). Both notifications are deduped against the actor
+    # so users never get pinged about their own actions.
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        return
+    notified: set[str] = {user_id}
+    if str(post.user_id) not in notified:
+        notification_service.create_notification(
+            user_id=str(post.user_id),
+            type="reply_received",
+            title="💬 New Reply",
+            message=f"replied to your post \"{post.title[:50]}\"",
+            reference_type="post",
+            reference_id=str(post.id),
+            actor_id=user_id,
+            db=db
+        )
+        notified.add(str(post.user_id))
+
+    if parent_reply_id:
+        parent = db.query(PostReply).filter(PostReply.id == parent_reply_id).first()
+        if parent and str(parent.user_id) not in notified:
+            notification_service.create_notification(
+                user_id=str(parent.user_id),
+                type="reply_received",
+                title="💬 New Reply",
+                message=f"replied to your comment on \"{post.title[:50]}\"",
+                reference_type="post",
+                reference_id=str(post.id),
+                actor_id=user_id,
+                db=db
+            )
+
+
+@job_queue.job("community.reconcile_stats", db=True, timeout=900)
+def reconcile_stats(db: Session, user_ids: List[str]) -> None:
+    changed = user_stats_service.reconcile(db, user_ids)
+    awarded = badge_service.check_all_badges(db, user_ids)
+    if changed or awarded:
+        logger.info(f"reconcile_stats: {len(changed)} rows fixed, {len(awarded)} users awarded badges")
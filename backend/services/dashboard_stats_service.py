@@ -0,0 +1,379 @@
+"""
+Dashboard Stats Service - precomputed snapshot for the admin overview page.
+
+The admin dashboard used to run ~20 COUNT queries plus three aggregates per
+published world on every page load. Here the same numbers come from a
+handful of FILTER-clause aggregates (one scan per table, one grouped query
+for all worlds) and are stored as a JSON snapshot in Redis with an `as_of`
+timestamp.
+
+- A daemon thread per worker recomputes the snapshot every
+  DASHBOARD_STATS_REFRESH_SECONDS. A short Redis lock means only one worker
+  actually runs the queries each interval; the others just serve it.
+- `get_snapshot(db, force_refresh=True)` recomputes on demand (the admin
+  "refresh" button).
+- If the snapshot is missing or older than twice the interval (refresher
+  not running, Redis flushed) the request computes it inline. If Redis is
+  down entirely the endpoint still works, just uncached.
+"""
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.course import Lesson, Level, World
+from models.premium import CoachingSubmission, CoachingSubmissionStatus
+from models.progress import BossSubmission, SubmissionStatus, UserProgress
+from models.user import Subscription, SubscriptionStatus, SubscriptionTier, User, UserProfile
+from services.redis_service import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Tier prices used for estimated MRR (update if pricing changes)
+TIER_PRICES: Dict[str, float] = {
+    "rookie": 0.0,
+    "advanced": 39.0,
+    "performer": 59.0,
+}
+
+SNAPSHOT_KEY = "admin:dashboard:snapshot"
+_REFRESH_LOCK_KEY = "admin:dashboard:refresh_lock"
+
+
+def _refresh_seconds() -> int:
+    return max(int(settings.DASHBOARD_STATS_REFRESH_SECONDS), 5)
+
+
+def _pct(part: int, whole: int) -> float:
+    return round((part / whole) * 100, 1) if whole > 0 else 0.0
+
+
+# ============================================
+# Computation
+# ============================================
+
+def _user_stats(db: Session, week_ago: datetime, two_weeks_ago: datetime) -> dict:
+    total, this_week, last_week = db.query(
+        func.count(User.id),
+        func.count(User.id).filter(User.created_at >= week_ago),
+        func.count(User.id).filter(and_(User.created_at >= two_weeks_ago, User.created_at < week_ago)),
+    ).one()
+
+    if last_week > 0:
+        growth = round(((this_week - last_week) / last_week) * 100, 1)
+    elif this_week > 0:
+        growth = 100.0
+    else:
+        growth = 0.0
+    return {
+        "total_users": total,
+        "users_this_week": this_week,
+        "users_last_week": last_week,
+        "user_growth_pct": growth,
+    }
+
+
+def _subscription_stats(db: Session) -> dict:
+    active = Subscription.status == SubscriptionStatus.ACTIVE
+    rookie, advanced, performer, canceled = db.query(
+        func.count(Subscription.id).filter(and_(active, Subscription.tier == SubscriptionTier.ROOKIE)),
+        func.count(Subscription.id).filter(and_(active, Subscription.tier == SubscriptionTier.ADVANCED)),
+        func.count(Subscription.id).filter(and_(active, Subscription.tier == SubscriptionTier.PERFORMER)),
+        func.count(Subscription.id).filter(Subscription.status == SubscriptionStatus.CANCELED),
+    ).one()
+    return {
+        "active_subscriptions": rookie + advanced + performer,
+        "rookie_count": rookie,
+        "advanced_count": advanced,
+        "performer_count": performer,
+        "canceled_count": canceled,
+        "estimated_mrr": (
+            rookie * TIER_PRICES["rookie"]
+            + advanced * TIER_PRICES["advanced"]
+            + performer * TIER_PRICES["performer"]
+        ),
+        "tier_prices": TIER_PRICES,
+    }
+
+
+def _submission_stats(db: Session, week_ago: datetime, month_start: datetime) -> dict:
+    approved = BossSubmission.status == SubmissionStatus.APPROVED
+    rejected = BossSubmission.status == SubmissionStatus.REJECTED
+    total, pending, approved_week, rejected_week, reviewed, approved_all = db.query(
+        func.count(BossSubmission.id),
+        func.count(BossSubmission.id).filter(BossSubmission.status == SubmissionStatus.PENDING),
+        func.count(BossSubmission.id).filter(and_(approved, BossSubmission.reviewed_at >= week_ago)),
+        func.count(BossSubmission.id).filter(and_(rejected, BossSubmission.reviewed_at >= week_ago)),
+        func.count(BossSubmission.id).filter(
+            BossSubmission.status.in_([SubmissionStatus.APPROVED, SubmissionStatus.REJECTED])
+        ),
+        func.count(BossSubmission.id).filter(approved),
+    ).one()
+
+    coaching_pending, coaching_completed = db.query(
+        func.count(CoachingSubmission.id).filter(
+            CoachingSubmission.status == CoachingSubmissionStatus.PENDING
+        ),
+        func.count(CoachingSubmission.id).filter(and_(
+            CoachingSubmission.status == CoachingSubmissionStatus.COMPLETED,
+            CoachingSubmission.reviewed_at >= month_start,
+        )),
+    ).one()
+    return {
+        "pending_submissions": pending,
+        "approved_this_week": approved_week,
+        "rejected_this_week": rejected_week,
+        "total_submissions": total,
+        "boss_pass_rate": _pct(approved_all, reviewed),
+        "coaching_pending": coaching_pending,
+        "coaching_completed_month": coaching_completed,
+    }
+
+
+def _recent_signups(db: Session) -> list:
+    rows = (
+        db.query(User, UserProfile, Subscription)
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)
+        .outerjoin(Subscription, Subscription.user_id == User.id)
+        .order_by(User.created_at.desc())
+        .limit(10)
+        .all()
+    )
+    return [
+        {
+            "id": str(u.id),
+            "email": u.email,
+            "first_name": p.first_name if p else "",
+            "last_name": p.last_name if p else "",
+            "avatar_url": p.avatar_url if p else None,
+            "tier": s.tier.value if s else None,
+            "sub_status": s.status.value if s else None,
+            "created_at": u.created_at.isoformat(),
+            "xp": p.xp if p else 0,
+            "level": p.level if p else 1,
+        }
+        for u, p, s in rows
+    ]
+
+
+def _top_lessons(db: Session) -> list:
+    rows = (
+        db.query(
+            Lesson.id,
+            Lesson.title,
+            Lesson.is_boss_battle,
+            Level.title.label("level_title"),
+            World.title.label("world_title"),
+            func.count(UserProgress.id).label("completions"),
+        )
+        .join(UserProgress, UserProgress.lesson_id == Lesson.id)
+        .join(Level, Level.id == Lesson.level_id)
+        .join(World, World.id == Level.world_id)
+        .filter(UserProgress.is_completed == True)
+        .group_by(Lesson.id, Lesson.title, Lesson.is_boss_battle, Level.title, World.title)
+        .order_by(func.count(UserProgress.id).desc())
+        .limit(5)
+        .all()
+    )
+    return [
+        {
+            "id": str(r.id),
+            "title": r.title,
+            "is_boss_battle": r.is_boss_battle,
+            "level_title": r.level_title,
+            "world_title": r.world_title,
+            "completions": r.completions,
+        }
+        for r in rows
+    ]
+
+
+def _world_stats(db: Session) -> list:
+    """Lessons, completions and distinct students for every published world
+    in one statement (two grouped subqueries joined onto worlds)."""
+    lesson_counts = (
+        db.query(Level.world_id.label("world_id"), func.count(Lesson.id).label("lessons"))
+        .join(Lesson, Lesson.level_id == Level.id)
+        .group_by(Level.world_id)
+        .subquery()
+    )
+    completion_counts = (
+        db.query(
+            Level.world_id.label("world_id"),
+            func.count(UserProgress.id).label("completions"),
+            func.count(func.distinct(UserProgress.user_id)).label("students"),
+        )
+        .join(Lesson, Lesson.level_id == Level.id)
+        .join(UserProgress, UserProgress.lesson_id == Lesson.id)
+        .filter(UserProgress.is_completed == True)
+        .group_by(Level.world_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            World.id,
+            World.title,
+            func.coalesce(lesson_counts.c.lessons, 0).label("lessons"),
+            func.coalesce(completion_counts.c.completions, 0).label("completions"),
+            func.coalesce(completion_counts.c.students, 0).label("students"),
+        )
+        .outerjoin(lesson_counts, lesson_counts.c.world_id == World.id)
+        .outerjoin(completion_counts, completion_counts.c.world_id == World.id)
+        .filter(World.is_published == True)
+        .order_by(World.order_index)
+        .all()
+    )
+    return [
+        {
+            "id": str(r.id),
+            "title": r.title,
+            "total_lessons": r.lessons,
+            "total_completions": r.completions,
+            "students_started": r.students,
+            "completion_rate": _pct(r.completions, r.students * r.lessons),
+        }
+        for r in rows
+    ]
+
+
+def compute_snapshot(db: Session, now: Optional[datetime] = None) -> dict:
+    """Run the dashboard aggregates and return the endpoint payload."""
+    now = now or datetime.now(timezone.utc)
+    week_ago = now - timedelta(days=7)
+    two_weeks_ago = now - timedelta(days=14)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    snapshot = {}
+    snapshot.update(_user_stats(db, week_ago, two_weeks_ago))
+    snapshot.update(_subscription_stats(db))
+    snapshot.update(_submission_stats(db, week_ago, month_start))
+    snapshot["recent_signups"] = _recent_signups(db)
+    snapshot["top_lessons"] = _top_lessons(db)
+    snapshot["world_stats"] = _world_stats(db)
+    snapshot["as_of"] = now.isoformat()
+    return snapshot
+
+
+# ============================================
+# Storage
+# ============================================
+
+def _store(snapshot: dict) -> None:
+    try:
+        # Kept well past the refresh interval so a stalled refresher still
+        # leaves something to serve while a request recomputes.
+        get_redis_client().set(SNAPSHOT_KEY, json.dumps(snapshot), ex=_refresh_seconds() * 10)
+    except Exception as e:
+        logger.warning(f"Dashboard snapshot write failed: {e}")
+
+
+def _load() -> Optional[dict]:
+    try:
+        raw = get_redis_client().get(SNAPSHOT_KEY)
+    except Exception as e:
+        logger.warning(f"Dashboard snapshot read failed: {e}")
+        return None
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _is_fresh(snapshot: dict, now: datetime) -> bool:
+    try:
+        as_of = datetime.fromisoformat(snapshot["as_of"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return now - as_of <= timedelta(seconds=_refresh_seconds() * 2)
+
+
+def refresh(db: Session) -> dict:
+    """Recompute and store the snapshot now."""
+    snapshot = compute_snapshot(db)
+    _store(snapshot)
+    return snapshot
+
+
+def get_snapshot(db: Session, force_refresh: bool = False) -> dict:
+    """The current snapshot, recomputed if forced, missing or stale."""
+    if not force_refresh:
+        snapshot = _load()
+        if snapshot and _is_fresh(snapshot, datetime.now(timezone.utc)):
+            return snapshot
+    return refresh(db)
+
+
+# ============================================
+# Background refresher
+# ============================================
+
+def _default_session_factory() -> Session:
+    from models import get_session_local
+    return get_session_local()()
+
+
+class SnapshotRefresher:
+    """Daemon thread that keeps the snapshot warm."""
+
+    def __init__(self, session_factory=_default_session_factory) -> None:
+        self._session_factory = session_factory
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="dashboard-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def tick(self) -> bool:
+        """Refresh once if no other worker did this interval. Returns True if
+        this call recomputed the snapshot."""
+        interval = _refresh_seconds()
+        try:
+            # Lock expires just before the next tick, so exactly one worker
+            # wins each interval and a crashed holder never blocks the next.
+            if not get_redis_client().set(_REFRESH_LOCK_KEY, "1", nx=True, ex=max(interval - 1, 1)):
+                return False
+        except Exception as e:
+            logger.debug(f"Dashboard refresh lock unavailable: {e}")
+            return False
+        session = self._session_factory()
+        try:
+            refresh(session)
+            return True
+        finally:
+            session.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Dashboard snapshot refresh failed")
+            self._stopping.wait(_refresh_seconds())
+
+
+_refresher = SnapshotRefresher()
+
+
+def start() -> None:
+    _refresher.start()
+
+
+def stop() -> None:
+    _refresher.stop()
@@ -0,0 +1,416 @@
+"""
+Email Broadcast - concurrent, resumable bulk sends through Resend's batch API.
+
+Used by scripts/broadcast.py and scripts/broadcast_waitlist.py. One
+`Broadcast.run` call sends one campaign:
+
+- Recipients stream from the segment query through a server-side cursor
+  (`stream_recipients`), so a 20k list is never held in memory.
+- Every BATCH_SIZE recipients are claimed in the `email_sends` ledger
+  with one INSERT .. ON CONFLICT DO UPDATE WHERE status = 'failed'
+  RETURNING email: only rows this sender inserted (or a failed row it
+  re-claimed) come back, so two senders on two machines never send the
+  same recipient, and a re-run skips everyone already sent or claimed.
+- Each claimed batch is one POST /emails/batch. Requests are spaced by a
+  token bucket (Resend counts requests, not emails) with at most
+  `concurrency` in flight. 429 / 5xx / network errors retry with backoff
+  under the same Idempotency-Key, so a retry of a batch Resend already
+  accepted isn't sent twice. A 400 / 422 is bisected to isolate the bad
+  address instead of failing the whole batch; a 401 / 403 (bad or revoked
+  key) aborts the run, and any other 4xx fails just that batch.
+- Outcomes are written back per recipient: 'sent' with Resend's id, or
+  'failed' with the error (failed rows are retried by the next run).
+
+A sender that dies mid-request leaves its batch 'claimed': whether
+Resend took it is unknown, so those rows are only re-sent when the
+operator asks (`retry_claimed`, with no other sender running).
+`BroadcastStats` carries live throughput; `SendLedger.summary` the
+campaign's totals across every sender.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import socket
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import get_engine, get_session_local
+from models.email import EmailSend
+
+BATCH_SIZE = 100            # Resend's per-request limit for /emails/batch
+DEFAULT_RATE = 2.0          # requests per second (Resend's default team limit)
+DEFAULT_CONCURRENCY = 4
+STREAM_CHUNK = 1000         # rows per server-side cursor fetch
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+REQUEST_TIMEOUT_SECONDS = 30.0
+PROGRESS_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class Recipient:
+    user_id: Optional[str]
+    email: str
+    username: str
+
+
+def stream_recipients(sql: str, params: Optional[dict] = None) -> Iterator[Recipient]:
+    """Rows of a segment query (id, email, username) through a server-side cursor."""
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_CHUNK).execute(
+            text(sql), params or {}
+        )
+        for row in result:
+            email = (row.email or "").strip()
+            if email:
+                yield Recipient(str(row.id), email, row.username or "Dancer")
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up. One event loop only."""
+
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    async def acquire(self) -> None:
+        while True:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ============================================
+# Send ledger
+# ============================================
+
+class SendLedger:
+    """The `email_sends` rows of one campaign. Each call is its own transaction."""
+
+    def __init__(self, campaign: str, session_factory=None, worker: Optional[str] = None):
+        self.campaign = campaign
+        self._session_factory = session_factory or get_session_local()
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+
+    def _session(self) -> Session:
+        return self._session_factory()
+
+    def claim(self, recipients: Sequence[Recipient], retry_claimed: bool = False) -> List[Recipient]:
+        """The recipients this sender now owns; the rest were sent or are
+        claimed by someone else."""
+        if not recipients:
+            return []
+        now = datetime.utcnow()
+        stmt = insert(EmailSend).values([
+            {
+                "campaign": self.campaign, "email": r.email.lower(), "user_id": r.user_id,
+                "status": "claimed", "attempts": 1, "claimed_by": self.worker, "claimed_at": now,
+            }
+            for r in recipients
+        ])
+        reclaimable = ("failed", "claimed") if retry_claimed else ("failed",)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EmailSend.campaign, EmailSend.email],
+            set_={
+                "status": "claimed",
+                "attempts": EmailSend.attempts + 1,
+                "claimed_by": stmt.excluded.claimed_by,
+                "claimed_at": stmt.excluded.claimed_at,
+                "error": None,
+            },
+            where=EmailSend.status.in_(reclaimable),
+        ).returning(EmailSend.email)
+        with self._session() as db:
+            claimed = {email for (email,) in db.execute(stmt)}
+            db.commit()
+        return [r for r in recipients if r.email.lower() in claimed]
+
+    def record(self, sent: Dict[str, str], failed: Dict[str, str]) -> None:
+        """Mark `sent` {email: provider id} and `failed` {email: error}."""
+        now = datetime.utcnow()
+        rows = [
+            {"campaign": self.campaign, "email": email.lower(), "status": "sent",
+             "provider_id": provider_id, "sent_at": now, "error": None}
+            for email, provider_id in sent.items()
+        ] + [
+            {"campaign": self.campaign, "email": email.lower(), "status": "failed", "error": error[:1000]}
+            for email, error in failed.items()
+        ]
+        if not rows:
+            return
+        with self._session() as db:
+            # Split by key set: an executemany needs the same columns per row.
+            for status in ("sent", "failed"):
+                batch = [row for row in rows if row["status"] == status]
+                if batch:
+                    db.execute(update(EmailSend), batch)
+            db.commit()
+
+    def import_sent(self, emails: Iterable[str]) -> int:
+        """Record addresses sent before the ledger existed (already_sent_*.txt)."""
+        rows = [{"campaign": self.campaign, "email": e.strip().lower(), "status": "sent", "attempts": 1}
+                for e in {e.strip().lower() for e in emails if e.strip()}]
+        if not rows:
+            return 0
+        with self._session() as db:
+            result = db.execute(insert(EmailSend).values(rows).on_conflict_do_nothing())
+            db.commit()
+        return result.rowcount or 0
+
+    def sent_among(self, emails: Sequence[str]) -> set:
+        """Which of `emails` are already sent or claimed (dry runs)."""
+        if not emails:
+            return set()
+        with self._session() as db:
+            rows = db.query(EmailSend.email).filter(
+                EmailSend.campaign == self.campaign,
+                EmailSend.email.in_([e.lower() for e in emails]),
+                EmailSend.status != "failed",
+            ).all()
+        return {email for (email,) in rows}
+
+    def summary(self) -> Dict[str, int]:
+        """{status: recipients} for the whole campaign, every sender included."""
+        with self._session() as db:
+            rows = (
+                db.query(EmailSend.status, func.count())
+                .filter(EmailSend.campaign == self.campaign)
+                .group_by(EmailSend.status)
+                .all()
+            )
+        return {status: count for status, count in rows}
+
+
+# ============================================
+# Sending
+# ============================================
+
+@dataclass
+class BroadcastStats:
+    started: float = field(default_factory=time.monotonic)
+    seen: int = 0            # recipients read from the segment
+    skipped: int = 0         # skip-list / duplicate addresses
+    already_done: int = 0    # sent or claimed earlier (this or another sender)
+    claimed: int = 0
+    sent: int = 0
+    failed: int = 0
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0       # 429 responses
+    aborted: Optional[str] = None   # auth error that stopped the run
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def per_second(self) -> float:
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        return (
+            f"{self.elapsed:7.1f}s  seen={self.seen} sent={self.sent} failed={self.failed} "
+            f"skipped={self.skipped} already={self.already_done} requests={self.requests} "
+            f"retries={self.retries} 429s={self.throttled}  {self.per_second:.1f}/s"
+        )
+
+
+def _backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _idempotency_key(campaign: str, emails: Sequence[str]) -> str:
+    digest = hashlib.sha256("\n".join([campaign, *sorted(emails)]).encode("utf-8")).hexdigest()
+    return f"{campaign[:40]}-{digest[:32]}"
+
+
+class Broadcast:
+    """
+    One campaign's send. `render(recipient)` returns the Resend email body
+    without "to" (from, subject, html, text, ...); `skip(email)` returns a
+    reason to leave an address out, or None. With `dry_run` nothing is
+    claimed or sent; `stats.claimed` counts who would be.
+    """
+
+    def __init__(
+        self,
+        campaign: str,
+        render: Callable[[Recipient], dict],
+        *,
+        ledger: Optional[SendLedger] = None,
+        skip: Callable[[str], Optional[str]] = lambda email: None,
+        rate: float = DEFAULT_RATE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        batch_size: int = BATCH_SIZE,
+        limit: int = 0,
+        retry_claimed: bool = False,
+        dry_run: bool = False,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        on_progress: Optional[Callable[[BroadcastStats], None]] = None,
+    ):
+        self.campaign = campaign
+        self.render = render
+        self.ledger = ledger or SendLedger(campaign)
+        self.skip = skip
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.batch_size = min(batch_size, BATCH_SIZE)
+        self.limit = limit
+        self.retry_claimed = retry_claimed
+        self.dry_run = dry_run
+        self.api_key = api_key if api_key is not None else settings.RESEND_API_KEY
+        self.base_url = (base_url or settings.RESEND_BASE_URL).rstrip("/")
+        self.transport = transport
+        self.on_progress = on_progress
+        self.stats = BroadcastStats()
+        self._seen_emails: set = set()
+
+    def _next_chunk(self, recipients: Iterator[Recipient]) -> List[Recipient]:
+        """Up to batch_size new, unskipped recipients (runs in a thread: it
+        pulls from the DB cursor)."""
+        room = self.batch_size
+        if self.limit:
+            room = min(room, self.limit - self.stats.claimed)
+        chunk: List[Recipient] = []
+        while len(chunk) < room:
+            recipient = next(recipients, None)
+            if recipient is None:
+                break
+            self.stats.seen += 1
+            email = recipient.email.lower()
+            if email in self._seen_emails or self.skip(email):
+                self.stats.skipped += 1
+                continue
+            self._seen_emails.add(email)
+            chunk.append(recipient)
+        return chunk
+
+    async def run(self, recipients: Iterable[Recipient]) -> BroadcastStats:
+        stats = self.stats
+        stats.started = time.monotonic()
+        recipients = iter(recipients)
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        progress = asyncio.create_task(self._report()) if self.on_progress else None
+
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            base_url=self.base_url, headers=headers, limits=limits,
+            timeout=REQUEST_TIMEOUT_SECONDS, transport=self.transport,
+        ) as client:
+            while not (self.limit and stats.claimed >= self.limit) and not stats.aborted:
+                chunk = await asyncio.to_thread(self._next_chunk, recipients)
+                if not chunk:
+                    break
+                if self.dry_run:
+                    done = await asyncio.to_thread(self.ledger.sent_among, [r.email for r in chunk])
+                    stats.already_done += len(done)
+                    stats.claimed += len(chunk) - len(done)
+                    continue
+
+                claimed = await asyncio.to_thread(self.ledger.claim, chunk, self.retry_claimed)
+                stats.already_done += len(chunk) - len(claimed)
+                stats.claimed += len(claimed)
+                if not claimed:
+                    continue
+
+                await slots.acquire()
+                task = asyncio.create_task(self._send(client, claimed))
+                in_flight.add(task)
+
+                def _done(t, _in_flight=in_flight, _slots=slots):
+                    _in_flight.discard(t)
+                    _slots.release()
+
+                task.add_done_callback(_done)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+
+        if progress:
+            progress.cancel()
+            self.on_progress(stats)
+        return stats
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(PROGRESS_SECONDS)
+            self.on_progress(self.stats)
+
+    async def _send(self, client: httpx.AsyncClient, batch: List[Recipient]) -> None:
+        try:
+            emails = [{**self.render(r), "to": [r.email]} for r in batch]
+            results = await self._post(client, batch, emails)
+        except Exception as e:
+            results = {r.email: (None, f"{type(e).__name__}: {e}") for r in batch}
+        sent = {email: pid for email, (pid, error) in results.items() if error is None}
+        failed = {email: error for email, (pid, error) in results.items() if error is not None}
+        await asyncio.to_thread(self.ledger.record, sent, failed)
+        self.stats.sent += len(sent)
+        self.stats.failed += len(failed)
+
+    async def _post(
+        self, client: httpx.AsyncClient, batch: List[Recipient], emails: List[dict],
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """{email: (provider id, error)} for one batch, retrying and bisecting."""
+        addresses = [r.email for r in batch]
+        key = _idempotency_key(self.campaign, addresses)
+        error = "not attempted"
+        for attempt in range(MAX_ATTEMPTS):
+            await self.bucket.acquire()
+            if self.stats.aborted:
+                return {email: (None, f"aborted: {self.stats.aborted}") for email in addresses}
+            self.stats.requests += 1
+            try:
+                response = await client.post("/emails/batch", json=emails, headers={"Idempotency-Key": key})
+            except httpx.HTTPError as e:
+                error, delay = f"{type(e).__name__}: {e}", _backoff_delay(attempt)
+            else:
+                if response.status_code < 300:
+                    ids = [item.get("id") for item in response.json().get("data") or []]
+                    return {email: (ids[i] if i < len(ids) else None, None) for i, email in enumerate(addresses)}
+                error = f"HTTP {response.status_code}: {response.text[:300]}"
+                if response.status_code == 429:
+                    self.stats.throttled += 1
+                    retry_after = response.headers.get("retry-after")
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else _backoff_delay(attempt)
+                elif response.status_code in (401, 403):
+                    # The key is bad or revoked: every request will fail the same way.
+                    self.stats.aborted = self.stats.aborted or error
+                    break
+                elif response.status_code in (400, 422):
+                    # The batch was rejected for its content; find the bad address(es).
+                    if len(batch) == 1:
+                        return {addresses[0]: (None, error)}
+                    mid = len(batch) // 2
+                    left = await self._post(client, batch[:mid], emails[:mid])
+                    right = await self._post(client, batch[mid:], emails[mid:])
+                    return {**left, **right}
+                elif response.status_code < 500:
+                    # Applies to the request as a whole (413 etc.); retrying won't help.
+                    break
+                else:
+                    delay = _backoff_delay(attempt)
+            if attempt + 1 < MAX_ATTEMPTS:
+                self.stats.retries += 1
+                await asyncio.sleep(delay)
+        return {email: (None, error) for email in addresses}
@@ -2,8 +2,9 @@
 Email service for sending transactional emails using Resend.
 """
 import logging
-from typing import Optional
+from typing import Callable, Optional
 from config import settings
+from services import job_queue
 
 logger = logging.getLogger(__name__)
 
@@ -988,3 +989,26 @@ To unsubscribe, reply to pavlepopovic@themamboguild.com with "Unsubscribe".
     except Exception as e:
         logger.error(f"Failed to send waitlist welcome email to {email}: {str(e)}")
         return False
+
+
+# ============================================
+# Queued sending
+# ============================================
+
+@job_queue.job("email.send", max_attempts=6)
+def _send_queued(sender: str, args: list, kwargs: dict) -> None:
+    if not resend or not settings.RESEND_API_KEY:
+        logger.info(f"Resend not configured; dropping queued {sender}")
+        return
+    fn = globals().get(sender)
+    if not (sender.startswith("send_") and callable(fn)):
+        raise LookupError(f"unknown email sender {sender!r}")
+    if not fn(*args, **kwargs):
+        raise RuntimeError(f"{sender} failed")
+
+
+def queue_email(sender: Callable[..., bool], *args, key: Optional[str] = None, **kwargs) -> None:
+    """Send `sender(*args, **kwargs)` from the job queue (retried with backoff)
+    instead of inside the request. `key` dedupes re-deliveries of the same
+    trigger, e.g. a Stripe webhook event."""
+    job_queue.enqueue("email.send", key=key, sender=sender.__name__, args=list(args), kwargs=kwargs)
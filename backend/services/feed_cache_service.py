@@ -0,0 +1,134 @@
+"""
+Feed Cache Service - read-through cache for community feed pages.
+
+Two layers:
+  1. A shared, viewer-independent page: the post payloads (including the
+     author block) for one (post_type, tags, video_type, page) combination.
+     Only publicly visible posts go in, so any viewer can be served from it.
+  2. A per-viewer overlay (user_reaction, is_saved) merged at response time
+     by post_service — two small indexed lookups on the page's post IDs.
+
+Invalidation is event-driven: an after_flush listener notices any content
+change to a Post (create, edit, soft delete, moderation flip, video
+attached by the Mux webhook) and bumps that post_type's generation once
+the transaction commits. Counter-only changes (reaction_count,
+reply_count) don't invalidate — they are refreshed by FEED_CACHE_TTL.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.community import Post
+from services import redis_service
+from utils.db_hooks import after_commit
+
+logger = logging.getLogger(__name__)
+
+# Columns whose change does NOT invalidate cached pages. Likes and replies
+# land constantly; the TTL bounds how stale their counts can get.
+_COUNTER_ONLY_COLUMNS = {"reaction_count", "reply_count", "updated_at"}
+
+
+def _filter_key(
+    post_type: Optional[str],
+    tags: Optional[List[str]],
+    video_type: Optional[str],
+    generations: dict,
+) -> str:
+    """Cache key fragment for one feed filter combination + generation."""
+    if post_type in redis_service.FEED_POST_TYPES:
+        gen = f"g{generations[post_type]}"
+    else:
+        gen = "g" + ".".join(str(generations[t]) for t in redis_service.FEED_POST_TYPES)
+    tag_part = ",".join(sorted(set(tags))) if tags else "-"
+    return f"{post_type or 'all'}:{video_type or '-'}:{tag_part}:{gen}"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def get_page(
+    post_type: Optional[str],
+    tags: Optional[List[str]],
+    video_type: Optional[str],
+    page: str,
+) -> tuple[Optional[list], Optional[str]]:
+    """
+    Look up a shared feed page.
+
+    Returns (posts, filter_key). `posts` is None on a miss; `filter_key` is
+    None when Redis is unavailable, in which case the caller should not try
+    to store the page it loads.
+    """
+    generations = redis_service.get_feed_generations()
+    if generations is None:
+        return None, None
+
+    key = _filter_key(post_type, tags, video_type, generations)
+    cached = redis_service.get_cached_feed_page(key, page)
+    redis_service.record_feed_cache_result(hit=cached is not None)
+    if cached is None:
+        return None, key
+    try:
+        return json.loads(cached), key
+    except ValueError:
+        logger.warning(f"Discarding corrupt feed cache entry {key}:{page}")
+        return None, key
+
+
+def put_page(filter_key: Optional[str], page: str, posts: list) -> None:
+    """Store a shared feed page under the key returned by get_page()."""
+    if filter_key is None:
+        return
+    redis_service.cache_feed_page(filter_key, page, json.dumps(posts, default=_json_default))
+
+
+def get_stats() -> dict:
+    """Cluster-wide hit/miss counters for the admin dashboard."""
+    return redis_service.get_feed_cache_stats()
+
+
+# ============================================
+# Event-driven invalidation
+# ============================================
+
+def _has_content_change(post: Post) -> bool:
+    state = inspect(post)
+    for attr in state.mapper.column_attrs:
+        if attr.key in _COUNTER_ONLY_COLUMNS:
+            continue
+        if state.attrs[attr.key].history.has_changes():
+            return True
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_post_change(session: Session, flush_context) -> None:
+    touched_types = set()
+    for obj in session.new:
+        if isinstance(obj, Post):
+            touched_types.add(obj.post_type)
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            touched_types.add(obj.post_type)
+    for obj in session.dirty:
+        if isinstance(obj, Post) and _has_content_change(obj):
+            touched_types.add(obj.post_type)
+
+    if not touched_types:
+        return
+
+    def _bump():
+        if len(touched_types) == 1:
+            redis_service.invalidate_feed_cache(next(iter(touched_types)))
+        else:
+            redis_service.invalidate_feed_cache()
+
+    after_commit(session, _bump)
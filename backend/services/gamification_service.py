@@ -15,26 +15,13 @@ def calculate_level(xp: int) -> int:
     return max(1, int(math.floor(math.sqrt(xp / 100))))
 
 
-def update_streak(user_id: str, db: Session) -> Dict:
+def apply_streak(profile: UserProfile, db: Session) -> Dict:
     """
-    Update user streak based on last login date.
-    Now includes streak freeze protection.
-    
-    Returns dict with:
-        - streak_count: Current streak count
-        - streak_saved: Whether a freeze was used to save the streak
-        - save_method: Method used to save streak (if any)
-        - message: User-friendly message
+    Count today's activity toward the profile's streak, in memory: advances
+    or resets it (saving it with a freeze if one is available), stamps
+    last_login_date, and awards streak badges. The caller must hold the
+    profile row lock; see `update_streak` for the result dict.
     """
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-    if not profile:
-        return {
-            "streak_count": 0,
-            "streak_saved": False,
-            "save_method": None,
-            "message": "Profile not found"
-        }
-
     # Compute 'today' in the user's local timezone so a user in UTC-8 doesn't
     # lose their streak at 4pm local time when the server rolls to UTC midnight.
     today = user_local_today(profile)
@@ -65,16 +52,9 @@ def update_streak(user_id: str, db: Session) -> Dict:
         message = f"🔥 {profile.streak_count} day streak!"
     elif last_login < yesterday:
         # Streak would be broken - try to save it with freezes
-        from services.streak_service import (
-            attempt_streak_save,
-            check_and_reset_weekly_freeze
-        )
-        
-        # First check/reset weekly freeze
-        check_and_reset_weekly_freeze(user_id, db)
-        
-        # Attempt automatic save (weekly freebie or inventory freeze)
-        result = attempt_streak_save(user_id, db)
+        # (weekly freebie or inventory freeze)
+        from services.streak_service import save_streak
+        result = save_streak(profile)
         
         if result.saved:
             streak_saved = True
@@ -88,11 +68,10 @@ def update_streak(user_id: str, db: Session) -> Dict:
                 profile.streak_count = 0
 
     profile.last_login_date = datetime.now(timezone.utc)
-    db.flush()
 
     # Check streak badges after updating streak
     from services.badge_service import check_streak_badges
-    check_streak_badges(user_id, profile.streak_count, db)
+    check_streak_badges(str(profile.user_id), profile.streak_count, db)
 
     # ML feature: streak milestone crossings are a strong retention signal.
     if profile.streak_count in {7, 30, 100, 365}:
@@ -116,6 +95,33 @@ def update_streak(user_id: str, db: Session) -> Dict:
     }
 
 
+def update_streak(user_id: str, db: Session) -> Dict:
+    """
+    Update user streak based on last login date.
+    Now includes streak freeze protection.
+    
+    Returns dict with:
+        - streak_count: Current streak count
+        - streak_saved: Whether a freeze was used to save the streak
+        - save_method: Method used to save streak (if any)
+        - message: User-friendly message
+    """
+    profile = db.query(UserProfile).filter(
+        UserProfile.user_id == user_id
+    ).with_for_update().first()
+    if not profile:
+        return {
+            "streak_count": 0,
+            "streak_saved": False,
+            "save_method": None,
+            "message": "Profile not found"
+        }
+
+    result = apply_streak(profile, db)
+    db.flush()
+    return result
+
+
 def update_streak_simple(user_id: str, db: Session) -> int:
     """
     Simple version that returns just the streak count.
@@ -163,6 +169,21 @@ def award_xp(
     if not profile:
         return {"error": "Profile not found"}
 
+    result = apply_xp(profile, xp_amount, db, reason=reason, actor_user_id=actor_user_id)
+    db.flush()
+    return result
+
+
+def apply_xp(
+    profile: UserProfile,
+    xp_amount: int,
+    db: Session,
+    *,
+    reason: str = "lesson_complete",
+    actor_user_id: Optional[str] = None,
+) -> dict:
+    """Add XP to a profile the caller holds locked, in memory: level, audit
+    row and LevelUp event. No bounds check; see `award_xp`."""
     old_level = profile.level
     profile.xp = (profile.xp or 0) + xp_amount
     new_level = calculate_level(profile.xp)
@@ -177,7 +198,6 @@ def award_xp(
             actor_user_id=actor_user_id,
         )
     )
-    db.flush()
 
     leveled_up = new_level > old_level
 
@@ -205,4 +225,3 @@ def award_xp(
         "leveled_up": leveled_up,
         "new_level": new_level,
     }
-
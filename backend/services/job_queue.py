@@ -0,0 +1,476 @@
+"""
+Job Queue - durable Redis-backed background jobs for request side effects.
+
+Request handlers commit their primary write and hand the slow secondary
+work (badge checks, notification fan-out, Mux cleanup, transactional
+email) to a job instead of doing it before the response:
+
+    @job_queue.job("mux.delete_asset", max_attempts=8)
+    def _delete_asset(asset_id: str) -> None: ...
+
+    job_queue.enqueue("mux.delete_asset", asset_id=asset_id)
+    job_queue.enqueue_after_commit(db, "mux.delete_asset", asset_id=asset_id)
+
+Jobs are JSON envelopes in Redis:
+
+    jobs:ready     LIST  runnable now (RPUSH / LPOP, FIFO)
+    jobs:delayed   ZSET  retries (and delayed jobs) scored by run-at
+    jobs:inflight  ZSET  claimed jobs scored by lease deadline; a worker
+                         that dies mid-job leaves its lease to expire and
+                         the job goes back to jobs:ready, counted as a
+                         failed attempt
+    jobs:dead      LIST  jobs out of attempts, newest first, with the error
+    jobs:key:{k}   STR   idempotency key: a second enqueue with the same
+                         key inside IDEMPOTENCY_TTL is dropped
+    jobs:stats     HASH  per job: ok / failed / dead counts, run and wait ms
+
+Claim, promote, enqueue, finish and dead-letter retry are Lua scripts so a
+job is never in two places (or none). A worker only settles a job while it
+still holds the lease it claimed: once the lease expired and another worker
+reclaimed the envelope, the late finisher leaves that worker's lease alone. Failures retry with jittered exponential backoff up to the
+job's `max_attempts`, then land in jobs:dead for an admin to inspect.
+
+Workers run as daemon threads (JOB_WORKERS_IN_API per API process, so a
+single-service deploy still drains the queue) and/or as a dedicated
+process (scripts/job_worker.py). `JOB_QUEUE_EAGER=true` / `set_eager(True)`
+runs every job inline at enqueue time, for tests and offline development.
+If Redis is unreachable at enqueue time the job also runs inline — the
+work the request used to do itself — rather than being lost.
+"""
+import importlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from services.redis_service import get_redis_client
+from utils.db_hooks import after_commit
+
+logger = logging.getLogger(__name__)
+
+READY_KEY = "jobs:ready"
+DELAYED_KEY = "jobs:delayed"
+INFLIGHT_KEY = "jobs:inflight"
+DEAD_KEY = "jobs:dead"
+STATS_KEY = "jobs:stats"
+_IDEMPOTENCY_KEY = "jobs:key:{key}"
+
+IDEMPOTENCY_TTL = 24 * 3600
+DEAD_LETTER_MAX = 1000
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_TIMEOUT_SECONDS = 300
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_CAP_SECONDS = 600.0
+IDLE_POLL_SECONDS = 0.5
+PROMOTE_BATCH = 100
+
+# Modules whose import registers jobs; a worker process loads them all.
+JOB_MODULES = (
+    "services.community_jobs",
+    "services.email_service",
+    "services.post_service",
+)
+
+_ENQUEUE = """
+if ARGV[3] ~= '' and not redis.call('SET', ARGV[3], '1', 'NX', 'EX', ARGV[4]) then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+else
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+_CLAIM = """
+local raw = redis.call('LPOP', KEYS[1])
+if raw then
+    redis.call('ZADD', KEYS[2], ARGV[1], raw)
+end
+return raw
+"""
+
+# Settle a claimed job, but only if the lease is still the one this worker
+# set (same envelope, same deadline) — an expired lease may have been
+# reclaimed by another worker, whose entry must stay.
+# KEYS = inflight, delayed, dead
+# ARGV = raw, lease deadline, outcome ('ok' / 'retry' / 'dead'), new raw,
+#        retry-at, dead-letter max
+_FINISH = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score or tonumber(score) ~= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+if ARGV[3] == 'retry' then
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[4])
+elseif ARGV[3] == 'dead' then
+    redis.call('LPUSH', KEYS[3], ARGV[4])
+    redis.call('LTRIM', KEYS[3], 0, tonumber(ARGV[6]) - 1)
+end
+return 1
+"""
+
+# Oldest dead jobs back onto jobs:ready with a fresh attempt count.
+_RETRY_DEAD = """
+local moved = 0
+for i = 1, tonumber(ARGV[1]) do
+    local raw = redis.call('RPOP', KEYS[1])
+    if not raw then
+        break
+    end
+    local envelope = cjson.decode(raw)
+    envelope['attempt'] = 0
+    envelope['error'] = nil
+    envelope['died_at'] = nil
+    redis.call('RPUSH', KEYS[2], cjson.encode(envelope))
+    moved = moved + 1
+end
+return moved
+"""
+
+# Due retries go back to jobs:ready as they are. An expired lease counts as
+# a failed attempt (the worker died or the job overran), so a job that
+# keeps killing its worker ends up in jobs:dead instead of looping.
+# KEYS = delayed, inflight, ready, dead, stats
+# ARGV = now, batch, {name: max_attempts} (JSON), default max_attempts,
+#        dead-letter max
+_PROMOTE = """
+local moved = 0
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, raw in ipairs(due) do
+    redis.call('ZREM', KEYS[1], raw)
+    redis.call('RPUSH', KEYS[3], raw)
+    moved = moved + 1
+end
+local max_attempts = cjson.decode(ARGV[3])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, raw in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], raw)
+    local envelope = cjson.decode(raw)
+    envelope['attempt'] = (tonumber(envelope['attempt']) or 0) + 1
+    envelope['error'] = 'lease expired'
+    if envelope['attempt'] >= (tonumber(max_attempts[envelope['name']]) or tonumber(ARGV[4])) then
+        envelope['died_at'] = tonumber(ARGV[1])
+        redis.call('LPUSH', KEYS[4], cjson.encode(envelope))
+        redis.call('LTRIM', KEYS[4], 0, tonumber(ARGV[5]) - 1)
+        redis.call('HINCRBY', KEYS[5], envelope['name'] .. ':dead', 1)
+    else
+        redis.call('RPUSH', KEYS[3], cjson.encode(envelope))
+        redis.call('HINCRBY', KEYS[5], envelope['name'] .. ':failed', 1)
+    end
+    moved = moved + 1
+end
+return moved
+"""
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    name: str
+    fn: Callable
+    max_attempts: int
+    timeout: int
+    uses_db: bool
+
+
+_registry: Dict[str, JobSpec] = {}
+_scripts: dict = {}
+_eager = settings.JOB_QUEUE_EAGER
+_eager_keys: set = set()
+
+
+def job(name: str, *, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        timeout: int = DEFAULT_TIMEOUT_SECONDS, db: bool = False):
+    """Register `fn` as job `name`. Keyword arguments must be JSON-serializable.
+    With `db=True` the job gets a fresh session as its first argument,
+    committed on success and rolled back on failure. `timeout` is the
+    lease: a job still running after it is handed to another worker."""
+    def register(fn):
+        _registry[name] = JobSpec(name, fn, max_attempts, timeout, db)
+        return fn
+    return register
+
+
+def job_names() -> List[str]:
+    return sorted(_registry)
+
+
+def set_eager(eager: bool) -> None:
+    global _eager
+    _eager = eager
+    _eager_keys.clear()
+
+
+def _script(source: str):
+    client = get_redis_client()
+    script = _scripts.get(source)
+    if script is None or script.registered_client is not client:
+        script = _scripts[source] = client.register_script(source)
+    return script
+
+
+def _envelope(name: str, kwargs: dict, key: Optional[str], attempt: int = 0) -> dict:
+    return {"id": uuid.uuid4().hex, "name": name, "kwargs": kwargs, "key": key,
+            "attempt": attempt, "enqueued_at": time.time()}
+
+
+# ============================================
+# Enqueueing
+# ============================================
+
+def enqueue(name: str, *, key: Optional[str] = None, delay: float = 0, **kwargs) -> bool:
+    """Queue job `name`. False if `key` was already used (an earlier enqueue
+    of the same side effect). Never raises for queue trouble."""
+    if _eager:
+        if key is not None:
+            if key in _eager_keys:
+                return False
+            _eager_keys.add(key)
+        _run_inline(name, kwargs)
+        return True
+
+    envelope = _envelope(name, kwargs, key)
+    run_at = time.time() + delay if delay > 0 else 0
+    try:
+        queued = _script(_ENQUEUE)(
+            keys=[READY_KEY, DELAYED_KEY],
+            args=[json.dumps(envelope), run_at,
+                  _IDEMPOTENCY_KEY.format(key=key) if key else "", IDEMPOTENCY_TTL],
+        )
+    except Exception as e:
+        logger.warning(f"[JOBS] enqueue {name} failed, running inline: {e}")
+        _run_inline(name, kwargs)
+        return True
+    return bool(queued)
+
+
+def enqueue_after_commit(db, name: str, *, key: Optional[str] = None, **kwargs) -> None:
+    """Queue job `name` once `db` commits; dropped if it rolls back."""
+    after_commit(db, lambda: enqueue(name, key=key, **kwargs))
+
+
+def _run_inline(name: str, kwargs: dict) -> None:
+    try:
+        _execute(_registry[name], kwargs)
+    except Exception:
+        logger.exception(f"[JOBS] inline {name} failed (non-fatal)")
+
+
+def _execute(spec: JobSpec, kwargs: dict) -> None:
+    if not spec.uses_db:
+        spec.fn(**kwargs)
+        return
+    from models import get_session_local
+
+    db = get_session_local()()
+    try:
+        spec.fn(db, **kwargs)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ============================================
+# Working
+# ============================================
+
+def _backoff_delay(attempt: int) -> float:
+    ceiling = min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def load_jobs() -> None:
+    """Import every module that registers jobs (worker processes)."""
+    for module in JOB_MODULES:
+        importlib.import_module(module)
+
+
+def promote_due(now: Optional[float] = None) -> int:
+    """Move due retries back onto jobs:ready, and expired leases too as one
+    more attempt (jobs:dead once out of attempts)."""
+    max_attempts = {name: spec.max_attempts for name, spec in _registry.items()}
+    return _script(_PROMOTE)(
+        keys=[DELAYED_KEY, INFLIGHT_KEY, READY_KEY, DEAD_KEY, STATS_KEY],
+        args=[now or time.time(), PROMOTE_BATCH, json.dumps(max_attempts),
+              DEFAULT_MAX_ATTEMPTS, DEAD_LETTER_MAX],
+    )
+
+
+def work_one() -> bool:
+    """Claim and run one ready job. False when the queue was empty."""
+    client = get_redis_client()
+    lease = time.time() + DEFAULT_TIMEOUT_SECONDS
+    raw = _script(_CLAIM)(keys=[READY_KEY, INFLIGHT_KEY], args=[lease])
+    if raw is None:
+        return False
+
+    envelope = json.loads(raw)
+    name = envelope["name"]
+    spec = _registry.get(name)
+    if spec is not None and spec.timeout != DEFAULT_TIMEOUT_SECONDS:
+        lease = time.time() + spec.timeout
+        client.zadd(INFLIGHT_KEY, {raw: lease}, xx=True)
+
+    started = time.time()
+    try:
+        if spec is None:
+            raise LookupError(f"unknown job {name!r}")
+        _execute(spec, envelope["kwargs"])
+    except Exception as e:
+        _fail(client, raw, lease, envelope, spec, started, e)
+        return True
+
+    _finish(raw, lease, "ok")
+    _record(client, name, "ok", started, envelope["enqueued_at"])
+    return True
+
+
+def _finish(raw: str, lease: float, outcome: str, new_raw: str = "", retry_at: float = 0) -> bool:
+    """Settle a claimed job if this worker still holds its lease."""
+    owned = _script(_FINISH)(
+        keys=[INFLIGHT_KEY, DELAYED_KEY, DEAD_KEY],
+        args=[raw, lease, outcome, new_raw, retry_at, DEAD_LETTER_MAX],
+    )
+    if not owned:
+        logger.warning(f"[JOBS] {json.loads(raw)['name']} outlived its lease; "
+                       f"leaving it to the worker that reclaimed it")
+    return bool(owned)
+
+
+def _fail(client, raw: str, lease: float, envelope: dict, spec: Optional[JobSpec],
+          started: float, error: Exception) -> None:
+    name = envelope["name"]
+    attempt = envelope["attempt"] + 1
+    max_attempts = spec.max_attempts if spec else 1
+    envelope = {**envelope, "attempt": attempt, "error": f"{type(error).__name__}: {error}"[:1000]}
+
+    if attempt < max_attempts:
+        if _finish(raw, lease, "retry", json.dumps(envelope), time.time() + _backoff_delay(attempt)):
+            logger.warning(f"[JOBS] {name} attempt {attempt}/{max_attempts} failed, retrying: {envelope['error']}")
+        _record(client, name, "failed", started, envelope["enqueued_at"])
+    else:
+        envelope["died_at"] = time.time()
+        if _finish(raw, lease, "dead", json.dumps(envelope)):
+            logger.error(f"[JOBS] {name} dead after {attempt} attempts: {envelope['error']}")
+            _record(client, name, "dead", started, envelope["enqueued_at"])
+        else:
+            _record(client, name, "failed", started, envelope["enqueued_at"])
+
+
+def _record(client, name: str, outcome: str, started: float, enqueued_at: float) -> None:
+    pipe = client.pipeline(transaction=False)
+    pipe.hincrby(STATS_KEY, f"{name}:{outcome}", 1)
+    pipe.hincrbyfloat(STATS_KEY, f"{name}:ms", round((time.time() - started) * 1000, 3))
+    pipe.hincrbyfloat(STATS_KEY, f"{name}:wait_ms", round(max(0.0, started - enqueued_at) * 1000, 3))
+    pipe.execute()
+
+
+class JobWorker:
+    """Runs jobs on `threads` daemon threads until `stop()`."""
+
+    def __init__(self, threads: int = 1):
+        self.threads = threads
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        load_jobs()
+        self._stop.clear()
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_forever(self) -> None:
+        """Work on the calling thread (dedicated worker process)."""
+        load_jobs()
+        self._run()
+
+    def _run(self) -> None:
+        promoted_at = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - promoted_at >= IDLE_POLL_SECONDS:
+                    promote_due()
+                    promoted_at = time.monotonic()
+                if not work_one():
+                    self._stop.wait(IDLE_POLL_SECONDS)
+            except Exception as e:
+                logger.error(f"[JOBS] worker loop error: {e}")
+                self._stop.wait(IDLE_POLL_SECONDS * 4)
+
+
+_worker = JobWorker(settings.JOB_WORKERS_IN_API)
+
+
+def start() -> None:
+    if settings.JOB_WORKERS_IN_API > 0 and not _eager:
+        _worker.start()
+
+
+def stop() -> None:
+    _worker.stop()
+
+
+# ============================================
+# Admin
+# ============================================
+
+def get_stats() -> dict:
+    """{jobs: {name: {ok, failed, dead, avg_ms, avg_wait_ms}}, depth: {...}} for admins."""
+    try:
+        client = get_redis_client()
+        pipe = client.pipeline(transaction=False)
+        pipe.hgetall(STATS_KEY)
+        pipe.llen(READY_KEY)
+        pipe.zcard(DELAYED_KEY)
+        pipe.zcard(INFLIGHT_KEY)
+        pipe.llen(DEAD_KEY)
+        raw, ready, delayed, inflight, dead = pipe.execute()
+    except Exception as e:
+        logger.error(f"[JOBS] failed to read stats: {e}")
+        raw, ready, delayed, inflight, dead = {}, 0, 0, 0, 0
+
+    jobs = {}
+    for field, value in (raw or {}).items():
+        name, _, metric = field.rpartition(":")
+        jobs.setdefault(name, {})[metric] = float(value)
+    for name, m in jobs.items():
+        runs = m.get("ok", 0) + m.get("failed", 0) + m.get("dead", 0)
+        jobs[name] = {
+            "ok": int(m.get("ok", 0)),
+            "failed": int(m.get("failed", 0)),
+            "dead": int(m.get("dead", 0)),
+            "avg_ms": round(m.get("ms", 0) / runs, 1) if runs else 0.0,
+            "avg_wait_ms": round(m.get("wait_ms", 0) / runs, 1) if runs else 0.0,
+        }
+    return {"jobs": jobs, "depth": {"ready": ready, "delayed": delayed, "inflight": inflight, "dead": dead}}
+
+
+def dead_jobs(limit: int = 50) -> List[dict]:
+    """Most recent dead-lettered jobs (newest first)."""
+    return [json.loads(raw) for raw in get_redis_client().lrange(DEAD_KEY, 0, limit - 1)]
+
+
+def retry_dead(limit: int = DEAD_LETTER_MAX) -> int:
+    """Move dead jobs back onto jobs:ready with fresh attempts (one script,
+    so a job is never popped without being pushed)."""
+    return _script(_RETRY_DEAD)(keys=[DEAD_KEY, READY_KEY], args=[limit])
@@ -0,0 +1,458 @@
+"""
+Knowledge Base - ranked retrieval for Diego's `search_knowledge_base` tool.
+
+Passages are scored with BM25 over two kinds of segment:
+
+- The course notes (`mambo_course/`, `training_science_course/` markdown,
+  one passage per section) are indexed offline by
+  scripts/build_kb_index.py into data/knowledge_base.idx, which each
+  worker memory-maps at startup. Postings and passage text stay in the
+  page cache; only the vocabulary is parsed into memory.
+- The catalog (published worlds, levels and lessons; for free worlds also
+  the lessons' content_json text, notes and quiz questions, never the
+  answers) is indexed in process, one segment per world.
+  The segments share the catalog's version key, so an admin edit (which
+  bumps `catalog:version`, see catalog_service) triggers a rebuild on the
+  next search; only worlds whose passages changed are re-indexed.
+
+Document frequencies and average length are summed across segments at
+query time, so scores are comparable wherever a passage lives. Results
+are the top-k passages with a snippet around the best-matching sentence.
+"""
+import glob
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from models.course import Level, World
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv(
+    "KB_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "knowledge_base.idx"),
+)
+INDEX_MAGIC = b"KBX1"
+
+# Course-notes directories the offline index is built from (not shipped in
+# the image; when present, `load` checks the index was built from them).
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COURSE_NOTES_SOURCES = (
+    ("Mambo History", os.path.join(_REPO_ROOT, "mambo_course")),
+    ("Training Science", os.path.join(_REPO_ROOT, "training_science_course")),
+)
+
+# Okapi BM25 parameters (the usual defaults).
+K1 = 1.2
+B = 0.75
+# Title tokens count this many times over in a passage.
+TITLE_WEIGHT = 2
+# Long markdown sections are split on paragraphs into passages of about this size.
+PASSAGE_WORDS = 160
+SNIPPET_CHARS = 240
+
+LOCAL_TTL_SECONDS = 60  # catalog segments' lifetime when Redis can't be asked
+
+_TOKEN = re.compile(r"\w+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$", re.MULTILINE)
+_MARKUP = re.compile(r"[*_`>#]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from has have how i in is it its "
+    "me my of on or so that the their them then there these this to was what "
+    "when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-folded word tokens without stopwords
+    ("Danzón's" -> ["danzon", "s"] -> ["danzon"])."""
+    folded = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return [t for t in _TOKEN.findall(folded) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", _MARKUP.sub("", text or "")).strip()
+
+
+# ============================================
+# Passages and hits
+# ============================================
+
+@dataclass(frozen=True)
+class Passage:
+    source: str   # "world", "level", "lesson", "quiz" or a course-notes name
+    title: str
+    text: str
+
+
+@dataclass(frozen=True)
+class Hit:
+    source: str
+    title: str
+    snippet: str
+    score: float
+
+
+def _passage_tokens(passage: Passage) -> List[str]:
+    return tokenize(passage.title) * TITLE_WEIGHT + tokenize(passage.text)
+
+
+def markdown_passages(source: str, text: str, title: Optional[str] = None) -> List[Passage]:
+    """
+    One passage per heading section of a markdown document, titled
+    "<document title> › <section>". Sections longer than PASSAGE_WORDS are
+    split on paragraph boundaries.
+    """
+    headings = list(_HEADING.finditer(text))
+    if title is None and headings and len(headings[0].group(1)) == 1:
+        title = _clean(headings[0].group(2))
+    title = title or source
+
+    sections: List[Tuple[str, str]] = []
+    if not headings:
+        sections.append((title, text))
+    else:
+        sections.append((title, text[:headings[0].start()]))
+        for i, heading in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            name = _clean(heading.group(2))
+            sections.append((title if name == title else f"{title} › {name}", text[heading.end():end]))
+
+    passages = []
+    for section_title, body in sections:
+        chunk: List[str] = []
+        words = 0
+        for paragraph in re.split(r"\n\s*\n", body):
+            paragraph = _clean(paragraph)
+            if not paragraph:
+                continue
+            if chunk and words + len(paragraph.split()) > PASSAGE_WORDS:
+                passages.append(Passage(source, section_title, " ".join(chunk)))
+                chunk, words = [], 0
+            chunk.append(paragraph)
+            words += len(paragraph.split())
+        if chunk:
+            passages.append(Passage(source, section_title, " ".join(chunk)))
+    return passages
+
+
+def _lesson_passages(world_title: str, lesson, full: bool) -> List[Passage]:
+    """A lesson's passages. The tool's results reach anonymous chat users,
+    so paid lessons contribute only their public title and description,
+    and quiz passages never include the answer (or the explanation that
+    gives it away)."""
+    title = f"{world_title} › {lesson.title}"
+    if not full:
+        return [Passage("lesson", title, _clean(lesson.description or ""))]
+    content = lesson.content_json if isinstance(lesson.content_json, dict) else {}
+    blocks = [b for b in content.get("blocks") or [] if isinstance(b, dict)]
+
+    summary = " ".join(
+        [lesson.description or ""]
+        + [b.get("content") or "" for b in blocks if b.get("type") == "text" and isinstance(b.get("content"), str)]
+    )
+    passages = [Passage("lesson", title, _clean(summary))]
+    if isinstance(content.get("notes"), str):
+        passages.extend(markdown_passages("lesson", content["notes"], title=title))
+
+    questions = list(content.get("questions") or content.get("quiz") or [])
+    for block in blocks:
+        if block.get("type") == "quiz":
+            questions.extend(block.get("questions") or [])
+    for q in questions:
+        if isinstance(q, dict) and isinstance(q.get("question"), str):
+            passages.append(Passage("quiz", title, _clean(q["question"])))
+    return passages
+
+
+def world_passages(world: World) -> List[Passage]:
+    """Every passage the catalog contributes for one world. Lesson content
+    is only indexed for free worlds; paid worlds contribute their public
+    metadata (titles, descriptions, objectives, outcomes)."""
+    objectives = " ".join(str(o) for o in (world.objectives or []))
+    passages = [Passage("world", world.title, _clean(f"{world.description or ''} {objectives}"))]
+    for level in world.levels:
+        passages.append(Passage(
+            "level", f"{world.title} › {level.title}",
+            _clean(f"{level.description or ''} {level.outcome or ''}"),
+        ))
+        for lesson in level.lessons:
+            passages.extend(_lesson_passages(world.title, lesson, full=bool(world.is_free)))
+    return [p for p in passages if p.text or p.source == "world"]
+
+
+# ============================================
+# Segments
+# ============================================
+
+class MemorySegment:
+    """BM25 postings over a fixed list of passages, held in memory."""
+
+    def __init__(self, passages: Sequence[Passage]):
+        self.passages = tuple(passages)
+        self.lengths = array("I")
+        self.terms: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, passage in enumerate(self.passages):
+            counts: Dict[str, int] = {}
+            tokens = _passage_tokens(passage)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.terms.setdefault(token, []).append((doc, tf))
+            self.lengths.append(len(tokens))
+        self.total_length = sum(self.lengths)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.passages)
+
+    def postings(self, term: str) -> Sequence[Tuple[int, int]]:
+        return self.terms.get(term, ())
+
+    def passage(self, doc: int) -> Passage:
+        return self.passages[doc]
+
+
+class MappedSegment:
+    """
+    A segment read from an index file written by `write_index`.
+
+    Layout: magic, u32 header length, JSON header (passage table and
+    vocabulary), padding to 4 bytes, then postings as native-endian u32
+    (doc, tf) pairs and the passages' UTF-8 text. Only the header is
+    parsed; postings and text are sliced from the mapping on demand.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a knowledge base index")
+        header_len = int.from_bytes(self._mm[4:8], "little")
+        header = json.loads(self._mm[8:8 + header_len])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine")
+        data = _align(8 + header_len)
+        self._postings = memoryview(self._mm)[data:data + 8 * header["pairs"]].cast("I")
+        self._texts = data + 8 * header["pairs"]
+        self._docs = header["docs"]            # [source, title, text_offset, text_bytes, length]
+        self._terms = header["terms"]          # term -> [first pair, pair count]
+        self.built_at = header.get("built_at")
+        self.sources_digest = header.get("sources")
+        self.lengths = [d[4] for d in self._docs]
+        self.total_length = sum(self.lengths)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self._docs)
+
+    def postings(self, term: str) -> Sequence[Tuple[int, int]]:
+        entry = self._terms.get(term)
+        if entry is None:
+            return ()
+        first, count = entry
+        pairs = self._postings[2 * first:2 * (first + count)]
+        return list(zip(pairs[0::2], pairs[1::2]))
+
+    def passage(self, doc: int) -> Passage:
+        source, title, offset, size, _ = self._docs[doc]
+        start = self._texts + offset
+        return Passage(source, title, self._mm[start:start + size].decode("utf-8"))
+
+
+def _align(offset: int) -> int:
+    return (offset + 3) & ~3
+
+
+def course_note_files(directory: str) -> List[str]:
+    """A course's module_*.md files in module order."""
+    def module_number(path: str) -> int:
+        match = re.search(r"(\d+)", os.path.basename(path))
+        return int(match.group(1)) if match else 0
+    return sorted(glob.glob(os.path.join(directory, "module_*.md")), key=module_number)
+
+
+def sources_digest(sources: Sequence[Tuple[str, str]]) -> Optional[str]:
+    """SHA-256 over the course-notes files an index is built from; None
+    when none of them are present (e.g. in the production image)."""
+    digest = hashlib.sha256()
+    found = False
+    for name, directory in sources:
+        for path in course_note_files(directory):
+            found = True
+            digest.update(f"{name}\0{os.path.basename(path)}\0".encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest() if found else None
+
+
+def write_index(path: str, passages: Sequence[Passage], built_at: Optional[str] = None,
+                sources: Optional[str] = None) -> dict:
+    """Index `passages` into a file `MappedSegment` can map; `sources` is the
+    `sources_digest` of what they came from. Returns stats."""
+    segment = MemorySegment(passages)
+    pairs = array("I")
+    terms = {}
+    for term in sorted(segment.terms):
+        postings = segment.terms[term]
+        terms[term] = [len(pairs) // 2, len(postings)]
+        for doc, tf in postings:
+            pairs.extend((doc, tf))
+
+    texts = bytearray()
+    docs = []
+    for passage, length in zip(segment.passages, segment.lengths):
+        encoded = passage.text.encode("utf-8")
+        docs.append([passage.source, passage.title, len(texts), len(encoded), length])
+        texts += encoded
+
+    header = json.dumps({
+        "byteorder": sys.byteorder, "built_at": built_at, "sources": sources,
+        "pairs": len(pairs) // 2, "docs": docs, "terms": terms,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(INDEX_MAGIC + len(header).to_bytes(4, "little") + header)
+        f.write(b"\0" * (_align(8 + len(header)) - 8 - len(header)))
+        f.write(pairs.tobytes())
+        f.write(texts)
+    os.replace(tmp, path)
+    return {"passages": len(docs), "terms": len(terms), "bytes": os.path.getsize(path)}
+
+
+# ============================================
+# Search
+# ============================================
+
+def _snippet(text: str, terms: Iterable[str]) -> str:
+    """The sentence with the most query terms, and what follows it, up to SNIPPET_CHARS."""
+    wanted = set(terms)
+    sentences = _SENTENCE.split(text)
+    best = max(range(len(sentences)), key=lambda i: len(wanted & set(tokenize(sentences[i]))), default=0)
+    snippet = " ".join(sentences[best:]) if sentences else ""
+    if len(snippet) > SNIPPET_CHARS:
+        snippet = snippet[:SNIPPET_CHARS].rsplit(" ", 1)[0] + " …"
+    return snippet
+
+
+def rank(segments: Sequence, query: str, k: int = 5) -> List[Hit]:
+    """BM25 top-k over `segments` with collection statistics summed across them."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    segments = [s for s in segments if s is not None and s.n_docs]
+    n_docs = sum(s.n_docs for s in segments)
+    if not terms or not n_docs:
+        return []
+    avg_length = sum(s.total_length for s in segments) / n_docs
+
+    totals: Dict[Tuple[int, int], float] = {}
+    for term in terms:
+        per_segment = [s.postings(term) for s in segments]
+        df = sum(len(p) for p in per_segment)
+        if not df:
+            continue
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for i, segment_postings in enumerate(per_segment):
+            lengths = segments[i].lengths
+            for doc, tf in segment_postings:
+                norm = tf + K1 * (1 - B + B * lengths[doc] / avg_length)
+                totals[(i, doc)] = totals.get((i, doc), 0.0) + idf * tf * (K1 + 1) / norm
+
+    hits = []
+    for (i, doc), score in heapq.nlargest(k, totals.items(), key=lambda item: item[1]):
+        passage = segments[i].passage(doc)
+        hits.append(Hit(passage.source, passage.title, _snippet(passage.text, terms), round(score, 3)))
+    return hits
+
+
+# ============================================
+# Per-worker index
+# ============================================
+
+_static: Optional[MappedSegment] = None
+_static_loaded = False
+_load_lock = threading.Lock()
+
+# World id -> (fingerprint of its passages, segment). Reused across catalog
+# rebuilds for worlds whose passages didn't change.
+_world_segments: Dict[str, Tuple[str, MemorySegment]] = {}
+
+
+def load(path: Optional[str] = None) -> Optional[MappedSegment]:
+    """Map the offline course-notes index (startup). Missing or unreadable
+    files are logged and leave only the catalog segments searchable."""
+    global _static, _static_loaded
+    with _load_lock:
+        try:
+            _static = MappedSegment(path or INDEX_PATH)
+            logger.info(f"Knowledge base mapped: {_static.n_docs} passages (built {_static.built_at})")
+            if path is None:
+                current = sources_digest(COURSE_NOTES_SOURCES)
+                if current is not None and current != _static.sources_digest:
+                    logger.warning(
+                        "Knowledge base index is stale: the course notes changed since it was "
+                        "built. Run `python -m scripts.build_kb_index` and commit data/knowledge_base.idx."
+                    )
+        except Exception as e:
+            _static = None
+            logger.warning(f"Knowledge base index not loaded ({path or INDEX_PATH}): {e}")
+        _static_loaded = True
+        return _static
+
+
+def _build_catalog_segments(db: Session) -> Tuple[MemorySegment, ...]:
+    worlds = (
+        db.query(World)
+        .options(joinedload(World.levels).joinedload(Level.lessons))
+        .filter(World.is_published == True)  # noqa: E712
+        .order_by(World.order_index)
+        .all()
+    )
+    segments = {}
+    for world in worlds:
+        passages = world_passages(world)
+        fingerprint = hashlib.sha1(
+            json.dumps([(p.source, p.title, p.text) for p in passages]).encode("utf-8")
+        ).hexdigest()
+        cached = _world_segments.get(str(world.id))
+        if cached is None or cached[0] != fingerprint:
+            cached = (fingerprint, MemorySegment(passages))
+        segments[str(world.id)] = cached
+    rebuilt = sum(1 for wid, entry in segments.items() if _world_segments.get(wid) is not entry)
+    _world_segments.clear()
+    _world_segments.update(segments)
+    logger.info(f"Knowledge base: {rebuilt} of {len(segments)} world segments re-indexed")
+    return tuple(segment for _, segment in segments.values())
+
+
+# Shares the catalog's version key: catalog_service's ORM watcher bumps it
+# on every committed World/Level/Lesson/LevelEdge change.
+_catalog_segments: VersionedCache[Tuple[MemorySegment, ...]] = VersionedCache(
+    "Knowledge base", "catalog:version", _build_catalog_segments, local_ttl=LOCAL_TTL_SECONDS
+)
+
+
+def search(query: str, db: Optional[Session] = None, k: int = 5) -> List[Hit]:
+    """Top-k passages for `query` (course notes, plus the catalog when `db` is given)."""
+    if not _static_loaded:
+        load()
+    segments = [_static]
+    if db is not None:
+        segments.extend(_catalog_segments.get(db))
+    return rank(segments, query, k)
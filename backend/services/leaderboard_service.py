@@ -1,14 +1,37 @@
 """
 Leaderboard Service - Ranking system with periods and categories.
+
+Scores live in Redis sorted sets that are maintained incrementally from the
+community write paths (post / reaction / reply / solution events), so a
+top-N read is a ZREVRANGEBYSCORE and a rank lookup is a ZREVRANK instead of
+five GROUP BY subqueries outer-joined against every user.
+
+Key layout (per category):
+    lb:{category}:all             all-time scores
+    lb:{category}:d:{YYYYMMDD}    one bucket per UTC day (expires after 35d)
+    lb:{category}:{period}        ZUNIONSTORE of the last N day buckets,
+                                  cached for WINDOW_CACHE_TTL seconds
+
+Windows are day-granular: "weekly" is today's bucket plus the previous six.
+That is the only intentional difference from the SQL definition, which uses
+a rolling `now - 7 days` cutoff.
+
+The SQL implementation is kept as the fallback for when Redis is down or the
+sets have not been built yet (`lb:meta:built_at` missing). `rebuild_from_sql`
+repopulates everything atomically — run `scripts/rebuild_leaderboards.py` on
+cold start or to repair drift (e.g. after admin moderation flips).
 """
 import logging
-from datetime import datetime, timedelta, timezone
-from typing import Optional, List
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone, date
+from typing import Optional, List, Dict, Iterable, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, case
 
 from models.user import User, UserProfile
 from models.community import Post, PostReply, PostReaction, UserStats, ModerationStatus
+from services.redis_service import get_redis_client
+from utils.db_hooks import after_commit
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +50,20 @@ SCORING = {
     "active": {"posts": 3, "reactions_received": 0, "replies": 2, "reactions_given": 1},
 }
 
+# Metric names accepted by record_event(). Each maps onto the SCORING keys.
+METRIC_POSTS = "posts"
+METRIC_REACTIONS_RECEIVED = "reactions_received"
+METRIC_REACTIONS_GIVEN = "reactions_given"
+METRIC_REPLIES = "replies"
+METRIC_SOLUTIONS = "solutions"
+
+_KEY_PREFIX = "lb"
+_BUILT_AT_KEY = f"{_KEY_PREFIX}:meta:built_at"
+_REBUILD_LOCK_KEY = f"{_KEY_PREFIX}:meta:rebuild_lock"
+DAY_BUCKET_TTL = 35 * 24 * 60 * 60   # outlives the longest (30d) window
+WINDOW_CACHE_TTL = 30                # seconds a unioned weekly/monthly set is reused
+REBUILD_LOCK_TTL = 300
+
 
 def _get_date_filter(period: str) -> Optional[datetime]:
     """Get the cutoff date for a given period."""
@@ -36,6 +73,161 @@ def _get_date_filter(period: str) -> Optional[datetime]:
     return datetime.now(timezone.utc) - timedelta(days=days)
 
 
+# ============================================
+# Redis key helpers
+# ============================================
+
+def _all_time_key(category: str) -> str:
+    return f"{_KEY_PREFIX}:{category}:all"
+
+
+def _day_key(category: str, day: date) -> str:
+    return f"{_KEY_PREFIX}:{category}:d:{day.strftime('%Y%m%d')}"
+
+
+def _window_key(category: str, period: str) -> str:
+    return f"{_KEY_PREFIX}:{category}:{period}"
+
+
+def _utc_day(ts: Optional[datetime]) -> date:
+    """UTC calendar day of a timestamp. DB timestamps are naive UTC."""
+    if ts is None:
+        return datetime.now(timezone.utc).date()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.date()
+
+
+def _window_days(period: str, today: Optional[date] = None) -> List[date]:
+    """Day buckets that make up a rolling window, newest first."""
+    days = PERIOD_FILTERS.get(period)
+    if not days:
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    return [today - timedelta(days=i) for i in range(days)]
+
+
+def _score_deltas(metric: str, count: int = 1) -> Dict[str, int]:
+    """Per-category score change for `count` occurrences of `metric`."""
+    return {
+        category: weights[metric] * count
+        for category, weights in SCORING.items()
+        if weights.get(metric, 0)
+    }
+
+
+# ============================================
+# Incremental updates (write path)
+# ============================================
+
+def _apply_increments(increments: Iterable[Tuple[str, str, datetime, int]]) -> None:
+    """ZINCRBY every (metric, user_id, occurred_at, count) into the all-time
+    set and the matching day bucket, in one pipeline round-trip."""
+    client = get_redis_client()
+    pipe = client.pipeline(transaction=False)
+    touched_days = set()
+    for metric, user_id, occurred_at, count in increments:
+        day = _utc_day(occurred_at)
+        for category, delta in _score_deltas(metric, count).items():
+            pipe.zincrby(_all_time_key(category), delta, user_id)
+            day_key = _day_key(category, day)
+            pipe.zincrby(day_key, delta, user_id)
+            touched_days.add(day_key)
+    for day_key in touched_days:
+        pipe.expire(day_key, DAY_BUCKET_TTL)
+    pipe.execute()
+
+
+def record_event(
+    metric: str,
+    user_id: str,
+    db: Session,
+    occurred_at: Optional[datetime] = None,
+    count: int = 1,
+) -> None:
+    """
+    Queue a score change for `user_id` and apply it once `db` commits.
+
+    `count` may be negative (unlike, delete). `occurred_at` must be the
+    timestamp the SQL definition filters on (post/reply/reaction created_at)
+    so the change lands in the same day bucket the original event did.
+    """
+    if not count or metric not in {
+        METRIC_POSTS, METRIC_REACTIONS_RECEIVED, METRIC_REACTIONS_GIVEN,
+        METRIC_REPLIES, METRIC_SOLUTIONS,
+    }:
+        return
+    record_events([(metric, str(user_id), occurred_at or datetime.utcnow(), count)], db)
+
+
+def record_events(increments: List[Tuple[str, str, datetime, int]], db: Session) -> None:
+    """Batch variant of record_event — one pipeline for all increments."""
+    increments = [i for i in increments if i[3]]
+    if not increments:
+        return
+
+    def _apply():
+        try:
+            _apply_increments(increments)
+        except Exception as e:
+            # Redis down: the SQL fallback keeps serving, the next rebuild
+            # repairs the sets.
+            logger.warning(f"Leaderboard increment skipped: {e}")
+
+    after_commit(db, _apply)
+
+
+# ============================================
+# Read path
+# ============================================
+
+def _is_built(client) -> bool:
+    return bool(client.exists(_BUILT_AT_KEY))
+
+
+def _resolve_key(client, category: str, period: str) -> str:
+    """Return the sorted-set key holding scores for (category, period),
+    materialising the rolling-window union if it isn't cached."""
+    if PERIOD_FILTERS.get(period) is None:
+        return _all_time_key(category)
+
+    window_key = _window_key(category, period)
+    if not client.exists(window_key):
+        day_keys = [_day_key(category, d) for d in _window_days(period)]
+        pipe = client.pipeline(transaction=True)
+        pipe.zunionstore(window_key, day_keys)
+        pipe.expire(window_key, WINDOW_CACHE_TTL)
+        pipe.execute()
+    return window_key
+
+
+def _hydrate_entries(rows: List[Tuple[str, float]], db: Session, start_rank: int = 1) -> List[dict]:
+    """Attach profile fields to (user_id, score) pairs with one query."""
+    if not rows:
+        return []
+    user_ids = [uid for uid, _ in rows]
+    profiles = db.query(
+        UserProfile.user_id,
+        UserProfile.username,
+        UserProfile.first_name,
+        UserProfile.avatar_url,
+    ).filter(UserProfile.user_id.in_(user_ids)).all()
+    profile_map = {str(p.user_id): p for p in profiles}
+
+    entries = []
+    for idx, (uid, score) in enumerate(rows):
+        p = profile_map.get(uid)
+        entries.append({
+            "id": uid,
+            "username": p.username if p else None,
+            "first_name": (p.first_name if p else None) or "User",
+            "avatar_url": p.avatar_url if p else None,
+            "score": int(score),
+            "rank": start_rank + idx,
+        })
+    return entries
+
+
 def get_leaderboard(
     period: str = "all_time",
     category: str = "overall",
@@ -46,6 +238,26 @@ def get_leaderboard(
     Get leaderboard entries for a given period and category.
     Returns list of {user_id, first_name, avatar_url, score, rank}.
     """
+    if category not in SCORING:
+        category = "overall"
+    try:
+        client = get_redis_client()
+        if _is_built(client):
+            key = _resolve_key(client, category, period)
+            rows = client.zrevrangebyscore(key, "+inf", "(0", start=0, num=limit, withscores=True)
+            return _hydrate_entries(rows, db)
+    except Exception as e:
+        logger.warning(f"Leaderboard Redis read failed, using SQL: {e}")
+    return _get_leaderboard_sql(period=period, category=category, limit=limit, db=db)
+
+
+def _get_leaderboard_sql(
+    period: str = "all_time",
+    category: str = "overall",
+    limit: int = 10,
+    db: Session = None
+) -> List[dict]:
+    """Authoritative SQL computation. Fallback read path and rebuild oracle."""
     cutoff = _get_date_filter(period)
     weights = SCORING.get(category, SCORING["overall"])
 
@@ -174,8 +386,24 @@ def get_user_rank(
     Get a specific user's rank and score.
     Returns {rank, score}.
     """
-    # Get full leaderboard (up to 1000) and find user's position
-    leaderboard = get_leaderboard(period=period, category=category, limit=1000, db=db)
+    if category not in SCORING:
+        category = "overall"
+    try:
+        client = get_redis_client()
+        if _is_built(client):
+            key = _resolve_key(client, category, period)
+            pipe = client.pipeline(transaction=False)
+            pipe.zscore(key, str(user_id))
+            pipe.zrevrank(key, str(user_id))
+            score, rank = pipe.execute()
+            if score is None or score <= 0:
+                return {"rank": None, "score": 0}
+            return {"rank": rank + 1, "score": int(score)}
+    except Exception as e:
+        logger.warning(f"Leaderboard rank Redis read failed, using SQL: {e}")
+
+    # SQL fallback: scan the top 1000 and find the user's position
+    leaderboard = _get_leaderboard_sql(period=period, category=category, limit=1000, db=db)
 
     for entry in leaderboard:
         if entry["id"] == user_id:
@@ -187,3 +415,142 @@ def get_user_rank(
 def get_hall_of_fame(limit: int = 5, db: Session = None) -> List[dict]:
     """Get all-time top contributors."""
     return get_leaderboard(period="all_time", category="overall", limit=limit, db=db)
+
+
+# ============================================
+# Rebuild (cold start / drift repair)
+# ============================================
+
+def _metric_rows_by_day(db: Session, since: datetime) -> Dict[str, List[Tuple[str, date, int]]]:
+    """(user_id, day, count) per metric for everything since `since`."""
+    def _grouped(user_col, ts_col, *filters, join=None):
+        day = func.date_trunc("day", ts_col)
+        q = db.query(user_col, day.label("day"), func.count().label("n"))
+        if join is not None:
+            q = q.join(*join)
+        return [
+            (str(uid), d.date() if isinstance(d, datetime) else d, n)
+            for uid, d, n in q.filter(ts_col >= since, *filters).group_by(user_col, day).all()
+        ]
+
+    active_post = (Post.is_deleted == False, Post.moderation_status == ModerationStatus.ACTIVE.value)
+    return {
+        METRIC_POSTS: _grouped(Post.user_id, Post.created_at, *active_post),
+        METRIC_REACTIONS_RECEIVED: _grouped(
+            Post.user_id, PostReaction.created_at, *active_post,
+            join=(PostReaction, PostReaction.post_id == Post.id),
+        ),
+        METRIC_REPLIES: _grouped(PostReply.user_id, PostReply.created_at, PostReply.is_deleted == False),
+        METRIC_SOLUTIONS: _grouped(
+            PostReply.user_id, PostReply.created_at,
+            PostReply.is_deleted == False, PostReply.is_accepted_answer == True,
+        ),
+        METRIC_REACTIONS_GIVEN: _grouped(PostReaction.user_id, PostReaction.created_at),
+    }
+
+
+def _metric_totals(db: Session) -> Dict[str, List[Tuple[str, int]]]:
+    """All-time (user_id, count) per metric."""
+    active_post = (Post.is_deleted == False, Post.moderation_status == ModerationStatus.ACTIVE.value)
+    return {
+        METRIC_POSTS: db.query(Post.user_id, func.count(Post.id)).filter(
+            *active_post
+        ).group_by(Post.user_id).all(),
+        METRIC_REACTIONS_RECEIVED: db.query(Post.user_id, func.count(PostReaction.id)).join(
+            PostReaction, PostReaction.post_id == Post.id
+        ).filter(*active_post).group_by(Post.user_id).all(),
+        METRIC_REPLIES: db.query(PostReply.user_id, func.count(PostReply.id)).filter(
+            PostReply.is_deleted == False
+        ).group_by(PostReply.user_id).all(),
+        METRIC_SOLUTIONS: db.query(PostReply.user_id, func.count(PostReply.id)).filter(
+            PostReply.is_deleted == False, PostReply.is_accepted_answer == True,
+        ).group_by(PostReply.user_id).all(),
+        METRIC_REACTIONS_GIVEN: db.query(PostReaction.user_id, func.count(PostReaction.id)).group_by(
+            PostReaction.user_id
+        ).all(),
+    }
+
+
+def rebuild_from_sql(db: Session) -> dict:
+    """
+    Recompute every leaderboard set from Postgres and swap it in atomically.
+
+    Builds into `:tmp` keys and RENAMEs them over the live keys in one
+    MULTI, so readers never see a half-built board. Guarded by a Redis lock
+    so concurrent workers booting at once don't all rebuild.
+    Returns a summary dict (or {"skipped": True} if another rebuild holds
+    the lock).
+    """
+    client = get_redis_client()
+    if not client.set(_REBUILD_LOCK_KEY, "1", nx=True, ex=REBUILD_LOCK_TTL):
+        return {"skipped": True}
+
+    try:
+        max_days = max(d for d in PERIOD_FILTERS.values() if d)
+        today = datetime.now(timezone.utc).date()
+        since = datetime.combine(today - timedelta(days=max_days - 1), datetime.min.time())
+
+        all_time: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for metric, rows in _metric_totals(db).items():
+            for uid, n in rows:
+                for category, delta in _score_deltas(metric, n).items():
+                    all_time[category][str(uid)] += delta
+
+        by_day: Dict[Tuple[str, date], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for metric, rows in _metric_rows_by_day(db, since).items():
+            for uid, day, n in rows:
+                for category, delta in _score_deltas(metric, n).items():
+                    by_day[(category, day)][uid] += delta
+
+        build = client.pipeline(transaction=False)
+        swaps: List[Tuple[str, str, Optional[int]]] = []
+
+        def _stage(final_key: str, scores: Dict[str, int], ttl: Optional[int]):
+            tmp_key = f"{final_key}:tmp"
+            build.delete(tmp_key)
+            members = {uid: s for uid, s in scores.items() if s}
+            if members:
+                build.zadd(tmp_key, members)
+                swaps.append((tmp_key, final_key, ttl))
+            else:
+                swaps.append((None, final_key, ttl))
+
+        for category in SCORING:
+            _stage(_all_time_key(category), all_time.get(category, {}), None)
+            for offset in range(max_days):
+                day = today - timedelta(days=offset)
+                _stage(_day_key(category, day), by_day.get((category, day), {}), DAY_BUCKET_TTL)
+        build.execute()
+
+        swap = client.pipeline(transaction=True)
+        for tmp_key, final_key, ttl in swaps:
+            if tmp_key is None:
+                swap.delete(final_key)
+                continue
+            swap.rename(tmp_key, final_key)
+            if ttl:
+                swap.expire(final_key, ttl)
+        for category in SCORING:
+            for period, days in PERIOD_FILTERS.items():
+                if days:
+                    swap.delete(_window_key(category, period))
+        swap.set(_BUILT_AT_KEY, datetime.now(timezone.utc).isoformat())
+        swap.execute()
+
+        summary = {
+            "skipped": False,
+            "users_ranked": len(all_time.get("overall", {})),
+            "day_buckets": max_days,
+        }
+        logger.info(f"Leaderboards rebuilt from SQL: {summary}")
+        return summary
+    finally:
+        client.delete(_REBUILD_LOCK_KEY)
+
+
+def ensure_built(db: Session) -> bool:
+    """Rebuild on cold start (no built marker). Returns True if a rebuild ran."""
+    client = get_redis_client()
+    if _is_built(client):
+        return False
+    return not rebuild_from_sql(db).get("skipped")
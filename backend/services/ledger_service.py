@@ -0,0 +1,199 @@
+"""
+Ledger Service - clave_transactions as the record behind current_claves.
+
+`UserProfile.current_claves` is the balance every read uses; each earn /
+spend writes a ClaveTransaction and moves it in the same transaction. This
+module keeps the two honest and cheap to read:
+
+- Snapshots: `take_snapshots` records each user's ledger balance as of a
+  point in time (one INSERT .. SELECT for everyone with new transactions),
+  so checking a balance only sums the transactions since the last one.
+- Reconciliation: `iter_drift` streams, in one statement, every profile
+  whose current_claves differs from last snapshot + later transactions;
+  `repair` books the difference as a `ledger_adjustment` transaction, so
+  users keep the balance they see and the ledger explains it.
+  scripts/reconcile_claves.py runs both; schedule it daily.
+- History: `get_history` pages a user's transactions by keyset cursor.
+- Balance cache: `get_balance` reads Redis (redis_service's clave balance
+  helpers), falling back to the profile row. Any ORM change to
+  current_claves drops the key once the transaction commits. Spending
+  always re-checks the locked row, so a stale cached value can at worst
+  mislabel a button for CLAVE_BALANCE_TTL.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session, object_session
+
+from models.community import ClaveTransaction
+from models.user import UserProfile
+from services import principal_service, redis_service
+from utils.db_hooks import after_commit
+from utils.pagination import after_cursor
+
+logger = logging.getLogger(__name__)
+
+ADJUSTMENT_REASON = "ledger_adjustment"
+
+# Snapshots are taken this far in the past, so no transaction created
+# before the cut-off can still be uncommitted (and missed for good).
+SNAPSHOT_LAG = timedelta(minutes=10)
+
+
+# ============================================
+# Balance cache
+# ============================================
+
+def get_balance(user_id: str, db: Session) -> int:
+    """Current balance: this session's own copy, else Redis, else the row."""
+    # A profile this session already holds may carry uncommitted changes;
+    # it is fresher than the cache.
+    profile = principal_service.loaded_profile(db, user_id)
+    if profile is not None:
+        return profile.current_claves or 0
+
+    cached = redis_service.get_cached_clave_balance(str(user_id))
+    if cached is not None:
+        return cached
+    balance = db.query(UserProfile.current_claves).filter(UserProfile.user_id == user_id).scalar()
+    if balance is None:
+        return 0
+    redis_service.cache_clave_balance(str(user_id), balance)
+    return balance
+
+
+@event.listens_for(UserProfile, "after_update")
+def _balance_changed(mapper, connection, target) -> None:
+    if not inspect(target).attrs.current_claves.history.has_changes():
+        return
+    user_id = str(target.user_id)
+    session = object_session(target)
+    if session is None:
+        redis_service.invalidate_clave_balance(user_id)
+    else:
+        after_commit(session, lambda: redis_service.invalidate_clave_balance(user_id))
+
+
+# ============================================
+# History
+# ============================================
+
+def get_history(
+    user_id: str,
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[tuple] = None,
+) -> List[dict]:
+    """A page of the user's transactions, newest first; pass the decoded
+    cursor of the previous page's last item to continue."""
+    query = db.query(ClaveTransaction).filter(ClaveTransaction.user_id == user_id)
+    if cursor:
+        query = query.filter(after_cursor(ClaveTransaction.created_at, ClaveTransaction.id, cursor))
+    transactions = query.order_by(
+        ClaveTransaction.created_at.desc(), ClaveTransaction.id.desc()
+    ).limit(limit).all()
+    return [
+        {
+            "id": str(t.id),
+            "amount": t.amount,
+            "reason": t.reason,
+            "reference_id": str(t.reference_id) if t.reference_id else None,
+            "created_at": t.created_at,
+        }
+        for t in transactions
+    ]
+
+
+# ============================================
+# Snapshots and reconciliation
+# ============================================
+
+_LAST_SNAPSHOT = """
+    last_snapshot AS (
+        SELECT DISTINCT ON (user_id) user_id, as_of, balance
+        FROM clave_balance_snapshots
+        ORDER BY user_id, as_of DESC
+    )
+"""
+
+_TAKE_SNAPSHOTS = f"""
+    WITH {_LAST_SNAPSHOT},
+    since AS (
+        SELECT t.user_id, SUM(t.amount) AS delta
+        FROM clave_transactions t
+        LEFT JOIN last_snapshot s ON s.user_id = t.user_id
+        WHERE (s.as_of IS NULL OR t.created_at > s.as_of) AND t.created_at <= :as_of
+        GROUP BY t.user_id
+    )
+    INSERT INTO clave_balance_snapshots (user_id, as_of, balance)
+    SELECT d.user_id, :as_of, COALESCE(s.balance, 0) + d.delta
+    FROM since d
+    LEFT JOIN last_snapshot s ON s.user_id = d.user_id
+    ON CONFLICT DO NOTHING
+"""
+
+_DRIFT = f"""
+    WITH {_LAST_SNAPSHOT},
+    since AS (
+        SELECT t.user_id, SUM(t.amount) AS delta
+        FROM clave_transactions t
+        LEFT JOIN last_snapshot s ON s.user_id = t.user_id
+        WHERE s.as_of IS NULL OR t.created_at > s.as_of
+        GROUP BY t.user_id
+    )
+    SELECT p.user_id, p.current_claves, COALESCE(s.balance, 0) + COALESCE(d.delta, 0) AS expected
+    FROM user_profiles p
+    LEFT JOIN last_snapshot s ON s.user_id = p.user_id
+    LEFT JOIN since d ON d.user_id = p.user_id
+    WHERE p.current_claves <> COALESCE(s.balance, 0) + COALESCE(d.delta, 0)
+"""
+
+
+@dataclass(frozen=True)
+class Drift:
+    user_id: str
+    current_claves: int
+    expected: int
+
+    @property
+    def difference(self) -> int:
+        return self.current_claves - self.expected
+
+
+def take_snapshots(db: Session, as_of: Optional[datetime] = None) -> int:
+    """Snapshot every user with transactions since their last snapshot, as
+    of `as_of` (default: now - SNAPSHOT_LAG). Returns rows written; the
+    caller commits."""
+    as_of = as_of or datetime.utcnow() - SNAPSHOT_LAG
+    written = db.execute(text(_TAKE_SNAPSHOTS), {"as_of": as_of}).rowcount or 0
+    logger.info(f"clave snapshots: {written} users as of {as_of.isoformat()}")
+    return written
+
+
+def iter_drift(db: Session, batch_size: int = 1000) -> Iterator[Drift]:
+    """Every profile whose balance disagrees with the ledger: one statement
+    (a consistent view of both tables), streamed with a server-side cursor."""
+    result = db.execute(
+        text(_DRIFT).execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for user_id, current_claves, expected in result:
+        yield Drift(str(user_id), int(current_claves), int(expected))
+
+
+def repair(drift: Drift, db: Session) -> ClaveTransaction:
+    """Book the difference so the ledger matches the balance the user sees."""
+    txn = ClaveTransaction(
+        user_id=drift.user_id,
+        amount=drift.difference,
+        reason=ADJUSTMENT_REASON,
+    )
+    db.add(txn)
+    db.flush()
+    logger.warning(
+        f"clave ledger adjusted for {drift.user_id}: balance {drift.current_claves}, "
+        f"ledger {drift.expected} ({drift.difference:+d})"
+    )
+    return txn
@@ -1,20 +1,42 @@
 """Meta Conversions API (CAPI) dispatcher.
 
-Invoked from ``analytics_service.track_event`` via a FastAPI BackgroundTask
-for every event in ``CONVERSION_EVENTS``. Wraps the whole flow in a blanket
-try/except — a Meta outage must never propagate back into a Stripe webhook
-or auth response.
+``analytics_service.track_event`` hands every event in ``CONVERSION_EVENTS``
+to ``dispatch_event`` (via a FastAPI BackgroundTask). That call only builds
+the event and queues it — it never does network I/O on a worker thread.
+
+One ``CapiDispatcher`` per process runs an asyncio loop on a daemon thread:
+
+- Batches: up to ``MAX_EVENTS_PER_REQUEST`` (Graph's per-call limit) events
+  per POST, lingering ``BATCH_LINGER_SECONDS`` to fill a batch.
+- Pooled: one ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed) reused
+  for every request, at most ``MAX_IN_FLIGHT`` batches concurrently.
+- Retries: 5xx / 429 / network errors back off with full jitter via
+  ``asyncio.sleep`` — no thread sleeps. A 400 rejects the whole batch, so
+  it is bisected to isolate the bad event(s) instead of losing the lot.
+- Bulk status: ``capi_status`` / ``capi_sent_at`` are stamped with one
+  UPDATE per status per batch, after the analytics buffer has flushed the
+  rows.
+
+A Meta outage must never propagate back into a Stripe webhook or auth
+response, so nothing here raises to callers; failures are logged and
+recorded as ``capi_status = 'error'``.
 
 Docs: https://developers.facebook.com/docs/marketing-api/conversions-api/
 """
 from __future__ import annotations
 
+import asyncio
+import atexit
+import importlib.util
 import logging
-import time
+import random
+import threading
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Mapping, Optional
+from typing import Any, Callable, Dict, List, Mapping, Optional
 
 import httpx
+from sqlalchemy import update
 
 from config import settings
 from models import get_session_local
@@ -24,13 +46,25 @@ from utils.meta_user_data import build_user_data
 logger = logging.getLogger(__name__)
 
 
-_GRAPH_URL_TEMPLATE = "https://graph.facebook.com/{version}/{pixel_id}/events"
+_GRAPH_PATH_TEMPLATE = "/{version}/{pixel_id}/events"
+
+MAX_EVENTS_PER_REQUEST = 1000
+BATCH_LINGER_SECONDS = 1.0
+MAX_IN_FLIGHT = 4
+MAX_PENDING_EVENTS = 50_000
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+REQUEST_TIMEOUT_SECONDS = 10.0
+SHUTDOWN_TIMEOUT_SECONDS = 15.0
+
+_HTTP2 = importlib.util.find_spec("h2") is not None
 
 
 def _graph_endpoint() -> Optional[str]:
     if not settings.META_PIXEL_ID:
         return None
-    return _GRAPH_URL_TEMPLATE.format(
+    return settings.META_GRAPH_BASE_URL.rstrip("/") + _GRAPH_PATH_TEMPLATE.format(
         version=settings.META_API_VERSION,
         pixel_id=settings.META_PIXEL_ID,
     )
@@ -73,7 +107,7 @@ def _build_custom_data(
     return cd
 
 
-def _build_payload(
+def _build_event(
     *,
     event_id: str,
     event_name: str,
@@ -82,6 +116,7 @@ def _build_payload(
     custom_data: dict,
     page_url: Optional[str],
 ) -> dict:
+    """One entry of the Graph ``data`` array."""
     event_entry: dict = {
         "event_name": event_name,
         "event_time": int(event_time.timestamp()),
@@ -93,64 +128,315 @@ def _build_payload(
         event_entry["custom_data"] = custom_data
     if page_url:
         event_entry["event_source_url"] = page_url
+    return event_entry
 
-    payload: dict = {"data": [event_entry]}
+
+def _build_payload(events: List[dict]) -> dict:
+    payload: dict = {"data": events}
     if settings.META_TEST_EVENT_CODE:
         payload["test_event_code"] = settings.META_TEST_EVENT_CODE
     return payload
 
 
-def _post_with_retries(url: str, payload: dict, access_token: str) -> httpx.Response:
-    """POST with exponential backoff on 5xx only. 4xx means the payload is
-    broken — retrying won't help, log and move on."""
-    backoff = 1.0
-    last_exc: Optional[BaseException] = None
-    resp: Optional[httpx.Response] = None
-    for attempt in range(3):
-        try:
-            resp = httpx.post(
-                url,
-                params={"access_token": access_token},
-                json=payload,
-                timeout=5.0,
-            )
-            if resp.status_code < 500:
-                return resp
-            logger.warning(
-                "meta_capi: graph %s on attempt %d — body=%s",
-                resp.status_code, attempt + 1, resp.text[:500],
-            )
-        except httpx.HTTPError as exc:
-            last_exc = exc
-            logger.warning("meta_capi: network error attempt %d: %s", attempt + 1, exc)
-        time.sleep(backoff)
-        backoff *= 2
-    if resp is not None:
-        return resp
-    if last_exc is not None:
-        raise last_exc
-    raise RuntimeError("meta_capi: exhausted retries without response")
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^n))."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _is_retryable(status_code: int) -> bool:
+    return status_code >= 500 or status_code == 429
+
+
+# Graph error codes that apply to the request as a whole: bad / expired /
+# revoked token (190, 102), missing permission (10, 200-299). Subcode 33 on
+# code 100 is an unknown or inaccessible pixel ID.
+_REQUEST_WIDE_CODES = {190, 102, 10}
+_BAD_OBJECT_SUBCODE = 33
 
 
-def _update_status(event_id: str, status: str) -> None:
-    """Background tasks don't share the caller's DB session, so open a
-    fresh short-lived one just to stamp the status."""
-    SessionLocal = get_session_local()
-    session = SessionLocal()
+def _is_per_event_error(resp: httpx.Response) -> bool:
+    """True when a 400 is Graph rejecting the payload's contents (invalid
+    parameter, code 100) — worth bisecting to find the bad event. Auth,
+    permission and pixel errors fail every subset the same way."""
     try:
-        row = session.query(UserEvent).filter(UserEvent.event_id == event_id).first()
-        if row is None:
-            return
-        row.capi_status = status
-        row.capi_sent_at = datetime.now(timezone.utc)
+        error = resp.json().get("error") or {}
+        code = int(error.get("code"))
+    except (ValueError, TypeError, AttributeError):
+        return False
+    if code in _REQUEST_WIDE_CODES or 200 <= code < 300:
+        return False
+    return code == 100 and error.get("error_subcode") != _BAD_OBJECT_SUBCODE
+
+
+def _write_statuses(statuses: Dict[str, str]) -> None:
+    """Stamp capi_status for a whole batch: one UPDATE per distinct status."""
+    by_status: Dict[str, List[str]] = {}
+    for event_id, status in statuses.items():
+        by_status.setdefault(status, []).append(event_id)
+
+    session = get_session_local()()
+    try:
+        now = datetime.now(timezone.utc)
+        for status, event_ids in by_status.items():
+            session.execute(
+                update(UserEvent)
+                .where(UserEvent.event_id.in_(event_ids))
+                .values(capi_status=status, capi_sent_at=now)
+                .execution_options(synchronize_session=False)
+            )
         session.commit()
     except Exception:
-        logger.exception("meta_capi: failed to stamp capi_status for %s", event_id)
+        logger.exception("meta_capi: failed to stamp capi_status for %d events", len(statuses))
         session.rollback()
     finally:
         session.close()
 
 
+def _wait_for_rows(ticket: Optional[int]) -> None:
+    """Block until the analytics buffer has written rows up to ``ticket``."""
+    if ticket is None:
+        return
+    from services import analytics_buffer
+    if not analytics_buffer.get_buffer().wait_flushed(ticket):
+        logger.warning("meta_capi: analytics rows not flushed in time; some statuses may not stick")
+
+
+@dataclass
+class _Pending:
+    event: dict
+    flush_ticket: Optional[int]
+
+
+_STOP = object()
+
+
+class CapiDispatcher:
+    """Async batching dispatcher running on its own event-loop thread."""
+
+    def __init__(
+        self,
+        *,
+        endpoint: Callable[[], Optional[str]] = _graph_endpoint,
+        access_token: Callable[[], Optional[str]] = lambda: settings.META_CAPI_ACCESS_TOKEN,
+        status_writer: Callable[[Dict[str, str]], None] = _write_statuses,
+        max_batch: int = MAX_EVENTS_PER_REQUEST,
+        linger: float = BATCH_LINGER_SECONDS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_pending: int = MAX_PENDING_EVENTS,
+    ) -> None:
+        self._endpoint = endpoint
+        self._access_token = access_token
+        self._status_writer = status_writer
+        self._max_batch = max_batch
+        self._linger = linger
+        self._max_in_flight = max_in_flight
+        self._max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stopped = False
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Caller side (any thread)
+    # ------------------------------------------------------------------
+
+    def submit(self, event: dict, flush_ticket: Optional[int] = None) -> bool:
+        """Queue one Graph event entry. Returns False if it was dropped."""
+        with self._lock:
+            if self._stopped or self._pending >= self._max_pending:
+                self.dropped += 1
+                if self.dropped % 100 == 1:
+                    logger.warning("meta_capi: dispatcher saturated (%d dropped so far)", self.dropped)
+                return False
+            self._pending += 1
+        self._ensure_started()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _Pending(event, flush_ticket))
+        return True
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """Send whatever is queued, then stop the loop. Safe to call twice."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("meta_capi: %d events still pending at shutdown", self._pending)
+
+    def stats(self) -> dict:
+        return {"pending": self._pending, "sent": self.sent, "failed": self.failed, "dropped": self.dropped}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            self._ready.wait()
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._thread_main, name="meta-capi", daemon=True)
+                self._thread.start()
+        self._ready.wait()
+
+    def _thread_main(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    # ------------------------------------------------------------------
+    # Loop side
+    # ------------------------------------------------------------------
+
+    async def _next_batch(self) -> tuple[list, bool]:
+        """Wait for one event, then linger to fill the batch.
+        Returns (batch, stop_requested)."""
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._linger
+        while len(batch) < self._max_batch:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        limits = httpx.Limits(
+            max_connections=self._max_in_flight,
+            max_keepalive_connections=self._max_in_flight,
+        )
+        slots = asyncio.Semaphore(self._max_in_flight)
+        in_flight: set = set()
+        async with httpx.AsyncClient(http2=_HTTP2, limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+            stop = False
+            while not stop:
+                batch, stop = await self._next_batch()
+                if not batch:
+                    continue
+                with self._lock:
+                    self._pending -= len(batch)
+                # Bounded concurrency; while all slots are busy the queue
+                # absorbs new events (up to max_pending).
+                await slots.acquire()
+                task = asyncio.create_task(self._send_batch(client, batch))
+                in_flight.add(task)
+
+                def _done(t, _slots=slots, _in_flight=in_flight):
+                    _in_flight.discard(t)
+                    _slots.release()
+
+                task.add_done_callback(_done)
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _send_batch(self, client: httpx.AsyncClient, batch: List[_Pending]) -> None:
+        events = [p.event for p in batch]
+        try:
+            endpoint, token = self._endpoint(), self._access_token()
+            if endpoint is None or not token:
+                logger.debug("meta_capi: not configured — skipping %d events", len(events))
+                statuses = {e["event_id"]: "skipped" for e in events}
+            else:
+                statuses = await self._post_events(client, endpoint, token, events)
+        except Exception:
+            logger.exception("meta_capi: batch of %d failed", len(events))
+            statuses = {e["event_id"]: "error" for e in events}
+
+        self.sent += sum(1 for s in statuses.values() if s == "ok")
+        self.failed += sum(1 for s in statuses.values() if s == "error")
+
+        tickets = [p.flush_ticket for p in batch if p.flush_ticket is not None]
+        max_ticket = max(tickets) if tickets else None
+
+        def _stamp():
+            _wait_for_rows(max_ticket)
+            self._status_writer(statuses)
+
+        try:
+            await asyncio.to_thread(_stamp)
+        except Exception:
+            logger.exception("meta_capi: status stamp failed")
+
+    async def _post_events(
+        self, client: httpx.AsyncClient, url: str, token: str, events: List[dict]
+    ) -> Dict[str, str]:
+        resp = await self._post_with_retries(client, url, token, events)
+        if resp is not None and 200 <= resp.status_code < 300:
+            return {e["event_id"]: "ok" for e in events}
+
+        if resp is not None and resp.status_code == 400 and len(events) > 1 and _is_per_event_error(resp):
+            # Graph rejects the whole request for one malformed event.
+            # Bisect so the good events still go through.
+            mid = len(events) // 2
+            left = await self._post_events(client, url, token, events[:mid])
+            right = await self._post_events(client, url, token, events[mid:])
+            return {**left, **right}
+
+        if resp is not None:
+            logger.warning(
+                "meta_capi: graph rejected %d event(s) (%s) — %s",
+                len(events), resp.status_code, resp.text[:500],
+            )
+        return {e["event_id"]: "error" for e in events}
+
+    async def _post_with_retries(
+        self, client: httpx.AsyncClient, url: str, token: str, events: List[dict]
+    ) -> Optional[httpx.Response]:
+        """POST with jittered backoff on 5xx/429/network errors. Other 4xx
+        mean the payload (or token) is broken — retrying won't help."""
+        resp: Optional[httpx.Response] = None
+        payload = _build_payload(events)
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                resp = await client.post(url, params={"access_token": token}, json=payload)
+                if not _is_retryable(resp.status_code):
+                    return resp
+                logger.warning(
+                    "meta_capi: graph %s on attempt %d — body=%s",
+                    resp.status_code, attempt + 1, resp.text[:500],
+                )
+            except httpx.HTTPError as exc:
+                logger.warning("meta_capi: network error attempt %d: %s", attempt + 1, exc)
+            if attempt + 1 < MAX_ATTEMPTS:
+                await asyncio.sleep(_backoff_delay(attempt))
+        return resp
+
+
+_dispatcher = CapiDispatcher()
+atexit.register(_dispatcher.shutdown)
+
+
+def get_dispatcher() -> CapiDispatcher:
+    return _dispatcher
+
+
+def shutdown() -> None:
+    _dispatcher.shutdown()
+
+
 def dispatch_event(
     *,
     event_id: str,
@@ -168,16 +454,15 @@ def dispatch_event(
     fbp: Optional[str],
     fbc: Optional[str],
     page_url: Optional[str],
+    flush_ticket: Optional[int] = None,
 ) -> None:
-    """Send one event to Meta. Safe to run inside BackgroundTasks — never
-    raises; logs on failure and records the outcome on the UserEvent row."""
-    try:
-        endpoint = _graph_endpoint()
-        if endpoint is None or not settings.META_CAPI_ACCESS_TOKEN:
-            logger.debug("meta_capi: not configured — skipping dispatch for %s", event_name)
-            _update_status(event_id, "skipped")
-            return
+    """Queue one event for Meta. Safe to run inside BackgroundTasks — never
+    raises and never blocks on the network.
 
+    ``flush_ticket`` is the analytics buffer ticket of the event's row (None
+    if it was written synchronously); the status stamp waits for it.
+    """
+    try:
         user_data = build_user_data(
             email=email,
             first_name=first_name,
@@ -189,7 +474,7 @@ def dispatch_event(
             fbc=fbc,
         )
         custom_data = _build_custom_data(event_name, value, currency, properties)
-        payload = _build_payload(
+        event = _build_event(
             event_id=event_id,
             event_name=event_name,
             event_time=event_time,
@@ -197,20 +482,7 @@ def dispatch_event(
             custom_data=custom_data,
             page_url=page_url,
         )
-
-        resp = _post_with_retries(endpoint, payload, settings.META_CAPI_ACCESS_TOKEN)
-
-        if 200 <= resp.status_code < 300:
-            _update_status(event_id, "ok")
-        else:
-            logger.warning(
-                "meta_capi: graph rejected %s (%s) — %s",
-                event_name, resp.status_code, resp.text[:500],
-            )
-            _update_status(event_id, "error")
+        if not _dispatcher.submit(event, flush_ticket):
+            _write_statuses({event_id: "error"})
     except Exception:
         logger.exception("meta_capi: dispatch failed for %s (%s)", event_name, event_id)
-        try:
-            _update_status(event_id, "error")
-        except Exception:
-            pass
@@ -280,6 +280,10 @@ def delete_asset(asset_id: str) -> bool:
         return True
         
     except ApiException as e:
+        if e.status == 404:
+            # Already gone (deleted in the dashboard, or a retried delete).
+            logger.info(f"Mux asset {asset_id} already deleted")
+            return True
         logger.error(f"Failed to delete Mux asset {asset_id}: {e}")
         return False
     except Exception as e:
@@ -1,14 +1,30 @@
 """
 Notification Service - Create and manage in-app notifications.
+
+Personal notifications are one `notifications` row per recipient.
+Announcements to everyone (a course going live) are one
+`broadcast_notifications` row, merged into each user's list when it is
+read; their read state is a per-user watermark ("mark all read") plus a
+row per broadcast read individually above it. `prune_notifications`
+keeps the personal table to a bounded window.
 """
 import logging
 import uuid
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, text
+from sqlalchemy import and_, func, desc, or_, select, tuple_
 
-from models.notification import Notification
-from models.user import UserProfile
+from models.notification import (
+    BroadcastNotification,
+    BroadcastNotificationRead,
+    Notification,
+    NotificationWatermark,
+)
+from models.user import User, UserProfile
+from services import notification_stream
+from utils.pagination import after_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -41,72 +57,159 @@ def create_notification(
     )
     db.add(notification)
     db.flush()
+    notification_stream.notify_created([notification], db)
     logger.info(f"Notification created for user {user_id}: {type} - {title}")
     return notification
 
 
+def create_notifications(rows: List[dict], db: Session) -> List[Notification]:
+    """Bulk form of `create_notification`: one flush for many rows.
+
+    Each row holds create_notification's keyword arguments (user_id, type,
+    title, message, and optionally reference_type / reference_id / actor_id).
+    """
+    notifications = [Notification(id=uuid.uuid4(), **row) for row in rows]
+    if notifications:
+        db.add_all(notifications)
+        db.flush()
+        notification_stream.notify_created(notifications, db)
+        logger.info(f"{len(notifications)} notifications created")
+    return notifications
+
+
 def broadcast_course_published(world, db: Session, exclude_user_id: Optional[str] = None) -> int:
     """Notify every user that a new course/choreo/topic just went live.
 
-    Idempotent: if a `course_published` notification already exists for this
-    world, the call is a no-op. That way an admin toggling published off and
-    back on doesn't spam the bell a second time. Returns the number of rows
-    inserted (0 when skipped).
+    Stores a single broadcast row. Idempotent: a world is announced at most
+    once, so an admin toggling published off and back on doesn't spam the
+    bell a second time. Returns 1 when the broadcast was created, 0 when
+    skipped.
     """
-    already = db.query(Notification.id).filter(
-        Notification.type == "course_published",
-        Notification.reference_id == str(world.id),
-    ).first()
-    if already:
-        logger.info(f"broadcast_course_published: already sent for {world.id}, skipping")
-        return 0
-
     course_type = (world.course_type or "course").lower()
     type_label = {"choreo": "choreo", "topic": "topic"}.get(course_type, "course")
     title = f"New {type_label}: {world.title}"
     message = f"{world.title} is live. Tap to check it out."
 
-    # Single SQL fan-out — one INSERT per user, atomic.
-    result = db.execute(
-        text(
-            """
-            INSERT INTO notifications (
-                id, user_id, actor_id, type, title, message,
-                reference_type, reference_id, is_read, created_at
-            )
-            SELECT gen_random_uuid(), users.id, NULL, :type, :title, :message,
-                   'course', :ref_id, false, NOW()
-            FROM users
-            WHERE (CAST(:exclude AS UUID) IS NULL OR users.id <> CAST(:exclude AS UUID))
-            """
+    broadcast = dict(
+        id=uuid.uuid4(),
+        type="course_published",
+        title=title,
+        message=message,
+        reference_type="course",
+        reference_id=str(world.id),
+        exclude_user_id=exclude_user_id,
+        created_at=datetime.utcnow(),
+    )
+    inserted = db.execute(
+        pg_insert(BroadcastNotification).values(**broadcast)
+        .on_conflict_do_nothing(constraint="unique_broadcast_reference")
+        .returning(BroadcastNotification.id)
+    ).first()
+    if inserted is None:
+        logger.info(f"broadcast_course_published: already sent for {world.id}, skipping")
+        return 0
+    notification_stream.notify_broadcast(BroadcastNotification(**broadcast), db)
+    logger.info(f"broadcast_course_published: broadcast {inserted[0]} for {world.id}")
+    return 1
+
+
+# ============================================
+# Broadcast visibility and read state
+# ============================================
+
+def _broadcast_window(user_id: str, db: Session) -> Optional[Tuple[datetime, datetime]]:
+    """(visible_from, read_until) for the user's broadcasts: those made
+    before they signed up aren't shown, and everything up to the watermark
+    is read. None for an unknown user."""
+    row = db.query(User.created_at, NotificationWatermark.broadcasts_read_until).outerjoin(
+        NotificationWatermark, NotificationWatermark.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    joined, read_until = row
+    return joined, max(joined, read_until) if read_until else joined
+
+
+def _visible_broadcasts(user_id: str, visible_from: datetime, db: Session):
+    """Broadcasts the user sees, each with its individual-read marker (or None)."""
+    return db.query(BroadcastNotification, BroadcastNotificationRead.broadcast_id).outerjoin(
+        BroadcastNotificationRead,
+        and_(
+            BroadcastNotificationRead.broadcast_id == BroadcastNotification.id,
+            BroadcastNotificationRead.user_id == user_id,
         ),
-        {
-            "type": "course_published",
-            "title": title,
-            "message": message,
-            "ref_id": str(world.id),
-            "exclude": str(exclude_user_id) if exclude_user_id else None,
-        },
+    ).filter(
+        BroadcastNotification.created_at >= visible_from,
+        or_(
+            BroadcastNotification.exclude_user_id.is_(None),
+            BroadcastNotification.exclude_user_id != user_id,
+        ),
+    )
+
+
+def _unread_broadcasts(user_id: str, window: Tuple[datetime, datetime], db: Session):
+    return _visible_broadcasts(user_id, window[0], db).filter(
+        BroadcastNotification.created_at > window[1],
+        BroadcastNotificationRead.broadcast_id.is_(None),
+    )
+
+
+def _format_broadcasts(rows, read_until: datetime) -> List[dict]:
+    return [
+        _format_broadcast(b, is_read=read_marker is not None or b.created_at <= read_until)
+        for b, read_marker in rows
+    ]
+
+
+def _merge(personal: List[dict], broadcasts: List[dict], newest_first: bool = True) -> List[dict]:
+    """Interleave two lists already in (created_at, id) order."""
+    return sorted(
+        personal + broadcasts,
+        key=lambda n: (n["created_at"], uuid.UUID(n["id"])),
+        reverse=newest_first,
     )
-    count = result.rowcount or 0
-    logger.info(f"broadcast_course_published: inserted {count} notifications for {world.id}")
-    return count
 
 
+# ============================================
+# Reading
+# ============================================
+
 def get_notifications(
     user_id: str,
     skip: int = 0,
     limit: int = 20,
-    db: Session = None
+    db: Session = None,
+    cursor: Optional[tuple] = None,
 ) -> List[dict]:
-    """Get all notifications for a user, newest first."""
-    notifications = db.query(Notification).filter(
-        Notification.user_id == user_id
-    ).order_by(
-        desc(Notification.created_at)
-    ).offset(skip).limit(limit).all()
+    """Get all notifications for a user (personal and broadcast), newest first.
+
+    Pass a decoded `cursor` (created_at, id) to resume after the previous
+    page (keyset); `skip` is only used by old clients without one.
+    """
+    window = _broadcast_window(user_id, db)
+    # Both sources are read up to the page end and merged; with an offset
+    # the page can start anywhere in either, hence skip + limit each.
+    fetch = limit if cursor else skip + limit
+
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    broadcasts = _visible_broadcasts(user_id, window[0], db) if window else None
+    if cursor:
+        query = query.filter(after_cursor(Notification.created_at, Notification.id, cursor))
+        if broadcasts is not None:
+            broadcasts = broadcasts.filter(
+                after_cursor(BroadcastNotification.created_at, BroadcastNotification.id, cursor)
+            )
+    notifications = query.order_by(
+        desc(Notification.created_at), desc(Notification.id)
+    ).limit(fetch).all()
 
-    return _format_notifications(notifications, db)
+    merged = _format_notifications(notifications, db)
+    if broadcasts is not None:
+        rows = broadcasts.order_by(
+            desc(BroadcastNotification.created_at), desc(BroadcastNotification.id)
+        ).limit(fetch).all()
+        merged = _merge(merged, _format_broadcasts(rows, window[1]))
+    return merged[:limit] if cursor else merged[skip:skip + limit]
 
 
 def get_unread_notifications(
@@ -122,27 +225,136 @@ def get_unread_notifications(
         desc(Notification.created_at)
     ).limit(limit).all()
 
-    return _format_notifications(notifications, db)
+    merged = _format_notifications(notifications, db)
+    window = _broadcast_window(user_id, db)
+    if window:
+        rows = _unread_broadcasts(user_id, window, db).order_by(
+            desc(BroadcastNotification.created_at)
+        ).limit(limit).all()
+        merged = _merge(merged, _format_broadcasts(rows, window[1]))
+    return merged[:limit]
+
+
+def get_notifications_since(
+    user_id: str,
+    position: tuple,
+    db: Session,
+    limit: int = 50,
+) -> List[Tuple[str, dict]]:
+    """Notifications newer than `position` (a decoded cursor), oldest first,
+    as (event id, payload) pairs — what an SSE client missed while away."""
+    created_at, row_id = position
+    rows = db.query(Notification).filter(
+        Notification.user_id == user_id,
+        tuple_(Notification.created_at, Notification.id) > tuple_(created_at, row_id),
+    ).order_by(
+        Notification.created_at, Notification.id
+    ).limit(limit).all()
+    merged = _format_notifications(rows, db)
+
+    window = _broadcast_window(user_id, db)
+    if window:
+        broadcasts = _visible_broadcasts(user_id, window[0], db).filter(
+            tuple_(BroadcastNotification.created_at, BroadcastNotification.id) > tuple_(created_at, row_id),
+        ).order_by(
+            BroadcastNotification.created_at, BroadcastNotification.id
+        ).limit(limit).all()
+        merged = _merge(merged, _format_broadcasts(broadcasts, window[1]), newest_first=False)
+    return [
+        (encode_cursor(n["created_at"], n["id"]), n)
+        for n in merged[:limit]
+    ]
 
 
 def get_unread_count(user_id: str, db: Session) -> int:
-    """Get count of unread notifications."""
+    """Get count of unread notifications (Redis counter, SQL on a miss)."""
+    return notification_stream.unread_count(user_id, db)
+
+
+def count_personal_unread(user_id: str, db: Session) -> int:
+    """Unread personal notifications (the partial unread index)."""
     return db.query(func.count(Notification.id)).filter(
         Notification.user_id == user_id,
         Notification.is_read == False
     ).scalar() or 0
 
 
+def count_unread(user_id: str, db: Session) -> int:
+    """Authoritative unread count from SQL."""
+    personal = count_personal_unread(user_id, db)
+    window = _broadcast_window(user_id, db)
+    if not window:
+        return personal
+    return personal + (_unread_broadcasts(user_id, window, db).count() or 0)
+
+
+def recent_broadcasts(db: Session, limit: int) -> List[dict]:
+    """The newest broadcasts, newest first, as cached by notification_stream
+    for unread counts."""
+    rows = db.query(
+        BroadcastNotification.id, BroadcastNotification.created_at, BroadcastNotification.exclude_user_id
+    ).order_by(
+        desc(BroadcastNotification.created_at), desc(BroadcastNotification.id)
+    ).limit(limit).all()
+    return [
+        {
+            "id": str(row_id),
+            "created_at": notification_stream.state_time(created_at),
+            "exclude_user_id": str(exclude) if exclude else None,
+        }
+        for row_id, created_at, exclude in rows
+    ]
+
+
+def broadcast_read_state(user_id: str, db: Session) -> Optional[dict]:
+    """The user's broadcast read state as cached by notification_stream:
+    ``until`` (everything at or before it is read or predates them) and
+    ``read:{id}`` for each broadcast read individually. None for an
+    unknown user."""
+    window = _broadcast_window(user_id, db)
+    if not window:
+        return None
+    state = {"until": notification_stream.state_time(window[1])}
+    for (broadcast_id,) in db.query(BroadcastNotificationRead.broadcast_id).filter(
+        BroadcastNotificationRead.user_id == user_id
+    ):
+        state[f"read:{broadcast_id}"] = "1"
+    return state
+
+
+# ============================================
+# Read state
+# ============================================
+
 def mark_read(notification_id: str, user_id: str, db: Session) -> bool:
-    """Mark a single notification as read."""
+    """Mark a single notification (personal or broadcast) as read."""
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
         Notification.user_id == user_id
     ).first()
-    if not notification:
+    if notification:
+        if not notification.is_read:
+            notification.is_read = True
+            db.flush()
+            notification_stream.notify_read(user_id, 1, db)
+        return True
+
+    window = _broadcast_window(user_id, db)
+    if not window:
         return False
-    notification.is_read = True
-    db.flush()
+    row = _visible_broadcasts(user_id, window[0], db).filter(
+        BroadcastNotification.id == notification_id
+    ).first()
+    if row is None:
+        return False
+    broadcast, read_marker = row
+    if read_marker is None and broadcast.created_at > window[1]:
+        db.execute(
+            pg_insert(BroadcastNotificationRead).values(
+                user_id=user_id, broadcast_id=broadcast.id, created_at=datetime.utcnow(),
+            ).on_conflict_do_nothing()
+        )
+        notification_stream.notify_read(user_id, 0, db, broadcast_id=str(broadcast.id))
     return True
 
 
@@ -152,8 +364,85 @@ def mark_all_read(user_id: str, db: Session) -> int:
         Notification.user_id == user_id,
         Notification.is_read == False
     ).update({"is_read": True})
+
+    window = _broadcast_window(user_id, db)
+    read_until = None
+    broadcasts = 0
+    if window:
+        unread = [
+            created_at for (created_at,) in _unread_broadcasts(user_id, window, db)
+            .with_entities(BroadcastNotification.created_at).all()
+        ]
+        if unread:
+            read_until = max(unread)
+            _advance_watermark(user_id, read_until, db)
+            broadcasts = len(unread)
     db.flush()
-    return count
+    notification_stream.notify_read(user_id, count, db, broadcasts_read_until=read_until)
+    return count + broadcasts
+
+
+def _advance_watermark(user_id: str, read_until: datetime, db: Session) -> None:
+    """Move the broadcast watermark forward (never back) and drop the
+    individual reads it now covers."""
+    stmt = pg_insert(NotificationWatermark).values(user_id=user_id, broadcasts_read_until=read_until)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[NotificationWatermark.user_id],
+        set_={"broadcasts_read_until": func.greatest(
+            NotificationWatermark.broadcasts_read_until, stmt.excluded.broadcasts_read_until
+        )},
+    ))
+    db.query(BroadcastNotificationRead).filter(
+        BroadcastNotificationRead.user_id == user_id,
+        BroadcastNotificationRead.broadcast_id.in_(
+            select(BroadcastNotification.id).where(BroadcastNotification.created_at <= read_until)
+        ),
+    ).delete(synchronize_session=False)
+
+
+# ============================================
+# Retention
+# ============================================
+
+# Read notifications are kept this long; unread ones a while longer.
+READ_RETENTION_DAYS = 90
+UNREAD_RETENTION_DAYS = 365
+
+
+def expired_notifications(
+    db: Session,
+    read_days: int = READ_RETENTION_DAYS,
+    unread_days: int = UNREAD_RETENTION_DAYS,
+    now: Optional[datetime] = None,
+):
+    """Query of the ids of personal notifications past retention."""
+    now = now or datetime.utcnow()
+    return db.query(Notification.id).filter(
+        or_(
+            Notification.created_at < now - timedelta(days=unread_days),
+            and_(Notification.is_read == True, Notification.created_at < now - timedelta(days=read_days)),
+        )
+    )
+
+
+def prune_notifications(
+    db: Session,
+    read_days: int = READ_RETENTION_DAYS,
+    unread_days: int = UNREAD_RETENTION_DAYS,
+    batch_size: int = 5000,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Delete one batch of notifications past retention. Returns the number
+    deleted; call (and commit) until it returns less than `batch_size`.
+    Small batches keep each delete's locks and WAL short.
+    """
+    batch = expired_notifications(db, read_days, unread_days, now).limit(batch_size).subquery()
+    deleted = db.query(Notification).filter(
+        Notification.id.in_(select(batch.c.id))
+    ).delete(synchronize_session=False)
+    db.flush()
+    return deleted
 
 
 def _format_notifications(rows: List[Notification], db: Session) -> List[dict]:
@@ -172,6 +461,23 @@ def _format_notifications(rows: List[Notification], db: Session) -> List[dict]:
     return [_format_notification(n, actors.get(str(n.actor_id)) if n.actor_id else None) for n in rows]
 
 
+def _format_broadcast(b: BroadcastNotification, is_read: bool) -> dict:
+    """Format a broadcast like a personal notification (ids never collide)."""
+    return {
+        "id": str(b.id),
+        "type": b.type,
+        "title": b.title,
+        "message": b.message,
+        "reference_type": b.reference_type,
+        "reference_id": b.reference_id,
+        "is_read": is_read,
+        "created_at": b.created_at,
+        "actor_id": None,
+        "actor_username": None,
+        "actor_avatar_url": None,
+    }
+
+
 def _format_notification(n: Notification, actor: Optional[UserProfile] = None) -> dict:
     """Format a notification for API response."""
     return {
@@ -0,0 +1,477 @@
+"""Real-time notification delivery: Redis pub/sub fan-out to SSE clients.
+
+The bell used to poll /notifications/unread-count every 30 seconds (a
+COUNT(*) per open tab, nearly always unchanged). Now:
+
+- Each committed notification is published on ``CHANNEL`` with its
+  recipient's user id. Every uvicorn worker runs one listener thread,
+  subscribed once, that hands events to the SSE connections it holds for
+  that user (``NotificationHub``), so a connection can live on any worker.
+- The unread count of personal notifications is kept in Redis
+  (``notifications:unread:{user_id}``), seeded from SQL on first read and
+  adjusted on create / mark-read. The adjustment only applies to an
+  existing key — a missing key is simply reseeded from SQL on the next
+  read — and the key expires after ``UNREAD_TTL_SECONDS``, which bounds
+  any drift.
+- Unread broadcasts are counted, not stored per user: the newest
+  ``RECENT_BROADCASTS`` broadcast rows (one shared Redis key) against the
+  user's broadcast read state (watermark plus individual reads, one Redis
+  hash per user, kept up to date on mark-read). A new broadcast only drops
+  the shared key and is pushed to every connection as one ``notification``
+  event that clients add to their count — no per-user keys to reset and no
+  refetch stampede.
+- Events carry the notification's keyset cursor as their SSE id, so a
+  reconnecting EventSource sends it back as Last-Event-ID and the stream
+  replays what was missed from SQL before going live.
+
+Pub/sub is at-most-once: when the listener loses Redis, or a slow client's
+queue overflows, the affected connections get a ``resync`` event and the
+client refetches. Heartbeats (SSE comments) keep proxies from closing idle
+streams and let the server notice disconnected clients.
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from services.redis_service import get_redis_client
+from utils.db_hooks import after_commit
+from utils.pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "notifications:events"
+BROADCAST = "*"
+_UNREAD_KEY = "notifications:unread:{user_id}"
+_BROADCAST_STATE_KEY = "notifications:broadcast_state:{user_id}"
+_RECENT_BROADCASTS_KEY = "notifications:broadcasts:recent"
+UNREAD_TTL_SECONDS = 3600
+RECENT_BROADCASTS = 50
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+QUEUE_SIZE = 100
+RECONNECT_DELAY_SECONDS = 5.0
+
+# Add ARGV[1] to an existing counter, floored at 0; nil if the key is absent.
+_ADJUST_IF_EXISTS = """
+local value = redis.call('GET', KEYS[1])
+if not value then return nil end
+local n = tonumber(value) + tonumber(ARGV[1])
+if n < 0 then n = 0 end
+redis.call('SET', KEYS[1], n, 'KEEPTTL')
+return n
+"""
+
+# Set hash field ARGV[1] = ARGV[2] only on an existing (seeded) hash.
+_HSET_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+
+# ============================================
+# Unread counter
+# ============================================
+
+def unread_count(user_id: str, db: Session) -> int:
+    """Personal unread (Redis counter, seeded from SQL when missing) plus
+    unread broadcasts."""
+    key = _UNREAD_KEY.format(user_id=user_id)
+    personal = None
+    try:
+        cached = get_redis_client().get(key)
+        if cached is not None:
+            personal = int(cached)
+    except Exception as e:
+        logger.debug(f"Unread counter read failed: {e}")
+
+    if personal is None:
+        from services.notification_service import count_personal_unread
+        personal = count_personal_unread(user_id, db)
+        try:
+            # NX: don't clobber a value another worker seeded in the meantime.
+            get_redis_client().set(key, personal, ex=UNREAD_TTL_SECONDS, nx=True)
+        except Exception as e:
+            logger.debug(f"Unread counter seed failed: {e}")
+    return personal + (_broadcast_unread(user_id, db) or 0)
+
+
+def _adjust_unread(user_id: str, delta: int) -> Optional[int]:
+    try:
+        result = get_redis_client().eval(_ADJUST_IF_EXISTS, 1, _UNREAD_KEY.format(user_id=user_id), delta)
+    except Exception as e:
+        logger.debug(f"Unread counter update failed: {e}")
+        return None
+    return int(result) if result is not None else None
+
+
+def _cached_personal(user_id: str) -> Optional[int]:
+    try:
+        cached = get_redis_client().get(_UNREAD_KEY.format(user_id=user_id))
+    except Exception as e:
+        logger.debug(f"Unread counter read failed: {e}")
+        return None
+    return int(cached) if cached is not None else None
+
+
+def _recent_broadcasts(db: Optional[Session]) -> Optional[List[dict]]:
+    """The newest broadcasts ({id, created_at, exclude_user_id}), cached for
+    every user. Without `db` only the cache is read (None on a miss)."""
+    try:
+        cached = get_redis_client().get(_RECENT_BROADCASTS_KEY)
+        if cached is not None:
+            return json.loads(cached)
+    except Exception as e:
+        logger.debug(f"Recent broadcasts read failed: {e}")
+    if db is None:
+        return None
+
+    from services.notification_service import recent_broadcasts
+    broadcasts = recent_broadcasts(db, RECENT_BROADCASTS)
+    try:
+        get_redis_client().set(_RECENT_BROADCASTS_KEY, json.dumps(broadcasts), ex=UNREAD_TTL_SECONDS, nx=True)
+    except Exception as e:
+        logger.debug(f"Recent broadcasts seed failed: {e}")
+    return broadcasts
+
+
+def _broadcast_state(user_id: str, db: Optional[Session]) -> Optional[dict]:
+    """The user's broadcast read state as a hash: ``until`` (watermark, or
+    sign-up time) and ``read:{id}`` per broadcast read above it. Without
+    `db` only the cache is read. None on a miss or for an unknown user."""
+    key = _BROADCAST_STATE_KEY.format(user_id=user_id)
+    try:
+        cached = get_redis_client().hgetall(key)
+        if cached:
+            return cached
+    except Exception as e:
+        logger.debug(f"Broadcast read state read failed: {e}")
+    if db is None:
+        return None
+
+    from services.notification_service import broadcast_read_state
+    state = broadcast_read_state(user_id, db)
+    if state is None:
+        return None
+    try:
+        pipe = get_redis_client().pipeline(transaction=True)
+        pipe.hset(key, mapping=state)
+        pipe.expire(key, UNREAD_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Broadcast read state seed failed: {e}")
+    return state
+
+
+def _broadcast_unread(user_id: str, db: Optional[Session]) -> Optional[int]:
+    """Unread broadcasts for the user: recent rows newer than the
+    watermark, not excluded, not read one by one."""
+    broadcasts = _recent_broadcasts(db)
+    state = _broadcast_state(user_id, db) if broadcasts is not None else None
+    if state is None:
+        return None if db is None else 0
+    until = state["until"]
+    return sum(
+        1 for b in broadcasts
+        if b["created_at"] > until
+        and b["exclude_user_id"] != user_id
+        and f"read:{b['id']}" not in state
+    )
+
+
+def _total_unread(user_id: str, personal: Optional[int]) -> Optional[int]:
+    """The full unread count from Redis alone, or None if any part isn't cached."""
+    if personal is None:
+        return None
+    broadcasts = _broadcast_unread(user_id, None)
+    return None if broadcasts is None else personal + broadcasts
+
+
+def _update_broadcast_state(user_id: str, field: str, value: str) -> None:
+    try:
+        get_redis_client().eval(_HSET_IF_EXISTS, 1, _BROADCAST_STATE_KEY.format(user_id=user_id), field, value)
+    except Exception as e:
+        logger.debug(f"Broadcast read state update failed: {e}")
+
+
+def state_time(value) -> str:
+    """A timestamp as stored in the broadcast caches (sortable as text)."""
+    return value.isoformat(timespec="microseconds")
+
+
+# ============================================
+# Publishing (after commit)
+# ============================================
+
+def event_id(notification) -> str:
+    return encode_cursor(notification.created_at, notification.id)
+
+
+def _publish(user_id: str, event: str, data: dict, event_id: Optional[str] = None,
+             exclude_user_id: Optional[str] = None) -> None:
+    try:
+        get_redis_client().publish(CHANNEL, json.dumps(
+            {"user_id": user_id, "event": event, "data": data, "id": event_id,
+             "exclude_user_id": exclude_user_id},
+            default=str,
+        ))
+    except Exception as e:
+        logger.debug(f"Notification publish failed: {e}")
+
+
+def notify_created(notifications: Iterable, db: Session) -> None:
+    """Once `db` commits: bump each recipient's unread count and push the event."""
+    from services.notification_service import _format_notification
+    events = [
+        (str(n.user_id), event_id(n), _format_notification(n))
+        for n in notifications
+    ]
+    if not events:
+        return
+
+    def _deliver() -> None:
+        for user_id, eid, payload in events:
+            payload["unread_count"] = _total_unread(user_id, _adjust_unread(user_id, +1))
+            _publish(user_id, "notification", payload, eid)
+
+    after_commit(db, _deliver)
+
+
+def notify_read(user_id: str, count: int, db: Session, *, broadcast_id: Optional[str] = None,
+                broadcasts_read_until=None) -> None:
+    """Once `db` commits: drop `count` from the personal unread count, record
+    a broadcast read one by one (`broadcast_id`) or up to a new watermark
+    (`broadcasts_read_until`), and update open tabs."""
+    if not (count or broadcast_id or broadcasts_read_until):
+        return
+
+    def _deliver() -> None:
+        if broadcast_id:
+            _update_broadcast_state(user_id, f"read:{broadcast_id}", "1")
+        if broadcasts_read_until:
+            _update_broadcast_state(user_id, "until", state_time(broadcasts_read_until))
+        personal = _adjust_unread(user_id, -count) if count else _cached_personal(user_id)
+        _publish(user_id, "unread", {"unread_count": _total_unread(user_id, personal)})
+
+    after_commit(db, _deliver)
+
+
+def notify_broadcast(broadcast, db: Session) -> None:
+    """Once `db` commits: a broadcast notification now shows for every user
+    (see notification_service.broadcast_course_published). The shared
+    recent-broadcasts key is dropped and every open tab gets the broadcast
+    as a `notification` event without an unread_count, which clients add
+    to their own count. Per-user state is untouched."""
+    from services.notification_service import _format_broadcast
+    payload = _format_broadcast(broadcast, is_read=False)
+    eid = event_id(broadcast)
+    exclude = str(broadcast.exclude_user_id) if broadcast.exclude_user_id else None
+
+    def _deliver() -> None:
+        try:
+            get_redis_client().delete(_RECENT_BROADCASTS_KEY)
+        except Exception as e:
+            logger.warning(f"Recent broadcasts not refreshed after broadcast: {e}")
+        _publish(BROADCAST, "notification", payload, eid, exclude_user_id=exclude)
+
+    after_commit(db, _deliver)
+
+
+# ============================================
+# Per-worker hub
+# ============================================
+
+def _default_client():
+    # A dedicated connection: a subscribed connection can't run commands.
+    import redis
+    from config import settings
+    return redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=5)
+
+
+_Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+class NotificationHub:
+    """The SSE connections this worker holds, fed by one pub/sub listener."""
+
+    def __init__(self, client_factory=_default_client) -> None:
+        self._client_factory = client_factory
+        self._subscribers: Dict[str, Set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    @property
+    def user_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Register a connection; call from the connection's event loop."""
+        self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(str(user_id))
+            if not subs:
+                return
+            subs.difference_update({s for s in subs if s[1] is queue})
+            if not subs:
+                del self._subscribers[str(user_id)]
+
+    def dispatch(self, message: dict) -> None:
+        """Hand an event to every local connection of its recipient."""
+        user_id = message.get("user_id")
+        with self._lock:
+            if user_id == BROADCAST:
+                exclude = message.get("exclude_user_id")
+                targets = [
+                    s for uid, subs in self._subscribers.items() if uid != exclude for s in subs
+                ]
+            else:
+                targets = list(self._subscribers.get(user_id, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                pass  # loop closed; the connection's finally will unsubscribe
+
+    def _resync_all(self) -> None:
+        self.dispatch({"user_id": BROADCAST, "event": "resync", "data": {}})
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="notification-hub", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            pubsub = None
+            try:
+                pubsub = self._client_factory().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Anything published while we were away is lost: have
+                # clients refetch (a no-op on the first connect).
+                self._resync_all()
+                while not self._stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get("type") != "message":
+                        continue
+                    try:
+                        self.dispatch(json.loads(message["data"]))
+                    except (ValueError, TypeError):
+                        logger.debug(f"Ignoring malformed notification event: {message['data']!r}")
+            except Exception as e:
+                logger.warning(f"Notification listener lost Redis, retrying: {e}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stopping.wait(RECONNECT_DELAY_SECONDS)
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+
+def _offer(queue: asyncio.Queue, message: dict) -> None:
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # The client isn't keeping up: replace the backlog with a resync.
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"event": "resync", "data": {}})
+
+
+_hub = NotificationHub()
+atexit.register(_hub.stop)
+
+
+def get_hub() -> NotificationHub:
+    return _hub
+
+
+def stop() -> None:
+    _hub.stop()
+
+
+# ============================================
+# SSE framing
+# ============================================
+
+def format_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(
+    user_id: str,
+    queue: asyncio.Queue,
+    is_disconnected,
+    backlog: List[Tuple[str, dict]],
+    unread: int,
+    expires_at: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    The SSE body for one connection: retry hint, replayed backlog, current
+    unread count, then live events with a heartbeat comment whenever
+    ``HEARTBEAT_SECONDS`` pass quietly. Ends at ``expires_at`` (the access
+    token's expiry) so the client has to reconnect with a valid token.
+    Unsubscribes when the client goes.
+    """
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        for eid, payload in backlog:
+            yield format_event("notification", payload, eid)
+        yield format_event("unread", {"unread_count": unread})
+        while True:
+            timeout = HEARTBEAT_SECONDS
+            if expires_at is not None:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    break
+                timeout = min(timeout, remaining)
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if expires_at is not None and time.time() >= expires_at:
+                    break
+                if _hub.stopping or await is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            yield format_event(message["event"], message.get("data") or {}, message.get("id"))
+    finally:
+        _hub.unsubscribe(user_id, queue)
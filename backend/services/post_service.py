@@ -3,7 +3,7 @@ Post Service - Community Posts for The Stage & The Lab
 Handles post creation, feeds, reactions, replies, and solutions.
 """
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, desc
@@ -12,10 +12,12 @@ import uuid
 
 from models.user import User, UserProfile, Subscription, SubscriptionTier, SubscriptionStatus
 from models.community import Post, PostReply, PostReaction, CommunityTag, ModerationStatus, SavedPost
-from services.moderation_service import evaluate_reply, evaluate_post
+from services import moderation_service
 from services.tier_service import community_participation_status, community_gate_message
 from services.mux_service import delete_asset as delete_mux_asset
-from services import rate_limit_service
+from services import rate_limit_service, leaderboard_service, feed_cache_service, user_stats_service, job_queue
+from utils.db_hooks import after_commit
+from utils.pagination import after_cursor
 from services.clave_service import (
     spend_claves, can_afford, get_video_slot_status, get_question_slot_status,
     award_accepted_answer,
@@ -106,10 +108,11 @@ def _format_post_response(post: Post, current_user_id: str, db: Session) -> dict
     return _build_post_dict(post, user, user_reaction, db, is_saved=is_saved)
 
 
-def _format_posts_bulk(posts: list, current_user_id: str, db: Session) -> list:
+def _format_posts_shared(posts: list, db: Session) -> list:
     """
-    Format a list of posts for API response using batch queries.
-    Avoids N+1: 2 extra queries regardless of how many posts.
+    Format posts without any viewer-specific fields (user_reaction and
+    is_saved are left at their defaults). This is the shape the feed cache
+    stores. One batch query for all authors.
     """
     if not posts:
         return []
@@ -121,36 +124,48 @@ def _format_posts_bulk(posts: list, current_user_id: str, db: Session) -> list:
     ).all()
     user_map = {str(u.id): u for u in users}
 
-    post_ids = [p.id for p in posts]
+    return [
+        _build_post_dict(p, user_map.get(str(p.user_id)), None, db)
+        for p in posts
+    ]
 
-    # Batch-load current user's reactions and saved status in two queries
-    reaction_map: dict = {}
-    saved_set: set = set()
-    if current_user_id:
-        reactions = db.query(PostReaction).filter(
-            PostReaction.post_id.in_(post_ids),
-            PostReaction.user_id == current_user_id
-        ).all()
-        reaction_map = {str(r.post_id): r.reaction_type for r in reactions}
 
-        saved_rows = db.query(SavedPost.post_id).filter(
-            SavedPost.post_id.in_(post_ids),
-            SavedPost.user_id == current_user_id
-        ).all()
-        saved_set = {str(row[0]) for row in saved_rows}
+def _apply_viewer_overlay(post_dicts: list, current_user_id: str, db: Session) -> list:
+    """
+    Merge the viewer's own state (user_reaction, is_saved) into formatted
+    posts. Two queries regardless of page size; none for anonymous viewers.
+    """
+    if not post_dicts or not current_user_id:
+        return post_dicts
+
+    post_ids = [d["id"] for d in post_dicts]
+
+    reactions = db.query(PostReaction.post_id, PostReaction.reaction_type).filter(
+        PostReaction.post_id.in_(post_ids),
+        PostReaction.user_id == current_user_id
+    ).all()
+    reaction_map = {str(post_id): reaction_type for post_id, reaction_type in reactions}
+
+    saved_rows = db.query(SavedPost.post_id).filter(
+        SavedPost.post_id.in_(post_ids),
+        SavedPost.user_id == current_user_id
+    ).all()
+    saved_set = {str(row[0]) for row in saved_rows}
 
     return [
-        _build_post_dict(
-            p,
-            user_map.get(str(p.user_id)),
-            reaction_map.get(str(p.id)),
-            db,
-            is_saved=str(p.id) in saved_set,
-        )
-        for p in posts
+        {**d, "user_reaction": reaction_map.get(d["id"]), "is_saved": d["id"] in saved_set}
+        for d in post_dicts
     ]
 
 
+def _format_posts_bulk(posts: list, current_user_id: str, db: Session) -> list:
+    """
+    Format a list of posts for API response using batch queries.
+    Avoids N+1: 3 extra queries regardless of how many posts.
+    """
+    return _apply_viewer_overlay(_format_posts_shared(posts, db), current_user_id, db)
+
+
 def _format_reply_response(reply: PostReply, db: Session, user: User = None) -> dict:
     """Format a reply for API response. Pass pre-loaded user to avoid extra query."""
     if user is None:
@@ -174,6 +189,97 @@ def format_posts_bulk_public(posts: list, current_user_id: str, db: Session) ->
     return _format_posts_bulk(posts, current_user_id, db)
 
 
+def _on_post_published(post: Post, db: Session) -> None:
+    """
+    Side effects of a post becoming publicly visible — at creation, or when
+    a pending post is cleared by moderation. Only visible posts count
+    toward tag usage and leaderboards; flagged posts must not inflate
+    channel/trending tag stats.
+    """
+    for tag_slug in post.tags or []:
+        db.query(CommunityTag).filter(
+            CommunityTag.slug == tag_slug
+        ).update({"usage_count": CommunityTag.usage_count + 1})
+    leaderboard_service.record_event(
+        leaderboard_service.METRIC_POSTS, str(post.user_id), db, occurred_at=post.created_at
+    )
+    user_stats_service.record_post(post, +1, db)
+    _queue_content_badges(post, f"post_published:{post.id}", db)
+
+
+def _queue_content_badges(post: Post, key: str, db: Session) -> None:
+    """Check the author's content badges against their counters once `db` commits."""
+    job_queue.enqueue_after_commit(
+        db,
+        "community.post_created",
+        key=key,
+        user_id=str(post.user_id),
+        post_type=post.post_type,
+        video_type=post.video_type,
+        has_video=post.mux_asset_id is not None,
+    )
+
+
+def _on_reply_published(reply: PostReply, post: Post) -> None:
+    """Only publicly visible replies count toward reply_count."""
+    post.reply_count = (post.reply_count or 0) + 1
+
+
+def attach_post_video(post: Post, asset_id: str, playback_id: str, db: Session) -> None:
+    """
+    Attach a finished Mux upload to its post (upload poll or webhook; stage
+    posts are created before the upload completes). The first attach counts
+    the video toward its author's stats and queues their video badge checks
+    for after the commit. Caller commits.
+    """
+    first_attach = post.mux_asset_id is None
+    if first_attach:
+        user_stats_service.record_video(post, +1, db)
+    post.mux_asset_id = asset_id
+    post.mux_playback_id = playback_id
+    if first_attach and user_stats_service.is_counted(post):
+        _queue_content_badges(post, f"post_video:{post.id}", db)
+
+
+def detach_post_video(post: Post, db: Session) -> None:
+    """Clear a post's Mux asset (deleted by an admin); it stops counting. Caller commits."""
+    if post.mux_asset_id is not None:
+        user_stats_service.record_video(post, -1, db)
+    post.mux_asset_id = None
+    post.mux_playback_id = None
+
+
+def apply_moderation_verdict(kind: str, object_id: str, status: str, db: Session) -> bool:
+    """
+    Resolve a pending post/reply to the AI verdict ('active' or
+    'flagged_by_ai'). Only pending rows transition — if an admin already
+    approved/ghosted it, or the author deleted it, the verdict is dropped.
+    Publishing side effects run here for rows cleared to active.
+    Returns True if the row changed. Caller commits.
+    """
+    model = Post if kind == "post" else PostReply
+    row = (
+        db.query(model)
+        .filter(model.id == object_id)
+        .with_for_update()
+        .first()
+    )
+    if not row or row.is_deleted or row.moderation_status != ModerationStatus.PENDING.value:
+        return False
+
+    row.moderation_status = status
+    if status == ModerationStatus.ACTIVE.value:
+        if kind == "post":
+            _on_post_published(row, db)
+        else:
+            post = db.query(Post).filter(Post.id == row.post_id).with_for_update().first()
+            if post:
+                _on_reply_published(row, post)
+    db.flush()
+    logger.info(f"Moderation verdict for {kind} {object_id}: {status}")
+    return True
+
+
 def create_post(
     user_id: str,
     post_type: str,
@@ -203,11 +309,6 @@ def create_post(
             "gate_state": gate["state"],
         }
 
-    # Hourly rate limit (anti-spam; the only gate now that posting is free).
-    allowed, info = rate_limit_service.check("post", user_id, db)
-    if not allowed:
-        return {"success": False, "message": info["message"], "rate_limited": True}
-
     # Validate tags exist
     if not tags or len(tags) == 0:
         return {"success": False, "message": "At least one tag is required"}
@@ -263,11 +364,18 @@ def create_post(
         # Lab posts require body
         if not body or not body.strip():
             return {"success": False, "message": "Question body is required for Lab posts"}
-    
+
+    # Hourly rate limit (anti-spam; the only gate now that posting is free).
+    # Checked after validation so a rejected submission doesn't use up a slot.
+    allowed, info = rate_limit_service.check("post", user_id, db)
+    if not allowed:
+        return {"success": False, "message": info["message"], "rate_limited": True}
+
     # Posting is free. spend_claves() is a no-op when cost == 0 but we keep the
     # call so anti-abuse (future non-zero pricing) can reuse the same path.
     success, balance = spend_claves(user_id, cost, f"post_{post_type}", db)
     if not success:
+        rate_limit_service.refund("post", user_id)
         return {
             "success": False,
             "message": f"Unable to post right now. Please try again shortly.",
@@ -280,10 +388,12 @@ def create_post(
     # 1", "Beginner Combo 2") repeatedly tripped the "gibberish/filler"
     # rule and silenced legitimate dancers. Lab posts always have a body
     # with the actual question text, so moderation still applies there.
+    # Unless the verdict is cached the post starts 'pending' and the
+    # moderation pipeline decides after commit.
     if post_type == "stage":
         moderation_status = ModerationStatus.ACTIVE.value
     else:
-        moderation_status = evaluate_post(title=title, body=body)
+        moderation_status = moderation_service.moderate_post(title=title, body=body)
 
     # Create post
     post = Post(
@@ -302,16 +412,12 @@ def create_post(
         moderation_status=moderation_status,
     )
     db.add(post)
+    db.flush()
 
-    # Only visible posts count toward tag usage — flagged posts must not
-    # inflate channel/trending tag stats.
     if moderation_status == ModerationStatus.ACTIVE.value:
-        for tag_slug in valid_tag_slugs:
-            db.query(CommunityTag).filter(
-                CommunityTag.slug == tag_slug
-            ).update({"usage_count": CommunityTag.usage_count + 1})
-
-    db.flush()
+        _on_post_published(post, db)
+    elif moderation_status == ModerationStatus.PENDING.value:
+        moderation_service.schedule(db, "post", post.id, title, body)
 
     logger.info(f"User {user_id} created {post_type} post {post.id} [moderation={moderation_status}]")
 
@@ -335,40 +441,100 @@ def get_feed(
     skip: int = 0,
     limit: int = 20,
     current_user_id: str = None,
-    db: Session = None
+    db: Session = None,
+    cursor: Optional[tuple] = None,
 ) -> List[dict]:
     """
-    Get paginated feed of posts.
+    Get paginated feed of posts, newest first.
     Supports single tag or multi-tag filtering.
     Shadowban: flagged posts are visible only to their author.
+
+    Pagination: pass a decoded `cursor` (created_at, id) from
+    utils.pagination to resume after the last post of the previous page —
+    `skip` is ignored then. Offset paging still works for old clients.
+
+    Served through feed_cache_service whenever the viewer would see exactly
+    the public feed, i.e. they have no hidden posts of their own to splice in.
     """
     from sqlalchemy import or_ as _or
 
-    query = db.query(Post).filter(Post.is_deleted == False)
+    if tags and len(tags) > 0:
+        tag_filter = tags
+    elif tag:
+        tag_filter = [tag]
+    else:
+        tag_filter = None
+    if video_type not in _VALID_VIDEO_TYPES:
+        video_type = None
+
+    sees_public_feed = not current_user_id or not _has_hidden_posts(current_user_id, db)
+    if sees_public_feed:
+        if cursor:
+            page_key = f"c{cursor[0].isoformat()}|{cursor[1]}:{limit}"
+        else:
+            page_key = f"o{skip}:{limit}"
+        page, filter_key = feed_cache_service.get_page(post_type, tag_filter, video_type, page_key)
+        if page is None:
+            query = _feed_query(post_type, tag_filter, video_type, db).filter(
+                Post.moderation_status == ModerationStatus.ACTIVE.value
+            )
+            posts = _paginate_newest_first(query, skip, limit, cursor).all()
+            page = _format_posts_shared(posts, db)
+            feed_cache_service.put_page(filter_key, page_key, page)
+        return _apply_viewer_overlay(page, current_user_id, db)
+
+    query = _feed_query(post_type, tag_filter, video_type, db).filter(_or(
+        Post.moderation_status == ModerationStatus.ACTIVE.value,
+        Post.user_id == current_user_id,
+    ))
+    posts = _paginate_newest_first(query, skip, limit, cursor).all()
+    return _format_posts_bulk(posts, current_user_id, db)
 
-    if current_user_id:
-        query = query.filter(_or(
-            Post.moderation_status == ModerationStatus.ACTIVE.value,
-            Post.user_id == current_user_id,
-        ))
+
+def _paginate_newest_first(query, skip: int, limit: int, cursor: Optional[tuple]):
+    """Order posts by (created_at, id) DESC and apply keyset or offset paging.
+    The id tie-breaker makes the order total, which keyset paging needs."""
+    if cursor:
+        query = query.filter(after_cursor(Post.created_at, Post.id, cursor))
     else:
-        query = query.filter(Post.moderation_status == ModerationStatus.ACTIVE.value)
+        query = query.offset(skip)
+    return query.order_by(desc(Post.created_at), desc(Post.id)).limit(limit)
+
+
+def _has_hidden_posts(user_id: str, db: Session) -> bool:
+    """True if the user authored any live post that only they can see."""
+    return db.query(
+        db.query(Post.id).filter(
+            Post.user_id == user_id,
+            Post.is_deleted == False,
+            Post.moderation_status != ModerationStatus.ACTIVE.value,
+        ).exists()
+    ).scalar()
+
+
+def _feed_query(
+    post_type: Optional[str],
+    tags: Optional[List[str]],
+    video_type: Optional[str],
+    db: Session,
+):
+    """Base feed query (no visibility filter) for the given filters."""
+    from sqlalchemy import or_ as _or
+
+    query = db.query(Post).filter(Post.is_deleted == False)
 
     if post_type:
         query = query.filter(Post.post_type == post_type)
 
-    if video_type and video_type in _VALID_VIDEO_TYPES:
+    if video_type:
         # video_type only applies to stage posts; lab posts have it null.
         query = query.filter(Post.video_type == video_type)
 
-    if tags and len(tags) > 0:
+    if tags:
         # Multi-tag filter: post must have ANY of the specified tags
         query = query.filter(_or(*[Post.tags.any(t) for t in tags]))
-    elif tag:
-        query = query.filter(Post.tags.any(tag))
 
-    posts = query.order_by(desc(Post.created_at)).offset(skip).limit(limit).all()
-    return _format_posts_bulk(posts, current_user_id, db)
+    return query
 
 
 def get_post_detail(
@@ -480,6 +646,17 @@ def add_reaction(
     db.add(reaction)
     post.reaction_count += 1
     db.flush()
+    if user_stats_service.is_counted(post):
+        user_stats_service.record_likes(post, reaction.reaction_type, +1, db)
+
+    leaderboard_increments = [
+        (leaderboard_service.METRIC_REACTIONS_GIVEN, user_id, reaction.created_at, 1),
+    ]
+    if post.moderation_status == ModerationStatus.ACTIVE.value:
+        leaderboard_increments.append(
+            (leaderboard_service.METRIC_REACTIONS_RECEIVED, str(post.user_id), reaction.created_at, 1)
+        )
+    leaderboard_service.record_events(leaderboard_increments, db)
 
     logger.info(f"User {user_id} liked post {post_id}")
     return {
@@ -530,9 +707,28 @@ def remove_reaction(
         if owner_stats and owner_stats.reactions_received_count > 0:
             owner_stats.reactions_received_count -= 1
 
+    leaderboard_increments = [
+        (leaderboard_service.METRIC_REACTIONS_GIVEN, user_id, reaction.created_at, -1),
+    ]
+    if post and not post.is_deleted and post.moderation_status == ModerationStatus.ACTIVE.value:
+        leaderboard_increments.append(
+            (leaderboard_service.METRIC_REACTIONS_RECEIVED, str(post.user_id), reaction.created_at, -1)
+        )
+
+    if post and user_stats_service.is_counted(post):
+        user_stats_service.record_likes(post, reaction.reaction_type, -1, db)
+
     db.delete(reaction)
     db.flush()
 
+    # A like still inside the rate-limit window gives its unit back, as the
+    # deleted row did when the limit counted rows.
+    window = rate_limit_service.POLICIES["reaction"].window_seconds
+    if reaction.created_at and reaction.created_at >= datetime.utcnow() - timedelta(seconds=window):
+        after_commit(db, lambda: rate_limit_service.refund("reaction", user_id))
+
+    leaderboard_service.record_events(leaderboard_increments, db)
+
     total = post.reaction_count if post else 0
     return {
         "success": True,
@@ -633,6 +829,7 @@ def add_reply(
     # so the same path can gate future pricing or per-user accounting.
     success, balance = spend_claves(user_id, COST_COMMENT, "comment", db, reference_id=str(post_id))
     if not success:
+        rate_limit_service.refund("reply", user_id)
         return {
             "success": False,
             "message": "Unable to post comment right now. Please try again shortly.",
@@ -640,8 +837,8 @@ def add_reply(
             "balance": balance
         }
 
-    # AI Gatekeeper: evaluate reply content before saving
-    moderation_status = evaluate_reply(content)
+    # AI Gatekeeper: cached verdict, or 'pending' until the pipeline decides
+    moderation_status = moderation_service.moderate_reply(content)
 
     # Create reply with moderation status
     reply = PostReply(
@@ -656,12 +853,19 @@ def add_reply(
     )
     db.add(reply)
 
-    # Only count publicly visible replies toward reply_count
     if moderation_status == ModerationStatus.ACTIVE.value:
-        post.reply_count += 1
+        _on_reply_published(reply, post)
 
     db.flush()
 
+    if moderation_status == ModerationStatus.PENDING.value:
+        moderation_service.schedule(db, "reply", reply.id, content)
+
+    leaderboard_service.record_event(
+        leaderboard_service.METRIC_REPLIES, user_id, db, occurred_at=reply.created_at
+    )
+    user_stats_service.record_reply(user_id, +1, db)
+
     logger.info(f"User {user_id} replied to post {post_id} [moderation={moderation_status}]")
     return {
         "success": True,
@@ -704,14 +908,25 @@ def mark_solution(
     if str(reply.user_id) == user_id:
         return {"success": False, "message": "You can't accept your own answer"}
     
+    leaderboard_increments = []
+
     # Unmark previous accepted answer if any
     if post.accepted_answer_id:
         old_answer = db.query(PostReply).filter(
             PostReply.id == post.accepted_answer_id
         ).first()
         if old_answer:
+            if old_answer.is_accepted_answer and old_answer.id != reply.id and not old_answer.is_deleted:
+                leaderboard_increments.append(
+                    (leaderboard_service.METRIC_SOLUTIONS, str(old_answer.user_id), old_answer.created_at, -1)
+                )
             old_answer.is_accepted_answer = False
-    
+
+    if not reply.is_accepted_answer and not reply.is_deleted:
+        leaderboard_increments.append(
+            (leaderboard_service.METRIC_SOLUTIONS, str(reply.user_id), reply.created_at, 1)
+        )
+
     # Mark new answer
     reply.is_accepted_answer = True
     post.accepted_answer_id = reply.id
@@ -721,6 +936,8 @@ def mark_solution(
     award_accepted_answer(str(reply.user_id), str(post_id), db)
     
     db.flush()
+
+    leaderboard_service.record_events(leaderboard_increments, db)
     
     logger.info(f"Post {post_id} marked reply {reply_id} as solution")
     return {"success": True, "message": "Solution marked! Helper awarded 15 🥢"}
@@ -806,6 +1023,17 @@ def update_post(
     }
 
 
+@job_queue.job("mux.delete_asset", max_attempts=8)
+def _delete_mux_asset_job(asset_id: str) -> None:
+    if not delete_mux_asset(asset_id):
+        raise RuntimeError(f"Mux asset {asset_id} was not deleted")
+
+
+def schedule_mux_delete(asset_id: str, db: Session) -> None:
+    """Release a Mux asset once `db` commits (job queue, retried)."""
+    job_queue.enqueue_after_commit(db, "mux.delete_asset", key=f"mux_delete:{asset_id}", asset_id=asset_id)
+
+
 def delete_post(
     post_id: str,
     user_id: str,
@@ -830,9 +1058,33 @@ def delete_post(
         if str(post.user_id) != user_id and not is_admin:
             return {"success": False, "message": "You can only delete your own posts"}
 
+        was_counted = user_stats_service.is_counted(post)
+
         # Soft delete
         post.is_deleted = True
 
+        # Leaderboard and user_stats: a deleted post stops scoring for its
+        # author, and so do the likes it had collected (bucketed by when
+        # each like landed, and by reaction type for the stats row).
+        if was_counted:
+            post_owner_id = str(post.user_id)
+            leaderboard_increments = [
+                (leaderboard_service.METRIC_POSTS, post_owner_id, post.created_at, -1),
+            ]
+            reactions_by_type = {}
+            reaction_day = func.date_trunc("day", PostReaction.created_at)
+            for day, reaction_type, n in db.query(
+                reaction_day, PostReaction.reaction_type, func.count(PostReaction.id)
+            ).filter(
+                PostReaction.post_id == post.id
+            ).group_by(reaction_day, PostReaction.reaction_type).all():
+                leaderboard_increments.append(
+                    (leaderboard_service.METRIC_REACTIONS_RECEIVED, post_owner_id, day, -n)
+                )
+                reactions_by_type[reaction_type] = reactions_by_type.get(reaction_type, 0) + n
+            leaderboard_service.record_events(leaderboard_increments, db)
+            user_stats_service.record_post(post, -1, db, reaction_counts=reactions_by_type)
+
         # Decrement tag usage counts so tag stats remain accurate
         for tag_slug in (post.tags or []):
             db.query(CommunityTag).filter(
@@ -840,24 +1092,16 @@ def delete_post(
             ).update({"usage_count": CommunityTag.usage_count - 1})
 
         # Mux asset cleanup: free the video from Mux so we don't pay for orphaned assets.
-        # Post's own video.
-        if post.mux_asset_id:
-            try:
-                delete_mux_asset(post.mux_asset_id)
-            except Exception:
-                logger.exception(f"Failed to delete Mux asset {post.mux_asset_id} for post {post_id}")
-
-        # Cascade: video replies on this post also get their Mux assets released.
-        reply_assets = db.query(PostReply.mux_asset_id).filter(
+        # Post's own video, then the video replies on this post. Queued for
+        # after the commit (a Mux round trip per asset, retried on failure).
+        asset_ids = [post.mux_asset_id] if post.mux_asset_id else []
+        asset_ids += [asset_id for (asset_id,) in db.query(PostReply.mux_asset_id).filter(
             PostReply.post_id == post_id,
             PostReply.mux_asset_id.isnot(None),
             PostReply.is_deleted == False
-        ).all()
-        for (asset_id,) in reply_assets:
-            try:
-                delete_mux_asset(asset_id)
-            except Exception:
-                logger.exception(f"Failed to delete reply Mux asset {asset_id} for post {post_id}")
+        ).all()]
+        for asset_id in asset_ids:
+            schedule_mux_delete(asset_id, db)
 
         db.flush()
 
@@ -895,35 +1139,26 @@ def search_posts(
     skip: int = 0,
     limit: int = 20,
     current_user_id: str = None,
-    db: Session = None
+    db: Session = None,
+    cursor: Optional[tuple] = None,
+    sort: str = "relevance",
 ) -> List[dict]:
     """
-    Search posts by title, author username, and/or tags.
-    Title and username use ILIKE; also matches if query appears in any tag.
+    Search posts by text (title, body, tags), author username, or exact tag.
+    See search_service for matching and scoring.
     Additional tag/tags/video_type params narrow results.
     Shadowban: flagged posts are returned only to their author.
+
+    sort="relevance" (default) pages by offset; sort="new" (or any cursor)
+    returns newest first with the same cursor/offset contract as get_feed.
+    Each result carries `highlight` ({title?, body?} HTML with <mark> tags)
+    when the text index matched.
     """
     from sqlalchemy import or_
-    from models.user import UserProfile
-
-    # Escape ILIKE special characters to prevent wildcard injection
-    escaped_query = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
-    pattern = f"%{escaped_query}%"
-
-    # Search title OR username (via outer join — keeps posts whose author
-    # has no profile row from being silently dropped) OR tag content.
-    search_query = (
-        db.query(Post)
-        .outerjoin(UserProfile, UserProfile.user_id == Post.user_id)
-        .filter(
-            Post.is_deleted == False,
-            or_(
-                Post.title.ilike(pattern),
-                UserProfile.username.ilike(pattern),
-                Post.tags.any(query.lower()),
-            ),
-        )
-    )
+    from services import search_service
+
+    search_query, score = search_service.build_search_query(db, query)
+    search_query = search_query.filter(Post.is_deleted == False)
 
     if current_user_id:
         search_query = search_query.filter(or_(
@@ -947,18 +1182,22 @@ def search_posts(
     elif tag:
         search_query = search_query.filter(Post.tags.any(tag))
 
-    # The outer join to user_profiles can dup posts if a user has multiple
-    # profile rows (shouldn't happen, but the join could in theory). Use
-    # distinct() to be safe.
-    posts = (
-        search_query
-        .distinct(Post.id)
-        .order_by(Post.id, desc(Post.created_at))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return _format_posts_bulk(posts, current_user_id, db)
+    if sort == "new" or cursor:
+        posts = _paginate_newest_first(search_query, skip, limit, cursor).all()
+    else:
+        posts = (
+            search_query
+            .order_by(desc(score), desc(Post.created_at), desc(Post.id))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    results = _format_posts_bulk(posts, current_user_id, db)
+    highlights = search_service.get_highlights(db, [p.id for p in posts], query)
+    for item in results:
+        item["highlight"] = highlights.get(item["id"])
+    return results
 
 
 def update_reply(
@@ -1016,15 +1255,20 @@ def delete_reply(
     if str(reply.user_id) != user_id and not is_admin:
         return {"success": False, "message": "You can only delete your own replies"}
 
+    leaderboard_increments = [
+        (leaderboard_service.METRIC_REPLIES, str(reply.user_id), reply.created_at, -1),
+    ]
+    if reply.is_accepted_answer:
+        leaderboard_increments.append(
+            (leaderboard_service.METRIC_SOLUTIONS, str(reply.user_id), reply.created_at, -1)
+        )
+
     # Soft delete
     reply.is_deleted = True
 
-    # Mux asset cleanup for video replies.
+    # Mux asset cleanup for video replies (after the commit).
     if reply.mux_asset_id:
-        try:
-            delete_mux_asset(reply.mux_asset_id)
-        except Exception:
-            logger.exception(f"Failed to delete Mux asset {reply.mux_asset_id} for reply {reply_id}")
+        schedule_mux_delete(reply.mux_asset_id, db)
 
     # Decrement reply count on parent post
     post = db.query(Post).filter(Post.id == post_id).first()
@@ -1039,5 +1283,8 @@ def delete_reply(
 
     db.flush()
 
+    leaderboard_service.record_events(leaderboard_increments, db)
+    user_stats_service.record_reply(str(reply.user_id), -1, db)
+
     logger.info(f"User {user_id} (admin={is_admin}) soft-deleted reply {reply_id}")
     return {"success": True, "message": "Reply deleted"}
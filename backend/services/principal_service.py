@@ -0,0 +1,283 @@
+"""
+Principal Service - who the current request is acting as.
+
+A `Principal` bundles the authenticated User with their subscription state
+(status / tier / period end) and lazily their profile. It is resolved once
+per request by `dependencies.get_current_user` and memoized on the
+request's Session (`db.info`), so services that only get `(user_id, db)` —
+`clave_service.is_user_pro`, `tier_service.user_tier`,
+`skill_tree_access.is_lesson_accessible` — can answer from it via
+`cached(db, user_id)` instead of re-querying Subscription.
+
+Across requests the user row and subscription state come from a short-TTL
+Redis snapshot (`principal:{user_id}`), so a warm request authenticates
+with zero SQL. The snapshot is dropped after any committed change to that
+User or Subscription row (mapper events below — this covers the Stripe
+webhook, profile/account updates and admin edits alike).
+
+Deliberately NOT snapshotted:
+- `hashed_password` (never leaves Postgres; loads on access if needed);
+- the UserProfile — it carries hot counters (xp, claves, streak) that
+  change on most writes; caching it across requests would serve stale
+  balances and let `profile.xp += n` write back a stale value. It is loaded
+  at most once per request through `principal.profile` instead.
+"""
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Optional, Union
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from models.user import (
+    Subscription,
+    SubscriptionStatus,
+    SubscriptionTier,
+    User,
+    UserProfile,
+    UserRole,
+)
+from services.redis_service import get_redis_client
+from utils.db_hooks import after_commit
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL_SECONDS = 60
+_SNAPSHOT_KEY = "principal:{user_id}"
+_INFO_KEY = "principal"
+
+# Columns of `users` carried in the snapshot (everything but the password).
+_USER_FIELDS = ("email", "auth_provider", "social_id", "is_verified")
+_PRO_TIERS = (SubscriptionTier.ADVANCED, SubscriptionTier.PERFORMER)
+_ACTIVE_STATUSES = (SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING)
+
+
+class Principal:
+    """The authenticated user plus their subscription state."""
+
+    def __init__(
+        self,
+        user: User,
+        subscription_status: Optional[SubscriptionStatus] = None,
+        subscription_tier: Optional[SubscriptionTier] = None,
+        current_period_end: Optional[datetime] = None,
+    ) -> None:
+        self.user = user
+        self.subscription_status = subscription_status
+        self.subscription_tier = subscription_tier
+        self.current_period_end = current_period_end
+
+    @property
+    def user_id(self) -> str:
+        return str(self.user.id)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.user.role == UserRole.ADMIN
+
+    @property
+    def profile(self) -> Optional[UserProfile]:
+        """Loaded on first access; the identity map keeps it for the request."""
+        return self.user.profile
+
+    @property
+    def subscription(self) -> Optional[Subscription]:
+        """The ORM row, for handlers that read more than the tier or mutate it."""
+        return self.user.subscription
+
+    @property
+    def has_active_subscription(self) -> bool:
+        return self.subscription_status in _ACTIVE_STATUSES
+
+    @property
+    def is_pro(self) -> bool:
+        """Same rule as `clave_service.is_user_pro`."""
+        return self.has_active_subscription and self.subscription_tier in _PRO_TIERS
+
+    @property
+    def tier(self) -> str:
+        """Same rule as `tier_service.user_tier`."""
+        from services.tier_service import effective_tier
+        return effective_tier(self.subscription_status, self.subscription_tier, self.current_period_end)
+
+
+# ============================================
+# Snapshot (de)serialization
+# ============================================
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _to_snapshot(principal: Principal) -> str:
+    user = principal.user
+    return json.dumps({
+        "user": {
+            "id": str(user.id),
+            "role": user.role.value,
+            "created_at": _iso(user.created_at),
+            "updated_at": _iso(user.updated_at),
+            **{name: getattr(user, name) for name in _USER_FIELDS},
+        },
+        "subscription": {
+            "status": principal.subscription_status.value,
+            "tier": principal.subscription_tier.value,
+            "current_period_end": _iso(principal.current_period_end),
+        } if principal.subscription_status is not None else None,
+    })
+
+
+def _from_snapshot(raw: str, db: Session) -> Principal:
+    data = json.loads(raw)
+    u = data["user"]
+    user = User(
+        id=uuid.UUID(u["id"]),
+        role=UserRole(u["role"]),
+        created_at=_parse_dt(u["created_at"]),
+        updated_at=_parse_dt(u["updated_at"]),
+        **{name: u[name] for name in _USER_FIELDS},
+    )
+    # Present it to the session as a clean, already-persisted row: no SELECT,
+    # attributes not in the snapshot load on first access, and a handler
+    # that changes a column flushes an UPDATE of just that column.
+    make_transient_to_detached(user)
+    user = db.merge(user, load=False)
+
+    s = data.get("subscription")
+    if not s:
+        return Principal(user)
+    return Principal(
+        user,
+        SubscriptionStatus(s["status"]),
+        SubscriptionTier(s["tier"]),
+        _parse_dt(s["current_period_end"]),
+    )
+
+
+# ============================================
+# Resolution
+# ============================================
+
+def _info(db: Session) -> Optional[dict]:
+    info = getattr(db, "info", None)
+    # MagicMock sessions in unit tests have no real info dict.
+    return info if isinstance(info, dict) else None
+
+
+def cached(db: Session, user_id: Union[str, uuid.UUID]) -> Optional[Principal]:
+    """The request's principal if it is `user_id`, else None (no I/O)."""
+    info = _info(db)
+    principal = info.get(_INFO_KEY) if info is not None else None
+    if principal is not None and principal.user_id == str(user_id):
+        return principal
+    return None
+
+
+def loaded_profile(db: Session, user_id: Union[str, uuid.UUID]) -> Optional[UserProfile]:
+    """The UserProfile for `user_id` if this session already holds it, with
+    its columns loaded (no I/O). It may carry uncommitted changes."""
+    identity_map = getattr(db, "identity_map", None)
+    if not hasattr(identity_map, "values"):
+        return None
+    for obj in identity_map.values():
+        if (
+            isinstance(obj, UserProfile)
+            and str(obj.user_id) == str(user_id)
+            and not inspect(obj).expired_attributes
+        ):
+            return obj
+    return None
+
+
+def _load(db: Session, user_id: uuid.UUID) -> Optional[Principal]:
+    row = (
+        db.query(User, Subscription.status, Subscription.tier, Subscription.current_period_end)
+        .outerjoin(Subscription, Subscription.user_id == User.id)
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    user, status, tier, period_end = row
+    return Principal(user, status, tier, period_end)
+
+
+def resolve(db: Session, user_id: uuid.UUID) -> Optional[Principal]:
+    """
+    The principal for `user_id`, or None if the user doesn't exist.
+
+    Request memo first, then the Redis snapshot, then one SELECT (user
+    joined to subscription), which refreshes the snapshot.
+    """
+    principal = cached(db, user_id)
+    if principal is not None:
+        return principal
+
+    key = _SNAPSHOT_KEY.format(user_id=user_id)
+    try:
+        raw = get_redis_client().get(key)
+    except Exception as e:
+        logger.debug(f"Principal snapshot read failed: {e}")
+        raw = None
+
+    if raw:
+        try:
+            principal = _from_snapshot(raw, db)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable principal snapshot for {user_id}: {e}")
+            principal = None
+
+    if principal is None:
+        principal = _load(db, user_id)
+        if principal is None:
+            return None
+        try:
+            get_redis_client().setex(key, SNAPSHOT_TTL_SECONDS, _to_snapshot(principal))
+        except Exception as e:
+            logger.debug(f"Principal snapshot write failed: {e}")
+
+    info = _info(db)
+    if info is not None:
+        info[_INFO_KEY] = principal
+    return principal
+
+
+def invalidate(user_id: Union[str, uuid.UUID]) -> None:
+    """Drop the snapshot (call after the user's row or subscription changes)."""
+    try:
+        get_redis_client().delete(_SNAPSHOT_KEY.format(user_id=user_id))
+    except Exception as e:
+        logger.debug(f"Principal snapshot invalidation failed: {e}")
+
+
+def _on_change(user_id, session: Optional[Session]) -> None:
+    if user_id is None:
+        return
+    if session is None:
+        invalidate(user_id)
+        return
+    # The request memo is stale from here on, whether or not this commits.
+    info = _info(session)
+    if info is not None and cached(session, user_id) is not None:
+        info.pop(_INFO_KEY, None)
+    user_id = str(user_id)
+    after_commit(session, lambda: invalidate(user_id))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_change(mapper, connection, target) -> None:
+    _on_change(target.id, object_session(target))
+
+
+@event.listens_for(Subscription, "after_insert")
+@event.listens_for(Subscription, "after_update")
+@event.listens_for(Subscription, "after_delete")
+def _invalidate_on_subscription_change(mapper, connection, target) -> None:
+    _on_change(target.user_id, object_session(target))
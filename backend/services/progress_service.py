@@ -0,0 +1,236 @@
+"""
+Progress Service - completing a lesson in one transaction.
+
+`complete_lesson` is the whole completion pipeline:
+
+1. the lesson and its world come from the catalog snapshot (no SQL), and
+   access is checked against the request's Principal (no SQL);
+2. `user_progress` is upserted with INSERT .. ON CONFLICT DO UPDATE
+   WHERE NOT is_completed, so a second completion (double-click, retry)
+   returns no row and is refused without a separate read;
+3. the profile is read once, FOR UPDATE, and XP, streak (freezes
+   included) and streak badges are applied to it in memory
+   (gamification_service.apply_xp / apply_streak);
+4. the LessonCompleted event goes to the analytics write-behind buffer,
+   its attribution read from the profile already in the session.
+
+The caller commits once; every change above is flushed by that commit.
+scripts/bench_lesson_completion.py counts the statements per completion.
+
+Completed lessons per user are also kept as a Redis set
+(`progress:completed:{user_id}`), so course lists, skill trees and unlock
+maps never query user_progress:
+
+- `completed_lessons` reads it with one SMEMBERS. A set without the
+  SENTINEL member (missing, expired, or only holding lessons completed
+  since) is cold-loaded from user_progress and merged in.
+- Writes only ever add (SADD), after the completion commits, so a cold
+  load racing a completion can't drop it. Ids of lessons deleted since
+  are left behind; callers only look up ids from the catalog.
+- `check_completed_lessons` compares the set with user_progress and
+  repairs it (scripts/check_progress_cache.py samples users).
+- Redis down: the same query as the cold load, every time.
+"""
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import FrozenSet, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.progress import UserProgress
+from models.user import UserProfile
+from services import catalog_service
+from services.catalog_service import CatalogLesson, CatalogWorld
+from services.gamification_service import MAX_XP_PER_AWARD, apply_streak, apply_xp
+from services.principal_service import Principal
+from services.redis_service import get_redis_client
+from utils.db_hooks import after_commit
+
+logger = logging.getLogger(__name__)
+
+
+COMPLETED_KEY = "progress:completed:{user_id}"
+COMPLETED_TTL_SECONDS = 7 * 24 * 3600
+# Marks a set as fully loaded; never a lesson id.
+SENTINEL = "*"
+
+
+class CompletionError(Exception):
+    http_status = 400
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class LessonNotFound(CompletionError):
+    http_status = 404
+
+
+class SubscriptionRequired(CompletionError):
+    http_status = 403
+
+
+class AlreadyCompleted(CompletionError):
+    http_status = 400
+
+
+def find_lesson(db: Session, lesson_id: str) -> Optional[Tuple[CatalogWorld, CatalogLesson]]:
+    """The lesson and its world from the catalog snapshot, or None."""
+    return catalog_service.get_catalog(db).lesson(lesson_id)
+
+
+# ============================================
+# Completed-lesson set
+# ============================================
+
+def _load_completed(user_id: str, db: Session) -> FrozenSet[str]:
+    rows = db.query(UserProgress.lesson_id).filter(
+        UserProgress.user_id == user_id,
+        UserProgress.is_completed == True,  # noqa: E712
+    ).all()
+    return frozenset(str(lesson_id) for (lesson_id,) in rows)
+
+
+def _add_completed(user_id: str, lesson_ids, loaded: bool = False) -> None:
+    key = COMPLETED_KEY.format(user_id=user_id)
+    members = list(lesson_ids) + ([SENTINEL] if loaded else [])
+    if not members:
+        return
+    try:
+        pipe = get_redis_client().pipeline()
+        pipe.sadd(key, *members)
+        pipe.expire(key, COMPLETED_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Completed-lesson set write failed: {e}")
+
+
+def completed_lessons(user_id: str, db: Session) -> FrozenSet[str]:
+    """Ids of every lesson the user has completed."""
+    user_id = str(user_id)
+    try:
+        members = get_redis_client().smembers(COMPLETED_KEY.format(user_id=user_id))
+    except Exception as e:
+        logger.debug(f"Completed-lesson set read failed: {e}")
+        return _load_completed(user_id, db)
+    if SENTINEL in members:
+        return frozenset(members - {SENTINEL})
+
+    completed = _load_completed(user_id, db)
+    _add_completed(user_id, completed, loaded=True)
+    return completed | frozenset(members)
+
+
+def check_completed_lessons(user_id: str, db: Session, fix: bool = False) -> Tuple[set, set]:
+    """
+    Compare the cached set with user_progress: returns (missing, extra) ids.
+    Only loaded sets are checked. The cache is read first, so an id it has
+    that user_progress (read after) lacks is genuinely stale. `fix` adds
+    the missing ids and removes the extra ones.
+    """
+    user_id = str(user_id)
+    key = COMPLETED_KEY.format(user_id=user_id)
+    client = get_redis_client()
+    members = client.smembers(key)
+    if SENTINEL not in members:
+        return set(), set()
+    cached = members - {SENTINEL}
+    actual = _load_completed(user_id, db)
+    missing, extra = set(actual - cached), set(cached - actual)
+    if fix:
+        if missing:
+            _add_completed(user_id, missing)
+        if extra:
+            client.srem(key, *extra)
+    return missing, extra
+
+
+# ============================================
+# Completion
+# ============================================
+
+def _mark_completed(user_id: str, lesson_id: str, db: Session) -> bool:
+    """Upsert the progress row as completed; False if it already was."""
+    now = datetime.now(timezone.utc)
+    stmt = (
+        insert(UserProgress)
+        .values(id=uuid.uuid4(), user_id=user_id, lesson_id=lesson_id, is_completed=True, completed_at=now)
+        .on_conflict_do_update(
+            constraint="unique_user_lesson",
+            set_={"is_completed": True, "completed_at": now},
+            where=UserProgress.is_completed.is_(False),
+        )
+        .returning(UserProgress.id)
+    )
+    return db.execute(stmt).first() is not None
+
+
+def complete_lesson(principal: Principal, lesson_id: str, db: Session) -> dict:
+    """
+    Mark the lesson complete for `principal` and award its XP and today's
+    streak. Returns the XP result (xp_gained, new_total_xp, leveled_up,
+    new_level); raises CompletionError. Flushes nothing: the caller commits.
+
+    Access control mirrors `GET /courses/lessons/{lesson_id}`: admins are
+    unrestricted, free worlds are open to any user, paid worlds need an
+    active subscription.
+    """
+    found = find_lesson(db, lesson_id)
+    if found is None:
+        raise LessonNotFound("Lesson not found")
+    world, lesson = found
+
+    if not principal.is_admin and not world.is_free and not principal.has_active_subscription:
+        raise SubscriptionRequired("Subscription required to complete this lesson.")
+
+    user_id = principal.user_id
+    if not _mark_completed(user_id, lesson.id, db):
+        raise AlreadyCompleted("Lesson already completed")
+    after_commit(db, lambda: _add_completed(user_id, [lesson.id]))
+
+    profile = (
+        db.query(UserProfile)
+        .filter(UserProfile.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    if profile is None:
+        # Progress is still recorded; there's nothing to award XP to.
+        return {"xp_gained": 0, "new_total_xp": 0, "leveled_up": False, "new_level": 1}
+
+    xp_amount = min(lesson.xp_value or 0, MAX_XP_PER_AWARD)
+    if xp_amount > 0:
+        xp_result = apply_xp(profile, xp_amount, db, reason="lesson_complete")
+    else:
+        xp_result = {
+            "xp_gained": 0,
+            "new_total_xp": profile.xp,
+            "leveled_up": False,
+            "new_level": profile.level,
+        }
+
+    apply_streak(profile, db)
+
+    # ML feature: completion velocity is the core engagement signal.
+    try:
+        from services.analytics_service import track_event
+        track_event(
+            db=db,
+            event_name="LessonCompleted",
+            user_id=profile.user_id,
+            properties={
+                "lesson_id": lesson.id,
+                "lesson_title": lesson.title,
+                "world_slug": world.slug,
+                "is_boss_battle": lesson.is_boss_battle,
+                "xp": lesson.xp_value,
+                "leveled_up": xp_result["leveled_up"],
+            },
+        )
+    except Exception:
+        logger.exception("complete_lesson: track failed (non-fatal)")
+
+    return xp_result
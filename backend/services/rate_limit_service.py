@@ -9,80 +9,186 @@ Limits are intentionally generous — a genuinely active user shouldn't hit
 them. They are a soft floor against bot/scripted abuse, not a throttle on
 human behavior.
 
-Backed by the existing Post / PostReply / PostReaction tables (no Redis,
-no new schema). Queries are indexed on user_id + created_at so the cost
-is a single count per hour.
+Counting is a Redis sliding window (redis_service.sliding_window_hit — one
+atomic script call). The pro/free tier that picks the limit is cached in
+Redis for TIER_CACHE_TTL (and dropped when a Subscription row changes),
+so the hot path does no SQL at all. Only when
+Redis is unavailable do we fall back to counting the action's own rows
+in Post / PostReply / PostReaction (indexed on user_id + created_at).
+
+An action that fails after its check, or a row deleted inside the window,
+gives its unit back with ``refund``. New actions plug in with
+``register_policy``.
 """
+import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Tuple
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
 
 from models.community import Post, PostReply, PostReaction
+from models.user import Subscription
+from services import redis_service
 from services.clave_service import is_user_pro
+from utils.db_hooks import after_commit
+from utils.rate_limit_headers import RateLimitResult, record
 
+logger = logging.getLogger(__name__)
+
+TIER_CACHE_TTL = 300  # seconds; backstop for tier changes made outside the ORM
+_TIER_KEY = "rl:tier:{user_id}"
+
+
+def _counter(model) -> Callable[[Session, str, datetime], int]:
+    def count_since(db: Session, user_id: str, since: datetime) -> int:
+        return db.query(func.count(model.id)).filter(
+            model.user_id == user_id,
+            model.created_at >= since,
+        ).scalar() or 0
+    return count_since
 
-# (free_limit, pro_limit) per hour
-LIMITS = {
-    "post": (10, 20),
-    "reply": (30, 60),
-    "reaction": (60, 120),
-}
 
-_ACTION_LABELS = {
-    "post": "posts",
-    "reply": "replies",
-    "reaction": "reactions",
+@dataclass(frozen=True)
+class Policy:
+    """How one action is limited."""
+    label: str                  # plural noun for the denial message
+    free_limit: int
+    pro_limit: Optional[int] = None   # None: same limit for everyone (no tier lookup)
+    window_seconds: int = 3600
+    # SQL fallback when Redis is down; None means fail open.
+    count_since: Optional[Callable[[Session, str, datetime], int]] = None
+
+
+POLICIES: Dict[str, Policy] = {
+    "post": Policy("posts", 10, 20, count_since=_counter(Post)),
+    "reply": Policy("replies", 30, 60, count_since=_counter(PostReply)),
+    "reaction": Policy("reactions", 60, 120, count_since=_counter(PostReaction)),
 }
 
 
-def _limit_for(action: str, is_pro: bool) -> int:
-    free, pro = LIMITS[action]
-    return pro if is_pro else free
+def register_policy(action: str, policy: Policy) -> None:
+    POLICIES[action] = policy
 
 
-def _count_since(db: Session, action: str, user_id: str, since: datetime) -> int:
-    if action == "post":
-        return db.query(func.count(Post.id)).filter(
-            Post.user_id == user_id,
-            Post.created_at >= since,
-        ).scalar() or 0
-    if action == "reply":
-        return db.query(func.count(PostReply.id)).filter(
-            PostReply.user_id == user_id,
-            PostReply.created_at >= since,
-        ).scalar() or 0
-    if action == "reaction":
-        return db.query(func.count(PostReaction.id)).filter(
-            PostReaction.user_id == user_id,
-            PostReaction.created_at >= since,
-        ).scalar() or 0
-    raise ValueError(f"Unknown rate limit action: {action}")
+def _policy(action: str) -> Policy:
+    try:
+        return POLICIES[action]
+    except KeyError:
+        raise ValueError(f"Unknown rate limit action: {action}")
+
+
+# ============================================
+# Tier lookup (cached)
+# ============================================
+
+def _user_is_pro(user_id: str, db: Session) -> bool:
+    key = _TIER_KEY.format(user_id=user_id)
+    try:
+        cached = redis_service.get_redis_client().get(key)
+        if cached is not None:
+            return cached == "1"
+    except Exception as e:
+        logger.debug(f"Tier cache read failed: {e}")
+
+    is_pro = is_user_pro(user_id, db)
+    try:
+        redis_service.get_redis_client().setex(key, TIER_CACHE_TTL, "1" if is_pro else "0")
+    except Exception as e:
+        logger.debug(f"Tier cache write failed: {e}")
+    return is_pro
+
+
+def invalidate_tier(user_id: str) -> None:
+    """Drop the cached tier (call after a subscription changes)."""
+    try:
+        redis_service.get_redis_client().delete(_TIER_KEY.format(user_id=user_id))
+    except Exception as e:
+        logger.debug(f"Tier cache invalidation failed: {e}")
+
+
+@event.listens_for(Subscription, "after_insert")
+@event.listens_for(Subscription, "after_update")
+def _invalidate_tier_on_subscription_change(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None and target.user_id is not None:
+        user_id = str(target.user_id)
+        after_commit(session, lambda: invalidate_tier(user_id))
+
+
+def _limit_for(policy: Policy, user_id: str, db: Session) -> int:
+    if policy.pro_limit is None:
+        return policy.free_limit
+    return policy.pro_limit if _user_is_pro(user_id, db) else policy.free_limit
+
+
+# ============================================
+# Checks
+# ============================================
+
+def _sql_check(action: str, policy: Policy, limit: int, user_id: str, db: Session) -> RateLimitResult:
+    """Fallback: count the user's rows for this action in the window."""
+    if policy.count_since is None:
+        return RateLimitResult(True, limit, limit, policy.window_seconds)
+    since = datetime.utcnow() - timedelta(seconds=policy.window_seconds)
+    current = policy.count_since(db, user_id, since)
+    result = RateLimitResult(
+        allowed=current < limit,
+        limit=limit,
+        remaining=max(limit - current - 1, 0) if current < limit else 0,
+        reset_seconds=policy.window_seconds,
+    )
+    record(result)
+    return result
 
 
 def check(action: str, user_id: str, db: Session) -> Tuple[bool, dict]:
     """
     Returns (allowed, info). info includes current/limit/reset_seconds so
-    callers can surface useful feedback. On denial, allowed=False.
+    callers can surface useful feedback. On denial, allowed=False. An
+    allowed check consumes one unit of the user's allowance; call it once
+    the request has passed its own validation, and `refund` if the action
+    still doesn't happen.
 
     Unknown action raises ValueError (programmer error, not user input).
     """
-    is_pro = is_user_pro(user_id, db)
-    limit = _limit_for(action, is_pro)
-
-    window_start = datetime.utcnow() - timedelta(hours=1)
-    current = _count_since(db, action, user_id, window_start)
-
-    if current < limit:
-        return True, {"current": current, "limit": limit, "window_seconds": 3600}
-
-    label = _ACTION_LABELS.get(action, action)
-    return False, {
-        "current": current,
-        "limit": limit,
-        "window_seconds": 3600,
-        "message": (
-            f"You've hit the hourly limit of {limit} {label}. "
-            "Take a breather and come back shortly."
-        ),
+    policy = _policy(action)
+    limit = _limit_for(policy, user_id, db)
+
+    try:
+        result = redis_service.sliding_window_hit(f"{action}:{user_id}", limit, policy.window_seconds)
+    except Exception as e:
+        logger.warning(f"Rate limiter falling back to SQL for {action}: {e}")
+        result = _sql_check(action, policy, limit, user_id, db)
+
+    info = {
+        "current": result.limit - result.remaining,
+        "limit": result.limit,
+        "remaining": result.remaining,
+        "window_seconds": policy.window_seconds,
+        "reset_seconds": result.reset_seconds,
     }
+    if result.allowed:
+        return True, info
+
+    window = "hourly limit" if policy.window_seconds == 3600 else "limit"
+    info["message"] = (
+        f"You've hit the {window} of {limit} {policy.label}. "
+        "Take a breather and come back shortly."
+    )
+    return False, info
+
+
+def refund(action: str, user_id: str) -> None:
+    """
+    Give back the unit an allowed `check` consumed — the action failed
+    after all, or its row was deleted inside the window. Like the SQL
+    fallback's row count, the allowance tracks rows that exist. Best
+    effort: a Redis error just leaves the unit spent.
+    """
+    policy = _policy(action)
+    try:
+        redis_service.sliding_window_refund(f"{action}:{user_id}", policy.window_seconds)
+    except Exception as e:
+        logger.debug(f"Rate limit refund failed for {action}: {e}")
@@ -89,6 +89,119 @@ def verify_oauth_state(state: str, provider: str) -> bool:
         return False
 
 
+# ============================================
+# Sliding-window rate limiting
+# ============================================
+
+# Sliding-window counter: one integer per fixed window; the effective count
+# is the current window plus the previous window weighted by how much of it
+# still overlaps the sliding window. O(1) memory per (action, identifier),
+# and check-and-increment is a single atomic script, so concurrent requests
+# can't both slip past the limit the way GET-then-INCR allowed.
+#
+# KEYS[1] = current window key, KEYS[2] = previous window key
+# ARGV    = limit, window_ms, elapsed_ms (into current window), cost
+# Returns {allowed (0/1), count after this request, reset_ms}
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local curr = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local count = prev * (window - elapsed) / window + curr
+if count + cost > limit then
+  local wait = window - elapsed
+  if prev > 0 and curr + cost <= limit then
+    -- the previous window slides out linearly; wait until enough has gone
+    local needed = window - (limit - cost - curr) * window / prev
+    wait = math.max(needed - elapsed, 1)
+  end
+  return {0, math.ceil(count), math.ceil(wait)}
+end
+redis.call('INCRBY', KEYS[1], cost)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, math.ceil(count + cost), window - elapsed}
+"""
+
+_sliding_window_script = None
+
+
+def sliding_window_hit(key: str, limit: int, window_seconds: int, cost: int = 1):
+    """
+    Atomically count one request against a sliding window.
+
+    Returns a RateLimitResult(allowed, limit, remaining, reset_seconds) and
+    records it for the X-RateLimit-* headers. Raises on Redis errors —
+    callers choose between failing open and a fallback.
+    """
+    import time
+    from utils.rate_limit_headers import RateLimitResult, record
+
+    global _sliding_window_script
+    client = get_redis_client()
+    if _sliding_window_script is None:
+        _sliding_window_script = client.register_script(_SLIDING_WINDOW_LUA)
+
+    window_ms = window_seconds * 1000
+    now_ms = int(time.time() * 1000)
+    window_index = now_ms // window_ms
+    # Hash tag keeps both windows in one cluster slot.
+    keys = [f"rl:{{{key}}}:{window_index}", f"rl:{{{key}}}:{window_index - 1}"]
+    allowed, count, reset_ms = _sliding_window_script(
+        keys=keys, args=[limit, window_ms, now_ms - window_index * window_ms, cost], client=client
+    )
+    result = RateLimitResult(
+        allowed=bool(allowed),
+        limit=limit,
+        remaining=max(limit - int(count), 0),
+        reset_seconds=-(-int(reset_ms) // 1000),
+    )
+    record(result)
+    return result
+
+
+# Give back units an allowed hit took, newest window first (the current
+# window holds the hit unless the window rolled over since).
+#
+# KEYS[1] = current window key, KEYS[2] = previous window key
+# ARGV    = cost
+# Returns the number of units given back
+_SLIDING_WINDOW_REFUND_LUA = """
+local left = tonumber(ARGV[1])
+for i = 1, 2 do
+  local n = tonumber(redis.call('GET', KEYS[i]) or '0')
+  local take = math.min(n, left)
+  if take > 0 then
+    redis.call('DECRBY', KEYS[i], take)
+    left = left - take
+  end
+end
+return tonumber(ARGV[1]) - left
+"""
+
+_sliding_window_refund_script = None
+
+
+def sliding_window_refund(key: str, window_seconds: int, cost: int = 1) -> int:
+    """
+    Undo `cost` units of an earlier sliding_window_hit on `key` (the action
+    it allowed did not happen, or its row was deleted). Raises on Redis
+    errors, like sliding_window_hit.
+    """
+    import time
+
+    global _sliding_window_refund_script
+    client = get_redis_client()
+    if _sliding_window_refund_script is None:
+        _sliding_window_refund_script = client.register_script(_SLIDING_WINDOW_REFUND_LUA)
+
+    window_ms = window_seconds * 1000
+    window_index = int(time.time() * 1000) // window_ms
+    keys = [f"rl:{{{key}}}:{window_index}", f"rl:{{{key}}}:{window_index - 1}"]
+    return int(_sliding_window_refund_script(keys=keys, args=[cost], client=client))
+
+
 def check_rate_limit(identifier: str, action: str, max_requests: int = 5, window_seconds: int = 300) -> bool:
     """
     Check if an action is rate limited for a given identifier.
@@ -97,28 +210,16 @@ def check_rate_limit(identifier: str, action: str, max_requests: int = 5, window
         identifier: Unique identifier (e.g., email or IP address)
         action: The action being rate limited (e.g., 'forgot_password')
         max_requests: Maximum requests allowed in the window
-        window_seconds: Time window in seconds (default: 5 minutes)
+        window_seconds: Sliding window length in seconds (default: 5 minutes)
     
     Returns:
         True if allowed (not rate limited), False if blocked
     """
     try:
-        client = get_redis_client()
-        key = f"rate_limit:{action}:{identifier}"
-        current = client.get(key)
-        
-        if current is None:
-            # First request - set counter with expiration
-            client.setex(key, window_seconds, 1)
-            return True
-        
-        if int(current) >= max_requests:
+        result = sliding_window_hit(f"{action}:{identifier}", max_requests, window_seconds)
+        if not result.allowed:
             logger.warning(f"Rate limit exceeded for {action}: {identifier}")
-            return False
-        
-        # Increment counter (keep existing TTL)
-        client.incr(key)
-        return True
+        return result.allowed
     except Exception as e:
         logger.error(f"Rate limit check failed: {e}")
         # Fail open - allow request if Redis is unavailable
@@ -193,13 +294,14 @@ def invalidate_clave_balance(user_id: str) -> bool:
         return False
 
 
-def cache_feed_page(feed_type: str, page: int, data: str) -> bool:
+def cache_feed_page(feed_type: str, page, data: str) -> bool:
     """
     Cache a page of feed data.
     
     Args:
-        feed_type: 'stage' or 'lab' or 'all'
-        page: Page number
+        feed_type: Filter key ('stage' / 'lab' / 'all' plus any tag and
+            video_type filters and the generation, see feed_cache_service)
+        page: Page identifier (offset/limit or cursor)
         data: JSON string of feed data
     
     Returns:
@@ -215,7 +317,7 @@ def cache_feed_page(feed_type: str, page: int, data: str) -> bool:
         return False
 
 
-def get_cached_feed_page(feed_type: str, page: int) -> Optional[str]:
+def get_cached_feed_page(feed_type: str, page) -> Optional[str]:
     """
     Get cached feed page.
     
@@ -252,6 +354,10 @@ def blacklist_token(token: str, ttl_seconds: int) -> bool:
         token_hash = hashlib.sha256(token.encode()).hexdigest()
         key = f"{_TOKEN_BLACKLIST_PREFIX}{token_hash}"
         client.setex(key, ttl_seconds, "1")
+        # Other workers' Bloom filters learn about it over pub/sub.
+        from services.revocation_filter import CHANNEL, get_filter
+        get_filter().add(token_hash)
+        client.publish(CHANNEL, token_hash)
         return True
     except Exception as e:
         logger.error(f"Failed to blacklist token: {e}")
@@ -263,10 +369,16 @@ def is_token_blacklisted(token: str) -> bool:
     Return True if the token has been explicitly revoked (e.g. after logout).
     Fails *open* on Redis error — if Redis is down we allow the request rather
     than lock everyone out.
+
+    Most tokens are answered by this worker's Bloom filter without touching
+    Redis (services/revocation_filter.py); only filter hits are confirmed.
     """
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    from services.revocation_filter import get_filter
+    if get_filter().definitely_not_revoked(token_hash):
+        return False
     try:
         client = get_redis_client()
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
         key = f"{_TOKEN_BLACKLIST_PREFIX}{token_hash}"
         return bool(client.exists(key))
     except Exception as e:
@@ -377,28 +489,82 @@ def get_mux_upload_owner(upload_id: str) -> Optional[str]:
         return None
 
 
+# Feed pages are keyed by a per-post_type generation number instead of being
+# deleted on write: invalidation is a single INCR (no KEYS scan blocking
+# Redis), and superseded pages simply age out via FEED_CACHE_TTL.
+_FEED_GENERATION_PREFIX = "feed:gen:"
+_FEED_STATS_KEY = "feed:stats"
+FEED_POST_TYPES = ("stage", "lab")
+
+
+def get_feed_generations(post_types=FEED_POST_TYPES) -> Optional[dict]:
+    """
+    Current generation number per post_type.
+
+    Returns:
+        {post_type: int} or None if Redis is unavailable
+    """
+    try:
+        client = get_redis_client()
+        values = client.mget([f"{_FEED_GENERATION_PREFIX}{t}" for t in post_types])
+        return {t: int(v or 0) for t, v in zip(post_types, values)}
+    except Exception as e:
+        logger.error(f"Failed to read feed generations: {e}")
+        return None
+
+
 def invalidate_feed_cache(feed_type: str = None) -> bool:
     """
-    Invalidate feed cache. Called when posts are created/deleted.
+    Invalidate feed cache. Called when posts are created/updated/deleted.
     
     Args:
-        feed_type: Specific feed type to invalidate, or None for all
+        feed_type: Specific post_type ('stage'/'lab') to invalidate, or None for all.
+            Pages of the unfiltered feed depend on every type, so they are
+            invalidated either way.
     
     Returns:
         True if successful, False otherwise
     """
     try:
         client = get_redis_client()
-        if feed_type:
-            pattern = f"feed:{feed_type}:*"
-        else:
-            pattern = "feed:*"
-        
-        keys = client.keys(pattern)
-        if keys:
-            client.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} feed cache entries")
+        types = [feed_type] if feed_type in FEED_POST_TYPES else list(FEED_POST_TYPES)
+        pipe = client.pipeline(transaction=False)
+        for t in types:
+            pipe.incr(f"{_FEED_GENERATION_PREFIX}{t}")
+        pipe.execute()
         return True
     except Exception as e:
         logger.error(f"Failed to invalidate feed cache: {e}")
         return False
+
+
+def record_feed_cache_result(hit: bool) -> None:
+    """Bump the shared hit/miss counters. Never raises."""
+    try:
+        client = get_redis_client()
+        client.hincrby(_FEED_STATS_KEY, "hits" if hit else "misses", 1)
+    except Exception as e:
+        logger.debug(f"Failed to record feed cache stat: {e}")
+
+
+def get_feed_cache_stats() -> dict:
+    """
+    Cumulative feed cache counters across all workers.
+
+    Returns:
+        {hits, misses, hit_rate} (zeros if Redis is unavailable)
+    """
+    try:
+        client = get_redis_client()
+        raw = client.hgetall(_FEED_STATS_KEY) or {}
+    except Exception as e:
+        logger.error(f"Failed to read feed cache stats: {e}")
+        raw = {}
+    hits = int(raw.get("hits", 0))
+    misses = int(raw.get("misses", 0))
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
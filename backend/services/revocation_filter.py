@@ -0,0 +1,174 @@
+"""Local Bloom filter over revoked access tokens.
+
+Every authenticated request used to ask Redis whether its token had been
+blacklisted (logout, password reset), although almost none ever are. Each
+worker now keeps a Bloom filter of the blacklisted token hashes:
+
+- "definitely not revoked" answers come from memory — no Redis call;
+- a filter hit (a revoked token, or a rare false positive) still confirms
+  against Redis, so a false positive never rejects a valid token.
+
+Keeping the filter complete is what makes a miss trustworthy:
+
+- on start the listener subscribes to ``CHANNEL`` *first*, then SCANs the
+  existing ``blacklisted:token:*`` keys, so nothing revoked in between can
+  slip through;
+- ``redis_service.blacklist_token`` adds the hash locally and publishes it,
+  so other workers learn about it within one pub/sub hop;
+- entries can't be removed from a Bloom filter, so it is rebuilt from a
+  fresh SCAN every ``REBUILD_SECONDS`` to shed expired tokens.
+
+Until the first sync completes, or whenever the subscription drops, the
+filter reports "not ready" and callers fall back to asking Redis. The
+listener thread starts lazily on first use, like the other background
+workers.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "blacklist:tokens"
+KEY_PATTERN = "blacklisted:token:*"
+_KEY_PREFIX = KEY_PATTERN[:-1]
+
+BLOOM_BITS = 1 << 20      # 128 KiB; ~1% false positives at ~100k revoked tokens
+BLOOM_HASHES = 7
+REBUILD_SECONDS = 600
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter keyed by hex SHA-256 digests.
+
+    The digest is already uniformly distributed, so the k bit positions are
+    just successive 4-byte slices of it — no further hashing needed.
+    """
+
+    def __init__(self, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES) -> None:
+        if hashes > 8:
+            raise ValueError("a SHA-256 digest yields at most 8 positions")
+        self._bits = bits
+        self._hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, digest: str):
+        raw = bytes.fromhex(digest)
+        for i in range(self._hashes):
+            yield int.from_bytes(raw[i * 4:(i + 1) * 4], "big") % self._bits
+
+    def add(self, digest: str) -> None:
+        for pos in self._positions(digest):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: str) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+def _default_client():
+    # A dedicated connection: a subscribed connection can't run commands,
+    # and the shared client is used by request threads.
+    import redis
+    from config import settings
+    return redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=5)
+
+
+class RevocationFilter:
+    """Bloom filter kept in sync with the Redis token blacklist."""
+
+    def __init__(self, client_factory=_default_client, rebuild_seconds: float = REBUILD_SECONDS) -> None:
+        self._client_factory = client_factory
+        self._rebuild_seconds = rebuild_seconds
+        self._bloom: Optional[BloomFilter] = None   # None = not ready
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Request side
+    # ------------------------------------------------------------------
+
+    def definitely_not_revoked(self, digest: str) -> bool:
+        """True only when the token is certainly not blacklisted. False means
+        "ask Redis" (revoked, a false positive, or filter not ready)."""
+        self._ensure_started()
+        bloom = self._bloom
+        return bloom is not None and digest not in bloom
+
+    def add(self, digest: str) -> None:
+        """Record a token this worker just blacklisted."""
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(digest)
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="revocation-filter", daemon=True)
+            self._thread.start()
+
+    def sync(self, client) -> BloomFilter:
+        """A fresh filter holding every blacklisted token hash in Redis."""
+        bloom = BloomFilter()
+        for key in client.scan_iter(match=KEY_PATTERN, count=1000):
+            bloom.add(key[len(_KEY_PREFIX):])
+        return bloom
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            pubsub = None
+            try:
+                client = self._client_factory()
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                self._bloom = self.sync(client)
+                rebuilt_at = time.monotonic()
+                while not self._stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        try:
+                            self._bloom.add(message["data"])
+                        except ValueError:
+                            logger.debug(f"Ignoring malformed revocation message: {message['data']!r}")
+                    if time.monotonic() - rebuilt_at >= self._rebuild_seconds:
+                        # Messages published during the SCAN wait in the
+                        # socket buffer and land in the new filter next loop.
+                        self._bloom = self.sync(client)
+                        rebuilt_at = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Revocation filter lost sync, checking Redis directly: {e}")
+            finally:
+                self._bloom = None
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stopping.wait(RECONNECT_DELAY_SECONDS)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+
+_filter = RevocationFilter()
+atexit.register(_filter.stop)
+
+
+def get_filter() -> RevocationFilter:
+    return _filter
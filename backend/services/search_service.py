@@ -0,0 +1,138 @@
+"""
+Search Service - ranked full-text search over community posts.
+
+Posts carry a `search_vector` tsvector (title + tags weighted A, body
+weighted B) kept current by a Postgres trigger and GIN-indexed
+(migration_031). Author usernames and titles also have pg_trgm indexes so
+typos and partial handles still match.
+
+A post matches if any of these hold:
+  - its search_vector matches websearch_to_tsquery(q)  (stemmed words, "phrases", -not)
+  - q is word-similar to its title                      (typo tolerance)
+  - its author's username contains / is similar to q
+  - q is exactly one of its tags
+
+Matches are ordered by a relevance score: text relevance, boosted by
+reactions (log-scaled so a viral post can't bury an exact match) and
+decayed by age. Visibility rules (soft delete, shadowban) stay with the
+caller in post_service, which owns them for every list endpoint.
+"""
+import html
+from typing import Dict, List, Optional
+
+from sqlalchemy import Float, and_, cast, func, literal, or_
+from sqlalchemy.orm import Query, Session
+
+from models.community import Post
+from models.user import UserProfile
+
+# Both the trigger and the query must use the same text search config.
+TS_CONFIG = "english"
+
+# Relevance blend. ts_rank_cd with normalization 32 is already in 0..1;
+# the trigram similarities are 0..1 too, so the weights read as "how much
+# is a fuzzy title/username hit worth relative to a perfect text hit".
+TITLE_FUZZY_WEIGHT = 0.6
+USERNAME_WEIGHT = 0.8
+TAG_WEIGHT = 1.0
+POPULARITY_WEIGHT = 0.15   # x ln(1 + reaction_count)
+RECENCY_DAYS = 60.0        # score halves after this many days
+
+# ts_headline markers. Control characters can't occur in user text, so
+# after HTML-escaping the snippet they can be swapped for <mark> safely.
+_HL_START = "\x02"
+_HL_STOP = "\x03"
+_HEADLINE_OPTIONS = (
+    f"StartSel={_HL_START}, StopSel={_HL_STOP}, "
+    "MaxWords=30, MinWords=10, ShortWord=2, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+
+
+def _ts_query(q: str):
+    return func.websearch_to_tsquery(TS_CONFIG, q)
+
+
+def _escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_search_query(db: Session, q: str) -> tuple[Query, object]:
+    """
+    Base query for posts matching `q`, joined to the author's profile.
+
+    Returns (query, score) where `score` is the relevance expression to
+    ORDER BY. No visibility filters are applied here.
+    """
+    ts_query = _ts_query(q)
+    tag = q.strip().lower()
+    username_pattern = f"%{_escape_like(q.strip())}%"
+
+    text_rank = func.coalesce(func.ts_rank_cd(Post.search_vector, ts_query, 32), 0.0)
+    title_similarity = func.word_similarity(q, Post.title)
+    username_similarity = func.coalesce(func.similarity(UserProfile.username, q), 0.0)
+    tag_hit = cast(func.coalesce(Post.tags.any(tag), False), Float)
+
+    relevance = (
+        text_rank
+        + TITLE_FUZZY_WEIGHT * title_similarity
+        + USERNAME_WEIGHT * username_similarity
+        + TAG_WEIGHT * tag_hit
+    )
+    age_days = func.extract("epoch", func.timezone("utc", func.now()) - Post.created_at) / 86400.0
+    score = (
+        relevance
+        * (1.0 + POPULARITY_WEIGHT * func.ln(1.0 + func.greatest(Post.reaction_count, 0)))
+        / (1.0 + func.greatest(age_days, 0.0) / RECENCY_DAYS)
+    )
+
+    query = (
+        db.query(Post)
+        # user_profiles.user_id is UNIQUE, so this can't duplicate posts.
+        .outerjoin(UserProfile, UserProfile.user_id == Post.user_id)
+        .filter(or_(
+            Post.search_vector.op("@@")(ts_query),
+            literal(q).op("<%")(Post.title),
+            UserProfile.username.ilike(username_pattern),
+            UserProfile.username.op("%")(q),
+            Post.tags.any(tag),
+        ))
+    )
+    return query, score
+
+
+def _render_highlight(fragment: Optional[str]) -> Optional[str]:
+    """HTML-escape a ts_headline fragment and turn its markers into <mark>."""
+    if not fragment or _HL_START not in fragment:
+        return None
+    escaped = html.escape(fragment, quote=False)
+    return escaped.replace(_HL_START, "<mark>").replace(_HL_STOP, "</mark>")
+
+
+def get_highlights(db: Session, post_ids: List, q: str) -> Dict[str, dict]:
+    """
+    Highlighted title/body snippets for one page of results.
+
+    Run separately from the ranked query on purpose: ts_headline re-parses
+    the whole document, so it should only ever see the ~20 rows returned,
+    not every match the planner sorts. Only fields that actually contain a
+    match are included; the output is safe to render as HTML.
+    """
+    if not post_ids:
+        return {}
+    ts_query = _ts_query(q)
+    rows = (
+        db.query(
+            Post.id,
+            func.ts_headline(TS_CONFIG, Post.title, ts_query, _HEADLINE_OPTIONS),
+            func.ts_headline(TS_CONFIG, func.coalesce(Post.body, ""), ts_query, _HEADLINE_OPTIONS),
+        )
+        .filter(and_(Post.id.in_(post_ids), Post.search_vector.op("@@")(ts_query)))
+        .all()
+    )
+    highlights = {}
+    for post_id, title, body in rows:
+        fields = {"title": _render_highlight(title), "body": _render_highlight(body)}
+        fields = {k: v for k, v in fields.items() if v}
+        if fields:
+            highlights[str(post_id)] = fields
+    return highlights
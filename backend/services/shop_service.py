@@ -4,29 +4,40 @@ Guild Shop service.
 Handles the full purchase lifecycle:
   * `list_items(...)`  — catalog view (tiered / active SKUs).
   * `list_inventory(...)` — what the user already owns.
-  * `purchase(user_id, sku, db)` — atomic: stock lock, balance lock, grant.
+  * `purchase(user_id, sku, db)` — atomic: balance lock, stock reservation, grant.
   * `equip(user_id, sku, db)` — set equipped_border_sku / equipped_title_sku.
 
-Stock race prevention: we `SELECT ... FOR UPDATE` the `shop_items` row
-for any SKU that has a stock_total. Under Postgres's default isolation
-this serialises concurrent purchases of the same scarce SKU without
-needing advisory locks. We count live purchases under the same lock so
-the count is guaranteed consistent with the decision.
+The catalog is a per-worker snapshot (`get_catalog`) behind a Redis-versioned
+cache; committed ORM changes to shop_items rebuild it everywhere, and raw-SQL
+seeding (migration 021) calls `invalidate_catalog`.
+
+Stock: each limited SKU has a `shop_stock_counters` row per stock period.
+A purchase reserves a unit with one conditional
+`UPDATE ... SET sold = sold + 1 WHERE sold < stock_total`, issued last so
+the row lock is only held while the transaction commits. In front of it a
+Redis counter of remaining units (DECR in a script, seeded from the DB row,
+expiring after STOCK_CACHE_TTL_SECONDS) turns buyers away once a drop is
+gone without touching Postgres; it is only a filter — the row decides.
+Unlimited SKUs take no stock lock at all. max_per_user is checked under the
+buyer's user_profiles lock, which spend_claves takes anyway.
 """
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 import uuid
 
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, update
 
-from models.shop import ShopItem, ShopPurchase
-from models.community import ClaveTransaction
+from models.shop import ShopItem, ShopPurchase, ShopStockCounter
 from models.user import UserProfile
 from services import clave_service, tier_service
+from services.redis_service import get_redis_client
+from utils.versioned_cache import VersionedCache
 
 logger = logging.getLogger(__name__)
 
@@ -80,12 +91,83 @@ class NotOwned(ShopError):
     http_status = 403
 
 
+# ---------------------------------------------------------------------------
+# Catalog snapshot
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    """Immutable copy of a shop_items row (same attribute names)."""
+    sku: str
+    kind: str
+    name: str
+    description: Optional[str]
+    price_claves: int
+    rarity: Optional[str]
+    tier_required: Optional[str]
+    stock_total: Optional[int]
+    stock_period: Optional[str]
+    max_per_user: Optional[int]
+    grants: dict
+    metadata_json: dict
+    is_active: bool
+    sort_order: int
+
+    @classmethod
+    def from_row(cls, row: ShopItem) -> "CatalogItem":
+        return cls(
+            sku=row.sku,
+            kind=row.kind,
+            name=row.name,
+            description=row.description,
+            price_claves=row.price_claves,
+            rarity=row.rarity,
+            tier_required=row.tier_required,
+            stock_total=row.stock_total,
+            stock_period=row.stock_period,
+            max_per_user=row.max_per_user,
+            grants=dict(row.grants or {}),
+            metadata_json=dict(row.metadata_json or {}),
+            is_active=bool(row.is_active),
+            sort_order=row.sort_order or 0,
+        )
+
+
+class ShopCatalog:
+    """Every SKU (active or not — inventories still show retired ones)."""
+
+    def __init__(self, items: Iterable[CatalogItem]) -> None:
+        self.items: Tuple[CatalogItem, ...] = tuple(sorted(items, key=lambda i: (i.sort_order, i.sku)))
+        self.by_sku: Dict[str, CatalogItem] = {i.sku: i for i in self.items}
+
+    def active(self, kind: Optional[str] = None) -> Tuple[CatalogItem, ...]:
+        return tuple(i for i in self.items if i.is_active and (kind is None or i.kind == kind))
+
+
+def _build_catalog(db: Session) -> ShopCatalog:
+    return ShopCatalog(CatalogItem.from_row(row) for row in db.query(ShopItem).all())
+
+
+_catalog: VersionedCache[ShopCatalog] = VersionedCache("Shop catalog", "shop:catalog:version", _build_catalog)
+_catalog.watch(ShopItem)
+
+
+def get_catalog(db: Session) -> ShopCatalog:
+    return _catalog.get(db)
+
+
+def invalidate_catalog() -> None:
+    """For writes that bypass the ORM (raw-SQL seeding)."""
+    _catalog.invalidate()
+
+
 # ---------------------------------------------------------------------------
 # Stock period keys
 # ---------------------------------------------------------------------------
 
 
-def _stock_period_key(item: ShopItem, when: Optional[datetime] = None) -> Optional[str]:
+def _stock_period_key(item: CatalogItem, when: Optional[datetime] = None) -> Optional[str]:
     """Map a stock_period enum to a string bucket (e.g. '2026-04')."""
     if not item.stock_period:
         return None
@@ -97,30 +179,168 @@ def _stock_period_key(item: ShopItem, when: Optional[datetime] = None) -> Option
     return None
 
 
+def _counter_period(period_key: Optional[str]) -> str:
+    return period_key or "all"
+
+
+# ---------------------------------------------------------------------------
+# Stock counters
+# ---------------------------------------------------------------------------
+
+STOCK_CACHE_TTL_SECONDS = 300
+
+# Take one unit: -2 if the counter isn't seeded, -1 if sold out, else what's left.
+_RESERVE = """
+local v = redis.call('GET', KEYS[1])
+if not v then return -2 end
+if tonumber(v) <= 0 then return -1 end
+return redis.call('DECR', KEYS[1])
+"""
+
+# Give a unit back, unless the counter has expired (it reseeds from the DB).
+_RELEASE = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return redis.call('INCR', KEYS[1]) end
+return nil
+"""
+
+
+def _stock_key(item: CatalogItem, period_key: Optional[str]) -> str:
+    # stock_total is part of the key, so a changed limit starts a fresh counter.
+    return f"shop:stock:{item.sku}:{_counter_period(period_key)}:{item.stock_total}"
+
+
+def _count_purchases_for_stock(sku: str, period_key: Optional[str], exclude_id=None):
+    q = select(func.count(ShopPurchase.id)).where(
+        ShopPurchase.sku == sku,
+        ShopPurchase.status == "fulfilled",
+    )
+    if period_key:
+        q = q.where(ShopPurchase.stock_period_key == period_key)
+    if exclude_id is not None:
+        q = q.where(ShopPurchase.id != exclude_id)
+    return q
+
+
+def _sold(db: Session, item: CatalogItem, period_key: Optional[str]) -> int:
+    """Units sold this period: the counter row, or the purchase log before
+    the period's first sale under counters."""
+    sold = db.query(ShopStockCounter.sold).filter(
+        ShopStockCounter.sku == item.sku,
+        ShopStockCounter.period_key == _counter_period(period_key),
+    ).scalar()
+    if sold is None:
+        sold = db.execute(_count_purchases_for_stock(item.sku, period_key)).scalar()
+    return int(sold or 0)
+
+
+def _seed_remaining(client, item: CatalogItem, period_key: Optional[str], db: Session) -> int:
+    remaining = max(0, item.stock_total - _sold(db, item, period_key))
+    client.set(_stock_key(item, period_key), remaining, ex=STOCK_CACHE_TTL_SECONDS, nx=True)
+    return remaining
+
+
+def remaining_stock(db: Session, items: Iterable[CatalogItem]) -> Dict[str, int]:
+    """Units left this period for each limited item: one MGET, with the
+    DB consulted only for counters Redis doesn't hold."""
+    limited = [(i, _stock_period_key(i)) for i in items if i.stock_total is not None]
+    if not limited:
+        return {}
+    try:
+        client = get_redis_client()
+        cached = client.mget([_stock_key(i, p) for i, p in limited])
+    except Exception as e:
+        logger.debug(f"Shop stock read failed: {e}")
+        return {i.sku: max(0, i.stock_total - _sold(db, i, p)) for i, p in limited}
+
+    result: Dict[str, int] = {}
+    for (item, period_key), value in zip(limited, cached):
+        if value is not None:
+            result[item.sku] = max(0, int(value))
+            continue
+        try:
+            result[item.sku] = _seed_remaining(client, item, period_key, db)
+        except Exception as e:
+            logger.debug(f"Shop stock seed failed: {e}")
+            result[item.sku] = max(0, item.stock_total - _sold(db, item, period_key))
+    return result
+
+
+def _reserve_fast(item: CatalogItem, period_key: Optional[str], db: Session) -> Optional[bool]:
+    """Redis pre-check: True if a unit was held, False if sold out, None
+    if Redis couldn't say (the DB reservation still decides)."""
+    key = _stock_key(item, period_key)
+    try:
+        client = get_redis_client()
+        left = client.eval(_RESERVE, 1, key)
+        if left == -2:
+            _seed_remaining(client, item, period_key, db)
+            left = client.eval(_RESERVE, 1, key)
+    except Exception as e:
+        logger.debug(f"Shop stock reservation skipped: {e}")
+        return None
+    if left is None or int(left) == -2:
+        return None
+    return int(left) >= 0
+
+
+def _release_fast(item: CatalogItem, period_key: Optional[str]) -> None:
+    try:
+        get_redis_client().eval(_RELEASE, 1, _stock_key(item, period_key))
+    except Exception as e:
+        logger.debug(f"Shop stock release failed: {e}")
+
+
+def _forget_fast(item: CatalogItem, period_key: Optional[str]) -> None:
+    try:
+        get_redis_client().delete(_stock_key(item, period_key))
+    except Exception as e:
+        logger.debug(f"Shop stock reset failed: {e}")
+
+
+def _reserve_unit(db: Session, item: CatalogItem, period_key: Optional[str], purchase_id) -> bool:
+    """Authoritative reservation: take a unit on the counter row, seeding
+    the row from the purchase log (minus `purchase_id`, the purchase being
+    made) the first time a period is sold in."""
+    counter = _counter_period(period_key)
+    take = (
+        update(ShopStockCounter)
+        .where(
+            ShopStockCounter.sku == item.sku,
+            ShopStockCounter.period_key == counter,
+            ShopStockCounter.sold < item.stock_total,
+        )
+        .values(sold=ShopStockCounter.sold + 1)
+        .returning(ShopStockCounter.sold)
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(take).first() is not None:
+        return True
+    # No row yet, or sold out. Seeding is a no-op if the row exists (or
+    # waits for a concurrent first buyer's seed), then try once more.
+    db.execute(
+        pg_insert(ShopStockCounter)
+        .values(
+            sku=item.sku,
+            period_key=counter,
+            sold=_count_purchases_for_stock(item.sku, period_key, purchase_id).scalar_subquery(),
+        )
+        .on_conflict_do_nothing()
+    )
+    return db.execute(take).first() is not None
+
+
 # ---------------------------------------------------------------------------
 # Catalog listings
 # ---------------------------------------------------------------------------
 
 
 def list_items(db: Session, kind: Optional[str] = None) -> list[dict]:
-    q = db.query(ShopItem).filter(ShopItem.is_active == True)  # noqa: E712
-    if kind:
-        q = q.filter(ShopItem.kind == kind)
-    items = q.order_by(ShopItem.sort_order.asc(), ShopItem.sku.asc()).all()
-
-    # Compute remaining stock per item (if any has stock_total).
-    result: list[dict] = []
-    for item in items:
-        period_key = _stock_period_key(item)
-        remaining: Optional[int] = None
-        if item.stock_total is not None:
-            used = _count_purchases_for_stock(db, item, period_key)
-            remaining = max(0, item.stock_total - used)
-        result.append(_serialize_item(item, remaining=remaining))
-    return result
+    items = get_catalog(db).active(kind)
+    remaining = remaining_stock(db, items)
+    return [_serialize_item(item, remaining=remaining.get(item.sku)) for item in items]
 
 
-def _serialize_item(item: ShopItem, remaining: Optional[int] = None) -> dict:
+def _serialize_item(item: CatalogItem, remaining: Optional[int] = None) -> dict:
     return {
         "sku": item.sku,
         "kind": item.kind,
@@ -139,16 +359,6 @@ def _serialize_item(item: ShopItem, remaining: Optional[int] = None) -> dict:
     }
 
 
-def _count_purchases_for_stock(db: Session, item: ShopItem, period_key: Optional[str]) -> int:
-    q = db.query(func.count(ShopPurchase.id)).filter(
-        ShopPurchase.sku == item.sku,
-        ShopPurchase.status == "fulfilled",
-    )
-    if period_key:
-        q = q.filter(ShopPurchase.stock_period_key == period_key)
-    return int(q.scalar() or 0)
-
-
 def _count_user_owned(db: Session, user_id: str, sku: str) -> int:
     return int(
         db.query(func.count(ShopPurchase.id))
@@ -164,9 +374,9 @@ def _count_user_owned(db: Session, user_id: str, sku: str) -> int:
 
 def list_inventory(db: Session, user_id: str) -> list[dict]:
     """Every fulfilled purchase for this user, grouped by SKU."""
+    catalog = get_catalog(db)
     purchases = (
-        db.query(ShopPurchase, ShopItem)
-        .join(ShopItem, ShopItem.sku == ShopPurchase.sku)
+        db.query(ShopPurchase.sku, ShopPurchase.created_at)
         .filter(
             ShopPurchase.user_id == user_id,
             ShopPurchase.status == "fulfilled",
@@ -176,21 +386,25 @@ def list_inventory(db: Session, user_id: str) -> list[dict]:
     )
 
     by_sku: dict[str, dict] = {}
-    for purchase, item in purchases:
-        entry = by_sku.setdefault(item.sku, {
+    for sku, created_at in purchases:
+        item = catalog.by_sku.get(sku)
+        if item is None:
+            continue
+        entry = by_sku.setdefault(sku, {
             **_serialize_item(item),
             "owned_count": 0,
-            "first_purchased_at": purchase.created_at,
+            "first_purchased_at": created_at,
         })
         entry["owned_count"] += 1
         # keep the earliest purchase
-        if purchase.created_at < entry["first_purchased_at"]:
-            entry["first_purchased_at"] = purchase.created_at
+        if created_at < entry["first_purchased_at"]:
+            entry["first_purchased_at"] = created_at
 
     # Annotate equipped state
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-    equipped_border = profile.equipped_border_sku if profile else None
-    equipped_title = profile.equipped_title_sku if profile else None
+    equipped = db.query(
+        UserProfile.equipped_border_sku, UserProfile.equipped_title_sku
+    ).filter(UserProfile.user_id == user_id).first()
+    equipped_border, equipped_title = equipped if equipped else (None, None)
     for entry in by_sku.values():
         entry["is_equipped"] = entry["sku"] in (equipped_border, equipped_title)
 
@@ -208,16 +422,8 @@ def purchase(user_id: str, sku: str, db: Session) -> dict:
     Raises a ShopError subclass for any gate failure. On success, returns
     a dict with the new balance + the ShopPurchase row.
     """
-    # Load and lock the catalog row if the SKU has stock. For unlimited
-    # SKUs we still lock (very cheap) so the serialization semantics are
-    # uniform and max_per_user cannot race either.
-    item = (
-        db.query(ShopItem)
-        .filter(ShopItem.sku == sku, ShopItem.is_active == True)  # noqa: E712
-        .with_for_update()
-        .first()
-    )
-    if not item:
+    item = get_catalog(db).by_sku.get(sku)
+    if not item or not item.is_active:
         raise ItemNotFound("Item not available")
 
     # Tier gate (unlocked: None means "open to all").
@@ -226,61 +432,67 @@ def purchase(user_id: str, sku: str, db: Session) -> dict:
             f"This item is for {item.tier_required.title() if item.tier_required else ''} members and above."
         )
 
+    # Serialize this buyer's purchases (spend_claves takes the same lock
+    # below) so max_per_user can't race a double click.
+    db.query(UserProfile.user_id).filter(UserProfile.user_id == user_id).with_for_update().first()
+
     # Cosmetics / singletons: block re-purchasing once owned.
     # (For true cosmetics we want owning = 1; if max_per_user==1 and they own it, bail.)
-    owned_count = _count_user_owned(db, user_id, sku)
-    if item.max_per_user is not None and owned_count >= item.max_per_user:
-        if item.max_per_user == 1:
-            raise AlreadyOwned("You already own this item.")
-        raise MaxPerUserReached(f"You've reached the max of {item.max_per_user} for this item.")
+    if item.max_per_user is not None:
+        owned_count = _count_user_owned(db, user_id, sku)
+        if owned_count >= item.max_per_user:
+            if item.max_per_user == 1:
+                raise AlreadyOwned("You already own this item.")
+            raise MaxPerUserReached(f"You've reached the max of {item.max_per_user} for this item.")
 
-    # Stock check (in the lock).
     period_key = _stock_period_key(item)
-    if item.stock_total is not None:
-        used = _count_purchases_for_stock(db, item, period_key)
-        if used >= item.stock_total:
-            raise OutOfStock("This item is sold out right now. Try again later.")
-
-    # Pay. spend_claves() locks user_profiles too, so we hold both rows briefly.
-    success, new_balance = clave_service.spend_claves(
-        user_id=user_id,
-        amount=item.price_claves,
-        reason=f"shop_purchase:{sku}",
-        db=db,
-        reference_id=None,
-    )
-    if not success:
-        raise InsufficientClaves(
-            f"Not enough claves. You need {item.price_claves} 🥢 (have {new_balance})."
+    limited = item.stock_total is not None
+    held = _reserve_fast(item, period_key, db) if limited else None
+    if held is False:
+        raise OutOfStock("This item is sold out right now. Try again later.")
+
+    try:
+        purchase_id = uuid.uuid4()
+        # Pay. Locks user_profiles (already held above).
+        success, new_balance, txn = clave_service.spend_claves_with_transaction(
+            user_id=user_id,
+            amount=item.price_claves,
+            reason=f"shop_purchase:{sku}",
+            db=db,
+            reference_id=purchase_id,
         )
-
-    # Find the txn we just wrote so we can link it to the purchase row.
-    txn = (
-        db.query(ClaveTransaction)
-        .filter(
-            ClaveTransaction.user_id == user_id,
-            ClaveTransaction.reason == f"shop_purchase:{sku}",
+        if not success:
+            raise InsufficientClaves(
+                f"Not enough claves. You need {item.price_claves} 🥢 (have {new_balance})."
+            )
+
+        purchase_row = ShopPurchase(
+            id=purchase_id,
+            user_id=user_id,
+            sku=sku,
+            price_paid=item.price_claves,
+            clave_txn_id=txn.id if txn else None,
+            status="fulfilled",
+            fulfillment_id=None,  # set by callers that fulfil (e.g. golden ticket)
+            stock_period_key=period_key,
         )
-        .order_by(ClaveTransaction.created_at.desc())
-        .first()
-    )
+        db.add(purchase_row)
 
-    purchase_row = ShopPurchase(
-        id=uuid.uuid4(),
-        user_id=user_id,
-        sku=sku,
-        price_paid=item.price_claves,
-        clave_txn_id=txn.id if txn else None,
-        status="fulfilled",
-        fulfillment_id=None,  # set by callers that fulfil (e.g. golden ticket)
-        stock_period_key=period_key,
-    )
-    db.add(purchase_row)
+        # Apply immediate grants.
+        _apply_grants(db, user_id, item)
 
-    # Apply immediate grants.
-    _apply_grants(db, user_id, item)
+        db.flush()
 
-    db.flush()
+        # Last, so the counter row stays locked only until the caller commits.
+        if limited and not _reserve_unit(db, item, period_key, purchase_id):
+            if held:
+                _forget_fast(item, period_key)  # Redis was behind: reseed it
+                held = None
+            raise OutOfStock("This item is sold out right now. Try again later.")
+    except Exception:
+        if held:
+            _release_fast(item, period_key)
+        raise
 
     logger.info(
         "shop.purchase user=%s sku=%s price=%s new_balance=%s period_key=%s",
@@ -298,7 +510,7 @@ def purchase(user_id: str, sku: str, db: Session) -> dict:
     }
 
 
-def _apply_grants(db: Session, user_id: str, item: ShopItem) -> None:
+def _apply_grants(db: Session, user_id: str, item: CatalogItem) -> None:
     """For utility SKUs, bump the user's bonus-slots counters on UserProfile."""
     grants = item.grants or {}
     if item.kind != "utility":
@@ -345,7 +557,7 @@ def equip(user_id: str, sku: Optional[str], db: Session, slot: str) -> dict:
         raise ShopError("Profile not found")
 
     if sku:
-        item = db.query(ShopItem).filter(ShopItem.sku == sku).first()
+        item = get_catalog(db).by_sku.get(sku)
         if not item:
             raise ItemNotFound("Item not found")
         if item.kind != slot:
@@ -7,67 +7,46 @@ Access rules:
 - Subscribed members have full access to every lesson in every world they
   paid for — prerequisites are a UI recommendation, not a hard gate.
 - `compute_level_unlock_map` returns a per-level "on-path" signal used by the
-  skill-tree UI to render lock icons and warn before skipping ahead.
+  skill-tree UI to render lock icons and warn before skipping ahead
+  (`resolve_level_unlocks` is the same rule without the queries).
 """
 
-from typing import Dict, List, Optional, Tuple
+from typing import AbstractSet, Dict, List, Mapping, Optional, Sequence, Tuple
 
 from sqlalchemy.orm import Session
 
 from models.course import Lesson, LevelEdge, World
-from models.progress import UserProgress
 from models.user import Subscription, SubscriptionStatus, User, UserRole
+from services import principal_service, progress_service
 
 
-def compute_level_unlock_map(
-    db: Session,
-    world: World,
-    user: Optional[User],
+def level_completion(
+    level_lessons: Mapping[str, Sequence[str]],
+    completed_lesson_ids: AbstractSet[str],
+) -> Dict[str, float]:
+    """{level_id: percent of its lessons in `completed_lesson_ids`}."""
+    completion: Dict[str, float] = {}
+    for level_id, lesson_ids in level_lessons.items():
+        total = len(lesson_ids)
+        if total == 0:
+            completion[level_id] = 0.0
+        else:
+            done = sum(1 for lid in lesson_ids if lid in completed_lesson_ids)
+            completion[level_id] = (done / total) * 100
+    return completion
+
+
+def resolve_level_unlocks(
+    level_ids: Sequence[str],
+    prerequisites_map: Mapping[str, Sequence[str]],
+    level_completion_map: Mapping[str, float],
 ) -> Dict[str, bool]:
     """
-    Return {level_id: is_unlocked} for every level in the given world.
+    {level_id: is_unlocked} from already-known prerequisites and completion.
 
-    Mirrors the logic in `get_world_skill_tree` — a level is unlocked when all
-    its prerequisite levels are 100% complete. This function does NOT apply an
-    admin bypass; callers needing role-based overrides should apply them on top
-    of the returned map.
+    Pure: the catalog snapshot supplies the structure, the caller supplies
+    the user's completion, and no queries run here.
     """
-    edges = db.query(LevelEdge).filter(LevelEdge.world_id == world.id).all()
-
-    prerequisites_map: Dict[str, List[str]] = {}
-    for edge in edges:
-        prerequisites_map.setdefault(str(edge.to_level_id), []).append(
-            str(edge.from_level_id)
-        )
-
-    completed_lesson_ids: set = set()
-    if user:
-        all_lesson_ids = [
-            str(l.id) for level in world.levels for l in level.lessons
-        ]
-        if all_lesson_ids:
-            rows = (
-                db.query(UserProgress.lesson_id)
-                .filter(
-                    UserProgress.user_id == user.id,
-                    UserProgress.is_completed == True,  # noqa: E712
-                    UserProgress.lesson_id.in_(all_lesson_ids),
-                )
-                .all()
-            )
-            completed_lesson_ids = {str(lid) for (lid,) in rows}
-
-    level_completion_map: Dict[str, float] = {}
-    for level in world.levels:
-        total = len(level.lessons)
-        if total == 0:
-            level_completion_map[str(level.id)] = 0.0
-        else:
-            done = sum(
-                1 for lesson in level.lessons if str(lesson.id) in completed_lesson_ids
-            )
-            level_completion_map[str(level.id)] = (done / total) * 100
-
     unlocked: Dict[str, bool] = {}
 
     def resolve(level_id: str) -> bool:
@@ -89,12 +68,52 @@ def compute_level_unlock_map(
         unlocked[level_id] = all_done
         return all_done
 
-    for level in world.levels:
-        resolve(str(level.id))
+    for level_id in level_ids:
+        resolve(level_id)
 
     return unlocked
 
 
+def compute_level_unlock_map(
+    db: Session,
+    world: World,
+    user: Optional[User],
+) -> Dict[str, bool]:
+    """
+    Return {level_id: is_unlocked} for every level in the given world.
+
+    Mirrors the logic in `get_world_skill_tree` — a level is unlocked when all
+    its prerequisite levels are 100% complete. This function does NOT apply an
+    admin bypass; callers needing role-based overrides should apply them on top
+    of the returned map.
+
+    Loads edges itself and progress from the user's cached completed-lesson
+    set; request handlers that already hold the catalog snapshot use
+    `resolve_level_unlocks` directly.
+    """
+    edges = db.query(LevelEdge).filter(LevelEdge.world_id == world.id).all()
+
+    prerequisites_map: Dict[str, List[str]] = {}
+    for edge in edges:
+        prerequisites_map.setdefault(str(edge.to_level_id), []).append(
+            str(edge.from_level_id)
+        )
+
+    level_lessons = {
+        str(level.id): [str(l.id) for l in level.lessons] for level in world.levels
+    }
+
+    completed_lesson_ids: AbstractSet[str] = frozenset()
+    if user:
+        completed_lesson_ids = progress_service.completed_lessons(str(user.id), db)
+
+    return resolve_level_unlocks(
+        list(level_lessons),
+        prerequisites_map,
+        level_completion(level_lessons, completed_lesson_ids),
+    )
+
+
 def is_lesson_accessible(
     db: Session,
     lesson: Lesson,
@@ -115,20 +134,36 @@ def is_lesson_accessible(
 
     level = lesson.level
     world = level.world if level else None
+    return is_world_accessible(db, world, user)
+
+
+def is_world_accessible(db: Session, world, user: User) -> Tuple[bool, Optional[str]]:
+    """
+    `is_lesson_accessible` for a lesson already resolved to its world (an
+    ORM World or a catalog snapshot's CatalogWorld; None fails closed).
+    """
+    if user.role == UserRole.ADMIN:
+        return (True, None)
+
     if not world:
         # No world means we can't reason about access; fail closed.
         return (False, "subscription")
 
     if not world.is_free:
-        subscription = (
-            db.query(Subscription)
-            .filter(Subscription.user_id == user.id)
-            .first()
-        )
-        if not subscription or subscription.status not in (
-            SubscriptionStatus.ACTIVE,
-            SubscriptionStatus.TRIALING,
-        ):
+        principal = principal_service.cached(db, user.id)
+        if principal is not None:
+            subscribed = principal.has_active_subscription
+        else:
+            subscription = (
+                db.query(Subscription)
+                .filter(Subscription.user_id == user.id)
+                .first()
+            )
+            subscribed = bool(subscription) and subscription.status in (
+                SubscriptionStatus.ACTIVE,
+                SubscriptionStatus.TRIALING,
+            )
+        if not subscribed:
             return (False, "subscription")
 
     return (True, None)
@@ -37,6 +37,24 @@ def _get_monday_of_week(d: date) -> date:
     return d - timedelta(days=d.weekday())
 
 
+def reset_weekly_freeze(profile: UserProfile) -> bool:
+    """
+    Give the profile back its weekly freebie if a new week (Monday, user's
+    local time) started since the last reset. In memory only.
+    Returns True if reset was performed.
+    """
+    this_monday = _get_monday_of_week(user_local_today(profile))
+    
+    # If we haven't reset this week yet (or never reset before)
+    if profile.last_freeze_reset_date is None or profile.last_freeze_reset_date < this_monday:
+        profile.weekly_free_freeze_used = False
+        profile.last_freeze_reset_date = this_monday
+        logger.info(f"Weekly freeze reset for user {profile.user_id}")
+        return True
+    
+    return False
+
+
 def check_and_reset_weekly_freeze(user_id: str, db: Session) -> bool:
     """
     Check if weekly freeze should be reset (every Monday).
@@ -46,17 +64,9 @@ def check_and_reset_weekly_freeze(user_id: str, db: Session) -> bool:
     if not profile:
         return False
 
-    today = user_local_today(profile)
-    this_monday = _get_monday_of_week(today)
-    
-    # If we haven't reset this week yet (or never reset before)
-    if profile.last_freeze_reset_date is None or profile.last_freeze_reset_date < this_monday:
-        profile.weekly_free_freeze_used = False
-        profile.last_freeze_reset_date = this_monday
+    if reset_weekly_freeze(profile):
         db.flush()
-        logger.info(f"Weekly freeze reset for user {user_id}")
         return True
-    
     return False
 
 
@@ -97,31 +107,18 @@ def get_freeze_status(user_id: str, db: Session) -> Dict:
     }
 
 
-def attempt_streak_save(user_id: str, db: Session) -> StreakFreezeResult:
+def save_streak(profile: UserProfile) -> StreakFreezeResult:
     """
-    Attempt to save a broken streak using available freeze methods.
+    Try to save the profile's broken streak with a freeze, in memory.
     Priority: 1) Weekly Freebie, 2) Inventory Freeze, 3) Auto-buy with Claves
-    Uses SELECT FOR UPDATE to prevent race conditions.
-
-    Returns:
-        StreakFreezeResult with outcome details
+    The caller must hold the profile row lock.
     """
-    profile = db.query(UserProfile).filter(
-        UserProfile.user_id == user_id
-    ).with_for_update().first()
-    if not profile:
-        return StreakFreezeResult(
-            saved=False,
-            message="Profile not found"
-        )
-    
-    # Check and reset weekly freeze if needed
-    check_and_reset_weekly_freeze(user_id, db)
+    user_id = profile.user_id
+    reset_weekly_freeze(profile)
     
     # Method 1: Weekly Freebie
     if not profile.weekly_free_freeze_used:
         profile.weekly_free_freeze_used = True
-        db.flush()
         logger.info(f"User {user_id} streak saved by weekly freebie")
         return StreakFreezeResult(
             saved=True,
@@ -133,7 +130,6 @@ def attempt_streak_save(user_id: str, db: Session) -> StreakFreezeResult:
     # Method 2: Inventory Freeze (with bounds check)
     if profile.inventory_freezes > 0:
         profile.inventory_freezes = max(0, profile.inventory_freezes - 1)
-        db.flush()
         logger.info(f"User {user_id} streak saved by inventory freeze. {profile.inventory_freezes} remaining.")
         return StreakFreezeResult(
             saved=True,
@@ -162,6 +158,28 @@ def attempt_streak_save(user_id: str, db: Session) -> StreakFreezeResult:
         )
 
 
+def attempt_streak_save(user_id: str, db: Session) -> StreakFreezeResult:
+    """
+    Attempt to save a broken streak using available freeze methods.
+    Uses SELECT FOR UPDATE to prevent race conditions.
+
+    Returns:
+        StreakFreezeResult with outcome details
+    """
+    profile = db.query(UserProfile).filter(
+        UserProfile.user_id == user_id
+    ).with_for_update().first()
+    if not profile:
+        return StreakFreezeResult(
+            saved=False,
+            message="Profile not found"
+        )
+    
+    result = save_streak(profile)
+    db.flush()
+    return result
+
+
 def repair_streak_with_claves(user_id: str, db: Session) -> StreakFreezeResult:
     """
     User-initiated repair of streak using claves.
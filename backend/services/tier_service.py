@@ -24,6 +24,24 @@ _TIER_RANK = {
 }
 
 
+def effective_tier(status, tier, period_end: Optional[datetime]) -> str:
+    """Tier string for a subscription's (status, tier, current_period_end).
+
+    Only ACTIVE / TRIALING count, and an elapsed period counts as Rookie —
+    see `user_tier`.
+    """
+    if status not in (SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING):
+        return "rookie"
+    if period_end is not None:
+        # Naive datetimes from older rows: treat as UTC so the comparison
+        # below doesn't raise.
+        if period_end.tzinfo is None:
+            period_end = period_end.replace(tzinfo=timezone.utc)
+        if period_end < datetime.now(timezone.utc):
+            return "rookie"
+    return tier.value if isinstance(tier, SubscriptionTier) else str(tier)
+
+
 def user_tier(user_id: str, db: Session) -> str:
     """Resolve the user's current effective tier string.
 
@@ -36,7 +54,14 @@ def user_tier(user_id: str, db: Session) -> str:
     granting access on a lapsed subscription. premium.is_guild_master
     already does this check; mirroring it here keeps every tier-gated
     surface (shop, feature flags, etc.) consistent.
+
+    Answered from the request's principal when it is this user's.
     """
+    from services import principal_service
+    principal = principal_service.cached(db, user_id)
+    if principal is not None:
+        return principal.tier
+
     sub = (
         db.query(Subscription)
         .filter(
@@ -50,15 +75,7 @@ def user_tier(user_id: str, db: Session) -> str:
     )
     if not sub:
         return "rookie"
-    period_end = sub.current_period_end
-    if period_end is not None:
-        # Naive datetimes from older rows: treat as UTC so the comparison
-        # below doesn't raise.
-        if period_end.tzinfo is None:
-            period_end = period_end.replace(tzinfo=timezone.utc)
-        if period_end < datetime.now(timezone.utc):
-            return "rookie"
-    return sub.tier.value if isinstance(sub.tier, SubscriptionTier) else str(sub.tier)
+    return effective_tier(sub.status, sub.tier, sub.current_period_end)
 
 
 def require_tier_at_least(user_id: str, required: Optional[str], db: Session) -> bool:
@@ -0,0 +1,273 @@
+"""
+User Stats Service - the materialized per-user `user_stats` row.
+
+Profile and badge views used to rebuild a user's numbers from live
+COUNTs over posts / post_reactions / post_replies on every request. The
+counters now live on `user_stats` (one row per user, keyed by user_id)
+and are kept current by the community write paths in post_service —
+the same places that feed the leaderboards:
+
+- a post becoming visible / being deleted  -> record_post
+- a visible post's video attached / cleared -> record_video
+- a like landing on / leaving a visible post -> record_likes
+- a reply being posted / deleted           -> record_reply
+
+Increments are applied SQL-side (`col = greatest(col + n, 0)`), so two
+concurrent writers never lose an update, and they commit or roll back
+with the caller's transaction. Writes that bypass those paths (the Mux
+webhook attaching a video later, admin edits, raw SQL) can still leave a
+row behind the truth; `reconcile` recomputes a batch of users from the
+source tables and fixes only the rows that drifted
+(`scripts/reconcile_user_stats.py`).
+
+The reactions_given / reactions_received / solutions_accepted counters
+predate this module and are still bumped by badge_service's increment_*
+helpers; reconcile covers them too.
+"""
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from models.community import ModerationStatus, Post, PostReaction, PostReply, UserStats
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+VIDEO_TYPES = ("motw", "original", "guild")
+
+# Legacy reaction types and the counter each one feeds (migration 017
+# collapsed new reactions to 'like', so these only move for old data).
+_LEGACY_REACTION_COLUMNS = {
+    "fire": "fires_received",
+    "clap": "claps_received",
+    "ruler": "metronomes_received",
+}
+
+# Every counter column on user_stats, in table order.
+COUNTER_COLUMNS: Tuple[str, ...] = (
+    "reactions_given_count",
+    "reactions_received_count",
+    "solutions_accepted_count",
+    "videos_posted",
+    "questions_posted",
+    "motw_videos",
+    "original_videos",
+    "guild_videos",
+    "motw_likes",
+    "original_likes",
+    "guild_likes",
+    "fires_received",
+    "claps_received",
+    "metronomes_received",
+    "comments_posted",
+)
+
+
+def get_or_create_stats(user_id: str, db: Session) -> UserStats:
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+    if not stats:
+        stats = UserStats(user_id=user_id)
+        db.add(stats)
+        db.flush()
+    return stats
+
+
+def is_counted(post: Post) -> bool:
+    """Only visible posts count toward their author's stats."""
+    return not post.is_deleted and post.moderation_status == ModerationStatus.ACTIVE.value
+
+
+# ============================================
+# Incremental maintenance
+# ============================================
+
+def apply(deltas: Mapping[str, Mapping[str, int]], db: Session) -> None:
+    """Add {user_id: {column: n}} to the users' rows and flush."""
+    changed = False
+    for user_id, columns in deltas.items():
+        columns = {col: n for col, n in columns.items() if n}
+        if not columns:
+            continue
+        stats = get_or_create_stats(user_id, db)
+        for col, n in columns.items():
+            setattr(stats, col, func.greatest(func.coalesce(getattr(UserStats, col), 0) + n, 0))
+        changed = True
+    if changed:
+        # Also expires the expressions, so the next read sees the new value.
+        db.flush()
+
+
+def _post_columns(post: Post) -> Counter:
+    columns = Counter()
+    has_video = post.mux_asset_id is not None
+    if post.post_type == "stage" and has_video:
+        columns["videos_posted"] += 1
+    if post.post_type == "lab":
+        columns["questions_posted"] += 1
+    if post.video_type in VIDEO_TYPES and has_video:
+        columns[f"{post.video_type}_videos"] += 1
+    return columns
+
+
+def _like_columns(post: Post, reaction_counts: Mapping[str, int]) -> Counter:
+    columns = Counter()
+    total = sum(reaction_counts.values())
+    if post.video_type in VIDEO_TYPES:
+        columns[f"{post.video_type}_likes"] += total
+    for reaction_type, n in reaction_counts.items():
+        legacy = _LEGACY_REACTION_COLUMNS.get(reaction_type)
+        if legacy:
+            columns[legacy] += n
+    return columns
+
+
+def record_post(post: Post, sign: int, db: Session, reaction_counts: Optional[Mapping[str, int]] = None) -> None:
+    """
+    A post became visible (sign=+1) or stopped being visible (sign=-1).
+    When it disappears, pass the likes it had collected by reaction_type
+    so they stop counting too.
+    """
+    columns = _post_columns(post)
+    if reaction_counts:
+        columns.update(_like_columns(post, reaction_counts))
+    apply({str(post.user_id): {col: sign * n for col, n in columns.items()}}, db)
+
+
+def record_video(post: Post, sign: int, db: Session) -> None:
+    """
+    A post gained (+1) or lost (-1) its Mux asset. Stage posts are created
+    before their upload finishes, so this — not record_post — is usually
+    where a video starts counting. Call before changing mux_asset_id.
+    """
+    if not is_counted(post):
+        return
+    columns = Counter()
+    if post.post_type == "stage":
+        columns["videos_posted"] += 1
+    if post.video_type in VIDEO_TYPES:
+        columns[f"{post.video_type}_videos"] += 1
+    apply({str(post.user_id): {col: sign * n for col, n in columns.items()}}, db)
+
+
+def record_likes(post: Post, reaction_type: str, sign: int, db: Session) -> None:
+    """A reaction was added to (+1) or removed from (-1) a visible post."""
+    columns = _like_columns(post, {reaction_type: 1})
+    apply({str(post.user_id): {col: sign * n for col, n in columns.items()}}, db)
+
+
+def record_reply(user_id: str, sign: int, db: Session) -> None:
+    apply({str(user_id): {"comments_posted": sign}}, db)
+
+
+# ============================================
+# Recompute from source
+# ============================================
+
+def iter_user_batches(db: Session, batch_size: int = 500) -> Iterator[list]:
+    """Every user id, in keyset-paginated batches."""
+    last = None
+    while True:
+        q = db.query(User.id).order_by(User.id)
+        if last is not None:
+            q = q.filter(User.id > last)
+        batch = [uid for (uid,) in q.limit(batch_size).all()]
+        if not batch:
+            return
+        last = batch[-1]
+        yield batch
+
+
+def compute(db: Session, user_ids: Sequence) -> Dict[str, Dict[str, int]]:
+    """
+    The true counter values for `user_ids`, from the source tables: a fixed
+    number of grouped aggregates, however many users are in the batch.
+    """
+    ids = [str(u) for u in user_ids]
+    is_visible = (Post.is_deleted == False) & (Post.moderation_status == ModerationStatus.ACTIVE.value)
+    result: Dict[str, Dict[str, int]] = {uid: dict.fromkeys(COUNTER_COLUMNS, 0) for uid in ids}
+
+    def put(rows: Iterable, columns: Sequence[str]) -> None:
+        for row in rows:
+            uid, values = str(row[0]), row[1:]
+            result[uid].update(zip(columns, values))
+
+    put(
+        db.query(PostReaction.user_id, func.count(PostReaction.id))
+        .filter(PostReaction.user_id.in_(ids))
+        .group_by(PostReaction.user_id).all(),
+        ("reactions_given_count",),
+    )
+    # Likes on each user's posts: every like for the legacy Crowd Favorite
+    # counter, visible posts only for the per-type families.
+    put(
+        db.query(
+            Post.user_id,
+            func.count(PostReaction.id),
+            func.count(case((is_visible & (Post.video_type == "motw"), 1))),
+            func.count(case((is_visible & (Post.video_type == "original"), 1))),
+            func.count(case((is_visible & (Post.video_type == "guild"), 1))),
+            func.count(case((is_visible & (PostReaction.reaction_type == "fire"), 1))),
+            func.count(case((is_visible & (PostReaction.reaction_type == "clap"), 1))),
+            func.count(case((is_visible & (PostReaction.reaction_type == "ruler"), 1))),
+        ).select_from(PostReaction).join(Post, Post.id == PostReaction.post_id)
+        .filter(Post.user_id.in_(ids))
+        .group_by(Post.user_id).all(),
+        ("reactions_received_count", "motw_likes", "original_likes", "guild_likes",
+         "fires_received", "claps_received", "metronomes_received"),
+    )
+    put(
+        db.query(
+            Post.user_id,
+            func.count(case(((Post.post_type == "stage") & Post.mux_asset_id.isnot(None), 1))),
+            func.count(case((Post.post_type == "lab", 1))),
+            func.count(case(((Post.video_type == "motw") & Post.mux_asset_id.isnot(None), 1))),
+            func.count(case(((Post.video_type == "original") & Post.mux_asset_id.isnot(None), 1))),
+            func.count(case(((Post.video_type == "guild") & Post.mux_asset_id.isnot(None), 1))),
+        ).filter(Post.user_id.in_(ids), is_visible)
+        .group_by(Post.user_id).all(),
+        ("videos_posted", "questions_posted", "motw_videos", "original_videos", "guild_videos"),
+    )
+    put(
+        db.query(
+            PostReply.user_id,
+            func.count(PostReply.id),
+            func.count(case((PostReply.is_accepted_answer == True, 1))),
+        ).filter(PostReply.user_id.in_(ids), PostReply.is_deleted == False)
+        .group_by(PostReply.user_id).all(),
+        ("comments_posted", "solutions_accepted_count"),
+    )
+    return result
+
+
+def reconcile(db: Session, user_ids: Sequence) -> List[str]:
+    """
+    Recompute `user_ids` from source and rewrite the rows that drifted
+    (creating missing ones). Flushes; the caller commits. Returns the ids
+    of the users whose row changed.
+    """
+    truth = compute(db, user_ids)
+    rows = {
+        str(s.user_id): s
+        for s in db.query(UserStats).filter(UserStats.user_id.in_(list(truth))).all()
+    }
+    changed = []
+    for uid, values in truth.items():
+        stats = rows.get(uid)
+        if stats is None:
+            if not any(values.values()):
+                continue
+            db.add(UserStats(user_id=uid, **values))
+            changed.append(uid)
+            continue
+        drift = {col: v for col, v in values.items() if (getattr(stats, col) or 0) != v}
+        if drift:
+            for col, v in drift.items():
+                setattr(stats, col, v)
+            changed.append(uid)
+    if changed:
+        db.flush()
+        logger.info(f"user_stats reconciled: {len(changed)} of {len(truth)} rows drifted")
+    return changed
@@ -0,0 +1,106 @@
+"""
+Unit tests for the async AI chat stream: tool offload, disconnect handling
+and the per-worker chat slots. The Anthropic client is a fake async stream
+behind monkeypatch — no live services are needed.
+"""
+import asyncio
+import json
+import threading
+from types import SimpleNamespace as NS
+
+from routers import ai_chat
+from routers.ai_chat import ChatMessage
+
+
+class _Stream:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for event in self.events:
+            await asyncio.sleep(0)
+            yield event
+
+
+class _Messages:
+    """First call answers with text then a tool call; follow-ups with text."""
+
+    def __init__(self):
+        self.calls = []
+
+    def stream(self, **kwargs):
+        self.calls.append(kwargs["messages"])
+        if len(self.calls) > 1:
+            return _Stream([NS(type="content_block_delta", delta=NS(type="text_delta", text="Magnifico"))])
+        return _Stream([
+            NS(type="content_block_delta", delta=NS(type="text_delta", text="Hola")),
+            NS(type="content_block_start", content_block=NS(type="tool_use", id="toolu_1", name="search_knowledge_base")),
+            NS(type="content_block_delta", delta=NS(type="input_json_delta", partial_json='{"query": "shines"}')),
+            NS(type="content_block_stop"),
+        ])
+
+
+def _collect(monkeypatch, is_disconnected=None):
+    messages = _Messages()
+    monkeypatch.setattr(ai_chat, "get_anthropic_client", lambda: NS(messages=messages))
+
+    async def run():
+        chunks = ai_chat.stream_claude_response(
+            [ChatMessage(role="user", content="Teach me shines")], db=None, is_disconnected=is_disconnected,
+        )
+        return [json.loads(c[len("data: "):]) async for c in chunks]
+
+    return asyncio.run(run()), messages
+
+
+def test_tool_runs_off_the_event_loop_and_feeds_the_follow_up(monkeypatch):
+    threads = []
+
+    def execute_tool(name, args, db=None):
+        threads.append(threading.current_thread())
+        return {"type": "knowledge_base", "query": args["query"], "result": "Footwork drills"}
+
+    monkeypatch.setattr(ai_chat, "execute_tool", execute_tool)
+    events, messages = _collect(monkeypatch)
+
+    assert [e["type"] for e in events] == ["text", "function_call", "text", "done"]
+    assert events[1]["args"] == {"query": "shines"} and events[2]["content"] == "Magnifico"
+    assert threads and threads[0] is not threading.main_thread()
+    tool_result = messages.calls[1][-1]["content"][0]
+    assert tool_result["tool_use_id"] == "toolu_1" and "Footwork drills" in tool_result["content"]
+
+
+def test_disconnected_client_skips_the_follow_up_call(monkeypatch):
+    monkeypatch.setattr(ai_chat, "execute_tool", lambda name, args, db=None: {"type": "knowledge_base"})
+
+    async def gone():
+        return True
+
+    events, messages = _collect(monkeypatch, is_disconnected=gone)
+
+    assert [e["type"] for e in events] == ["text", "function_call"]
+    assert len(messages.calls) == 1
+
+
+def test_chat_waits_for_a_slot_then_reports_busy(monkeypatch):
+    monkeypatch.setattr(ai_chat, "CHAT_SLOT_WAIT_SECONDS", 0.01)
+
+    async def run():
+        monkeypatch.setattr(ai_chat, "_chat_slots", asyncio.Semaphore(1))
+        async with ai_chat.chat_slot():
+            chunks = ai_chat.stream_claude_response([ChatMessage(role="user", content="Hola")])
+            busy = [json.loads(c[len("data: "):]) async for c in chunks]
+        async with ai_chat.chat_slot():  # released again
+            pass
+        return busy
+
+    monkeypatch.setattr(ai_chat, "get_anthropic_client", lambda: NS(messages=_Messages()))
+    events = asyncio.run(run())
+
+    assert len(events) == 1 and events[0]["type"] == "error" and events[0]["done"] is True
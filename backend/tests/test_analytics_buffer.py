@@ -0,0 +1,73 @@
+"""
+Unit tests for the write-behind analytics buffer and track_event routing.
+Sessions are MagicMocks, so no live database is needed.
+"""
+from unittest.mock import MagicMock
+
+from services import analytics_buffer, analytics_service
+
+
+def _buffer(session, **kwargs):
+    buf = analytics_buffer.EventBuffer(session_factory=lambda: session, **kwargs)
+    # Drive flushes by hand instead of through the background thread.
+    buf._ensure_started = lambda: None
+    return buf
+
+
+def test_flush_bulk_inserts_in_batches():
+    session = MagicMock()
+    buf = _buffer(session, batch_size=2)
+    tickets = [buf.submit({"event_id": str(i), "event_name": "VideoHeartbeat"}) for i in range(5)]
+    assert tickets == [1, 2, 3, 4, 5]
+
+    buf.flush()
+
+    batches = [c.args[1] for c in session.execute.call_args_list]
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert session.commit.call_count == 3
+    assert buf.wait_flushed(5, timeout=0)
+    assert buf.stats()["inserted"] == 5
+
+
+def test_full_queue_rejects_instead_of_blocking():
+    buf = _buffer(MagicMock(), max_size=1, enqueue_timeout=0)
+    assert buf.submit({"event_id": "a"}) == 1
+    assert buf.submit({"event_id": "b"}) is None
+    assert buf.stats()["rejected"] == 1
+    assert not buf.wait_flushed(1, timeout=0)
+
+
+def test_poison_row_is_dropped_alone():
+    session = MagicMock()
+
+    def execute(stmt, rows):
+        if len(rows) > 1 or rows[0]["event_id"] == "bad":
+            raise ValueError("boom")
+
+    session.execute.side_effect = execute
+    buf = _buffer(session)
+    for event_id in ("ok1", "bad", "ok2"):
+        buf.submit({"event_id": event_id, "event_name": "PageView"})
+    buf.flush()
+
+    assert buf.stats()["inserted"] == 2
+    assert buf.stats()["failed"] == 1
+    assert buf.wait_flushed(3, timeout=0)
+
+
+def test_track_event_buffers_ml_events_and_writes_conversions_now(monkeypatch):
+    submitted, written = [], []
+    buf = MagicMock()
+    buf.submit.side_effect = lambda row: submitted.append(row["event_name"]) or 1
+    monkeypatch.setattr(analytics_buffer, "get_buffer", lambda: buf)
+    monkeypatch.setattr(analytics_service, "_write_now", lambda row: written.append(row["event_name"]) or True)
+
+    db = MagicMock()
+    analytics_service.track_event(db, "VideoHeartbeat", properties={"percent": 50})
+    analytics_service.track_event(db, "Purchase", value=39.0, currency="usd")
+
+    assert submitted == ["VideoHeartbeat"]
+    assert written == ["Purchase"]
+    # The caller's session is never committed by analytics.
+    db.commit.assert_not_called()
+    db.rollback.assert_not_called()
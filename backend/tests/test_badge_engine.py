@@ -0,0 +1,183 @@
+"""
+Unit tests for the batched badge engine and the VersionedCache behind its
+definition index. Redis is a dict behind monkeypatch, sessions are MagicMock
+or unbound, and SQL is only compiled — no live services are needed.
+"""
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from services import badge_service
+from services.badge_service import BadgeDef, BadgeIndex
+from utils import versioned_cache
+from utils.versioned_cache import VersionedCache
+
+
+def _def(badge_id, req_type, threshold, name=None):
+    return BadgeDef(
+        id=badge_id, name=name or badge_id, description="", tier="silver", icon_url=None,
+        category="community", requirement_type=req_type, threshold=threshold, is_active=True,
+    )
+
+
+INDEX = BadgeIndex([
+    _def("critic_gold", "reactions_given", 50),
+    _def("critic_silver", "reactions_given", 10),
+    _def("critic_diamond", "reactions_given", 100),
+    _def("socialite", "comments_posted", 5),
+    _def("promoter", "referrals_converted", 3),
+])
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(badge_service, "get_badge_index", lambda db: INDEX)
+    return INDEX
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+
+def test_index_eligible_is_threshold_prefix():
+    assert [d.id for d in INDEX.eligible("reactions_given", 9)] == []
+    assert [d.id for d in INDEX.eligible("reactions_given", 50)] == ["critic_silver", "critic_gold"]
+    assert [d.id for d in INDEX.eligible("reactions_given", 10_000)] == [
+        "critic_silver", "critic_gold", "critic_diamond",
+    ]
+    assert INDEX.eligible("unknown_type", 10_000) == ()
+    assert INDEX.by_id["promoter"].threshold == 3
+
+
+def test_nothing_eligible_costs_no_query(index):
+    db = MagicMock()
+    badge_service.check_and_award_badges("u1", "reactions_given", 3, db)
+    db.query.assert_not_called()
+    db.execute.assert_not_called()
+
+
+def test_owned_badges_read_once_per_transaction(monkeypatch):
+    reads = []
+
+    def all_(query):
+        reads.append(query)
+        return [("critic_silver",)]
+
+    monkeypatch.setattr(Query, "all", all_)
+    db = Session()  # unbound; begin() is lazy about connecting
+    db.begin()
+    assert badge_service._owned_badges("u1", db) == {"critic_silver"}
+    assert badge_service._owned_badges("u1", db) == {"critic_silver"}
+    assert len(reads) == 1
+
+    badge_service._forget_owned("u1", ["critic_silver"], db)
+    assert badge_service._owned_badges("u1", db) == set()
+
+    db.commit()
+    db.begin()
+    badge_service._owned_badges("u1", db)
+    assert len(reads) == 2
+
+
+def test_award_badges_is_one_idempotent_insert(monkeypatch):
+    user_id = str(uuid.uuid4())
+    statements, announced = [], []
+
+    def execute(self, stmt, *args, **kwargs):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        # critic_gold was already held: ON CONFLICT skipped it.
+        result.all.return_value = [(uuid.UUID(user_id), "critic_silver")]
+        return result
+
+    monkeypatch.setattr(Session, "execute", execute)
+    monkeypatch.setattr(badge_service, "_announce", lambda awards, db: announced.extend(awards))
+
+    db = Session()
+    db.begin()
+    badge_service._owned_memo(db)[user_id] = set()
+    granted = badge_service.award_badges(
+        user_id, [INDEX.by_id["critic_silver"], INDEX.by_id["critic_gold"]], db
+    )
+
+    assert len(statements) == 1
+    assert "ON CONFLICT ON CONSTRAINT unique_user_badge DO NOTHING" in statements[0]
+    assert "RETURNING user_badges.user_id, user_badges.badge_id" in statements[0]
+    assert [d.id for d in granted] == ["critic_silver"]
+    assert announced == [(user_id, INDEX.by_id["critic_silver"])]
+    assert badge_service._owned_badges(user_id, db) == {"critic_silver", "critic_gold"}
+
+
+def test_sweep_awards_a_batch_in_one_insert(index, monkeypatch):
+    zero = {key: 0 for _, key in badge_service._STAT_REQUIREMENTS}
+    stats = {
+        "u1": {**zero, "reactions_given": 60, "comments_posted": 1},
+        "u2": {**zero, "referrals_converted": 3, "comments_posted": 5},
+    }
+    inserts, announced = [], []
+    monkeypatch.setattr(badge_service, "_collect_stats", lambda db, ids: {u: stats[u] for u in ids})
+    monkeypatch.setattr(
+        badge_service, "_insert_awards",
+        lambda rows, db: inserts.append(rows) or [(r["user_id"], r["badge_id"]) for r in rows],
+    )
+    monkeypatch.setattr(badge_service, "_announce", lambda awards, db: announced.extend(awards))
+
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [("u2", "promoter")]
+
+    awarded = badge_service.check_all_badges(db, ["u1", "u2"])
+
+    assert len(inserts) == 1
+    assert {u: [b["badge_id"] for b in badges] for u, badges in awarded.items()} == {
+        "u1": ["critic_silver", "critic_gold"],
+        "u2": ["socialite"],
+    }
+    assert len(announced) == 3
+
+
+def test_versioned_cache_rebuilds_on_version_bump(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(versioned_cache, "get_redis_client", lambda: redis)
+    builds = []
+    cache = VersionedCache("Test", "test:version", lambda db: builds.append(db) or len(builds))
+
+    assert cache.get("db") == 1 and cache.get("db") == 1
+    assert cache.version == 0
+
+    redis.incr("test:version")  # another worker committed a change
+    assert cache.get("db") == 2 and cache.version == 1
+
+    cache.invalidate()
+    assert redis.store["test:version"] == "2"
+    assert cache.get("db") == 3 and len(builds) == 3
+
+
+def test_versioned_cache_falls_back_to_local_ttl_without_redis(monkeypatch):
+    def down():
+        raise ConnectionError("redis down")
+
+    clock = [100.0]
+    monkeypatch.setattr(versioned_cache, "get_redis_client", down)
+    monkeypatch.setattr(versioned_cache.time, "monotonic", lambda: clock[0])
+    builds = []
+    cache = VersionedCache("Test", "test:version", lambda db: builds.append(db) or len(builds), local_ttl=60)
+
+    assert cache.get("db") == 1
+    clock[0] += 59
+    assert cache.get("db") == 1
+    clock[0] += 2
+    assert cache.get("db") == 2
+
+    cache.invalidate()  # bump fails, but the local copy is still dropped
+    assert cache.get("db") == 3
@@ -0,0 +1,96 @@
+"""
+Unit tests for broadcast notifications (one row per announcement, merged at
+read time) and notification retention. Sessions are unbound and SQL is only
+compiled, so no live services are needed.
+"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from models.notification import BroadcastNotification
+from services import notification_service, notification_stream
+
+T0 = datetime(2026, 6, 1, 12, 0, 0)
+
+
+def _sql(stmt) -> str:
+    stmt = getattr(stmt, "statement", stmt)
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _broadcast(minutes: int) -> BroadcastNotification:
+    return BroadcastNotification(
+        id=uuid.uuid4(), type="course_published", title="New course: X", message="X is live.",
+        reference_type="course", reference_id="w1", created_at=T0 + timedelta(minutes=minutes),
+    )
+
+
+def test_broadcast_is_one_idempotent_row(monkeypatch):
+    statements, results = [], iter([(uuid.uuid4(),), None])
+    notified = []
+
+    def execute(self, stmt, *args, **kwargs):
+        statements.append(_sql(stmt))
+        result = MagicMock()
+        result.first.return_value = next(results)
+        return result
+
+    monkeypatch.setattr(Session, "execute", execute)
+    monkeypatch.setattr(notification_stream, "notify_broadcast", lambda broadcast, db: notified.append(broadcast))
+    world = SimpleNamespace(id=uuid.uuid4(), title="Bachata Basics", course_type="course")
+
+    db = Session()
+    assert notification_service.broadcast_course_published(world, db) == 1
+    assert notification_service.broadcast_course_published(world, db) == 0  # re-publish
+
+    assert "INSERT INTO broadcast_notifications" in statements[0]
+    assert "ON CONFLICT ON CONSTRAINT unique_broadcast_reference DO NOTHING" in statements[0]
+    assert "users" not in statements[0]
+    assert [b.reference_id for b in notified] == [str(world.id)]
+
+
+def test_broadcast_read_state_and_merge():
+    old, mid, new = _broadcast(0), _broadcast(10), _broadcast(20)
+    read_until = T0 + timedelta(minutes=5)
+    formatted = notification_service._format_broadcasts(
+        [(new, None), (mid, mid.id), (old, None)], read_until,
+    )
+    assert [b["is_read"] for b in formatted] == [False, True, True]
+
+    personal = [{"id": str(uuid.uuid4()), "created_at": T0 + timedelta(minutes=m)} for m in (15, 5)]
+    merged = notification_service._merge(personal, formatted)
+    assert [n["created_at"] for n in merged] == [
+        T0 + timedelta(minutes=m) for m in (20, 15, 10, 5, 0)
+    ]
+
+
+def test_unread_broadcasts_respect_window_reads_and_exclusion():
+    user_id = str(uuid.uuid4())
+    sql = _sql(notification_service._unread_broadcasts(user_id, (T0, T0), Session()))
+
+    assert "LEFT OUTER JOIN broadcast_notification_reads" in sql
+    assert "broadcast_notifications.created_at >= " in sql      # visible since signup
+    assert "broadcast_notifications.created_at > " in sql       # above the watermark
+    assert "broadcast_notification_reads.broadcast_id IS NULL" in sql
+    assert "broadcast_notifications.exclude_user_id IS NULL OR" in sql
+
+
+def test_watermark_only_moves_forward(monkeypatch):
+    statements = []
+    monkeypatch.setattr(Session, "execute", lambda self, stmt, *a, **k: statements.append(_sql(stmt)))
+    deleted = []
+    monkeypatch.setattr(Query, "delete", lambda self, **kw: deleted.append(_sql(self)) or 0)
+
+    notification_service._advance_watermark(str(uuid.uuid4()), T0, Session())
+
+    assert "ON CONFLICT (user_id) DO UPDATE SET broadcasts_read_until = greatest(" in statements[0]
+    assert "broadcast_notification_reads.broadcast_id IN (SELECT broadcast_notifications.id" in deleted[0]
+
+
+def test_retention_keeps_unread_longer():
+    sql = _sql(notification_service.expired_notifications(Session(), read_days=90, unread_days=365, now=T0))
+    assert "notifications.created_at < %(created_at_1)s OR notifications.is_read = true" in sql
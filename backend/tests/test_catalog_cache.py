@@ -0,0 +1,145 @@
+"""
+Unit tests for the in-memory course catalog snapshot. The catalog is built
+from SimpleNamespace rows through a MagicMock session, so no live services
+are needed. Versioning itself is covered in test_badge_engine.py.
+"""
+import dataclasses
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import catalog_service
+from services.skill_tree_access import level_completion, resolve_level_unlocks
+
+
+def _lesson(lesson_id, level_id, order, xp=50, minutes=10, boss=False, week=None, content=None):
+    return SimpleNamespace(
+        id=lesson_id, level_id=level_id, title=lesson_id, is_boss_battle=boss,
+        order_index=order, week_number=week, day_number=None,
+        duration_minutes=minutes, xp_value=xp, content_json=content,
+    )
+
+
+def _level(level_id, lessons, order=0, total_xp=0, duration=0):
+    return SimpleNamespace(
+        id=level_id, title=level_id, description=None, order_index=order,
+        x_position=0.0, y_position=0.0, thumbnail_url=None, mux_preview_playback_id=None,
+        outcome=None, status=None, duration_minutes=duration, total_xp=total_xp,
+        lessons=lessons,
+    )
+
+
+def _world(world_id, levels, published=True, course_type="course", order=0):
+    return SimpleNamespace(
+        id=world_id, slug=world_id, title=world_id, description=None, image_url=None,
+        thumbnail_url=None, mux_preview_playback_id=None,
+        difficulty=SimpleNamespace(value="beginner"), course_type=course_type,
+        is_free=False, is_published=published, order_index=order,
+        total_duration_minutes=0, objectives=["a", "b"], levels=levels,
+    )
+
+
+def _db(worlds, edges=()):
+    db = MagicMock()
+
+    def query(model):
+        q = MagicMock()
+        if model is catalog_service.LevelEdge:
+            q.all.return_value = list(edges)
+        else:
+            q.options.return_value.order_by.return_value.all.return_value = worlds
+        return q
+
+    db.query.side_effect = query
+    return db
+
+
+def _sample_catalog():
+    notes = "Intro\n## TL;DR\nKeep your frame.\n## Drills\n..."
+    translated = {"notes": notes, "translations": {"es": {"notes": "## TL;DR\nMantén el marco."}}}
+    l1 = _level("L1", [
+        _lesson("a", "L1", 1, week=2),
+        _lesson("b", "L1", 0, week=1, content=translated),
+        _lesson("boss", "L1", 2, week=3, boss=True, xp=500, minutes=None),
+    ], total_xp=0, duration=0)
+    l2 = _level("L2", [_lesson("c", "L2", 0, week=4)], order=1, total_xp=999)
+    topic = _world("W1", [l1, l2], course_type="topic")
+    draft = _world("W2", [], published=False, order=1)
+    edge = SimpleNamespace(id="e1", world_id="W1", from_level_id="L1", to_level_id="L2")
+    return catalog_service.build_catalog(_db([topic, draft], [edge]))
+
+
+def test_build_resolves_totals_and_order():
+    catalog = _sample_catalog()
+    world = catalog.world("W1")
+
+    assert [w.id for w in catalog.published] == ["W1"]
+    assert catalog.world("W2").is_published is False
+    assert [l.id for l in world.lessons] == ["b", "a", "boss", "c"]
+    assert world.total_duration_minutes == 30 and world.lesson_count == 4
+
+    l1, l2 = world.levels
+    assert l1.total_xp == 600 and l1.duration_minutes == 20
+    assert l1.visible_lesson_count == 2
+    assert l2.total_xp == 999  # explicit value wins
+    assert world.prerequisites == {"L2": ("L1",)}
+
+
+def test_tldr_per_locale_with_english_fallback():
+    l1 = _sample_catalog().world("W1").levels[0]
+    assert l1.tldr("en") == "Keep your frame."
+    assert l1.tldr("es") == "Mantén el marco."
+    assert l1.tldr("fr") == "Keep your frame."
+
+
+def test_snapshot_is_immutable():
+    world = _sample_catalog().world("W1")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        world.title = "edited"
+    with pytest.raises(TypeError):
+        world.prerequisites["L1"] = ()
+
+
+def test_user_overlay_drives_unlocks():
+    world = _sample_catalog().world("W1")
+    level_lessons = world.level_lessons
+
+    completion = level_completion(level_lessons, {"a", "b"})
+    assert resolve_level_unlocks(list(level_lessons), world.prerequisites, completion) == {
+        "L1": True, "L2": False,
+    }
+    completion = level_completion(level_lessons, {"a", "b", "boss"})
+    assert resolve_level_unlocks(list(level_lessons), world.prerequisites, completion)["L2"] is True
+
+
+def test_lesson_index_gives_navigation_across_levels():
+    catalog = _sample_catalog()
+
+    first, boss, last = catalog.position("b"), catalog.position("boss"), catalog.position("c")
+    assert (first.prev_id, first.next_id, first.ordinal) == (None, "a", 0)
+    assert (boss.prev_id, boss.next_id, boss.level_title) == ("a", "c", "L1")
+    assert (last.prev_id, last.next_id, last.level_id) == ("boss", None, "L2")
+    world, lesson = catalog.lesson("c")
+    assert world.id == "W1" and lesson.id == "c"
+    assert catalog.position("missing") is None and catalog.lesson("missing") is None
+
+
+def test_get_lesson_reads_one_row_and_the_index(monkeypatch):
+    from models.user import UserRole
+    from routers import courses
+
+    catalog = _sample_catalog()
+    monkeypatch.setattr(catalog_service, "get_catalog", lambda db: catalog)
+    row = SimpleNamespace(
+        id="a", level_id="L1", title="a", description="", video_url="", xp_value=50,
+        week_number=2, day_number=None, content_json=None, mux_playback_id=None,
+        mux_asset_id=None, thumbnail_url=None, lesson_type="video",
+    )
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = row
+
+    detail = courses.get_lesson("a", current_user=SimpleNamespace(id="u1", role=UserRole.ADMIN), db=db)
+
+    assert (detail.prev_lesson_id, detail.next_lesson_id, detail.level_title) == ("b", "boss", "L1")
+    assert db.query.call_count == 1
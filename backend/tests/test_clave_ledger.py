@@ -0,0 +1,82 @@
+"""
+Unit tests for the clave ledger: cached balance reads, keyset-paged wallet
+history, and the snapshot / reconciliation SQL. Redis helpers are
+monkeypatched, sessions are MagicMock or unbound, and SQL is only compiled.
+"""
+import uuid
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from models.user import UserProfile
+from services import ledger_service, redis_service
+
+T0 = datetime(2026, 6, 1, 12, 0, 0)
+
+
+def test_cached_balance_skips_the_database(monkeypatch):
+    monkeypatch.setattr(redis_service, "get_cached_clave_balance", lambda uid: 42)
+    db = MagicMock()
+
+    assert ledger_service.get_balance("u1", db) == 42
+    db.query.assert_not_called()
+
+
+def test_balance_miss_reads_the_row_and_caches_it(monkeypatch):
+    cached = {}
+    monkeypatch.setattr(redis_service, "get_cached_clave_balance", lambda uid: None)
+    monkeypatch.setattr(redis_service, "cache_clave_balance", lambda uid, b: cached.update({uid: b}))
+    db = MagicMock()
+    db.query.return_value.filter.return_value.scalar.return_value = 7
+
+    assert ledger_service.get_balance("u1", db) == 7
+    assert cached == {"u1": 7}
+
+
+def test_session_copy_beats_the_cache(monkeypatch):
+    monkeypatch.setattr(redis_service, "get_cached_clave_balance", lambda uid: 42)
+    user_id = uuid.uuid4()
+    db = MagicMock()
+    db.identity_map.values.return_value = [UserProfile(user_id=user_id, current_claves=5)]
+
+    assert ledger_service.get_balance(str(user_id), db) == 5
+
+
+def test_history_pages_by_keyset(monkeypatch):
+    compiled = []
+    monkeypatch.setattr(
+        Query, "all",
+        lambda self: compiled.append(str(self.statement.compile(dialect=postgresql.dialect()))) or [],
+    )
+
+    assert ledger_service.get_history("u1", Session(), limit=20, cursor=(T0, uuid.uuid4())) == []
+    sql = compiled[0]
+    assert "(clave_transactions.created_at, clave_transactions.id) < " in sql
+    assert "ORDER BY clave_transactions.created_at DESC, clave_transactions.id DESC" in sql
+
+
+def test_snapshot_and_drift_build_on_the_last_snapshot(monkeypatch):
+    calls = []
+
+    def execute(self, stmt, params=None, **kwargs):
+        calls.append((str(stmt), params, stmt.get_execution_options()))
+        result = MagicMock()
+        result.rowcount = 3
+        result.__iter__.return_value = iter([(uuid.uuid4(), 110, 100)])
+        return result
+
+    monkeypatch.setattr(Session, "execute", execute)
+    db = Session()
+
+    assert ledger_service.take_snapshots(db, as_of=T0) == 3
+    drifts = list(ledger_service.iter_drift(db))
+
+    snapshot_sql, params, _ = calls[0]
+    assert "DISTINCT ON (user_id)" in snapshot_sql and "t.created_at <= :as_of" in snapshot_sql
+    assert params == {"as_of": T0}
+    drift_sql, _, options = calls[1]
+    assert "p.current_claves <> COALESCE(s.balance, 0) + COALESCE(d.delta, 0)" in drift_sql
+    assert options["stream_results"] is True
+    assert [d.difference for d in drifts] == [10]
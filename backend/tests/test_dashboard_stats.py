@@ -0,0 +1,111 @@
+"""
+Unit tests for the admin dashboard stats snapshot. Redis is a dict behind
+monkeypatch and queries are only compiled, so no live services are needed.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from services import dashboard_stats_service as svc
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+
+def _sql(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+def _capturing_db(monkeypatch, method, result):
+    """A real (unbound) Session whose terminal ``method`` records the SQL."""
+    executed = []
+
+    def capture(query):
+        executed.append(_sql(query))
+        return result
+
+    monkeypatch.setattr(Query, method, capture)
+    return Session(), executed
+
+
+def test_user_counts_are_one_filtered_scan(monkeypatch):
+    db, executed = _capturing_db(monkeypatch, "one", (10, 3, 2))
+    now = datetime(2026, 3, 10, tzinfo=timezone.utc)
+    stats = svc._user_stats(db, now - timedelta(days=7), now - timedelta(days=14))
+
+    assert stats["user_growth_pct"] == 50.0
+    assert len(executed) == 1
+    assert executed[0].count("FILTER (WHERE") == 2
+
+
+def test_world_stats_is_one_grouped_statement(monkeypatch):
+    db, executed = _capturing_db(monkeypatch, "all", [])
+    assert svc._world_stats(db) == []
+
+    assert len(executed) == 1
+    sql = executed[0]
+    assert "GROUP BY" in sql and "count(distinct(user_progress.user_id))" in sql
+    assert "worlds.is_published" in sql
+
+
+def test_serves_fresh_snapshot_without_querying(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(svc, "get_redis_client", lambda: redis)
+    calls = []
+    monkeypatch.setattr(svc, "compute_snapshot", lambda db: calls.append(1) or {
+        "total_users": len(calls), "as_of": datetime.now(timezone.utc).isoformat(),
+    })
+
+    first = svc.get_snapshot(MagicMock())
+    second = svc.get_snapshot(MagicMock())
+    assert first == second and calls == [1]
+
+    forced = svc.get_snapshot(MagicMock(), force_refresh=True)
+    assert forced["total_users"] == 2
+
+
+def test_stale_snapshot_is_recomputed(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(svc, "get_redis_client", lambda: redis)
+    old = datetime.now(timezone.utc) - timedelta(seconds=svc._refresh_seconds() * 3)
+    svc._store({"total_users": 1, "as_of": old.isoformat()})
+    monkeypatch.setattr(svc, "compute_snapshot", lambda db: {
+        "total_users": 2, "as_of": datetime.now(timezone.utc).isoformat(),
+    })
+    assert svc.get_snapshot(MagicMock())["total_users"] == 2
+
+
+def test_redis_down_still_serves(monkeypatch):
+    def boom():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(svc, "get_redis_client", boom)
+    monkeypatch.setattr(svc, "compute_snapshot", lambda db: {"total_users": 5, "as_of": "x"})
+    assert svc.get_snapshot(MagicMock())["total_users"] == 5
+
+
+def test_refresher_tick_only_one_worker_per_interval(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(svc, "get_redis_client", lambda: redis)
+    monkeypatch.setattr(svc, "compute_snapshot", lambda db: {"as_of": "now"})
+    sessions = []
+    factory = lambda: sessions.append(MagicMock()) or sessions[-1]
+
+    a = svc.SnapshotRefresher(session_factory=factory)
+    b = svc.SnapshotRefresher(session_factory=factory)
+    assert a.tick() is True
+    assert b.tick() is False
+    assert len(sessions) == 1 and sessions[0].close.called
@@ -0,0 +1,76 @@
+"""
+Unit tests for the two-layer community feed cache. Redis is replaced via
+monkeypatch and sessions are MagicMocks, so no live services are needed.
+"""
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from services import feed_cache_service, post_service
+
+
+def test_filter_key_uses_only_relevant_generation():
+    gens = {"stage": 4, "lab": 9}
+    # Filtered to one type: a lab write must not invalidate stage pages.
+    assert feed_cache_service._filter_key("stage", None, "motw", gens) == "stage:motw:-:g4"
+    # Unfiltered feed depends on both.
+    assert feed_cache_service._filter_key(None, None, None, gens) == "all:-:-:g4.9"
+
+
+def test_filter_key_is_tag_order_insensitive():
+    gens = {"stage": 0, "lab": 0}
+    a = feed_cache_service._filter_key("lab", ["timing", "on2"], None, gens)
+    b = feed_cache_service._filter_key("lab", ["on2", "timing", "on2"], None, gens)
+    assert a == b == "lab:-:on2,timing:g0"
+
+
+def test_get_page_round_trips_and_counts(monkeypatch):
+    store = {}
+    results = []
+    monkeypatch.setattr(feed_cache_service.redis_service, "get_feed_generations", lambda: {"stage": 1, "lab": 1})
+    monkeypatch.setattr(feed_cache_service.redis_service, "get_cached_feed_page", lambda k, p: store.get((k, p)))
+    monkeypatch.setattr(feed_cache_service.redis_service, "cache_feed_page", lambda k, p, d: store.__setitem__((k, p), d))
+    monkeypatch.setattr(feed_cache_service.redis_service, "record_feed_cache_result", lambda hit: results.append(hit))
+
+    page, key = feed_cache_service.get_page("stage", None, None, "o0:20")
+    assert page is None and key == "stage:-:-:g1"
+
+    feed_cache_service.put_page(key, "o0:20", [{"id": "p1", "created_at": datetime(2026, 1, 1, 12, 0)}])
+    page, _ = feed_cache_service.get_page("stage", None, None, "o0:20")
+    assert page == [{"id": "p1", "created_at": "2026-01-01T12:00:00"}]
+    assert results == [False, True]
+
+
+def test_get_page_skips_store_when_redis_down(monkeypatch):
+    monkeypatch.setattr(feed_cache_service.redis_service, "get_feed_generations", lambda: None)
+    page, key = feed_cache_service.get_page(None, None, None, "o0:20")
+    assert page is None and key is None
+
+
+def test_viewer_overlay_merges_reaction_and_saved_state():
+    db = MagicMock()
+
+    def query(*cols):
+        q = MagicMock()
+        if len(cols) == 2:  # (post_id, reaction_type)
+            q.filter.return_value.all.return_value = [("p1", "like")]
+        else:  # saved post ids
+            q.filter.return_value.all.return_value = [("p2",)]
+        return q
+
+    db.query.side_effect = query
+    shared = [
+        {"id": "p1", "user_reaction": None, "is_saved": False},
+        {"id": "p2", "user_reaction": None, "is_saved": False},
+    ]
+    merged = post_service._apply_viewer_overlay(shared, "viewer", db)
+    assert merged[0] == {"id": "p1", "user_reaction": "like", "is_saved": False}
+    assert merged[1] == {"id": "p2", "user_reaction": None, "is_saved": True}
+    # Shared page dicts are never mutated (they may be reused).
+    assert shared[0]["user_reaction"] is None
+
+
+def test_viewer_overlay_anonymous_is_free():
+    db = MagicMock()
+    page = [{"id": "p1", "user_reaction": None, "is_saved": False}]
+    assert post_service._apply_viewer_overlay(page, None, db) is page
+    db.query.assert_not_called()
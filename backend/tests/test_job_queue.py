@@ -0,0 +1,141 @@
+"""
+Unit tests for the Redis job queue: eager mode, the inline fallback when
+Redis is down, and the worker's retry / dead-letter bookkeeping. Redis is a
+MagicMock (the Lua scripts are stubbed) — no live services are needed.
+"""
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from services import job_queue, post_service
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    seen = []
+
+    def flaky(n, fail=False):
+        seen.append(n)
+        if fail:
+            raise ValueError("boom")
+
+    monkeypatch.setitem(job_queue._registry, "test.flaky",
+                        job_queue.JobSpec("test.flaky", flaky, max_attempts=2, timeout=300, uses_db=False))
+    return seen
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(job_queue, "get_redis_client", lambda: client)
+    monkeypatch.setattr(job_queue, "_eager", False)
+    return client
+
+
+def _claim(monkeypatch, envelope, owned=True):
+    """Stub the scripts: _CLAIM hands out `envelope`, _FINISH records its
+    call and reports whether this worker still held the lease."""
+    finished = []
+
+    def script(source):
+        if source == job_queue._FINISH:
+            return lambda keys, args: finished.append(args) or int(owned)
+        return lambda keys, args: json.dumps(envelope)
+
+    monkeypatch.setattr(job_queue, "_script", script)
+    return finished
+
+
+def test_eager_mode_runs_inline_once_per_key(monkeypatch, calls):
+    monkeypatch.setattr(job_queue, "_eager", True)
+    monkeypatch.setattr(job_queue, "_eager_keys", set())
+
+    assert job_queue.enqueue("test.flaky", key="k1", n=1) is True
+    assert job_queue.enqueue("test.flaky", key="k1", n=2) is False
+    assert job_queue.enqueue("test.flaky", n=3) is True
+    assert calls == [1, 3]
+
+
+def test_enqueue_runs_inline_when_redis_is_down(monkeypatch, calls, redis):
+    def down(source):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(job_queue, "_script", down)
+
+    assert job_queue.enqueue("test.flaky", n=7) is True
+    assert calls == [7]
+
+
+def test_failed_job_is_retried_then_dead_lettered(monkeypatch, calls, redis):
+    pipe = redis.pipeline.return_value
+    envelope = job_queue._envelope("test.flaky", {"n": 1, "fail": True}, None)
+
+    finished = _claim(monkeypatch, envelope)
+    assert job_queue.work_one() is True
+    raw, lease, outcome, scheduled, retry_at, _ = finished[0]
+    retried = json.loads(scheduled)
+    assert raw == json.dumps(envelope) and outcome == "retry" and retry_at > lease - 300
+    assert retried["attempt"] == 1 and retried["error"] == "ValueError: boom"
+
+    finished = _claim(monkeypatch, retried)
+    job_queue.work_one()
+    _, _, outcome, dead, _, dead_max = finished[0]
+    assert outcome == "dead" and json.loads(dead)["attempt"] == 2 and dead_max == job_queue.DEAD_LETTER_MAX
+    pipe.hincrby.assert_any_call(job_queue.STATS_KEY, "test.flaky:dead", 1)
+    assert calls == [1, 1]
+
+
+def test_successful_job_releases_its_lease(monkeypatch, calls, redis):
+    pipe = redis.pipeline.return_value
+    envelope = job_queue._envelope("test.flaky", {"n": 5}, None)
+    finished = _claim(monkeypatch, envelope)
+
+    assert job_queue.work_one() is True
+
+    [(raw, lease, outcome, *_)] = finished
+    assert raw == json.dumps(envelope) and outcome == "ok"
+    pipe.hincrby.assert_called_once_with(job_queue.STATS_KEY, "test.flaky:ok", 1)
+    assert calls == [5]
+
+
+def test_job_that_outlived_its_lease_is_not_dead_lettered(monkeypatch, calls, redis):
+    pipe = redis.pipeline.return_value
+    envelope = job_queue._envelope("test.flaky", {"n": 1, "fail": True}, None, attempt=1)
+    finished = _claim(monkeypatch, envelope, owned=False)
+
+    job_queue.work_one()
+
+    # The settle script found another worker's lease and left it; the
+    # failure is counted but the job is not reported dead.
+    assert finished[0][2] == "dead"
+    pipe.hincrby.assert_called_once_with(job_queue.STATS_KEY, "test.flaky:failed", 1)
+
+
+def test_promote_counts_expired_leases_against_max_attempts(monkeypatch, calls, redis):
+    seen = []
+    monkeypatch.setattr(job_queue, "_script", lambda source: lambda keys, args: seen.append((source, keys, args)) or 0)
+
+    job_queue.promote_due(now=100.0)
+
+    [(source, keys, args)] = seen
+    assert source == job_queue._PROMOTE and "'lease expired'" in source
+    assert keys == [job_queue.DELAYED_KEY, job_queue.INFLIGHT_KEY, job_queue.READY_KEY,
+                    job_queue.DEAD_KEY, job_queue.STATS_KEY]
+    assert args[0] == 100.0 and json.loads(args[2])["test.flaky"] == 2
+
+
+def test_mux_delete_waits_for_commit(monkeypatch):
+    deleted = []
+    monkeypatch.setattr(post_service, "delete_mux_asset", lambda asset_id: deleted.append(asset_id) or True)
+    monkeypatch.setattr(job_queue, "_eager", True)
+    monkeypatch.setattr(job_queue, "_eager_keys", set())
+    db = Session()
+
+    post_service.schedule_mux_delete("asset-1", db)
+    assert deleted == []
+
+    for callback in db.info.pop("after_commit_callbacks"):
+        callback()
+    assert deleted == ["asset-1"]
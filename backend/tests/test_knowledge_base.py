@@ -0,0 +1,145 @@
+"""
+Unit tests for the AI chat knowledge base: passage splitting, BM25 ranking,
+the memory-mapped index file and incremental catalog segments. Worlds are
+SimpleNamespace rows behind a MagicMock session and the index is written to
+tmp_path — no live services are needed.
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import knowledge_base
+from services.knowledge_base import MappedSegment, MemorySegment, rank
+
+NOTES = """# Module 1: The Precursors
+
+## The Story
+Arsenio Rodríguez added the conga to the son montuno.
+
+## The 'Aha' Moment
+Soft knees delay the weight transfer. That delay is Cuban motion.
+
+## Sources
+Various interviews.
+"""
+
+
+def _lesson(lesson_id, title, description="", content=None):
+    return SimpleNamespace(id=lesson_id, title=title, description=description, content_json=content)
+
+
+def _world(world_id, lessons, title=None, is_free=True):
+    level = SimpleNamespace(title="Basics", description="Footwork", outcome=None, lessons=lessons)
+    return SimpleNamespace(id=world_id, title=title or world_id, description="A course",
+                           objectives=["timing"], levels=[level], is_free=is_free)
+
+
+def _db(worlds):
+    db = MagicMock()
+    db.query.return_value.options.return_value.filter.return_value.order_by.return_value.all.return_value = worlds
+    return db
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(knowledge_base, "_world_segments", {})
+    monkeypatch.setattr(knowledge_base, "_static_loaded", True)
+    monkeypatch.setattr(knowledge_base, "_static", None)
+    monkeypatch.setattr(knowledge_base._catalog_segments, "_current_version", lambda: None)
+    monkeypatch.setattr(knowledge_base._catalog_segments, "_entry", None)
+
+
+def test_sections_become_ranked_passages():
+    passages = knowledge_base.markdown_passages("Mambo History", NOTES)
+
+    assert [p.title for p in passages] == [
+        "Module 1: The Precursors › The Story",
+        "Module 1: The Precursors › The 'Aha' Moment",
+        "Module 1: The Precursors › Sources",
+    ]
+    hits = rank([MemorySegment(passages)], "arsenio rodriguez conga")
+    assert hits[0].title.endswith("The Story") and len(hits) == 1
+    assert rank([MemorySegment(passages)], "soft knees")[0].snippet.startswith("Soft knees delay")
+
+
+def test_mapped_index_scores_like_memory(tmp_path):
+    passages = knowledge_base.markdown_passages("Mambo History", NOTES)
+    path = str(tmp_path / "kb.idx")
+
+    stats = knowledge_base.write_index(path, passages, built_at="2026-01-01")
+    mapped = MappedSegment(path)
+
+    assert stats["passages"] == mapped.n_docs == 3 and mapped.built_at == "2026-01-01"
+    assert rank([mapped], "delay weight transfer") == rank([MemorySegment(passages)], "delay weight transfer")
+    assert mapped.passage(0) == passages[0]
+
+
+def test_load_warns_when_course_notes_changed(tmp_path, monkeypatch, caplog):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "module_1.md").write_text(NOTES)
+    sources = (("Mambo History", str(notes)),)
+    path = str(tmp_path / "kb.idx")
+    knowledge_base.write_index(path, knowledge_base.markdown_passages("Mambo History", NOTES),
+                               sources=knowledge_base.sources_digest(sources))
+    monkeypatch.setattr(knowledge_base, "INDEX_PATH", path)
+    monkeypatch.setattr(knowledge_base, "COURSE_NOTES_SOURCES", sources)
+
+    knowledge_base.load()
+    assert "stale" not in caplog.text
+
+    (notes / "module_1.md").write_text(NOTES + "\n## New section\nMore.")
+    knowledge_base.load()
+    assert "Knowledge base index is stale" in caplog.text
+
+
+def test_every_free_lesson_and_quiz_is_searchable():
+    lessons = [_lesson(f"l{i}", f"Drill {i}") for i in range(150)]
+    lessons.append(_lesson("l150", "Shines", content={
+        "notes": "## TL;DR\nSuzie Q crosses behind.",
+        "questions": [{"question": "Which foot leads the guapea?", "options": ["Left", "Right"],
+                       "correct_answer": 0, "explanation": "Leaders start left."}],
+    }))
+
+    hits = knowledge_base.search("suzie q", db=_db([_world("w1", lessons, title="Mambo 101")]))
+    assert hits[0].title == "Mambo 101 › Shines › TL;DR"
+    quiz = knowledge_base.search("guapea", db=_db([_world("w1", lessons, title="Mambo 101")]))
+    assert quiz[0].source == "quiz" and quiz[0].snippet == "Which foot leads the guapea?"
+
+
+def test_paid_worlds_index_only_public_metadata():
+    lesson = _lesson("l1", "Shines", description="Footwork variations", content={
+        "notes": "## TL;DR\nSuzie Q crosses behind.",
+        "questions": [{"question": "Which foot leads the guapea?", "options": ["Left", "Right"],
+                       "correct_answer": 0}],
+    })
+    passages = knowledge_base.world_passages(_world("w1", [lesson], title="Mambo 201", is_free=False))
+
+    assert {p.source for p in passages} == {"world", "level", "lesson"}
+    assert not any("Suzie" in p.text or "guapea" in p.text for p in passages)
+
+
+def test_only_changed_worlds_are_reindexed(monkeypatch):
+    built = []
+    monkeypatch.setattr(knowledge_base, "MemorySegment",
+                        lambda passages: built.append(passages[0].title) or MemorySegment(passages))
+    w1 = _world("w1", [_lesson("a", "Basic step")])
+    w2 = _world("w2", [_lesson("b", "Cross body lead")])
+
+    knowledge_base._build_catalog_segments(_db([w1, w2]))
+    w2.levels[0].lessons[0].description = "Open the slot on 1"
+    knowledge_base._build_catalog_segments(_db([w1, w2]))
+
+    assert built == ["w1", "w2", "w2"]
+
+
+def test_chat_tool_returns_ranked_snippets(monkeypatch):
+    from routers import ai_chat
+
+    hit = knowledge_base.Hit("lesson", "Mambo 101 › Shines", "Suzie Q crosses behind.", 3.2)
+    monkeypatch.setattr(knowledge_base, "search", lambda query, db=None, k=5: [hit])
+
+    result = ai_chat.execute_search_knowledge_base("suzie q", db=MagicMock())
+
+    assert result["result"] == "I found the following relevant content: Mambo 101 › Shines: Suzie Q crosses behind."
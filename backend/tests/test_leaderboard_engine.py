@@ -0,0 +1,72 @@
+"""
+Unit tests for the Redis-backed leaderboard engine and the after-commit
+hook it relies on. Redis is replaced with a MagicMock client and the
+session hooks run against in-memory SQLite, so no live services are needed.
+"""
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from services import leaderboard_service as lb
+from utils.db_hooks import after_commit
+
+
+def test_score_deltas_follow_category_weights():
+    deltas = lb._score_deltas(lb.METRIC_SOLUTIONS)
+    assert deltas == {"overall": 15, "helpful": 10}
+
+    # Reactions given only score in the 'active' category.
+    assert lb._score_deltas(lb.METRIC_REACTIONS_GIVEN, 3) == {"active": 3}
+
+    # Negative counts reverse the same weights.
+    assert lb._score_deltas(lb.METRIC_POSTS, -1) == {"overall": -5, "creative": -5, "active": -3}
+
+
+def test_window_days_are_day_buckets_newest_first():
+    days = lb._window_days("weekly", today=date(2026, 3, 10))
+    assert len(days) == 7
+    assert days[0] == date(2026, 3, 10)
+    assert days[-1] == date(2026, 3, 4)
+    assert lb._window_days("all_time") == []
+
+
+def test_apply_increments_touches_all_time_and_day_bucket(monkeypatch):
+    client = MagicMock()
+    pipe = client.pipeline.return_value
+    monkeypatch.setattr(lb, "get_redis_client", lambda: client)
+
+    lb._apply_increments([(lb.METRIC_REPLIES, "u1", datetime(2026, 3, 10, 23, 59), 1)])
+
+    zincrs = {(c.args[0], c.args[1], c.args[2]) for c in pipe.zincrby.call_args_list}
+    assert ("lb:overall:all", 3, "u1") in zincrs
+    assert ("lb:overall:d:20260310", 3, "u1") in zincrs
+    assert ("lb:helpful:d:20260310", 3, "u1") in zincrs
+    # 'creative' doesn't weight replies.
+    assert not any(k.startswith("lb:creative") for k, _, _ in zincrs)
+    pipe.expire.assert_any_call("lb:overall:d:20260310", lb.DAY_BUCKET_TTL)
+    pipe.execute.assert_called_once()
+
+
+def test_after_commit_runs_on_commit_and_drops_on_rollback():
+    Session = sessionmaker(bind=create_engine("sqlite://"))
+    calls = []
+
+    with Session() as db:
+        db.execute(text("SELECT 1"))
+        after_commit(db, lambda: calls.append("committed"))
+        db.rollback()
+        db.commit()
+    assert calls == []
+
+    with Session() as db:
+        after_commit(db, lambda: calls.append("committed"))
+        db.commit()
+    assert calls == ["committed"]
+
+
+def test_record_event_is_noop_on_mock_session():
+    # Unit tests elsewhere pass MagicMock sessions into post_service; the
+    # hook must not blow up or try to reach Redis.
+    lb.record_event(lb.METRIC_POSTS, "u1", MagicMock())
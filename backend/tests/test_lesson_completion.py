@@ -0,0 +1,117 @@
+"""
+Unit tests for the single-transaction lesson completion pipeline. The
+catalog and analytics are monkeypatched, sessions are MagicMock or unbound,
+and SQL is only compiled — no live services are needed.
+"""
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from models.user import SubscriptionStatus, User, UserProfile, UserRole
+from services import analytics_service, progress_service
+from services.gamification_service import apply_streak
+from services.principal_service import Principal
+from services.streak_service import save_streak
+
+LESSON = SimpleNamespace(id=str(uuid.uuid4()), title="Basic step", is_boss_battle=False, xp_value=50)
+
+
+def _world(is_free: bool):
+    return SimpleNamespace(id="w1", slug="mambo-101", is_free=is_free, lessons=(LESSON,))
+
+
+def _principal(status=None) -> Principal:
+    return Principal(User(id=uuid.uuid4(), role=UserRole.STUDENT), status)
+
+
+def _profile(**overrides) -> UserProfile:
+    fields = dict(
+        user_id=uuid.uuid4(), xp=90, level=1, streak_count=4, timezone="UTC",
+        last_login_date=datetime.now(timezone.utc) - timedelta(days=1),
+        weekly_free_freeze_used=False, inventory_freezes=0,
+        last_freeze_reset_date=None, current_claves=0,
+    )
+    fields.update(overrides)
+    return UserProfile(**fields)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    def use(world):
+        monkeypatch.setattr(progress_service, "find_lesson", lambda db, lid: (world, LESSON))
+    monkeypatch.setattr(analytics_service, "track_event", lambda **kw: None)
+    return use
+
+
+def test_progress_upsert_only_updates_an_incomplete_row(monkeypatch):
+    statements = []
+
+    def execute(self, stmt, *args, **kwargs):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        result.first.return_value = None
+        return result
+
+    monkeypatch.setattr(Session, "execute", execute)
+
+    assert progress_service._mark_completed("u1", LESSON.id, Session()) is False
+    sql = statements[0]
+    assert "INSERT INTO user_progress" in sql
+    assert "ON CONFLICT ON CONSTRAINT unique_user_lesson DO UPDATE" in sql
+    assert "WHERE user_progress.is_completed IS false RETURNING user_progress.id" in sql
+
+
+def test_second_completion_is_refused_before_locking_the_profile(catalog, monkeypatch):
+    catalog(_world(is_free=True))
+    monkeypatch.setattr(progress_service, "_mark_completed", lambda *a: False)
+    db = MagicMock()
+
+    with pytest.raises(progress_service.AlreadyCompleted):
+        progress_service.complete_lesson(_principal(), LESSON.id, db)
+    db.query.assert_not_called()
+
+
+def test_paid_lesson_needs_a_subscription(catalog):
+    catalog(_world(is_free=False))
+
+    with pytest.raises(progress_service.SubscriptionRequired):
+        progress_service.complete_lesson(_principal(SubscriptionStatus.CANCELED), LESSON.id, MagicMock())
+
+
+def test_completion_applies_xp_and_streak_on_one_locked_read(catalog, monkeypatch):
+    catalog(_world(is_free=False))
+    monkeypatch.setattr(progress_service, "_mark_completed", lambda *a: True)
+    monkeypatch.setattr("services.badge_service.check_streak_badges", lambda *a: None)
+    profile = _profile()
+    db = MagicMock()
+    db.query.return_value.filter.return_value.with_for_update.return_value.first.return_value = profile
+
+    result = progress_service.complete_lesson(_principal(SubscriptionStatus.ACTIVE), LESSON.id, db)
+
+    assert result == {"xp_gained": 50, "new_total_xp": 140, "leveled_up": False, "new_level": 1}
+    assert profile.streak_count == 5
+    assert db.query.call_count == 1
+    db.flush.assert_not_called()
+    db.commit.assert_not_called()
+    db.add.assert_called_once()  # the XP audit row
+
+
+def test_broken_streak_is_saved_in_memory(monkeypatch):
+    monkeypatch.setattr("services.badge_service.check_streak_badges", lambda *a: None)
+    profile = _profile(last_login_date=datetime.now(timezone.utc) - timedelta(days=3),
+                       weekly_free_freeze_used=True, last_freeze_reset_date=date(2000, 1, 3))
+    db = MagicMock()
+
+    result = apply_streak(profile, db)
+
+    assert result["streak_saved"] and result["save_method"] == "weekly_freebie"
+    assert profile.streak_count == 4 and profile.weekly_free_freeze_used
+    db.query.assert_not_called()
+
+    spent = _profile(weekly_free_freeze_used=True, last_freeze_reset_date=date.today() + timedelta(days=7))
+    assert save_streak(spent).saved is False
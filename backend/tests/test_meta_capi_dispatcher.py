@@ -0,0 +1,107 @@
+"""
+Unit tests for the batched Meta CAPI dispatcher. HTTP goes through
+httpx.MockTransport, so nothing leaves the process.
+"""
+import asyncio
+import json
+
+import httpx
+
+from services import meta_capi_service
+from services.meta_capi_service import CapiDispatcher
+
+
+def _events(*names):
+    return [{"event_id": f"e{i}", "event_name": n} for i, n in enumerate(names)]
+
+
+def _run(handler, events):
+    seen = []
+
+    def record(request):
+        seen.append(json.loads(request.content)["data"])
+        return handler(request, seen)
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(record)) as client:
+            return await CapiDispatcher()._post_events(client, "https://graph.test/events", "tok", events)
+
+    return asyncio.run(go()), seen
+
+
+def test_whole_batch_goes_in_one_request():
+    statuses, seen = _run(lambda req, seen: httpx.Response(200, json={"events_received": 3}),
+                          _events("PageView", "Lead", "Purchase"))
+    assert statuses == {"e0": "ok", "e1": "ok", "e2": "ok"}
+    assert len(seen) == 1 and len(seen[0]) == 3
+
+
+def test_bad_request_is_bisected_to_the_bad_event():
+    def handler(request, seen):
+        data = json.loads(request.content)["data"]
+        bad = any(e["event_name"] == "Broken" for e in data)
+        if not bad:
+            return httpx.Response(200, json={})
+        return httpx.Response(400, json={"error": {
+            "type": "OAuthException", "code": 100, "error_subcode": 2804008, "message": "Invalid parameter",
+        }})
+
+    statuses, _ = _run(handler, _events("PageView", "Broken", "Lead", "Purchase"))
+    assert statuses == {"e0": "ok", "e1": "error", "e2": "ok", "e3": "ok"}
+
+
+def test_expired_token_fails_the_batch_without_bisecting():
+    def handler(request, seen):
+        return httpx.Response(400, json={"error": {
+            "type": "OAuthException", "code": 190, "message": "Error validating access token",
+        }})
+
+    statuses, seen = _run(handler, _events("PageView", "Lead", "Purchase", "Lead"))
+    assert set(statuses.values()) == {"error"}
+    assert len(seen) == 1
+
+
+def test_transient_errors_retry_with_backoff(monkeypatch):
+    monkeypatch.setattr(meta_capi_service, "_backoff_delay", lambda attempt: 0)
+
+    def handler(request, seen):
+        return httpx.Response(503 if len(seen) < 3 else 200, json={})
+
+    statuses, seen = _run(handler, _events("Purchase"))
+    assert statuses == {"e0": "ok"}
+    assert len(seen) == 3
+
+
+def test_backoff_is_jittered_and_capped():
+    for attempt in range(10):
+        assert 0 <= meta_capi_service._backoff_delay(attempt) <= meta_capi_service.BACKOFF_CAP_SECONDS
+
+
+def test_dispatcher_batches_and_stamps_in_bulk(monkeypatch):
+    stamped = []
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={})
+
+    dispatcher = CapiDispatcher(
+        endpoint=lambda: "https://graph.test/events",
+        access_token=lambda: "tok",
+        status_writer=stamped.append,
+        linger=0.05,
+    )
+    original = httpx.AsyncClient
+
+    def client_factory(**kwargs):
+        kwargs.pop("http2", None)
+        return original(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(meta_capi_service.httpx, "AsyncClient", client_factory)
+    for event in _events("PageView", "Lead", "Purchase"):
+        assert dispatcher.submit(event)
+    dispatcher.shutdown(timeout=5)
+
+    assert len(requests) == 1
+    assert stamped == [{"e0": "ok", "e1": "ok", "e2": "ok"}]
+    assert not dispatcher.submit(_events("Late")[0])
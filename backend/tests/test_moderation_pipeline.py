@@ -0,0 +1,88 @@
+"""
+Unit tests for the async moderation pipeline. Uses the fake LLM backend,
+an in-memory verdict cache and MagicMock sessions — no Anthropic, Redis or
+database needed.
+"""
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from models.community import ModerationStatus
+from services import moderation_service as mod
+from services import post_service
+
+
+@pytest.fixture
+def verdict_cache(monkeypatch):
+    store = {}
+    monkeypatch.setattr(mod, "get_cached_verdict", lambda kind, digest: store.get((kind, digest)))
+    monkeypatch.setattr(mod, "cache_verdict", lambda kind, digest, status: store.__setitem__((kind, digest), status))
+    monkeypatch.setattr(mod, "record_stage", lambda stage, seconds: None)
+    monkeypatch.setattr(mod, "record_outcome", lambda outcome: None)
+    return store
+
+
+def test_fingerprint_ignores_case_punctuation_and_spacing():
+    a = mod.content_fingerprint("reply", "You SUCK!!  delete this 🙄")
+    b = mod.content_fingerprint("reply", "you suck delete this")
+    assert a == b
+    assert a != mod.content_fingerprint("post", "you suck delete this")
+
+
+def test_parse_verdict_fails_open_and_only_caches_definitive():
+    assert mod._parse_verdict('{"verdict": "fail", "reason": "x"}', "reply", "") == ("flagged_by_ai", True)
+    assert mod._parse_verdict('{"verdict": "pass"}', "reply", "") == ("active", True)
+    assert mod._parse_verdict("not json", "reply", "") == ("active", False)
+    assert mod._parse_verdict('{"verdict": "maybe"}', "reply", "") == ("active", False)
+    assert mod._parse_verdict(None, "reply", "") == ("active", False)
+
+
+def test_moderate_reply_uses_cached_verdict(verdict_cache):
+    assert mod.moderate_reply("Great job!") == ModerationStatus.PENDING.value
+    verdict_cache[("reply", mod.content_fingerprint("reply", "great job"))] = "active"
+    assert mod.moderate_reply("Great   job!") == ModerationStatus.ACTIVE.value
+
+
+def test_pipeline_evaluates_dedupes_and_applies(verdict_cache):
+    applied = {}
+    backend = mod.FakeBackend(latency=0.05)
+    pipeline = mod.ModerationPipeline(
+        backend=backend,
+        apply=lambda kind, object_id, status: applied.__setitem__(object_id, status),
+        sweep=None,
+    )
+    try:
+        pipeline.submit("reply", "r1", ("Nice styling!",))
+        pipeline.submit("reply", "r2", ("nice styling",))   # near-duplicate, in flight together
+        pipeline.submit("reply", "r3", ("You suck, give up",))
+        deadline = time.monotonic() + 5
+        while pipeline.queued() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    assert applied == {"r1": "active", "r2": "active", "r3": "flagged_by_ai"}
+    assert backend.calls == 2
+    assert len(verdict_cache) == 2
+
+
+def test_apply_verdict_publishes_pending_reply():
+    reply = SimpleNamespace(moderation_status="pending", is_deleted=False, post_id="p1")
+    post = SimpleNamespace(reply_count=4)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.with_for_update.return_value.first.side_effect = [reply, post]
+
+    assert post_service.apply_moderation_verdict("reply", "r1", "active", db) is True
+    assert reply.moderation_status == "active"
+    assert post.reply_count == 5
+
+
+def test_apply_verdict_never_overrides_admin_decision():
+    reply = SimpleNamespace(moderation_status="ghosted", is_deleted=False, post_id="p1")
+    db = MagicMock()
+    db.query.return_value.filter.return_value.with_for_update.return_value.first.return_value = reply
+
+    assert post_service.apply_moderation_verdict("reply", "r1", "active", db) is False
+    assert reply.moderation_status == "ghosted"
@@ -0,0 +1,208 @@
+"""
+Unit tests for the SSE notification stream: framing, the per-worker hub and
+the Redis unread counter. Redis is a dict behind monkeypatch and the hub's
+listener thread is never started — no live services are needed.
+"""
+import asyncio
+import json
+import time
+
+from services import notification_stream
+from services.notification_stream import NotificationHub
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.published = []
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = str(value)
+        return True
+
+    def eval(self, script, numkeys, key, *args):
+        if key not in self.store:
+            return None
+        if script == notification_stream._HSET_IF_EXISTS:
+            self.store[key][args[0]] = args[1]
+            return 1
+        self.store[key] = str(max(int(self.store[key]) + int(args[0]), 0))
+        return int(self.store[key])
+
+    def hgetall(self, key):
+        return dict(self.store.get(key, {}))
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+def _hub() -> NotificationHub:
+    hub = NotificationHub()
+    hub._ensure_started = lambda: None
+    return hub
+
+
+def test_format_event():
+    assert notification_stream.format_event("unread", {"unread_count": 3}) == (
+        'event: unread\ndata: {"unread_count": 3}\n\n'
+    )
+    assert notification_stream.format_event("notification", {}, "abc").startswith("id: abc\nevent: notification\n")
+
+
+def test_unread_counter_seeds_then_adjusts(monkeypatch):
+    redis = _FakeRedis()
+    seeds = []
+    monkeypatch.setattr(notification_stream, "get_redis_client", lambda: redis)
+    from services import notification_service
+    monkeypatch.setattr(notification_service, "count_personal_unread", lambda user_id, db: seeds.append(user_id) or 4)
+    monkeypatch.setattr(notification_stream, "_broadcast_unread", lambda user_id, db: 0)
+
+    assert notification_stream._adjust_unread("u1", +1) is None  # no key: left for the next read
+    assert notification_stream.unread_count("u1", None) == 4
+    assert notification_stream._adjust_unread("u1", +1) == 5
+    assert notification_stream._adjust_unread("u1", -9) == 0
+    assert notification_stream.unread_count("u1", None) == 0
+    assert seeds == ["u1"]
+
+
+def test_broadcasts_are_counted_from_recent_rows_and_read_state(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(notification_stream, "get_redis_client", lambda: redis)
+    redis.store[notification_stream._RECENT_BROADCASTS_KEY] = json.dumps([
+        {"id": "b3", "created_at": "2026-03-03T00:00:00.000000", "exclude_user_id": None},
+        {"id": "b2", "created_at": "2026-03-02T00:00:00.000000", "exclude_user_id": "u1"},
+        {"id": "b1", "created_at": "2026-03-01T00:00:00.000000", "exclude_user_id": None},
+        {"id": "b0", "created_at": "2026-01-01T00:00:00.000000", "exclude_user_id": None},
+    ])
+    redis.store["notifications:broadcast_state:u1"] = {"until": "2026-02-01T00:00:00.000000"}
+    redis.store["notifications:unread:u1"] = "2"
+
+    # b0 is under the watermark and b2 was published by u1.
+    assert notification_stream.unread_count("u1", None) == 4
+
+    notification_stream._update_broadcast_state("u1", "read:b3", "1")
+    assert notification_stream._total_unread("u1", 2) == 3
+    assert notification_stream._total_unread("u2", 2) is None  # u2's state isn't cached
+
+
+def test_new_broadcast_is_one_event_not_a_resync(monkeypatch):
+    from datetime import datetime
+    from types import SimpleNamespace
+    from sqlalchemy.orm import Session
+
+    redis = _FakeRedis()
+    redis.store[notification_stream._RECENT_BROADCASTS_KEY] = "[]"
+    redis.store["notifications:unread:u1"] = "3"
+    monkeypatch.setattr(notification_stream, "get_redis_client", lambda: redis)
+    broadcast = SimpleNamespace(
+        id="b1", type="course_published", title="New course: Salsa", message="Salsa is live.",
+        reference_type="course", reference_id="w1", exclude_user_id="admin",
+        created_at=datetime(2026, 3, 1),
+    )
+    db = Session()
+
+    notification_stream.notify_broadcast(broadcast, db)
+    for callback in db.info.pop("after_commit_callbacks"):
+        callback()
+
+    [(_, message)] = redis.published
+    assert message["user_id"] == notification_stream.BROADCAST and message["event"] == "notification"
+    assert message["exclude_user_id"] == "admin" and "unread_count" not in message["data"]
+    # Only the shared list is dropped; per-user counters are left alone.
+    assert notification_stream._RECENT_BROADCASTS_KEY not in redis.store
+    assert redis.store["notifications:unread:u1"] == "3"
+
+
+def test_hub_routes_events_to_the_recipient():
+    async def scenario():
+        hub = _hub()
+        mine, other = hub.subscribe("u1"), hub.subscribe("u2")
+        hub.dispatch({"user_id": "u1", "event": "unread", "data": {"unread_count": 1}})
+        hub.dispatch({"user_id": notification_stream.BROADCAST, "event": "resync", "data": {}})
+        await asyncio.sleep(0)
+        assert [mine.get_nowait()["event"], mine.get_nowait()["event"]] == ["unread", "resync"]
+        assert other.get_nowait()["event"] == "resync" and other.empty()
+
+        hub.dispatch({"user_id": notification_stream.BROADCAST, "event": "notification",
+                      "data": {}, "exclude_user_id": "u2"})
+        await asyncio.sleep(0)
+        assert mine.get_nowait()["event"] == "notification" and other.empty()
+
+        assert (hub.connection_count, hub.user_count) == (2, 2)
+        hub.unsubscribe("u1", mine)
+        assert (hub.connection_count, hub.user_count) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_overflowing_queue_collapses_to_resync(monkeypatch):
+    monkeypatch.setattr(notification_stream, "QUEUE_SIZE", 2)
+
+    async def scenario():
+        hub = _hub()
+        queue = hub.subscribe("u1")
+        for n in range(3):
+            hub.dispatch({"user_id": "u1", "event": "unread", "data": {"unread_count": n}})
+        await asyncio.sleep(0)
+        assert queue.qsize() == 1 and queue.get_nowait()["event"] == "resync"
+
+    asyncio.run(scenario())
+
+
+def test_event_stream_replays_then_goes_live(monkeypatch):
+    monkeypatch.setattr(notification_stream, "HEARTBEAT_SECONDS", 0.01)
+    hub = _hub()
+    monkeypatch.setattr(notification_stream, "_hub", hub)
+
+    async def scenario():
+        queue = hub.subscribe("u1")
+        disconnected = iter([False, True])
+
+        async def is_disconnected():
+            return next(disconnected)
+
+        stream = notification_stream.event_stream(
+            "u1", queue, is_disconnected, backlog=[("c1", {"id": "n1"})], unread=2,
+        )
+        chunks = [await stream.__anext__() for _ in range(3)]
+        hub.dispatch({"user_id": "u1", "event": "notification", "data": {"id": "n2"}, "id": "c2"})
+        chunks.append(await stream.__anext__())
+        chunks += [chunk async for chunk in stream]
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert chunks == [
+        "retry: 5000\n\n",
+        'id: c1\nevent: notification\ndata: {"id": "n1"}\n\n',
+        'event: unread\ndata: {"unread_count": 2}\n\n',
+        'id: c2\nevent: notification\ndata: {"id": "n2"}\n\n',
+        ": ping\n\n",
+    ]
+    assert hub.connection_count == 0
+
+
+def test_event_stream_ends_when_the_token_expires(monkeypatch):
+    hub = _hub()
+    monkeypatch.setattr(notification_stream, "_hub", hub)
+
+    async def is_disconnected():
+        return False
+
+    async def scenario():
+        queue = hub.subscribe("u1")
+        stream = notification_stream.event_stream(
+            "u1", queue, is_disconnected, backlog=[], unread=0, expires_at=time.time() + 0.05,
+        )
+        return [chunk async for chunk in stream]
+
+    chunks = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert chunks == ["retry: 5000\n\n", 'event: unread\ndata: {"unread_count": 0}\n\n']
+    assert hub.connection_count == 0
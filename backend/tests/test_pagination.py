@@ -0,0 +1,60 @@
+"""
+Unit tests for opaque keyset cursors (utils/pagination.py).
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table
+from sqlalchemy.dialects import postgresql
+
+from utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    after_cursor,
+    decode_cursor,
+    encode_cursor,
+    parse_cursor_param,
+    set_next_cursor,
+)
+
+
+def test_cursor_round_trip():
+    ts = datetime(2026, 3, 10, 12, 30, 45, 123456)
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(ts, row_id)
+    assert "=" not in cursor  # URL-safe, unpadded
+    assert decode_cursor(cursor) == (ts, row_id)
+
+
+def test_cursor_accepts_iso_strings_from_cached_pages():
+    row_id = uuid.uuid4()
+    cursor = encode_cursor("2026-03-10T12:30:45", str(row_id))
+    assert decode_cursor(cursor) == (datetime(2026, 3, 10, 12, 30, 45), row_id)
+
+
+@pytest.mark.parametrize("bad", ["not-a-cursor", "e30", encode_cursor("yesterday", uuid.uuid4())])
+def test_malformed_cursor_is_400(bad):
+    with pytest.raises(HTTPException) as exc:
+        parse_cursor_param(bad)
+    assert exc.value.status_code == 400
+    assert parse_cursor_param(None) is None
+
+
+def test_next_cursor_only_on_full_page():
+    items = [{"created_at": datetime(2026, 1, 2), "id": str(uuid.uuid4())} for _ in range(3)]
+
+    partial = Response()
+    set_next_cursor(partial, items, limit=5)
+    assert NEXT_CURSOR_HEADER not in partial.headers
+
+    full = Response()
+    set_next_cursor(full, items, limit=3)
+    assert decode_cursor(full.headers[NEXT_CURSOR_HEADER])[1] == uuid.UUID(items[-1]["id"])
+
+
+def test_after_cursor_is_row_value_comparison():
+    t = Table("t", MetaData(), Column("created_at", DateTime), Column("id", Integer))
+    clause = after_cursor(t.c.created_at, t.c.id, (datetime(2026, 1, 1), 7))
+    sql = str(clause.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("(t.created_at, t.id) < (")
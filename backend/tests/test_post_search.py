@@ -0,0 +1,38 @@
+"""
+Unit tests for ranked community search. Queries are compiled against the
+Postgres dialect without executing, so no live database is needed.
+"""
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from services import search_service
+
+
+def _sql(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+def test_search_query_uses_indexed_operators():
+    query, score = search_service.build_search_query(Session(), "cross body lead")
+    sql = _sql(query.order_by(score))
+    assert "posts.search_vector @@ websearch_to_tsquery" in sql
+    assert "<%% posts.title" in sql           # trigram word similarity (GIN), pyformat-escaped
+    assert "user_profiles.username ILIKE" in sql
+    assert "ts_rank_cd(posts.search_vector" in sql
+    assert "ln(" in sql and "reaction_count" in sql
+
+
+def test_username_pattern_escapes_like_wildcards():
+    query, _ = search_service.build_search_query(Session(), "50%_off")
+    params = query.statement.compile(dialect=postgresql.dialect()).params
+    assert "%50\\%\\_off%" in params.values()
+
+
+def test_highlight_is_html_escaped():
+    fragment = "<script>x</script> basic \x02step\x03 drill"
+    assert search_service._render_highlight(fragment) == (
+        "&lt;script&gt;x&lt;/script&gt; basic <mark>step</mark> drill"
+    )
+    # ts_headline returns the leading text even when nothing matched.
+    assert search_service._render_highlight("no match here") is None
+    assert search_service._render_highlight(None) is None
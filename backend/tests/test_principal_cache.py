@@ -0,0 +1,135 @@
+"""
+Unit tests for the request principal cache and the revocation Bloom filter.
+Redis is a dict behind monkeypatch and sessions are unbound, so any SQL the
+code tried to run would raise — which is exactly what these tests check
+doesn't happen on the cached paths.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from models.user import Subscription, SubscriptionStatus, SubscriptionTier, User, UserRole
+from services import clave_service, principal_service, redis_service, revocation_filter, tier_service
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(("get", key))
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def exists(self, key):
+        self.calls.append(("exists", key))
+        return int(key in self.store)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(principal_service, "get_redis_client", lambda: fake)
+    monkeypatch.setattr(redis_service, "get_redis_client", lambda: fake)
+    return fake
+
+
+def _principal(tier=SubscriptionTier.ADVANCED, status=SubscriptionStatus.ACTIVE, period_end=None):
+    user = User(
+        id=uuid.uuid4(), email="a@b.co", auth_provider="email", social_id=None,
+        is_verified=True, role=UserRole.STUDENT, hashed_password="secret-hash",
+        created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 2),
+    )
+    return principal_service.Principal(user, status, tier, period_end)
+
+
+def test_snapshot_round_trip_needs_no_sql_and_omits_password():
+    original = _principal(period_end=datetime(2099, 1, 1))
+    raw = principal_service._to_snapshot(original)
+    assert "secret-hash" not in raw
+
+    db = Session()  # unbound: any query would raise
+    restored = principal_service._from_snapshot(raw, db)
+    assert restored.user in db and not db.dirty
+    assert restored.user.email == "a@b.co" and restored.user.role == UserRole.STUDENT
+    assert restored.tier == "advanced" and restored.is_pro
+
+
+def test_resolve_serves_snapshot_then_request_memo(redis):
+    original = _principal()
+    key = f"principal:{original.user.id}"
+    redis.store[key] = principal_service._to_snapshot(original)
+
+    db = Session()
+    first = principal_service.resolve(db, original.user.id)
+    second = principal_service.resolve(db, original.user.id)
+    assert first is second
+    assert redis.calls == [("get", key)]
+
+
+def test_services_answer_from_principal(redis):
+    original = _principal(tier=SubscriptionTier.PERFORMER, period_end=datetime.utcnow() - timedelta(days=1))
+    redis.store[f"principal:{original.user.id}"] = principal_service._to_snapshot(original)
+    db = Session()
+    principal_service.resolve(db, original.user.id)
+
+    user_id = str(original.user.id)
+    assert clave_service.is_user_pro(user_id, db) is True
+    # Lapsed period: pro by status, but the effective tier is Rookie.
+    assert tier_service.user_tier(user_id, db) == "rookie"
+    assert principal_service.cached(db, uuid.uuid4()) is None
+
+
+def test_subscription_change_drops_memo_and_parks_invalidation(redis):
+    original = _principal()
+    redis.store[f"principal:{original.user.id}"] = principal_service._to_snapshot(original)
+    db = Session()
+    principal_service.resolve(db, original.user.id)
+
+    sub = Subscription(user_id=original.user.id)
+    db.add(sub)
+    principal_service._invalidate_on_subscription_change(None, None, sub)
+
+    assert principal_service.cached(db, original.user.id) is None
+    callbacks = db.info["after_commit_callbacks"]
+    callbacks[0]()
+    assert f"principal:{original.user.id}" not in redis.store
+
+
+def test_bloom_filter_membership():
+    bloom = revocation_filter.BloomFilter(bits=1 << 12)
+    digests = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(50)]
+    for d in digests:
+        bloom.add(d)
+    assert all(d in bloom for d in digests)
+    others = [hashlib.sha256(f"x{i}".encode()).hexdigest() for i in range(200)]
+    assert sum(d in bloom for d in others) < 10
+
+
+def test_blacklist_check_skips_redis_on_filter_miss(redis, monkeypatch):
+    filt = revocation_filter.RevocationFilter()
+    monkeypatch.setattr(filt, "_ensure_started", lambda: None)
+    monkeypatch.setattr(revocation_filter, "_filter", filt)
+
+    # Not synced yet: every check goes to Redis.
+    assert redis_service.is_token_blacklisted("tok-a") is False
+    assert len(redis.calls) == 1
+
+    revoked = hashlib.sha256(b"tok-revoked").hexdigest()
+    redis.store[f"blacklisted:token:{revoked}"] = "1"
+    filt._bloom = revocation_filter.BloomFilter()
+    filt.add(revoked)
+
+    assert redis_service.is_token_blacklisted("tok-a") is False
+    assert len(redis.calls) == 1  # answered locally
+    assert redis_service.is_token_blacklisted("tok-revoked") is True
+    assert len(redis.calls) == 2  # filter hit confirmed against Redis
@@ -0,0 +1,92 @@
+"""
+Unit tests for the per-user completed-lesson set (progress_service). Redis
+is a dict of sets behind monkeypatch and sessions are MagicMock, so no live
+services are needed.
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import progress_service
+from services.progress_service import SENTINEL
+from services.skill_tree_access import level_completion, resolve_level_unlocks
+
+KEY = progress_service.COMPLETED_KEY.format(user_id="u1")
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.sets = {}
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(progress_service, "get_redis_client", lambda: fake)
+    return fake
+
+
+def _db(completed):
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [(lid,) for lid in completed]
+    return db
+
+
+def test_loaded_set_answers_without_sql(redis):
+    redis.sets[KEY] = {SENTINEL, "les1", "les2"}
+    db = _db([])
+
+    assert progress_service.completed_lessons("u1", db) == {"les1", "les2"}
+    db.query.assert_not_called()
+
+
+def test_cold_load_merges_completions_that_raced_it(redis):
+    redis.sets[KEY] = {"les3"}  # completed after the load's read; no sentinel yet
+    db = _db(["les1"])
+
+    assert progress_service.completed_lessons("u1", db) == {"les1", "les3"}
+    assert redis.sets[KEY] == {SENTINEL, "les1", "les3"}
+
+
+def test_redis_down_reads_user_progress(monkeypatch):
+    def down():
+        raise ConnectionError("redis down")
+    monkeypatch.setattr(progress_service, "get_redis_client", down)
+
+    assert progress_service.completed_lessons("u1", _db(["les1"])) == {"les1"}
+
+
+def test_consistency_check_repairs_both_ways(redis):
+    redis.sets[KEY] = {SENTINEL, "les1", "gone"}
+
+    missing, extra = progress_service.check_completed_lessons("u1", _db(["les1", "les2"]), fix=True)
+
+    assert (missing, extra) == ({"les2"}, {"gone"})
+    assert redis.sets[KEY] == {SENTINEL, "les1", "les2"}
+
+
+def test_unlocks_come_from_the_cached_set(redis):
+    redis.sets[KEY] = {SENTINEL, "les1"}
+    completed = progress_service.completed_lessons("u1", _db([]))
+    level_lessons = {"L1": ("les1",), "L2": ("les2",)}
+
+    completion = level_completion(level_lessons, completed)
+    assert resolve_level_unlocks(list(level_lessons), {"L2": ("L1",)}, completion) == {"L1": True, "L2": True}
@@ -0,0 +1,129 @@
+"""
+Unit tests for the sliding-window rate limiter, its SQL fallback and the
+X-RateLimit-* headers. Redis is a MagicMock; no live services needed.
+"""
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import rate_limit_service, redis_service
+from utils.rate_limit_headers import RateLimitHeadersMiddleware, RateLimitResult, header_values, record
+
+
+def test_sliding_window_hit_maps_script_reply(monkeypatch):
+    client = MagicMock()
+    script = MagicMock(return_value=[1, 3, 1500])
+    client.register_script.return_value = script
+    monkeypatch.setattr(redis_service, "get_redis_client", lambda: client)
+    monkeypatch.setattr(redis_service, "_sliding_window_script", None)
+
+    result = redis_service.sliding_window_hit("post:u1", 10, 3600)
+
+    assert result == RateLimitResult(allowed=True, limit=10, remaining=7, reset_seconds=2)
+    keys = script.call_args.kwargs["keys"]
+    # Both windows share a hash tag (same cluster slot) and are adjacent.
+    assert all(k.startswith("rl:{post:u1}:") for k in keys)
+    assert int(keys[0].rsplit(":", 1)[1]) == int(keys[1].rsplit(":", 1)[1]) + 1
+
+
+def test_refund_decrements_the_windows_hit(monkeypatch):
+    client = MagicMock()
+    script = MagicMock(return_value=1)
+    client.register_script.return_value = script
+    monkeypatch.setattr(redis_service, "get_redis_client", lambda: client)
+    monkeypatch.setattr(redis_service, "_sliding_window_refund_script", None)
+
+    rate_limit_service.refund("reaction", "u1")
+
+    assert script.call_args.kwargs["args"] == [1]
+    assert all(k.startswith("rl:{reaction:u1}:") for k in script.call_args.kwargs["keys"])
+
+
+def test_rejected_post_does_not_use_up_allowance(monkeypatch):
+    from services import post_service
+
+    checks = []
+    monkeypatch.setattr(post_service, "community_participation_status", lambda uid, db: {"allowed": True})
+    monkeypatch.setattr(rate_limit_service, "check", lambda *args: checks.append(args) or (True, {}))
+
+    result = post_service.create_post(user_id="u1", post_type="lab", title="t", tags=[], db=MagicMock())
+
+    assert result == {"success": False, "message": "At least one tag is required"}
+    assert checks == []
+
+
+def test_check_rate_limit_fails_open_when_redis_down(monkeypatch):
+    def boom():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_service, "get_redis_client", boom)
+    assert redis_service.check_rate_limit("1.2.3.4", "login") is True
+
+
+def test_tier_lookup_is_cached(monkeypatch):
+    store = {}
+    client = MagicMock()
+    client.get.side_effect = store.get
+    client.setex.side_effect = lambda k, ttl, v: store.__setitem__(k, v)
+    monkeypatch.setattr(rate_limit_service.redis_service, "get_redis_client", lambda: client)
+    lookups = []
+    monkeypatch.setattr(rate_limit_service, "is_user_pro", lambda uid, db: lookups.append(uid) or True)
+    monkeypatch.setattr(
+        rate_limit_service.redis_service, "sliding_window_hit",
+        lambda key, limit, window: RateLimitResult(True, limit, limit - 1, window),
+    )
+
+    for _ in range(3):
+        allowed, info = rate_limit_service.check("post", "u1", MagicMock())
+    assert allowed and info["limit"] == 20
+    assert lookups == ["u1"]
+
+
+def test_falls_back_to_sql_count_when_redis_down(monkeypatch):
+    def boom(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limit_service.redis_service, "sliding_window_hit", boom)
+    monkeypatch.setattr(rate_limit_service, "_user_is_pro", lambda uid, db: False)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.scalar.return_value = 10
+
+    allowed, info = rate_limit_service.check("post", "u1", db)
+    assert not allowed
+    assert info["limit"] == 10 and info["remaining"] == 0
+    assert "hourly limit of 10 posts" in info["message"]
+
+
+def test_headers_report_the_most_restrictive_result():
+    assert header_values([]) == {}
+    headers = header_values([
+        RateLimitResult(True, 600, 598, 60),
+        RateLimitResult(False, 5, 0, 42),
+    ])
+    assert headers == {
+        "X-RateLimit-Limit": "5",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": "42",
+        "Retry-After": "42",
+    }
+
+
+def test_middleware_sees_results_recorded_in_sync_endpoints():
+    app = FastAPI()
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+    @app.get("/limited")
+    def limited():  # sync: runs in the threadpool
+        record(RateLimitResult(True, 30, 12, 900))
+        return {}
+
+    @app.get("/free")
+    def free():
+        return {}
+
+    client = TestClient(app)
+    limited_resp = client.get("/limited")
+    assert limited_resp.headers["X-RateLimit-Remaining"] == "12"
+    assert "Retry-After" not in limited_resp.headers
+    assert "X-RateLimit-Limit" not in client.get("/free").headers
@@ -0,0 +1,154 @@
+"""
+Unit tests for the shop catalog snapshot and stock reservation. Redis is a
+dict behind monkeypatch, sessions are MagicMock or unbound, and SQL is only
+compiled — no live services are needed.
+"""
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from services import clave_service, shop_service, tier_service
+from services.shop_service import CatalogItem, ShopCatalog
+
+
+def _item(sku, **overrides):
+    fields = dict(
+        sku=sku, kind="border", name=sku, description=None, price_claves=100, rarity=None,
+        tier_required=None, stock_total=None, stock_period=None, max_per_user=None,
+        grants={}, metadata_json={}, is_active=True, sort_order=0,
+    )
+    fields.update(overrides)
+    return CatalogItem(**fields)
+
+
+DROP = _item("golden_ticket", kind="ticket", stock_total=2, stock_period="lifetime")
+BORDER = _item("gold_border", sort_order=1)
+CATALOG = ShopCatalog([BORDER, DROP, _item("retired", is_active=False)])
+
+
+class _FakeRedis:
+    def __init__(self, store=None):
+        self.store = dict(store or {})
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        if not (nx and key in self.store):
+            self.store[key] = str(value)
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def eval(self, script, numkeys, key):
+        if script == shop_service._RESERVE:
+            if key not in self.store:
+                return -2
+            if int(self.store[key]) <= 0:
+                return -1
+            self.store[key] = str(int(self.store[key]) - 1)
+            return int(self.store[key])
+        if key in self.store:
+            self.store[key] = str(int(self.store[key]) + 1)
+
+
+@pytest.fixture
+def shop(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(shop_service, "get_catalog", lambda db: CATALOG)
+    monkeypatch.setattr(shop_service, "get_redis_client", lambda: redis)
+    monkeypatch.setattr(tier_service, "require_tier_at_least", lambda *a: True)
+    return redis
+
+
+def _spend(monkeypatch, calls):
+    def spend(user_id, amount, reason, db, reference_id=None):
+        calls.append(reference_id)
+        return True, 900, SimpleNamespace(id=uuid.uuid4())
+    monkeypatch.setattr(clave_service, "spend_claves_with_transaction", spend)
+
+
+def test_list_items_reads_the_snapshot_and_one_mget(shop, monkeypatch):
+    shop.store[shop_service._stock_key(DROP, "lifetime")] = "1"
+    db = MagicMock()
+
+    items = shop_service.list_items(db)
+
+    assert [i["sku"] for i in items] == ["golden_ticket", "gold_border"]
+    assert [i["remaining_stock"] for i in items] == [1, None]
+    db.query.assert_not_called()
+
+
+def test_unlimited_purchase_links_the_returned_transaction(shop, monkeypatch):
+    spent = []
+    _spend(monkeypatch, spent)
+    reserved = []
+    monkeypatch.setattr(shop_service, "_reserve_unit", lambda *a: reserved.append(a) or True)
+    db = MagicMock()
+
+    result = shop_service.purchase("u1", "gold_border", db)
+
+    purchase_row = db.add.call_args[0][0]
+    assert purchase_row.clave_txn_id is not None
+    assert spent == [purchase_row.id] and result["purchase_id"] == str(purchase_row.id)
+    assert reserved == [] and shop.store == {}
+
+
+def test_sold_out_drop_is_refused_before_paying(shop, monkeypatch):
+    spent = []
+    _spend(monkeypatch, spent)
+    shop.store[shop_service._stock_key(DROP, "lifetime")] = "0"
+
+    with pytest.raises(shop_service.OutOfStock):
+        shop_service.purchase("u1", "golden_ticket", MagicMock())
+    assert spent == []
+
+
+def test_database_decides_when_redis_is_behind(shop, monkeypatch):
+    _spend(monkeypatch, [])
+    key = shop_service._stock_key(DROP, "lifetime")
+    shop.store[key] = "1"
+    monkeypatch.setattr(shop_service, "_reserve_unit", lambda *a: False)
+
+    with pytest.raises(shop_service.OutOfStock):
+        shop_service.purchase("u1", "golden_ticket", MagicMock())
+    assert key not in shop.store  # dropped, so it reseeds from the counter row
+
+
+def test_failed_purchase_gives_the_unit_back(shop, monkeypatch):
+    monkeypatch.setattr(
+        clave_service, "spend_claves_with_transaction", lambda *a, **k: (False, 10, None)
+    )
+    key = shop_service._stock_key(DROP, "lifetime")
+    shop.store[key] = "2"
+
+    with pytest.raises(shop_service.InsufficientClaves):
+        shop_service.purchase("u1", "golden_ticket", MagicMock())
+    assert shop.store[key] == "2"
+
+
+def test_reservation_is_a_conditional_update_seeded_once(monkeypatch):
+    statements = []
+    results = iter([None, None, (2,)])
+
+    def execute(self, stmt, *args, **kwargs):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        result.first.return_value = next(results)
+        return result
+
+    monkeypatch.setattr(Session, "execute", execute)
+    purchase_id = uuid.uuid4()
+
+    assert shop_service._reserve_unit(Session(), DROP, "lifetime", purchase_id)
+
+    take, seed, retake = statements
+    assert take == retake
+    assert "UPDATE shop_stock_counters SET sold=(shop_stock_counters.sold + " in take
+    assert "shop_stock_counters.sold < " in take and "RETURNING shop_stock_counters.sold" in take
+    assert "INSERT INTO shop_stock_counters" in seed and "ON CONFLICT DO NOTHING" in seed
+    assert "shop_purchases.id != " in seed  # the purchase being made isn't counted twice
@@ -0,0 +1,143 @@
+"""
+Unit tests for the materialized user_stats counters. Sessions are unbound or
+MagicMock and queries are only compiled, so no live services are needed.
+"""
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from models.community import UserStats
+from services import badge_service, user_stats_service
+
+
+def _sql(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+def _post(**overrides):
+    fields = dict(
+        user_id="u1", post_type="stage", video_type="motw", mux_asset_id="asset",
+        is_deleted=False, moderation_status="active",
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def _capture_apply(monkeypatch):
+    calls = []
+    monkeypatch.setattr(user_stats_service, "apply", lambda deltas, db: calls.append(deltas))
+    return calls
+
+
+def test_post_and_like_deltas(monkeypatch):
+    calls = _capture_apply(monkeypatch)
+
+    user_stats_service.record_post(_post(), +1, None)
+    user_stats_service.record_post(_post(post_type="lab", video_type=None, mux_asset_id=None), +1, None)
+    user_stats_service.record_likes(_post(), "like", +1, None)
+    user_stats_service.record_post(_post(), -1, None, reaction_counts={"like": 4, "fire": 1})
+
+    assert calls == [
+        {"u1": {"videos_posted": 1, "motw_videos": 1}},
+        {"u1": {"questions_posted": 1}},
+        {"u1": {"motw_likes": 1}},
+        {"u1": {"videos_posted": -1, "motw_videos": -1, "motw_likes": -5, "fires_received": -1}},
+    ]
+
+
+def test_visibility_rule():
+    assert user_stats_service.is_counted(_post())
+    assert not user_stats_service.is_counted(_post(is_deleted=True))
+    assert not user_stats_service.is_counted(_post(moderation_status="pending"))
+
+
+def test_apply_increments_sql_side():
+    stats = UserStats(user_id=uuid.uuid4(), motw_likes=7)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = stats
+
+    user_stats_service.apply({str(stats.user_id): {"motw_likes": 1, "guild_likes": 0}}, db)
+
+    expr = str(stats.motw_likes.compile(dialect=postgresql.dialect()))
+    assert expr.startswith("greatest(coalesce(user_stats.motw_likes")
+    assert stats.guild_likes is None  # zero deltas are not written
+    db.flush.assert_called_once()
+
+
+def test_reconcile_rewrites_only_drifted_rows(monkeypatch):
+    u1, u2, u3 = (str(uuid.uuid4()) for _ in range(3))
+    fresh = UserStats(user_id=uuid.UUID(u1), comments_posted=2,
+                      **{c: 0 for c in user_stats_service.COUNTER_COLUMNS if c != "comments_posted"})
+    stale = UserStats(user_id=uuid.UUID(u2), comments_posted=9)
+    results = iter([
+        [],                                   # reactions given
+        [],                                   # likes received
+        [],                                   # posts
+        [(u1, 2, 0), (u2, 3, 1)],             # replies: comments, solutions
+        [fresh, stale],                       # existing user_stats rows
+    ])
+    monkeypatch.setattr(Query, "all", lambda self: next(results))
+    db = Session()
+
+    changed = user_stats_service.reconcile(db, [u1, u2, u3])
+
+    assert changed == [u2]  # u3 has no activity and no row: left alone
+    assert stale.comments_posted == 3 and stale.solutions_accepted_count == 1
+    assert not db.new
+
+
+def test_get_user_stats_is_one_lookup(monkeypatch):
+    executed = []
+    stats = UserStats(user_id=uuid.uuid4(), reactions_received_count=5, guild_videos=2)
+
+    def first(query):
+        executed.append(_sql(query))
+        return stats, 4, 1
+
+    monkeypatch.setattr(Query, "first", first)
+    result = badge_service.get_user_stats(str(stats.user_id), Session())
+
+    assert len(executed) == 1
+    assert "LEFT OUTER JOIN user_profiles" in executed[0]
+    assert "WHERE user_stats.user_id = " in executed[0]
+    assert result["likes_received"] == 5 and result["guild_videos"] == 2
+    assert result["current_streak"] == 4 and result["referrals_converted"] == 1
+    assert result["comments_posted"] == 0
+
+
+def test_late_video_attach_counts_once(monkeypatch):
+    from services import post_service
+
+    calls = _capture_apply(monkeypatch)
+    post = _post(id="p1", mux_asset_id=None, mux_playback_id=None)
+
+    post_service.attach_post_video(post, "asset-1", "play-1", Session())
+    post_service.attach_post_video(post, "asset-1", "play-1", Session())
+    post_service.detach_post_video(post, Session())
+    post_service.attach_post_video(_post(id="p2", mux_asset_id=None, moderation_status="pending"), "a", "p", Session())
+
+    assert calls == [
+        {"u1": {"videos_posted": 1, "motw_videos": 1}},
+        {"u1": {"videos_posted": -1, "motw_videos": -1}},
+    ]
+    assert post.mux_asset_id is None and post.mux_playback_id is None
+
+
+def test_content_badges_read_counters_not_posts(monkeypatch):
+    from services import community_jobs
+
+    checked = []
+    monkeypatch.setattr(badge_service, "get_user_stats",
+                        lambda user_id, db: {"videos_posted": 12, "motw_videos": 3, "questions_posted": 4})
+    monkeypatch.setattr(badge_service, "check_and_award_badges",
+                        lambda user_id, req, value, db: checked.append((req, value)))
+    db = MagicMock()
+
+    community_jobs.post_created(db, "u1", "stage", video_type="motw", has_video=True)
+    community_jobs.post_created(db, "u1", "lab")
+
+    assert checked == [("videos_posted", 12), ("motw_videos", 3), ("questions_posted", 4)]
+    db.query.assert_not_called()
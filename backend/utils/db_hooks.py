@@ -0,0 +1,51 @@
+"""Post-commit side-effect hooks for SQLAlchemy sessions.
+
+Services flush, routers commit. Anything that mirrors DB state into Redis
+(leaderboards, caches, counters) must only run once the write is durable —
+otherwise a later rollback leaves Redis describing rows that never existed.
+
+`after_commit(db, fn)` parks `fn` on the session and runs it right after
+the next successful COMMIT. A ROLLBACK drops the parked callbacks. Callback
+failures are logged and swallowed: the primary write already succeeded and
+the mirrored state has its own drift-repair path.
+"""
+import logging
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "after_commit_callbacks"
+
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run `callback` once `db` commits. Dropped if the session rolls back."""
+    info = getattr(db, "info", None)
+    if not isinstance(info, dict):
+        # Not a real Session (e.g. a MagicMock in unit tests) — nothing will
+        # ever commit, so there's nothing to defer to.
+        return
+    info.setdefault(_PENDING_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    callbacks = session.info.pop(_PENDING_KEY, None)
+    if not callbacks:
+        return
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception("after_commit callback failed (non-fatal)")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction) -> None:
+    # A rolled-back SAVEPOINT leaves the outer transaction (and whatever it
+    # already wrote) alive, so only an outermost rollback discards.
+    if getattr(previous_transaction, "nested", False):
+        return
+    session.info.pop(_PENDING_KEY, None)
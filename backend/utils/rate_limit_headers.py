@@ -0,0 +1,68 @@
+"""X-RateLimit-* response headers.
+
+Rate-limit checks run deep inside services (post_service, redis_service)
+that never see the Response. Each check records its outcome in a
+request-scoped holder; ``RateLimitHeadersMiddleware`` then reports the most
+restrictive one:
+
+    X-RateLimit-Limit      requests allowed in the window
+    X-RateLimit-Remaining  requests left (after this one)
+    X-RateLimit-Reset      seconds until a request is allowed again / window rolls
+    Retry-After            only on denial
+
+The holder is a mutable list placed in a ContextVar *before* the endpoint
+runs, so sync endpoints executing in the threadpool (which get a copy of
+the context) append to the same list the middleware reads.
+"""
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_seconds: int
+
+
+_results: ContextVar[Optional[list]] = ContextVar("rate_limit_results", default=None)
+
+
+def record(result: RateLimitResult) -> None:
+    """Note a rate-limit outcome for the current request (no-op outside one)."""
+    holder = _results.get()
+    if holder is not None:
+        holder.append(result)
+
+
+def header_values(results: list) -> dict:
+    """Headers for the most restrictive of ``results`` (a denial wins)."""
+    if not results:
+        return {}
+    worst = min(results, key=lambda r: (r.allowed, r.remaining))
+    headers = {
+        "X-RateLimit-Limit": str(worst.limit),
+        "X-RateLimit-Remaining": str(worst.remaining),
+        "X-RateLimit-Reset": str(worst.reset_seconds),
+    }
+    if not worst.allowed:
+        headers["Retry-After"] = str(max(worst.reset_seconds, 1))
+    return headers
+
+
+class RateLimitHeadersMiddleware(BaseHTTPMiddleware):
+    """Attach X-RateLimit-* headers when the request hit a rate limiter."""
+
+    async def dispatch(self, request: Request, call_next):
+        holder: list = []
+        token = _results.set(holder)
+        try:
+            response = await call_next(request)
+        finally:
+            _results.reset(token)
+        for name, value in header_values(holder).items():
+            response.headers.setdefault(name, value)
+        return response
@@ -0,0 +1,103 @@
+"""Process-wide snapshots invalidated through a Redis version counter.
+
+For reference data that is read on hot paths but edited rarely (the course
+catalog, badge definitions). Each worker keeps one immutable snapshot built
+by ``build(db)``; committed ORM writes to the watched models INCR a Redis
+version key, and every ``get`` compares the snapshot's version with it (one
+GET) and rebuilds on mismatch. The writing worker also drops its own copy
+immediately.
+
+If Redis can't be asked, a snapshot is trusted for ``local_ttl`` seconds
+and then rebuilt, so a Redis outage costs freshness, never correctness
+for longer than that.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from services.redis_service import get_redis_client
+from utils.db_hooks import after_commit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class VersionedCache(Generic[T]):
+    def __init__(
+        self,
+        name: str,
+        version_key: str,
+        build: Callable[[Session], T],
+        local_ttl: float = 60,
+    ) -> None:
+        self.name = name
+        self.version_key = version_key
+        self._build = build
+        self.local_ttl = local_ttl
+        # (value, version, built_at) — swapped as a whole, never mutated.
+        self._entry: Optional[Tuple[T, Optional[int], float]] = None
+        self._lock = threading.Lock()
+
+    def _current_version(self) -> Optional[int]:
+        try:
+            return int(get_redis_client().get(self.version_key) or 0)
+        except Exception as e:
+            logger.debug(f"{self.name} version read failed: {e}")
+            return None
+
+    def _is_current(self, entry, version: Optional[int]) -> bool:
+        if entry is None:
+            return False
+        _, built_version, built_at = entry
+        if version is None:
+            return time.monotonic() - built_at < self.local_ttl
+        return built_version == version
+
+    def get(self, db: Session) -> T:
+        """The current snapshot, rebuilt if the version moved."""
+        version = self._current_version()
+        entry = self._entry
+        if self._is_current(entry, version):
+            return entry[0]
+        with self._lock:
+            entry = self._entry
+            if self._is_current(entry, version):
+                return entry[0]
+            value = self._build(db)
+            self._entry = (value, version, time.monotonic())
+            logger.info(f"{self.name} snapshot rebuilt (version {version})")
+            return value
+
+    @property
+    def version(self) -> Optional[int]:
+        """Version of the snapshot this worker holds (None if none/unknown)."""
+        entry = self._entry
+        return entry[1] if entry else None
+
+    def invalidate(self) -> None:
+        """Drop this worker's snapshot and tell the others to rebuild theirs."""
+        self._entry = None
+        try:
+            get_redis_client().incr(self.version_key)
+        except Exception as e:
+            logger.warning(
+                f"{self.name} version bump failed (other workers refresh within {self.local_ttl}s): {e}"
+            )
+
+    def watch(self, *models) -> None:
+        """Invalidate after any committed ORM insert/update/delete of `models`."""
+        def on_change(mapper, connection, target) -> None:
+            session = object_session(target)
+            if session is None:
+                self.invalidate()
+            else:
+                after_commit(session, self.invalidate)
+
+        for model in models:
+            for name in ("after_insert", "after_update", "after_delete"):
+                event.listen(model, name, on_change)
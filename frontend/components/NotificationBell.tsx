@@ -21,6 +21,11 @@ interface Notification {
   actor_avatar_url?: string | null;
 }
 
+// Reopening the notification stream after the server refused a reconnect.
+const STREAM_BACKOFF_MS = 1000;
+const STREAM_BACKOFF_CAP_MS = 60000;
+const STREAM_MAX_RECONNECTS = 5;
+
 const KNOWN_TYPES = new Set([
   "reaction_received",
   "reply_received",
@@ -117,14 +122,76 @@ export default function NotificationBell() {
     }
   }, []);
 
-  // Poll for unread count every 30 seconds
+  const isOpenRef = useRef(isOpen);
+  isOpenRef.current = isOpen;
+
+  // Live updates over SSE. The stream opens with the current unread count
+  // and EventSource reconnects (resuming via Last-Event-ID) on its own.
+  // The server ends the stream when the access token expires; if the
+  // reconnect is then refused (401), the source closes for good, so we
+  // refresh the token through apiClient and reopen with backoff, falling
+  // back to polling every 30 seconds after repeated failures (or when the
+  // browser has no EventSource).
   useEffect(() => {
-    fetchUnreadCount();
-    pollInterval.current = setInterval(fetchUnreadCount, 30000);
+    let source: EventSource | null = null;
+    let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+    let failures = 0;
+    let cancelled = false;
+
+    const startPolling = () => {
+      fetchUnreadCount();
+      pollInterval.current = setInterval(fetchUnreadCount, 30000);
+    };
+
+    const connect = () => {
+      const stream = apiClient.openNotificationStream();
+      source = stream;
+      stream.onopen = () => {
+        failures = 0;
+      };
+      stream.onerror = () => {
+        // Network drops stay CONNECTING and are retried by the browser.
+        if (stream.readyState !== EventSource.CLOSED) return;
+        stream.close();
+        if (failures >= STREAM_MAX_RECONNECTS) {
+          startPolling();
+          return;
+        }
+        const delay = Math.min(STREAM_BACKOFF_MS * 2 ** failures, STREAM_BACKOFF_CAP_MS);
+        failures += 1;
+        reconnectTimer = setTimeout(async () => {
+          // Goes through apiClient.request, which refreshes an expired token.
+          await fetchUnreadCount();
+          if (!cancelled) connect();
+        }, delay);
+      };
+      stream.addEventListener("unread", (e) => {
+        const data = JSON.parse((e as MessageEvent).data);
+        if (typeof data.unread_count === "number") setUnreadCount(data.unread_count);
+        else fetchUnreadCount();
+      });
+      stream.addEventListener("notification", (e) => {
+        const data = JSON.parse((e as MessageEvent).data);
+        if (typeof data.unread_count === "number") setUnreadCount(data.unread_count);
+        else setUnreadCount((n) => n + 1);
+        if (isOpenRef.current) fetchNotifications();
+      });
+      stream.addEventListener("resync", () => {
+        fetchUnreadCount();
+        if (isOpenRef.current) fetchNotifications();
+      });
+    };
+
+    if (typeof EventSource === "undefined") startPolling();
+    else connect();
+
     return () => {
+      cancelled = true;
+      if (reconnectTimer) clearTimeout(reconnectTimer);
       if (pollInterval.current) clearInterval(pollInterval.current);
+      source?.close();
     };
-  }, [fetchUnreadCount]);
+  }, [fetchUnreadCount, fetchNotifications]);
 
   // Load notifications when dropdown opens
   useEffect(() => {
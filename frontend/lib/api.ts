@@ -1522,6 +1522,12 @@ class ApiClient {
     return this.request<{ unread_count: number }>("/api/notifications/unread-count", { forceRefresh: true });
   }
 
+  /** Live notification events (SSE); the auth cookie rides along. The server
+   *  ends the stream at token expiry, so callers refresh and reopen on close. */
+  openNotificationStream(): EventSource {
+    return new EventSource(`${this.baseUrl}/api/notifications/stream`, { withCredentials: true });
+  }
+
   async markNotificationRead(notificationId: string) {
     return this.request<{ success: boolean }>(`/api/notifications/${notificationId}/read`, {
       method: "POST",
@@ -1813,7 +1819,7 @@ class ApiClient {
   // Admin — Enhanced Dashboard & Management
   // ============================================
 
-  async getDashboardStats() {
+  async getDashboardStats(refresh = false) {
     return this.request<{
       total_users: number;
       users_this_week: number;
@@ -1861,7 +1867,8 @@ class ApiClient {
         students_started: number;
         completion_rate: number;
       }>;
-    }>("/api/admin/dashboard-stats");
+      as_of: string;
+    }>(`/api/admin/dashboard-stats${refresh ? "?refresh=true" : ""}`);
   }
 
   async getStudentDetail(userId: string) {